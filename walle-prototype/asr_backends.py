@@ -0,0 +1,512 @@
+#!/usr/bin/env python3
+"""
+WALL-E 语音识别后端
+统一的 ASR 接口,支持 Google Web API 以及本地 CPU 离线模型 (Vosk / faster-whisper),
+通过 ASR_BACKEND 环境变量选择;本地模型进程内只加载一次并在启动时预热
+"""
+
+import atexit
+import contextvars
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, Type
+
+import speech_recognition as sr
+from audio_preprocess import get_preprocessor
+from deadline import deadline_stage, stage_timeout
+from logger_config import setup_logger
+from metrics import LatencyStats, format_summary
+
+logger = setup_logger("WALL-E.ASR", level=os.getenv("LOG_LEVEL", "INFO"))
+
+# 本地模型统一使用 16kHz 16 位单声道输入
+MODEL_SAMPLE_RATE = 16000
+MODEL_SAMPLE_WIDTH = 2
+
+
+@dataclass
+class ASRResult:
+    """一次识别的结果"""
+    text: str
+    confidence: Optional[float] = None
+    backend: str = ""
+    latency_ms: float = 0.0
+
+
+class ASRStream:
+    """
+    流式识别会话
+
+    默认实现只缓存音频,说完后整句识别;支持流式的后端可以在
+    accept() 中返回中间识别结果
+    """
+
+    def __init__(self, backend: "ASRBackend", sample_rate: int, sample_width: int):
+        self.backend = backend
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self._chunks = []
+
+    def accept(self, frame: bytes) -> Optional[str]:
+        """
+        送入一帧音频
+
+        Returns:
+            中间识别结果有变化时返回新的结果,否则返回 None
+        """
+        self._chunks.append(frame)
+        return None
+
+    def finish(self) -> str:
+        """语音结束,返回最终识别结果"""
+        audio = sr.AudioData(b"".join(self._chunks), self.sample_rate, self.sample_width)
+        return self.backend.recognize(audio)
+
+
+class ASRBackend:
+    """语音识别后端基类"""
+
+    name = "base"
+
+    def __init__(self, language: str = "zh-CN"):
+        self.language = language
+        self._loaded = False
+        self._load_lock = threading.Lock()
+
+    def load(self):
+        """加载模型 (只执行一次)"""
+        with self._load_lock:
+            if self._loaded:
+                return
+            start = time.perf_counter()
+            self._load()
+            self._loaded = True
+            elapsed = (time.perf_counter() - start) * 1000
+            logger.info(f"ASR 后端 {self.name} 加载完成,耗时 {elapsed:.0f}ms")
+
+    def _load(self):
+        pass
+
+    def warm_up(self):
+        """用一段静音跑一次识别,让首条指令不再承担初始化开销"""
+        try:
+            self.load()
+            start = time.perf_counter()
+            silence = sr.AudioData(
+                b"\x00" * (MODEL_SAMPLE_RATE // 2 * MODEL_SAMPLE_WIDTH),
+                MODEL_SAMPLE_RATE,
+                MODEL_SAMPLE_WIDTH,
+            )
+            self._warm_up(silence)
+            elapsed = (time.perf_counter() - start) * 1000
+            logger.info(f"ASR 后端 {self.name} 预热完成,耗时 {elapsed:.0f}ms")
+        except Exception as e:
+            logger.warning(f"ASR 后端 {self.name} 预热失败: {e}")
+
+    def _warm_up(self, audio: sr.AudioData):
+        try:
+            self._recognize(audio)
+        except sr.UnknownValueError:
+            pass
+
+    def recognize(self, audio: sr.AudioData) -> str:
+        """
+        识别一段语音
+
+        Args:
+            audio: 语音片段
+
+        Returns:
+            识别出的文本
+
+        Raises:
+            sr.UnknownValueError: 无法识别语音内容
+            sr.RequestError: 识别服务不可用
+        """
+        self.load()
+        with deadline_stage("asr"):
+            return self._recognize(audio)
+
+    def _recognize(self, audio: sr.AudioData) -> str:
+        raise NotImplementedError
+
+    def transcribe(self, audio: sr.AudioData) -> ASRResult:
+        """
+        识别一段语音并给出置信度
+
+        Returns:
+            ASRResult,后端不提供置信度时 confidence 为 None
+        """
+        self.load()
+        start = time.perf_counter()
+        text, confidence = self._transcribe(audio)
+        latency_ms = (time.perf_counter() - start) * 1000
+        return ASRResult(text, confidence, self.name, latency_ms)
+
+    def _transcribe(self, audio: sr.AudioData) -> Tuple[str, Optional[float]]:
+        return self._recognize(audio), None
+
+    def create_stream(self, sample_rate: int, sample_width: int) -> ASRStream:
+        """创建流式识别会话"""
+        self.load()
+        return ASRStream(self, sample_rate, sample_width)
+
+    def _normalize_text(self, text: str) -> str:
+        text = text.strip()
+        # 中文模型按词输出,词之间带空格
+        if self.language.lower().startswith("zh"):
+            text = text.replace(" ", "")
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+
+class GoogleASRBackend(ASRBackend):
+    """Google Web Speech API (需要联网)"""
+
+    name = "google"
+
+    def __init__(self, language: str = "zh-CN", preprocess: Optional[bool] = None):
+        """
+        Args:
+            language: 识别语言
+            preprocess: 上传前是否降采样、裁剪静音并预编码 FLAC,默认读取 ASR_PREPROCESS
+        """
+        super().__init__(language)
+        self.recognizer = sr.Recognizer()
+        if preprocess is None:
+            preprocess = os.getenv("ASR_PREPROCESS", "1").lower() in ("1", "true", "yes")
+        self.preprocess = preprocess
+
+    def _prepare(self, audio: sr.AudioData) -> sr.AudioData:
+        if not self.preprocess:
+            return audio
+        return get_preprocessor().process(audio)
+
+    def _warm_up(self, audio: sr.AudioData):
+        # 在线服务没有本地模型,预热只会产生一次无意义的网络请求
+        pass
+
+    def _recognize(self, audio: sr.AudioData) -> str:
+        # 在线识别的请求超时取识别阶段剩余的时间预算
+        self.recognizer.operation_timeout = stage_timeout("asr")
+        return self.recognizer.recognize_google(self._prepare(audio), language=self.language)
+
+    def _transcribe(self, audio: sr.AudioData) -> Tuple[str, Optional[float]]:
+        self.recognizer.operation_timeout = stage_timeout("asr")
+        result = self.recognizer.recognize_google(self._prepare(audio), language=self.language, show_all=True)
+        alternatives = result.get("alternative") if isinstance(result, dict) else None
+        if not alternatives:
+            raise sr.UnknownValueError()
+        best = alternatives[0]
+        return best["transcript"], best.get("confidence")
+
+
+class VoskASRStream(ASRStream):
+    """Vosk 流式识别,每帧送入解码器并返回变化的中间结果"""
+
+    def __init__(self, backend: "VoskASRBackend", sample_rate: int, sample_width: int):
+        super().__init__(backend, sample_rate, sample_width)
+        self._recognizer = backend._vosk.KaldiRecognizer(backend.model, MODEL_SAMPLE_RATE)
+        # Vosk 在句中停顿处会提交一段结果并清空中间结果,需要自己拼接
+        self._committed = []
+        self._partial = ""
+
+    def _join(self, parts) -> str:
+        if self.backend.language.lower().startswith("zh"):
+            return "".join(p.replace(" ", "") for p in parts)
+        return " ".join(p.strip() for p in parts if p.strip())
+
+    def accept(self, frame: bytes) -> Optional[str]:
+        if self.sample_rate != MODEL_SAMPLE_RATE or self.sample_width != MODEL_SAMPLE_WIDTH:
+            frame = sr.AudioData(frame, self.sample_rate, self.sample_width).get_raw_data(
+                convert_rate=MODEL_SAMPLE_RATE, convert_width=MODEL_SAMPLE_WIDTH
+            )
+        if self._recognizer.AcceptWaveform(frame):
+            self._committed.append(json.loads(self._recognizer.Result()).get("text", ""))
+            current = ""
+        else:
+            current = json.loads(self._recognizer.PartialResult()).get("partial", "")
+        text = self._join(self._committed + [current])
+        if not text or text == self._partial:
+            return None
+        self._partial = text
+        return text
+
+    def finish(self) -> str:
+        final = json.loads(self._recognizer.FinalResult()).get("text", "")
+        return self.backend._normalize_text(self._join(self._committed + [final]))
+
+
+class VoskASRBackend(ASRBackend):
+    """Vosk 离线识别 (需要 pip install vosk 并下载模型)"""
+
+    name = "vosk"
+
+    def __init__(self, language: str = "zh-CN", model_path: Optional[str] = None):
+        super().__init__(language)
+        self.model_path = model_path or os.getenv("VOSK_MODEL_PATH", "models/vosk-model-small-cn-0.22")
+        self.model = None
+
+    def _load(self):
+        try:
+            import vosk
+        except ImportError:
+            raise ImportError("使用 vosk 识别需要安装: pip install vosk")
+        if not os.path.isdir(self.model_path):
+            raise FileNotFoundError(f"Vosk 模型目录不存在: {self.model_path}")
+        vosk.SetLogLevel(-1)
+        self._vosk = vosk
+        self.model = vosk.Model(self.model_path)
+
+    def _recognize(self, audio: sr.AudioData) -> str:
+        return self._transcribe(audio)[0]
+
+    def _transcribe(self, audio: sr.AudioData) -> Tuple[str, Optional[float]]:
+        recognizer = self._vosk.KaldiRecognizer(self.model, MODEL_SAMPLE_RATE)
+        recognizer.SetWords(True)
+        recognizer.AcceptWaveform(
+            audio.get_raw_data(convert_rate=MODEL_SAMPLE_RATE, convert_width=MODEL_SAMPLE_WIDTH)
+        )
+        result = json.loads(recognizer.FinalResult())
+        words = result.get("result") or []
+        confidence = sum(w.get("conf", 0.0) for w in words) / len(words) if words else None
+        return self._normalize_text(result.get("text", "")), confidence
+
+    def create_stream(self, sample_rate: int, sample_width: int) -> ASRStream:
+        self.load()
+        return VoskASRStream(self, sample_rate, sample_width)
+
+
+class WhisperASRBackend(ASRBackend):
+    """faster-whisper 离线识别,CPU int8 推理 (需要 pip install faster-whisper)"""
+
+    name = "whisper"
+
+    def __init__(self, language: str = "zh-CN", model_size: Optional[str] = None):
+        super().__init__(language)
+        self.model_size = model_size or os.getenv("WHISPER_MODEL", "small")
+        self.model = None
+
+    def _load(self):
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError:
+            raise ImportError("使用 whisper 识别需要安装: pip install faster-whisper")
+        threads = int(os.getenv("ASR_CPU_THREADS", "0"))
+        self.model = WhisperModel(
+            self.model_size, device="cpu", compute_type="int8", cpu_threads=threads
+        )
+
+    def _recognize(self, audio: sr.AudioData) -> str:
+        return self._transcribe(audio)[0]
+
+    def _transcribe(self, audio: sr.AudioData) -> Tuple[str, Optional[float]]:
+        import numpy as np
+
+        raw = audio.get_raw_data(convert_rate=MODEL_SAMPLE_RATE, convert_width=MODEL_SAMPLE_WIDTH)
+        samples = np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+        segments, _ = self.model.transcribe(
+            samples,
+            language=self.language.split("-")[0],
+            beam_size=1,
+            vad_filter=False,
+        )
+        segments = list(segments)
+        text = self._normalize_text("".join(segment.text for segment in segments))
+        # 平均对数概率换算成 0-1 的置信度
+        avg_logprob = sum(s.avg_logprob for s in segments) / len(segments)
+        return text, math.exp(avg_logprob)
+
+
+class RecognizerRace(ASRBackend):
+    """
+    多识别器竞速
+
+    同一段语音并发交给多个后端,取第一个置信度达到阈值的结果并放弃其余后端;
+    记录每个后端的胜出次数和延迟,方便淘汰慢的后端。
+    不提供置信度的后端 (如 Google 偶尔不返回) 视为置信度满足阈值
+    """
+
+    name = "race"
+
+    def __init__(
+        self,
+        language: str = "zh-CN",
+        backends: Optional[List[ASRBackend]] = None,
+        confidence_threshold: Optional[float] = None,
+    ):
+        super().__init__(language)
+        if backends is None:
+            names = os.getenv("ASR_RACE_BACKENDS", "google,vosk").split(",")
+            backends = [create_asr_backend(n.strip(), language) for n in names if n.strip()]
+        if not backends:
+            raise ValueError("竞速识别至少需要一个后端")
+        self.backends = backends
+        if confidence_threshold is None:
+            confidence_threshold = float(os.getenv("ASR_RACE_CONFIDENCE", "0.6"))
+        self.confidence_threshold = confidence_threshold
+        self._executor = ThreadPoolExecutor(
+            max_workers=len(backends) * 2, thread_name_prefix="WALL-E-ASRRace"
+        )
+        self.stats: Dict[str, Dict] = {
+            b.name: {"attempts": 0, "wins": 0, "errors": 0, "latency": LatencyStats()}
+            for b in backends
+        }
+        self._stats_lock = threading.Lock()
+
+    def _load(self):
+        # 子后端各自加载,加载失败的后端不参与竞速
+        available = []
+        for backend in self.backends:
+            try:
+                backend.load()
+                available.append(backend)
+            except Exception as e:
+                logger.warning(f"竞速识别: 后端 {backend.name} 不可用,已跳过: {e}")
+        if not available:
+            raise RuntimeError("竞速识别: 没有可用的 ASR 后端")
+        self.backends = available
+
+    def warm_up(self):
+        try:
+            self.load()
+        except Exception as e:
+            logger.warning(f"ASR 后端 {self.name} 预热失败: {e}")
+            return
+        for future in [self._executor.submit(b.warm_up) for b in self.backends]:
+            future.result()
+
+    def _record(self, backend: ASRBackend, future):
+        with self._stats_lock:
+            stats = self.stats[backend.name]
+            if future.cancelled():
+                return
+            stats["attempts"] += 1
+            error = future.exception()
+            if error is None:
+                stats["latency"].record(future.result().latency_ms)
+            elif not isinstance(error, sr.UnknownValueError):
+                stats["errors"] += 1
+
+    def _recognize(self, audio: sr.AudioData) -> str:
+        return self._transcribe(audio)[0]
+
+    def _transcribe(self, audio: sr.AudioData) -> Tuple[str, Optional[float]]:
+        futures = {}
+        for backend in self.backends:
+            future = self._executor.submit(contextvars.copy_context().run, backend.transcribe, audio)
+            future.add_done_callback(lambda f, b=backend: self._record(b, f))
+            futures[future] = backend
+
+        pending = set(futures)
+        best: Optional[ASRResult] = None
+        winner: Optional[ASRResult] = None
+        error: Optional[BaseException] = None
+        while pending and winner is None:
+            # 超出识别阶段的时间预算时不再等待,用已有的最好结果
+            done, pending = wait(pending, timeout=stage_timeout("asr"), return_when=FIRST_COMPLETED)
+            if not done:
+                logger.warning(f"竞速识别: 超出时间预算, 放弃 {len(pending)} 个后端")
+                if best is None:
+                    error = error or sr.RequestError("语音识别超出时间预算")
+                break
+            for future in done:
+                if future.exception() is not None:
+                    logger.debug(f"竞速识别: {futures[future].name} 失败: {future.exception()}")
+                    if not isinstance(future.exception(), sr.UnknownValueError):
+                        error = future.exception()
+                    continue
+                result = future.result()
+                confidence = 1.0 if result.confidence is None else result.confidence
+                if confidence >= self.confidence_threshold:
+                    winner = result
+                    break
+                if best is None or confidence > (best.confidence or 0.0):
+                    best = result
+
+        for future in pending:
+            future.cancel()
+
+        result = winner or best
+        if result is None:
+            # 全部后端都失败: 有服务错误时抛出服务错误,否则视为听不懂
+            raise error or sr.UnknownValueError()
+        with self._stats_lock:
+            self.stats[result.backend]["wins"] += 1
+        logger.info(
+            f"竞速识别: {result.backend} 胜出 ({result.latency_ms:.0f}ms, "
+            f"置信度 {result.confidence if result.confidence is not None else '-'})"
+        )
+        return result.text, result.confidence
+
+    def report(self) -> Dict[str, Dict]:
+        """每个后端的尝试次数、胜率、错误数和延迟分位数"""
+        with self._stats_lock:
+            report = {}
+            for name, stats in self.stats.items():
+                attempts = stats["attempts"]
+                report[name] = {
+                    "attempts": attempts,
+                    "wins": stats["wins"],
+                    "win_rate": stats["wins"] / attempts if attempts else 0.0,
+                    "errors": stats["errors"],
+                    **stats["latency"].summary(),
+                }
+            return report
+
+    def log_report(self):
+        for name, stats in self.report().items():
+            logger.info(
+                f"竞速识别统计 [{name}]: 胜率 {stats['win_rate']:.0%} "
+                f"({stats['wins']}/{stats['attempts']}), 错误 {stats['errors']}, "
+                f"延迟 {format_summary(stats)}"
+            )
+
+
+ASR_BACKENDS: Dict[str, Type[ASRBackend]] = {
+    "google": GoogleASRBackend,
+    "vosk": VoskASRBackend,
+    "whisper": WhisperASRBackend,
+    "race": RecognizerRace,
+}
+
+
+def create_asr_backend(name: str, language: str = "zh-CN", **kwargs) -> ASRBackend:
+    """
+    按名称创建语音识别后端
+
+    Args:
+        name: 后端名称 (google, vosk, whisper, race)
+        language: 识别语言
+        **kwargs: 传给具体后端的参数
+
+    Returns:
+        ASRBackend 实例
+    """
+    if name not in ASR_BACKENDS:
+        raise ValueError(f"未知的 ASR 后端: {name}, 可选: {', '.join(ASR_BACKENDS)}")
+    return ASR_BACKENDS[name](language=language, **kwargs)
+
+
+_asr_backend: Optional[ASRBackend] = None
+_asr_backend_lock = threading.Lock()
+
+
+def get_asr_backend() -> ASRBackend:
+    """获取进程内共享的 ASR 后端 (按 ASR_BACKEND 环境变量创建,默认 google)"""
+    global _asr_backend
+    with _asr_backend_lock:
+        if _asr_backend is None:
+            name = os.getenv("ASR_BACKEND", "google")
+            language = os.getenv("ASR_LANGUAGE", "zh-CN")
+            logger.info(f"使用 ASR 后端: {name} ({language})")
+            _asr_backend = create_asr_backend(name, language)
+            if isinstance(_asr_backend, RecognizerRace):
+                atexit.register(_asr_backend.log_report)
+        return _asr_backend
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+WALL-E 持续音频采集服务
+进程生命周期内只打开一次麦克风,后台线程持续读音频做端点检测,
+切分好的语音片段通过队列交给识别器,主循环不再等待设备打开
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+from typing import Iterator, Optional
+
+import speech_recognition as sr
+from logger_config import setup_logger
+from metrics import format_summary
+from noise_calibration import device_key
+from vad import Endpointer, create_endpointer_from_env
+
+logger = setup_logger("WALL-E.AudioCapture", level=os.getenv("LOG_LEVEL", "INFO"))
+
+
+class UtteranceStream:
+    """
+    一段正在采集的语音
+
+    语音一开始就交给消费者,帧随采集实时到达,可以边说边识别;
+    说完后 wait() 返回完整的 sr.AudioData
+    """
+
+    _END = None
+
+    def __init__(self, sample_rate: int, sample_width: int):
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.audio: Optional[sr.AudioData] = None
+        self._frames: "queue.Queue[Optional[bytes]]" = queue.Queue()
+        self._done = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def discarded(self) -> bool:
+        """语音已结束但被判定为噪声"""
+        return self.done and self.audio is None
+
+    def push(self, frame: bytes):
+        self._frames.put(frame)
+
+    def close(self, data: Optional[bytes]):
+        """结束这段语音,data 为 None 表示丢弃"""
+        if data is not None:
+            self.audio = sr.AudioData(data, self.sample_rate, self.sample_width)
+        self._done.set()
+        self._frames.put(self._END)
+
+    def frames(self) -> Iterator[bytes]:
+        """按采集顺序逐帧返回音频,语音结束后停止"""
+        while True:
+            frame = self._frames.get()
+            if frame is self._END:
+                return
+            yield frame
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[sr.AudioData]:
+        """等待说完并返回完整语音,被丢弃时返回 None"""
+        self._done.wait(timeout)
+        return self.audio
+
+
+class AudioCaptureService:
+    """
+    常驻麦克风采集服务
+
+    启动后一直持有同一个输入流,后台线程把每帧音频交给端点检测器 (语音开头的预录音由端点检测器保留),
+    检测到语音开始时把 UtteranceStream 放入有界队列,之后的帧实时推给它;
+    当前语音流只由采集线程读写,线程退出时关闭
+    """
+
+    # stop() 等待采集线程退出的最长时间(秒)
+    stop_timeout = 2.0
+
+    def __init__(
+        self,
+        source: Optional[sr.AudioSource] = None,
+        endpointer: Optional[Endpointer] = None,
+        sample_rate: Optional[int] = None,
+        chunk_size: int = 1024,
+        queue_size: int = 8,
+    ):
+        """
+        Args:
+            source: 音频源,默认使用系统麦克风 sr.Microphone
+            endpointer: 端点检测器,默认按 VAD_* 环境变量创建
+            sample_rate: 麦克风采样率,默认使用设备默认值
+            chunk_size: 每帧采样数
+            queue_size: 待识别语音片段队列上限,满了丢弃最旧的片段
+        """
+        self._source = source
+        self.endpointer = endpointer
+        self.sample_rate = sample_rate
+        self.chunk_size = chunk_size
+
+        self._utterances: "queue.Queue[UtteranceStream]" = queue.Queue(maxsize=queue_size)
+        self._current: Optional[UtteranceStream] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self.dropped_utterances = 0
+        self._input_ended = False
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def in_speech(self) -> bool:
+        """当前是否正在采集一段语音"""
+        return self.endpointer is not None and self.endpointer.in_speech
+
+    @property
+    def exhausted(self) -> bool:
+        """有限音频源已读完且没有待识别的语音片段"""
+        return self._input_ended and not self.running and self._utterances.empty()
+
+    def start(self):
+        """打开输入流并启动后台采集线程 (重复调用无副作用)"""
+        with self._lock:
+            if self.running:
+                return
+            if self._source is None:
+                self._source = sr.Microphone(sample_rate=self.sample_rate, chunk_size=self.chunk_size)
+
+            logger.info("打开音频输入流...")
+            self._source.__enter__()
+
+            if self.endpointer is None:
+                # 只有真实麦克风才按设备记录底噪档案
+                device = device_key(self._source) if isinstance(self._source, sr.Microphone) else None
+                self.endpointer = create_endpointer_from_env(
+                    self._source.SAMPLE_RATE, self._source.SAMPLE_WIDTH, device=device
+                )
+
+            self._stop_event.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="WALL-E-AudioCapture", daemon=True
+            )
+            self._thread.start()
+            logger.info(
+                f"音频采集服务已启动: {self._source.SAMPLE_RATE}Hz, "
+                f"每帧 {self._source.CHUNK} 采样"
+            )
+
+    def stop(self):
+        """停止采集线程并关闭输入流"""
+        with self._lock:
+            if self._thread is None:
+                return
+            self._stop_event.set()
+            self._thread.join(timeout=self.stop_timeout)
+            if self._thread.is_alive():
+                # 线程还阻塞在读取上: 关闭输入流后它会退出,并自己关闭当前语音流
+                logger.warning("音频采集线程未能及时退出")
+            self._thread = None
+            try:
+                self._source.__exit__(None, None, None)
+            except Exception as e:
+                logger.warning(f"关闭音频输入流失败: {e}")
+            if self.endpointer is not None:
+                logger.info(f"端点检测延迟统计: {format_summary(self.endpointer.stats.summary())}")
+                calibrator = getattr(self.endpointer, "calibrator", None)
+                if calibrator is not None:
+                    calibrator.save(force=True)
+            logger.info("音频采集服务已停止")
+
+    def _run(self):
+        source = self._source
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    frame = source.stream.read(source.CHUNK)
+                except EOFError:
+                    # 文件回放等有限音频源读完
+                    logger.info("音频输入已结束")
+                    self._input_ended = True
+                    break
+                except Exception as e:
+                    logger.error(f"读取音频输入流失败: {e}", exc_info=True)
+                    break
+                if not frame:
+                    continue
+                self._process_frame(frame)
+        finally:
+            # 没说完的语音流在这里丢弃,stop() 不跨线程修改它
+            self._close_current(None)
+
+    def _process_frame(self, frame: bytes):
+        was_in_speech = self.endpointer.in_speech
+        utterance = self.endpointer.process(frame)
+
+        if not was_in_speech:
+            if self.endpointer.in_speech:
+                # 语音开始: pre-roll 和当前帧一起推给新的语音流
+                self._current = UtteranceStream(self._source.SAMPLE_RATE, self._source.SAMPLE_WIDTH)
+                for pending in self.endpointer.current_frames():
+                    self._current.push(pending)
+                self._enqueue(self._current)
+            return
+
+        self._current.push(frame)
+        if not self.endpointer.in_speech:
+            self._close_current(utterance.data if utterance is not None else None)
+
+    def _close_current(self, data: Optional[bytes]):
+        if self._current is not None:
+            self._current.close(data)
+            self._current = None
+
+    def _enqueue(self, stream: UtteranceStream):
+        while True:
+            try:
+                self._utterances.put_nowait(stream)
+                logger.debug(f"语音片段入队,当前队列长度: {self._utterances.qsize()}")
+                return
+            except queue.Full:
+                try:
+                    self._utterances.get_nowait()
+                    self.dropped_utterances += 1
+                    logger.warning("待识别队列已满,丢弃最旧的语音片段")
+                except queue.Empty:
+                    pass
+
+    def get_utterance_stream(self, timeout: Optional[float] = None) -> UtteranceStream:
+        """
+        获取下一段语音流 (语音一开始就返回,用于流式识别)
+
+        Args:
+            timeout: 等待语音开始的最长时间(秒),None 表示一直等待
+
+        Returns:
+            UtteranceStream 语音流
+
+        Raises:
+            sr.WaitTimeoutError: 超时仍未检测到语音
+        """
+        self.start()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                return self._utterances.get(timeout=0.05)
+            except queue.Empty:
+                pass
+            if not self.running:
+                raise sr.WaitTimeoutError("音频采集线程已停止")
+            if deadline is not None and time.monotonic() >= deadline:
+                raise sr.WaitTimeoutError("等待语音输入超时")
+
+    def get_utterance(self, timeout: Optional[float] = None) -> sr.AudioData:
+        """
+        获取下一段完整语音
+
+        Args:
+            timeout: 等待语音开始的最长时间(秒),None 表示一直等待;
+                     语音已经开始时会等它说完
+
+        Returns:
+            sr.AudioData 语音片段
+
+        Raises:
+            sr.WaitTimeoutError: 超时仍未检测到语音
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            audio = self.get_utterance_stream(timeout=remaining).wait()
+            if audio is not None:
+                return audio
+            logger.debug("语音片段过短被丢弃,继续等待")
+
+    def clear(self):
+        """丢弃已排队但尚未识别的语音片段"""
+        while True:
+            try:
+                self._utterances.get_nowait()
+            except queue.Empty:
+                return
+
+
+_capture_service: Optional[AudioCaptureService] = None
+_capture_service_lock = threading.Lock()
+
+
+def get_capture_service() -> AudioCaptureService:
+    """获取进程内共享的音频采集服务 (首次调用时创建并启动)"""
+    global _capture_service
+    with _capture_service_lock:
+        if _capture_service is None:
+            # WebRTC VAD 只支持固定采样率,按 30ms 一帧采集
+            webrtc = os.getenv("VAD_BACKEND", "energy") == "webrtc"
+            _capture_service = AudioCaptureService(
+                sample_rate=16000 if webrtc else None,
+                chunk_size=480 if webrtc else 1024,
+                queue_size=int(os.getenv("CAPTURE_QUEUE_SIZE", "8")),
+            )
+            atexit.register(_capture_service.stop)
+        service = _capture_service
+    service.start()
+    return service
+
+
+def set_capture_service(service: AudioCaptureService):
+    """替换进程内共享的音频采集服务 (例如改用 WAV 语料回放作为输入)"""
+    global _capture_service
+    with _capture_service_lock:
+        previous, _capture_service = _capture_service, service
+    if previous is service:
+        return
+    atexit.register(service.stop)
+    if previous is not None:
+        atexit.unregister(previous.stop)
+        previous.stop()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+WALL-E 识别前音频预处理
+上传给远程识别服务之前,先降采样到 16kHz 16 位单声道、裁掉首尾静音,
+并预先编码成 FLAC,减少每句话的上传字节数和上传时间
+"""
+
+import atexit
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import speech_recognition as sr
+from logger_config import setup_logger
+from metrics import LatencyStats, format_summary
+from vad import frame_rms
+
+logger = setup_logger("WALL-E.AudioPreprocess", level=os.getenv("LOG_LEVEL", "INFO"))
+
+TARGET_SAMPLE_RATE = 16000
+TARGET_SAMPLE_WIDTH = 2
+
+
+class CompactAudioData(sr.AudioData):
+    """
+    已预先编码 FLAC 的 AudioData
+
+    识别器按原采样率请求 FLAC 时直接返回缓存,多个远程识别器竞速时也只编码一次
+    """
+
+    def __init__(self, frame_data: bytes, sample_rate: int, sample_width: int, flac_data: bytes):
+        super().__init__(frame_data, sample_rate, sample_width)
+        self.flac_data = flac_data
+
+    def get_flac_data(self, convert_rate=None, convert_width=None):
+        if convert_rate in (None, self.sample_rate) and convert_width in (None, self.sample_width):
+            return self.flac_data
+        return super().get_flac_data(convert_rate, convert_width)
+
+
+class AudioPreprocessor:
+    """降采样 + 静音裁剪 + FLAC 编码"""
+
+    def __init__(
+        self,
+        target_rate: int = TARGET_SAMPLE_RATE,
+        trim_threshold: float = 300,
+        margin_ms: float = 150,
+        window_ms: float = 10,
+    ):
+        """
+        Args:
+            target_rate: 目标采样率 (只降不升)
+            trim_threshold: 静音判定的能量阈值 (16 位采样)
+            margin_ms: 裁剪后语音前后保留的余量
+            window_ms: 计算能量的窗口长度
+        """
+        self.target_rate = target_rate
+        self.trim_threshold = trim_threshold
+        self.margin_ms = margin_ms
+        self.window_ms = window_ms
+
+        self.encode_stats = LatencyStats()
+        self.input_bytes = 0
+        self.output_bytes = 0
+        self.trimmed_ms = 0.0
+        self._stats_lock = threading.Lock()
+
+    def trim(self, pcm: bytes, sample_rate: int) -> memoryview:
+        """
+        裁掉首尾静音
+
+        Returns:
+            指向原数据的 memoryview (不复制);整段都是静音时原样返回
+        """
+        view = memoryview(pcm)
+        window = max(TARGET_SAMPLE_WIDTH, int(sample_rate * self.window_ms / 1000) * TARGET_SAMPLE_WIDTH)
+        voiced = [
+            offset for offset in range(0, len(pcm), window)
+            if frame_rms(view[offset:offset + window], TARGET_SAMPLE_WIDTH) > self.trim_threshold
+        ]
+        if not voiced:
+            return view
+        margin = int(sample_rate * self.margin_ms / 1000) * TARGET_SAMPLE_WIDTH
+        start = max(0, voiced[0] - margin)
+        end = min(len(pcm), voiced[-1] + window + margin)
+        return view[start:end]
+
+    def process(self, audio: sr.AudioData) -> sr.AudioData:
+        """
+        预处理一段语音
+
+        Args:
+            audio: 麦克风采集的原始语音
+
+        Returns:
+            降采样、裁剪并预编码后的 CompactAudioData;编码失败时返回未编码的 AudioData
+        """
+        start = time.perf_counter()
+        rate = min(audio.sample_rate, self.target_rate)
+        pcm = audio.get_raw_data(
+            convert_rate=rate if rate != audio.sample_rate else None,
+            convert_width=TARGET_SAMPLE_WIDTH,
+        )
+        trimmed = self.trim(pcm, rate)
+        compact = sr.AudioData(trimmed.tobytes(), rate, TARGET_SAMPLE_WIDTH)
+        try:
+            compact = CompactAudioData(
+                compact.frame_data, rate, TARGET_SAMPLE_WIDTH, compact.get_flac_data()
+            )
+            output_bytes = len(compact.flac_data)
+        except Exception as e:
+            logger.warning(f"FLAC 编码失败,上传未编码音频: {e}")
+            output_bytes = len(compact.frame_data)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        input_bytes = len(audio.frame_data)
+        trimmed_ms = (len(pcm) - len(trimmed)) / (rate * TARGET_SAMPLE_WIDTH) * 1000
+        with self._stats_lock:
+            self.input_bytes += input_bytes
+            self.output_bytes += output_bytes
+            self.trimmed_ms += trimmed_ms
+            self.encode_stats.record(elapsed_ms)
+        logger.debug(
+            f"音频预处理: {audio.sample_rate}Hz → {rate}Hz, 裁掉静音 {trimmed_ms:.0f}ms, "
+            f"{input_bytes} → {output_bytes} 字节, 耗时 {elapsed_ms:.1f}ms"
+        )
+        return compact
+
+    def report(self) -> Dict:
+        """累计节省的字节数和编码耗时"""
+        with self._stats_lock:
+            saved = self.input_bytes - self.output_bytes
+            return {
+                "input_bytes": self.input_bytes,
+                "output_bytes": self.output_bytes,
+                "bytes_saved": saved,
+                "saved_ratio": saved / self.input_bytes if self.input_bytes else 0.0,
+                "trimmed_ms": self.trimmed_ms,
+                "encode": self.encode_stats.summary(),
+            }
+
+    def log_report(self):
+        report = self.report()
+        if not report["input_bytes"]:
+            return
+        logger.info(
+            f"音频预处理统计: 节省 {report['bytes_saved']} 字节 ({report['saved_ratio']:.0%}), "
+            f"裁掉静音 {report['trimmed_ms']:.0f}ms, 编码耗时 {format_summary(report['encode'])}"
+        )
+
+
+_preprocessor: Optional[AudioPreprocessor] = None
+_preprocessor_lock = threading.Lock()
+
+
+def get_preprocessor() -> AudioPreprocessor:
+    """获取进程内共享的音频预处理器"""
+    global _preprocessor
+    with _preprocessor_lock:
+        if _preprocessor is None:
+            _preprocessor = AudioPreprocessor(
+                trim_threshold=float(os.getenv("ASR_TRIM_THRESHOLD", "300")),
+            )
+            atexit.register(_preprocessor.log_report)
+        return _preprocessor
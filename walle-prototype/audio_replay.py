@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+WALL-E WAV 语料回放
+把一个目录下的 WAV 文件按实时或加速速度送进常驻采集服务,
+走与麦克风完全相同的端点检测和识别流程,输出延迟和准确率报告;
+没有麦克风的 Linux 服务器上也能复现语音链路的基准测试
+
+语料目录结构:
+    corpus/
+        nav_001.wav
+        nav_001.txt        # 期望识别结果 (可选)
+        transcripts.tsv    # 或者集中写在一个文件里: 文件名<TAB>期望结果
+
+用法:
+    python audio_replay.py corpus/ --speed 4 --json report.json
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import speech_recognition as sr
+from asr_backends import ASRBackend, get_asr_backend
+from audio_capture import AudioCaptureService, get_capture_service, set_capture_service
+from logger_config import setup_logger
+from metrics import LatencyStats, format_summary
+from text_utils import normalize_transcript
+from vad import create_endpointer_from_env
+
+logger = setup_logger("WALL-E.AudioReplay", level=os.getenv("LOG_LEVEL", "INFO"))
+
+REPLAY_SAMPLE_RATE = 16000
+REPLAY_SAMPLE_WIDTH = 2
+# 30ms 一帧,energy 和 webrtc 端点检测都能直接使用
+REPLAY_CHUNK = 480
+TRANSCRIPTS_FILE = "transcripts.tsv"
+
+
+@dataclass
+class CorpusItem:
+    """一条语料"""
+    path: Path
+    expected: Optional[str] = None
+
+
+def load_corpus(directory: str) -> List[CorpusItem]:
+    """
+    读取语料目录
+
+    Args:
+        directory: 包含 WAV 文件的目录
+
+    Returns:
+        按文件名排序的语料列表
+
+    Raises:
+        FileNotFoundError: 目录不存在或没有 WAV 文件
+    """
+    root = Path(directory)
+    wavs = sorted(root.glob("*.wav")) if root.is_dir() else []
+    if not wavs:
+        raise FileNotFoundError(f"语料目录中没有 WAV 文件: {directory}")
+
+    expected: Dict[str, str] = {}
+    index = root / TRANSCRIPTS_FILE
+    if index.exists():
+        for line in index.read_text(encoding="utf-8").splitlines():
+            name, sep, text = line.partition("\t")
+            if sep and not line.startswith("#"):
+                expected[Path(name.strip()).stem] = text.strip()
+
+    items = []
+    for wav in wavs:
+        sidecar = wav.with_suffix(".txt")
+        text = sidecar.read_text(encoding="utf-8").strip() if sidecar.exists() else expected.get(wav.stem)
+        items.append(CorpusItem(wav, text))
+    return items
+
+
+def read_wav_pcm(path: Path, sample_rate: int = REPLAY_SAMPLE_RATE) -> bytes:
+    """读取 WAV 并转换成单声道 16 位 PCM"""
+    with sr.AudioFile(str(path)) as source:
+        audio = sr.Recognizer().record(source)
+    return audio.get_raw_data(convert_rate=sample_rate, convert_width=REPLAY_SAMPLE_WIDTH)
+
+
+class _ReplayStream:
+    """按回放速度逐块吐出 PCM,读完后抛出 EOFError"""
+
+    def __init__(self, source: "WavReplaySource"):
+        self._source = source
+
+    def read(self, size: int) -> bytes:
+        return self._source.read_chunk(size)
+
+
+class WavReplaySource(sr.AudioSource):
+    """
+    把若干段 PCM 当作麦克风输入的音频源
+
+    每段之后补一段静音,保证端点检测能正常判定说完;speed 为回放倍速,0 表示不限速
+    """
+
+    def __init__(
+        self,
+        segments: List[bytes],
+        speed: float = 1.0,
+        sample_rate: int = REPLAY_SAMPLE_RATE,
+        chunk_size: int = REPLAY_CHUNK,
+        gap_ms: float = 1000,
+    ):
+        self.SAMPLE_RATE = sample_rate
+        self.SAMPLE_WIDTH = REPLAY_SAMPLE_WIDTH
+        self.CHUNK = chunk_size
+        self.speed = speed
+        self.stream = None
+
+        gap = b"\x00" * (int(sample_rate * gap_ms / 1000) * REPLAY_SAMPLE_WIDTH)
+        self._data = memoryview(b"".join(segment + gap for segment in segments))
+        # 每段音频结束位置 (字节),用于计算"说完 → 出结果"的延迟
+        self._segment_ends = []
+        offset = 0
+        for segment in segments:
+            offset += len(segment)
+            self._segment_ends.append(offset)
+            offset += len(gap)
+        self.segment_end_times: List[Optional[float]] = [None] * len(segments)
+
+        self._offset = 0
+        self._started_at = 0.0
+
+    def __enter__(self):
+        # 播放完毕后再次打开不会从头重放
+        self.stream = _ReplayStream(self)
+        if self._offset == 0:
+            self._started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stream = None
+
+    @property
+    def finished(self) -> bool:
+        return self._offset >= len(self._data)
+
+    def read_chunk(self, frames: int) -> bytes:
+        if self.finished:
+            raise EOFError("回放语料已播放完毕")
+        size = frames * REPLAY_SAMPLE_WIDTH
+        start, end = self._offset, min(self._offset + size, len(self._data))
+        if self.speed > 0:
+            due = self._started_at + end / (self.SAMPLE_RATE * REPLAY_SAMPLE_WIDTH) / self.speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        self._offset = end
+        now = time.perf_counter()
+        for i, segment_end in enumerate(self._segment_ends):
+            if self.segment_end_times[i] is None and start < segment_end <= end:
+                self.segment_end_times[i] = now
+        return self._data[start:end].tobytes()
+
+
+@dataclass
+class ReplayResult:
+    """一条语料的回放结果"""
+    file: str
+    expected: Optional[str]
+    text: Optional[str]
+    # 音频结束 → 端点检测判定说完
+    endpoint_ms: Optional[float] = None
+    # 识别耗时
+    asr_ms: Optional[float] = None
+    # 音频结束 → 拿到识别结果
+    total_ms: Optional[float] = None
+    cer: Optional[float] = None
+    error: Optional[str] = None
+
+
+def edit_distance(a: str, b: str) -> int:
+    """字符级编辑距离"""
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def character_error_rate(expected: str, actual: Optional[str]) -> float:
+    """字错误率 (忽略空白和标点)"""
+    reference = normalize_transcript(expected)
+    hypothesis = normalize_transcript(actual)
+    if not reference:
+        return 0.0 if not hypothesis else 1.0
+    return edit_distance(reference, hypothesis) / len(reference)
+
+
+def _replay_one(item: CorpusItem, asr: ASRBackend, speed: float) -> ReplayResult:
+    result = ReplayResult(item.path.name, item.expected, None)
+    try:
+        pcm = read_wav_pcm(item.path)
+    except Exception as e:
+        logger.error(f"读取语料失败 {item.path}: {e}")
+        result.error = str(e)
+        return result
+
+    source = WavReplaySource([pcm], speed=speed)
+    endpointer = create_endpointer_from_env(source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+    service = AudioCaptureService(source=source, endpointer=endpointer, chunk_size=source.CHUNK)
+    texts = []
+    asr_ms = 0.0
+    endpoint_at = recognized_at = None
+    try:
+        while True:
+            try:
+                audio = service.get_utterance(timeout=None)
+            except sr.WaitTimeoutError:
+                break
+            endpoint_at = time.perf_counter()
+            started = time.perf_counter()
+            try:
+                texts.append(asr.recognize(audio))
+            except sr.UnknownValueError:
+                pass
+            recognized_at = time.perf_counter()
+            asr_ms += (recognized_at - started) * 1000
+    except Exception as e:
+        logger.error(f"识别语料失败 {item.path}: {e}", exc_info=True)
+        result.error = str(e)
+    finally:
+        service.stop()
+
+    audio_end = source.segment_end_times[0]
+    result.text = "".join(texts) if texts else None
+    if recognized_at is not None and audio_end is not None:
+        result.endpoint_ms = max(0.0, (endpoint_at - audio_end) * 1000)
+        result.asr_ms = asr_ms
+        result.total_ms = max(0.0, (recognized_at - audio_end) * 1000)
+    if item.expected is not None:
+        result.cer = character_error_rate(item.expected, result.text)
+    return result
+
+
+def run_replay(
+    directory: str,
+    speed: float = 1.0,
+    asr: Optional[ASRBackend] = None,
+) -> Dict:
+    """
+    回放整个语料目录并生成报告
+
+    Args:
+        directory: 语料目录
+        speed: 回放倍速,1 为实时,0 为不限速
+        asr: 识别后端,默认使用 ASR_BACKEND 配置的后端
+
+    Returns:
+        报告字典: results 为逐条结果,summary 为延迟分位数和准确率汇总
+    """
+    items = load_corpus(directory)
+    asr = asr or get_asr_backend()
+    asr.warm_up()
+
+    endpoint_stats, asr_stats, total_stats = LatencyStats(), LatencyStats(), LatencyStats()
+    results = []
+    for item in items:
+        result = _replay_one(item, asr, speed)
+        results.append(result)
+        if result.total_ms is not None:
+            endpoint_stats.record(result.endpoint_ms)
+            asr_stats.record(result.asr_ms)
+            total_stats.record(result.total_ms)
+        mark = "✅" if result.cer == 0 else ("➖" if result.cer is None else "❌")
+        print(f"{mark} {result.file}: {result.text or '(无结果)'}"
+              + (f"  [期望: {result.expected}]" if result.cer else ""))
+
+    scored = [r for r in results if r.cer is not None]
+    summary = {
+        "files": len(results),
+        "recognized": sum(1 for r in results if r.text),
+        "errors": sum(1 for r in results if r.error),
+        "scored": len(scored),
+        "exact_match": sum(1 for r in scored if r.cer == 0) / len(scored) if scored else None,
+        "mean_cer": sum(r.cer for r in scored) / len(scored) if scored else None,
+        "endpoint": endpoint_stats.summary(),
+        "asr": asr_stats.summary(),
+        "total": total_stats.summary(),
+    }
+    return {"results": [asdict(r) for r in results], "summary": summary}
+
+
+def print_report(report: Dict):
+    """打印回放报告汇总"""
+    summary = report["summary"]
+    print("=" * 60)
+    print(f"📊 回放 {summary['files']} 条, 识别出 {summary['recognized']} 条, 出错 {summary['errors']} 条")
+    if summary["scored"]:
+        print(f"🎯 句准确率 {summary['exact_match']:.1%}, 平均字错误率 {summary['mean_cer']:.1%}")
+    print(f"⏱️  端点检测: {format_summary(summary['endpoint'])}")
+    print(f"⏱️  语音识别: {format_summary(summary['asr'])}")
+    print(f"⏱️  说完→出字: {format_summary(summary['total'])}")
+    print("=" * 60)
+
+
+_replay_source: Optional[WavReplaySource] = None
+_replay_lock = threading.Lock()
+
+
+def start_replay_input(directory: str, speed: float = 1.0) -> int:
+    """
+    用语料回放代替麦克风作为全局音频输入 (主程序的回放模式)
+
+    Args:
+        directory: 语料目录
+        speed: 回放倍速
+
+    Returns:
+        语料条数
+    """
+    global _replay_source
+    items = load_corpus(directory)
+    source = WavReplaySource([read_wav_pcm(item.path) for item in items], speed=speed)
+    endpointer = create_endpointer_from_env(source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+    with _replay_lock:
+        _replay_source = source
+        set_capture_service(AudioCaptureService(source=source, endpointer=endpointer, chunk_size=source.CHUNK))
+    logger.info(f"已切换到语料回放输入: {directory}, {len(items)} 条, {speed}x")
+    return len(items)
+
+
+def replay_exhausted() -> bool:
+    """回放输入是否已经全部识别完"""
+    with _replay_lock:
+        if _replay_source is None:
+            return True
+    return get_capture_service().exhausted
+
+
+def prompt_replay_input() -> bool:
+    """
+    主程序选择回放模式时调用: 读取 REPLAY_CORPUS_DIR (未设置时询问) 并切换输入
+
+    Returns:
+        是否切换成功
+    """
+    directory = os.getenv("REPLAY_CORPUS_DIR") or input("语料目录: ").strip()
+    try:
+        count = start_replay_input(directory, speed=float(os.getenv("REPLAY_SPEED", "1")))
+    except Exception as e:
+        logger.error(f"加载回放语料失败: {e}")
+        print(f"❌ 加载语料失败: {e}")
+        return False
+    print(f"📂 已加载 {count} 条语料,播放完毕后自动退出")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WALL-E WAV 语料回放基准测试")
+    parser.add_argument("corpus", help="语料目录 (*.wav + 同名 .txt 或 transcripts.tsv)")
+    parser.add_argument("--speed", type=float, default=float(os.getenv("REPLAY_SPEED", "1")),
+                        help="回放倍速, 1 为实时, 0 为不限速")
+    parser.add_argument("--json", help="把完整报告写入 JSON 文件")
+    args = parser.parse_args()
+
+    report = run_replay(args.corpus, speed=args.speed)
+    print_report(report)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"💾 报告已保存: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+"""
+pytest 公共配置
+测试中创建的客户端只在内存中缓存,不写入开发者主目录下的 ~/.walle
+"""
+
+import os
+
+# 工具清单不落盘
+os.environ["TOOL_MANIFEST_PATH"] = ""
+# 大模型调用记账只在内存中汇总 (部分测试会真实调用网关)
+os.environ["LLM_ACCOUNTING_PATH"] = ""
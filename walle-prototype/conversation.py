@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+WALL-E 对话上下文
+记住最近几轮指令和一份精简的结构化状态 (上一次的工具、参数、提到过的地点),
+只有像 "那换成百度地图" 这样的追问才把上下文发给大模型,
+并按 token 预算裁剪,避免历史越积越长拖慢每一次请求
+"""
+
+import atexit
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Union
+
+from logger_config import setup_logger
+from metrics import LatencyStats, format_summary
+
+try:
+    import tiktoken
+except ImportError:  # 可选依赖,没有时按字符数估算
+    tiktoken = None
+
+logger = setup_logger("WALL-E.Conversation", level=os.getenv("LOG_LEVEL", "INFO"))
+
+_CJK = re.compile(r"[　-〿㐀-䶿一-鿿＀-￯]")
+# 指代、省略或修改上一条指令的说法
+_FOLLOW_UP = re.compile(
+    r"^(?:那|那就|那么|还是|再|也|同样|刚才|上一个|这个|那个|它|换|改)"
+    r"|换成|改成|改用|换个|换一|不要.*要|也查|也看|呢$|[它那这]里"
+)
+# 参数中表示地点的字段
+PLACE_KEYS = ("origin", "destination", "query", "city", "city1", "city2")
+
+_encoding = None
+_encoding_failed = False
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算文本的 token 数
+
+    安装了 tiktoken 时使用 cl100k_base 编码;否则汉字按 1 个 token、
+    其余字符按每 4 个 1 个 token 估算
+    """
+    global _encoding, _encoding_failed
+    if tiktoken is not None and not _encoding_failed:
+        try:
+            if _encoding is None:
+                _encoding = tiktoken.get_encoding("cl100k_base")
+            return len(_encoding.encode(text))
+        except Exception as e:
+            logger.debug(f"tiktoken 不可用,改为按字符估算: {e}")
+            _encoding_failed = True
+    cjk = len(_CJK.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def message_tokens(messages: List[Dict[str, Any]]) -> int:
+    """估算一组对话消息的 token 数 (每条消息另加 4 个格式 token)"""
+    total = 2
+    for message in messages:
+        total += 4 + estimate_tokens(str(message.get("content") or ""))
+    return total
+
+
+@dataclass
+class Turn:
+    """一轮指令及其理解结果"""
+    text: str
+    intent: Union[Dict[str, Any], List[Dict[str, Any]]]
+    at: float
+
+
+class SessionContext:
+    """
+    会话上下文
+
+    结构化状态总是优先放入;剩余预算从最近一轮开始往前放历史对话,放不下就停止
+    """
+
+    def __init__(self, max_turns: int = 3, token_budget: int = 400, ttl_seconds: float = 300):
+        """
+        Args:
+            max_turns: 最多保留的历史轮数
+            token_budget: 上下文 (状态 + 历史) 的 token 上限
+            ttl_seconds: 距上一轮超过这个时间视为新会话,清空上下文
+        """
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.ttl_seconds = ttl_seconds
+
+        self.turns: "deque[Turn]" = deque(maxlen=max_turns)
+        self.last_tool: Optional[str] = None
+        self.last_params: Dict[str, Any] = {}
+        self.places: List[str] = []
+        self._lock = threading.Lock()
+
+        self.prompt_stats = LatencyStats()
+        self.context_stats = LatencyStats()
+        self.usage_stats = LatencyStats()
+        self.follow_ups = 0
+
+    def _expire(self):
+        if self.turns and time.time() - self.turns[-1].at > self.ttl_seconds:
+            logger.info("距上一轮对话太久,开始新会话")
+            self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.turns.clear()
+            self.last_tool = None
+            self.last_params = {}
+            self.places = []
+
+    def is_follow_up(self, text: str) -> bool:
+        """是否是依赖上一轮的追问 (只有追问才需要发送上下文)"""
+        self._expire()
+        if not self.turns or not text:
+            return False
+        return bool(_FOLLOW_UP.search(text.strip()))
+
+    def record(self, text: str, intent: Union[Dict[str, Any], List[Dict[str, Any]], None]):
+        """记录一轮已执行的指令,更新结构化状态 (unknown 不记录)"""
+        calls = intent if isinstance(intent, list) else [intent]
+        calls = [c for c in calls if isinstance(c, dict) and c.get("tool") not in (None, "unknown")]
+        if not calls:
+            return
+        with self._lock:
+            self.turns.append(Turn(text, intent, time.time()))
+            self.last_tool = calls[-1]["tool"]
+            self.last_params = dict(calls[-1].get("params") or {})
+            for call in calls:
+                for key in PLACE_KEYS:
+                    value = (call.get("params") or {}).get(key)
+                    if isinstance(value, str) and value and value != "当前位置":
+                        if value in self.places:
+                            self.places.remove(value)
+                        self.places.append(value)
+            self.places = self.places[-5:]
+
+    def state(self) -> Dict[str, Any]:
+        """精简的结构化状态"""
+        return {"last_tool": self.last_tool, "last_params": self.last_params, "places": list(self.places)}
+
+    def context_messages(self) -> List[Dict[str, str]]:
+        """
+        生成插在系统提示和当前指令之间的上下文消息
+
+        Returns:
+            [状态消息, 历史 user/assistant 消息...],总 token 数不超过 token_budget
+        """
+        with self._lock:
+            turns = list(self.turns)
+            state = self.state()
+        state_message = {
+            "role": "system",
+            "content": "对话状态 (用于理解省略和指代): " + json.dumps(state, ensure_ascii=False, separators=(",", ":")),
+        }
+        used = message_tokens([state_message])
+        if used > self.token_budget:
+            return []
+
+        history: List[Dict[str, str]] = []
+        for turn in reversed(turns):
+            pair = [
+                {"role": "user", "content": turn.text},
+                {"role": "assistant", "content": json.dumps(turn.intent, ensure_ascii=False, separators=(",", ":"))},
+            ]
+            cost = message_tokens(pair) - 2
+            if used + cost > self.token_budget:
+                break
+            history = pair + history
+            used += cost
+        return [state_message] + history
+
+    def record_prompt(self, messages: List[Dict[str, Any]], context_count: int, usage: Any = None):
+        """
+        记录一次请求的提示词 token 数
+
+        Args:
+            messages: 发送的全部消息
+            context_count: 其中上下文消息的条数
+            usage: 接口返回的 usage (有 prompt_tokens 时一并记录)
+        """
+        self.prompt_stats.record(message_tokens(messages))
+        if context_count:
+            self.follow_ups += 1
+            self.context_stats.record(message_tokens(messages[1:1 + context_count]) - 2)
+        prompt_tokens = getattr(usage, "prompt_tokens", None)
+        if isinstance(prompt_tokens, int):
+            self.usage_stats.record(prompt_tokens)
+
+    def log_stats(self):
+        summary = self.prompt_stats.summary()
+        if summary["count"]:
+            logger.info(
+                f"提示词 token (估算): {format_summary(summary, unit='')}; "
+                f"追问 {self.follow_ups} 次, 上下文 {format_summary(self.context_stats.summary(), unit='')}; "
+                f"接口统计 {format_summary(self.usage_stats.summary(), unit='')}"
+            )
+
+
+def conversation_context_enabled() -> bool:
+    """是否开启对话上下文 (CONVERSATION_CONTEXT, 默认开启)"""
+    return os.getenv("CONVERSATION_CONTEXT", "1").lower() in ("1", "true", "yes")
+
+
+def create_session_context() -> SessionContext:
+    """根据环境变量 CONTEXT_* 创建会话上下文;关闭时保留 0 轮,不会判定为追问"""
+    session = SessionContext(
+        max_turns=int(os.getenv("CONTEXT_TURNS", "3")) if conversation_context_enabled() else 0,
+        token_budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", "400")),
+        ttl_seconds=float(os.getenv("CONTEXT_TTL", "300")),
+    )
+    atexit.register(session.log_stats)
+    return session
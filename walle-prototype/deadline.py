@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+WALL-E 端到端时间预算
+main() 为每条指令创建一个 Deadline (默认 10 秒,语音识别 2 秒,AI 理解 3 秒),
+通过 contextvars 传给识别器、LLM 网关、工具调用和地图 API;
+每个阶段只拿剩余的预算作为超时,来不及时降级 (规则快速通道、缓存、直接打开网页),
+而不是一直等下去
+"""
+
+import atexit
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+
+from logger_config import setup_logger
+from metrics import LatencyStats, format_summary
+
+logger = setup_logger("WALL-E.Deadline", level=os.getenv("LOG_LEVEL", "INFO"))
+
+
+class DeadlineExceeded(TimeoutError):
+    """剩余时间预算不足,阶段被跳过"""
+    pass
+
+
+class Deadline:
+    """
+    一条指令的时间预算
+
+    timeout(stage) 返回该阶段现在还能用的秒数: 取总预算剩余时间和阶段预算剩余时间中较小的一个
+    """
+
+    def __init__(
+        self,
+        budget_seconds: float = 10.0,
+        stage_budgets: Optional[Dict[str, float]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            budget_seconds: 端到端总预算(秒)
+            stage_budgets: 各阶段预算(秒),如 {"asr": 2, "llm": 3}
+            clock: 时钟函数 (测试时替换)
+        """
+        self.budget_seconds = budget_seconds
+        self.stage_budgets = dict(stage_budgets or {})
+        self._clock = clock
+        self.started_at = clock()
+        self.stage_elapsed: Dict[str, float] = {}
+        self._stage_started: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def restart(self):
+        """从现在开始计时 (用户说完或输入完成时调用,等待开口的时间不计入预算)"""
+        self.started_at = self._clock()
+
+    def elapsed(self) -> float:
+        return self._clock() - self.started_at
+
+    def remaining(self) -> float:
+        """总预算剩余秒数 (不小于 0)"""
+        return max(0.0, self.budget_seconds - self.elapsed())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, stage: Optional[str] = None, cap: Optional[float] = None) -> float:
+        """
+        阶段可用的超时时间
+
+        Args:
+            stage: 阶段名称;有阶段预算时再受阶段预算限制 (阶段已开始时扣除已用时间)
+            cap: 调用方自己的超时上限
+
+        Returns:
+            可用秒数 (不小于 0)
+        """
+        available = self.remaining()
+        if stage in self.stage_budgets:
+            with self._lock:
+                started = self._stage_started.get(stage)
+            used = self._clock() - started if started is not None else 0.0
+            available = min(available, self.stage_budgets[stage] - used)
+        if cap is not None:
+            available = min(available, cap)
+        return max(0.0, available)
+
+    def check(self, stage: Optional[str] = None, minimum: float = 0.0):
+        """
+        预算不足时抛出 DeadlineExceeded
+
+        Args:
+            stage: 阶段名称
+            minimum: 阶段至少需要的秒数
+        """
+        available = self.timeout(stage)
+        if available <= minimum:
+            raise DeadlineExceeded(f"{stage or '指令'} 时间预算不足 (剩余 {available * 1000:.0f}ms)")
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator["Deadline"]:
+        """记录一个阶段的耗时;超出阶段预算时记录警告"""
+        started = self._clock()
+        with self._lock:
+            self._stage_started[name] = started
+        try:
+            yield self
+        finally:
+            elapsed = self._clock() - started
+            with self._lock:
+                self._stage_started.pop(name, None)
+                self.stage_elapsed[name] = self.stage_elapsed.get(name, 0.0) + elapsed
+            budget = self.stage_budgets.get(name)
+            if budget is not None and elapsed > budget:
+                logger.warning(f"阶段 {name} 耗时 {elapsed * 1000:.0f}ms, 超出预算 {budget * 1000:.0f}ms")
+
+
+_current: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar("walle_deadline", default=None)
+
+end_to_end_stats = LatencyStats()
+overruns = {"count": 0}
+
+
+def current_deadline() -> Optional[Deadline]:
+    """当前指令的 Deadline,不在 deadline_scope 中时返回 None"""
+    return _current.get()
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[Deadline]) -> Iterator[Optional[Deadline]]:
+    """在这个范围内 (包括用 contextvars.copy_context() 提交到线程池的任务) 使用给定的 Deadline"""
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def deadline_stage(name: str) -> Iterator[Optional[Deadline]]:
+    """在当前 Deadline 中记录一个阶段 (没有 Deadline 时什么都不做)"""
+    deadline = _current.get()
+    if deadline is None:
+        yield None
+        return
+    with deadline.stage(name):
+        yield deadline
+
+
+def finish_deadline():
+    """一条指令执行完毕: 记录端到端耗时,超出预算时记录警告"""
+    deadline = _current.get()
+    if deadline is None:
+        return
+    elapsed = deadline.elapsed()
+    end_to_end_stats.record(elapsed * 1000)
+    if elapsed > deadline.budget_seconds:
+        overruns["count"] += 1
+        logger.warning(f"本条指令耗时 {elapsed:.1f}s, 超出预算 {deadline.budget_seconds:.0f}s")
+
+
+def stage_timeout(stage: Optional[str] = None, default: Optional[float] = None) -> Optional[float]:
+    """
+    当前阶段可用的超时时间
+
+    Args:
+        stage: 阶段名称 (asr / llm / tool)
+        default: 调用方原本的超时;没有 Deadline 时原样返回,有 Deadline 时作为上限
+
+    Returns:
+        秒数,没有 Deadline 且没有 default 时返回 None
+    """
+    deadline = _current.get()
+    if deadline is None:
+        return default
+    return deadline.timeout(stage, cap=default)
+
+
+def restart_deadline():
+    """当前 Deadline 从现在开始计时"""
+    deadline = _current.get()
+    if deadline is not None:
+        deadline.restart()
+
+
+def create_request_deadline() -> Optional[Deadline]:
+    """
+    根据环境变量创建一条指令的 Deadline
+
+    DEADLINE_SECONDS (默认 10, 0 表示不限制) / DEADLINE_ASR_SECONDS (默认 2) / DEADLINE_LLM_SECONDS (默认 3)
+    """
+    budget = float(os.getenv("DEADLINE_SECONDS", "10"))
+    if budget <= 0:
+        return None
+    return Deadline(budget, {
+        "asr": float(os.getenv("DEADLINE_ASR_SECONDS", "2")),
+        "llm": float(os.getenv("DEADLINE_LLM_SECONDS", "3")),
+    })
+
+
+def log_deadline_stats():
+    summary = end_to_end_stats.summary()
+    if summary["count"]:
+        logger.info(f"端到端耗时: {format_summary(summary)}, 超出预算 {overruns['count']} 次")
+
+
+atexit.register(log_deadline_stats)
@@ -6,8 +6,8 @@ WALL-E MCP 功能演示脚本
 
 import os
 import json
-from openai import OpenAI
 from dotenv import load_dotenv
+from llm_gateway import get_llm_gateway
 from mcp_client import create_mcp_client
 from logger_config import setup_logger
 
@@ -68,10 +68,7 @@ if os.getenv("API_KEY"):
     print("\n4️⃣  测试 AI + MCP 集成:")
     
     # 首先测试API是否可用
-    client = OpenAI(
-        api_key=os.getenv("API_KEY"),
-        base_url=os.getenv("BASE_URL", "https://api.openai.com/v1")
-    )
+    client = get_llm_gateway()
     
     # 测试API连接
     api_available = False
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+WALL-E 意图缓存
+用户经常重复同样的指令 ("导航回家"、"播放晴天"),按归一化后的文本缓存
+{"tool", "params"} 结果,命中时不再调用大模型;
+内存 LRU + TTL,可选 SQLite 落盘,重启后依然有效;工具集变化时整体失效
+"""
+
+import atexit
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from logger_config import setup_logger
+from text_utils import normalize_transcript
+
+logger = setup_logger("WALL-E.IntentCache", level=os.getenv("LOG_LEVEL", "INFO"))
+
+
+def normalize_utterance(text: str) -> str:
+    """缓存键: 去掉空白和标点并转小写"""
+    return normalize_transcript(text).lower()
+
+
+def tool_fingerprint(mcp_client, prompt: str = "") -> str:
+    """
+    计算工具集指纹,工具名称、文档或提示词变化时指纹随之变化
+
+    Args:
+        mcp_client: MCPClient / SimpleMCPClient
+        prompt: 意图理解使用的工具说明
+
+    Returns:
+        十六进制指纹
+    """
+    digest = hashlib.sha1(prompt.encode("utf-8"))
+    for name in sorted(mcp_client.list_tools()):
+        digest.update(name.encode("utf-8"))
+        digest.update((mcp_client.get_tool_info(name) or "").encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class _SQLiteStore:
+    """意图缓存的磁盘存储"""
+
+    def __init__(self, path: str):
+        self.path = Path(os.path.expanduser(path))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS intents ("
+            "key TEXT PRIMARY KEY, fingerprint TEXT, intent TEXT, created_at REAL)"
+        )
+        self._conn.commit()
+
+    def load(self, fingerprint: str, not_before: float):
+        rows = self._conn.execute(
+            "SELECT key, intent, created_at FROM intents "
+            "WHERE fingerprint = ? AND created_at >= ? ORDER BY created_at",
+            (fingerprint, not_before),
+        ).fetchall()
+        return [(key, json.loads(intent), created_at) for key, intent, created_at in rows]
+
+    def put(self, key: str, fingerprint: str, intent: Dict[str, Any], created_at: float):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO intents VALUES (?, ?, ?, ?)",
+            (key, fingerprint, json.dumps(intent, ensure_ascii=False), created_at),
+        )
+        self._conn.commit()
+
+    def delete_other_fingerprints(self, fingerprint: str):
+        self._conn.execute("DELETE FROM intents WHERE fingerprint != ?", (fingerprint,))
+        self._conn.commit()
+
+    def clear(self):
+        self._conn.execute("DELETE FROM intents")
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+class IntentCache:
+    """
+    归一化文本 → 意图 的 LRU 缓存
+
+    只缓存成功识别出工具的结果 (tool 不为 unknown),读写都返回副本,
+    调用方修改参数不会污染缓存
+    """
+
+    def __init__(
+        self,
+        max_size: int = 256,
+        ttl_seconds: float = 24 * 3600,
+        path: Optional[str] = None,
+        fingerprint: str = "",
+    ):
+        """
+        Args:
+            max_size: 内存中最多保存的条目数
+            ttl_seconds: 条目有效期(秒)
+            path: SQLite 文件路径,None 表示只在内存中缓存
+            fingerprint: 当前工具集指纹
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.fingerprint = fingerprint
+        self.hits = 0
+        self.misses = 0
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._store = None
+        if path:
+            try:
+                self._store = _SQLiteStore(path)
+                self._load()
+            except (sqlite3.Error, OSError, ValueError) as e:
+                logger.warning(f"打开意图缓存文件失败,只使用内存缓存: {e}")
+                self._store = None
+
+    def _load(self):
+        self._store.delete_other_fingerprints(self.fingerprint)
+        rows = self._store.load(self.fingerprint, time.time() - self.ttl_seconds)
+        for key, intent, created_at in rows[-self.max_size:]:
+            self._entries[key] = (intent, created_at)
+        logger.info(f"从磁盘加载 {len(self._entries)} 条意图缓存")
+
+    def get(self, text: str, record: bool = True) -> Optional[Union[Dict[str, Any], List[Dict[str, Any]]]]:
+        """
+        查询缓存
+
+        Args:
+            text: 用户输入
+            record: 是否计入命中率 (流式识别的推测性查询传 False)
+
+        Returns:
+            命中时返回意图副本,否则返回 None
+        """
+        key = normalize_utterance(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[1] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                if record:
+                    self.misses += 1
+                return None
+            if record:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return copy.deepcopy(entry[0])
+
+    def put(self, text: str, intent: Union[Dict[str, Any], List[Dict[str, Any]]]):
+        """保存意图或多个工具调用组成的列表 (含 unknown 或格式不对的结果不缓存)"""
+        calls = intent if isinstance(intent, list) else [intent]
+        if not calls or any(not isinstance(c, dict) or c.get("tool") in (None, "unknown") for c in calls):
+            return
+        key = normalize_utterance(text)
+        if not key:
+            return
+        created_at = time.time()
+        value = copy.deepcopy(intent)
+        with self._lock:
+            self._entries[key] = (value, created_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            if self._store is not None:
+                try:
+                    self._store.put(key, self.fingerprint, value, created_at)
+                except sqlite3.Error as e:
+                    logger.warning(f"写入意图缓存文件失败: {e}")
+
+    def set_fingerprint(self, fingerprint: str):
+        """工具集变化时调用,指纹不同则清空缓存"""
+        with self._lock:
+            if fingerprint == self.fingerprint:
+                return
+            logger.info(f"工具集已变化 ({self.fingerprint} → {fingerprint}),清空意图缓存")
+            self.fingerprint = fingerprint
+            self._entries.clear()
+            if self._store is not None:
+                self._store.delete_other_fingerprints(fingerprint)
+
+    def invalidate(self):
+        """清空全部缓存"""
+        with self._lock:
+            self._entries.clear()
+            if self._store is not None:
+                self._store.clear()
+        logger.info("意图缓存已清空")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def log_stats(self):
+        stats = self.stats()
+        if stats["hits"] + stats["misses"]:
+            logger.info(
+                f"意图缓存统计: 命中 {stats['hits']} 次, 未命中 {stats['misses']} 次, "
+                f"命中率 {stats['hit_rate']:.0%}, 当前 {stats['size']} 条"
+            )
+
+
+def intent_cache_enabled() -> bool:
+    """是否开启意图缓存 (INTENT_CACHE, 默认开启)"""
+    return os.getenv("INTENT_CACHE", "1").lower() in ("1", "true", "yes")
+
+
+def create_intent_cache(fingerprint: str = "") -> Optional[IntentCache]:
+    """
+    根据环境变量 INTENT_CACHE_* 创建意图缓存
+
+    Returns:
+        IntentCache 实例,关闭缓存时返回 None
+    """
+    if not intent_cache_enabled():
+        return None
+    cache = IntentCache(
+        max_size=int(os.getenv("INTENT_CACHE_SIZE", "256")),
+        ttl_seconds=float(os.getenv("INTENT_CACHE_TTL", str(24 * 3600))),
+        path=os.getenv("INTENT_CACHE_PATH") or None,
+        fingerprint=fingerprint,
+    )
+    atexit.register(cache.log_stats)
+    return cache
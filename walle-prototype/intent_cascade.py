@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+WALL-E 两级模型级联
+规则、缓存和向量路由都没命中时,先让小模型 (LLM_CASCADE_MODEL) 用 JSON 模式选工具并给出置信度;
+置信度达到阈值、工具存在且必填参数齐全时直接采用,否则再交给 MODEL 配置的大模型。
+记录每次小模型给出的置信度,退出时输出升级率以及换用其他阈值时的升级率,
+用来明确地在准确率和延迟之间取舍
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from deadline import DeadlineExceeded
+from llm_gateway import KEEP_MODEL, LLMGateway
+from logger_config import setup_logger
+from metrics import LatencyStats, format_summary
+from tool_executor import Intent, as_calls
+from tool_schema import describe_tools, intent_from_json
+
+logger = setup_logger("WALL-E.IntentCascade", level=os.getenv("LOG_LEVEL", "INFO"))
+
+# 退出时对比这些阈值下的升级率
+THRESHOLDS = (0.5, 0.6, 0.7, 0.8, 0.9)
+
+ESCALATION_REASONS = ("low_confidence", "unknown", "unknown_tool", "missing_params", "invalid", "error")
+
+
+def required_params(schemas: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """工具名 → 必填参数"""
+    return {
+        schema["function"]["name"]: list(schema["function"]["parameters"].get("required", []))
+        for schema in schemas
+    }
+
+
+class ModelCascade:
+    """
+    小模型优先的意图理解
+
+    classify() 返回 None 表示需要升级到大模型
+    """
+
+    def __init__(
+        self,
+        client,
+        model: str,
+        schemas: List[Dict[str, Any]],
+        min_confidence: float = 0.8,
+        timeout: float = 1.0,
+    ):
+        """
+        Args:
+            client: OpenAI 客户端或 LLMGateway (网关不会用服务商的 <名称>_MODEL 替换小模型)
+            model: 小模型名称
+            schemas: 工具描述 (OpenAI tools 格式),用于生成提示词和检查必填参数
+            min_confidence: 直接采用小模型结果的最低置信度
+            timeout: 小模型请求超时(秒),同时受 AI 理解阶段剩余预算限制
+        """
+        self.client = client
+        self.model = model
+        self.min_confidence = min_confidence
+        self.timeout = timeout
+        self.required = required_params(schemas)
+        self.system_prompt = f"""你是 WALL-E 意图分类器。根据用户指令选择工具并抽取参数。
+
+{describe_tools(schemas)}
+
+只返回 JSON:
+- 格式: {{"tool": "工具名", "params": {{参数字典}}, "confidence": 0 到 1 之间的小数}}
+- 多个需求: {{"calls": [{{"tool": "工具名", "params": {{...}}}}, ...], "confidence": 0 到 1 之间的小数}}
+- 不明确: {{"tool": "unknown", "params": {{}}, "confidence": 0}}
+confidence 表示你对工具和参数都正确的把握,没有把握时给低分
+"""
+        self.latency = LatencyStats()
+        # 每次请求: (置信度, 是否因为置信度以外的原因升级)
+        self.samples: List[Tuple[float, bool]] = []
+        self.stats = {"requests": 0, "accepted": 0, **{reason: 0 for reason in ESCALATION_REASONS}}
+        self._lock = threading.Lock()
+
+    def _missing(self, intent: Intent) -> bool:
+        for call in as_calls(intent):
+            params = call.get("params") or {}
+            for name in self.required.get(call.get("tool"), []):
+                value = params.get(name)
+                if value is None or (isinstance(value, str) and not value.strip()):
+                    return True
+        return False
+
+    def judge(self, result: Any) -> Tuple[Optional[Intent], Optional[str], float]:
+        """
+        判断小模型的输出能否直接采用
+
+        Args:
+            result: 小模型返回的 JSON 对象
+
+        Returns:
+            (意图, 升级原因, 置信度);可以采用时升级原因为 None
+        """
+        if not isinstance(result, dict):
+            return None, "invalid", 0.0
+        result = dict(result)
+        try:
+            confidence = float(result.pop("confidence", 0.0))
+        except (TypeError, ValueError):
+            confidence = 0.0
+        intent = intent_from_json(result)
+        calls = as_calls(intent)
+        if not calls or any(c.get("tool") == "unknown" for c in calls):
+            return None, "unknown", confidence
+        if any(c.get("tool") not in self.required for c in calls):
+            return None, "unknown_tool", confidence
+        if self._missing(intent):
+            return None, "missing_params", confidence
+        if confidence < self.min_confidence:
+            return None, "low_confidence", confidence
+        return intent, None, confidence
+
+    def classify(self, text: str, record: bool = True) -> Optional[Intent]:
+        """
+        让小模型理解一句话
+
+        Args:
+            text: 用户输入
+            record: 是否计入升级率和延迟统计 (流式识别的推测性理解传 False)
+
+        Returns:
+            可以直接采用的意图;需要升级到大模型时返回 None
+
+        Raises:
+            DeadlineExceeded: AI 理解阶段预算已用完 (大模型同样来不及)
+        """
+        started = time.perf_counter()
+        confidence: Optional[float] = None
+        request = dict(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": text},
+            ],
+            temperature=0,
+            response_format={"type": "json_object"},
+            timeout=self.timeout,
+        )
+        if isinstance(self.client, LLMGateway):
+            request[KEEP_MODEL] = True
+        try:
+            response = self.client.chat.completions.create(**request)
+            intent, reason, confidence = self.judge(json.loads(response.choices[0].message.content or ""))
+        except DeadlineExceeded:
+            raise
+        except ValueError as e:
+            logger.debug(f"小模型输出不是 JSON: {e}")
+            intent, reason = None, "invalid"
+        except Exception as e:
+            logger.warning(f"小模型调用失败, 交给大模型: {e}")
+            intent, reason = None, "error"
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if record:
+            with self._lock:
+                self.stats["requests"] += 1
+                self.stats[reason or "accepted"] += 1
+                self.latency.record(elapsed_ms)
+                self.samples.append((confidence or 0.0, reason not in (None, "low_confidence")))
+        if reason is None:
+            logger.info(f"小模型采用 ({elapsed_ms:.0f}ms, 置信度 {confidence:.2f}): {intent}")
+        else:
+            logger.info(f"小模型升级到大模型 ({elapsed_ms:.0f}ms): {reason}, 置信度 {confidence if confidence is not None else '-'}")
+        return intent
+
+    def escalation_rate(self) -> Optional[float]:
+        """升级到大模型的比例,没有请求时返回 None"""
+        with self._lock:
+            requests = self.stats["requests"]
+            return (requests - self.stats["accepted"]) / requests if requests else None
+
+    def escalation_at(self, threshold: float) -> Optional[float]:
+        """换用另一个阈值时的升级率 (按记录的置信度重新判断),没有请求时返回 None"""
+        with self._lock:
+            if not self.samples:
+                return None
+            return sum(1 for confidence, other in self.samples if other or confidence < threshold) / len(self.samples)
+
+    def log_stats(self):
+        rate = self.escalation_rate()
+        if rate is None:
+            return
+        reasons = ", ".join(f"{r} {self.stats[r]}" for r in ESCALATION_REASONS if self.stats[r])
+        logger.info(
+            f"两级模型: 小模型 {self.model} 请求 {self.stats['requests']} 次, 升级率 {rate:.0%}"
+            f" (阈值 {self.min_confidence}{', ' + reasons if reasons else ''}), 延迟 {format_summary(self.latency.summary())}"
+        )
+        logger.info("  其他阈值的升级率: " + ", ".join(f"{t} → {self.escalation_at(t):.0%}" for t in THRESHOLDS))
+
+
+def create_model_cascade(client, schemas: List[Dict[str, Any]]) -> Optional[ModelCascade]:
+    """
+    根据环境变量创建两级模型级联
+
+    LLM_CASCADE_MODEL (小模型,未设置时不启用) / LLM_CASCADE_MIN_CONFIDENCE (默认 0.8) /
+    LLM_CASCADE_TIMEOUT (默认 1 秒)
+    """
+    model = os.getenv("LLM_CASCADE_MODEL", "").strip()
+    if not model or not schemas:
+        return None
+    cascade = ModelCascade(
+        client, model, schemas,
+        min_confidence=float(os.getenv("LLM_CASCADE_MIN_CONFIDENCE", "0.8")),
+        timeout=float(os.getenv("LLM_CASCADE_TIMEOUT", "1")),
+    )
+    logger.info(f"两级模型: 先用 {model} (置信度 ≥ {cascade.min_confidence} 直接采用), 否则使用 {os.getenv('MODEL', 'gpt-3.5-turbo')}")
+    atexit.register(cascade.log_stats)
+    return cascade
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+WALL-E 离线意图评测
+读取带标注的语料 (JSON Lines),用有限并发 + 限速把每条指令交给意图理解函数
+(规则 / 向量路由 / understand_with_mcp / 任意 模块:函数),
+输出工具准确率、参数准确率、混淆矩阵和每个工具的延迟分位数
+
+    python intent_eval.py intent_eval_corpus.jsonl --target simple --concurrency 4 --rate 5
+"""
+
+import argparse
+import importlib
+import json
+import os
+import threading
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from deadline import create_request_deadline, deadline_scope
+from metrics import LatencyStats, format_summary
+from tool_executor import as_calls
+
+UNKNOWN = "unknown"
+
+
+@dataclass
+class EvalCase:
+    """一条带标注的指令,calls 为期望的工具调用 (可以有多个)"""
+    text: str
+    calls: List[Dict[str, Any]]
+
+    @property
+    def label(self) -> str:
+        return "+".join(sorted(c["tool"] for c in self.calls)) or UNKNOWN
+
+
+@dataclass
+class EvalResult:
+    """一条指令的评测结果"""
+    case: EvalCase
+    predicted: List[Dict[str, Any]] = field(default_factory=list)
+    latency_ms: float = 0.0
+    error: Optional[str] = None
+
+    @property
+    def label(self) -> str:
+        return "+".join(sorted(c.get("tool", UNKNOWN) for c in self.predicted)) or UNKNOWN
+
+    @property
+    def tool_correct(self) -> bool:
+        return self.error is None and self.label == self.case.label
+
+    @property
+    def params_correct(self) -> bool:
+        """工具正确,且每个期望参数都与预测一致 (预测中多出的默认参数不计)"""
+        if not self.tool_correct:
+            return False
+        remaining = list(self.predicted)
+        for expected in self.case.calls:
+            match = next((p for p in remaining if _params_match(expected, p)), None)
+            if match is None:
+                return False
+            remaining.remove(match)
+        return True
+
+
+def _normalize(value: Any) -> Any:
+    return value.strip() if isinstance(value, str) else value
+
+
+def _params_match(expected: Dict[str, Any], predicted: Dict[str, Any]) -> bool:
+    if expected["tool"] != predicted.get("tool"):
+        return False
+    params = predicted.get("params") or {}
+    return all(_normalize(params.get(k)) == _normalize(v) for k, v in expected.get("params", {}).items())
+
+
+def load_corpus(path: str) -> List[EvalCase]:
+    """
+    读取评测语料 (JSON Lines,# 开头为注释)
+
+    每行 {"text", "tool", "params"},一句话多个需求时 {"text", "calls": [{"tool", "params"}, ...]},
+    期望没听懂时 tool 为 "unknown"
+
+    Raises:
+        ValueError: 某一行格式不对
+    """
+    cases = []
+    with open(os.path.expanduser(path), encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                data = json.loads(line)
+                calls = data["calls"] if "calls" in data else [{"tool": data["tool"], "params": data.get("params", {})}]
+                calls = [{"tool": c["tool"], "params": dict(c.get("params", {}))} for c in calls if c["tool"] != UNKNOWN]
+                cases.append(EvalCase(data["text"], calls))
+            except (ValueError, KeyError, TypeError) as e:
+                raise ValueError(f"{path}:{lineno} 语料格式错误: {e}")
+    return cases
+
+
+class RateLimiter:
+    """令牌桶限速: 平均每秒最多 rate 次,允许 burst 次突发"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """取一个令牌,没有时等待"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def evaluate(
+    cases: List[EvalCase],
+    understand_fn: Callable[[str], Any],
+    concurrency: int = 4,
+    rate: float = 0.0,
+    use_deadline: bool = False,
+) -> List[EvalResult]:
+    """
+    并发评测一组指令
+
+    Args:
+        cases: 评测语料
+        understand_fn: 意图理解函数 (text -> intent,没命中时可以返回 None)
+        concurrency: 最多同时进行的请求数
+        rate: 每秒最多发起的请求数,0 表示不限速
+        use_deadline: 每条指令是否在 DEADLINE_* 时间预算中执行 (评测降级效果)
+
+    Returns:
+        与 cases 顺序一致的结果列表
+    """
+    limiter = RateLimiter(rate, burst=concurrency)
+
+    def run(case: EvalCase) -> EvalResult:
+        limiter.acquire()
+        result = EvalResult(case)
+        started = time.perf_counter()
+        try:
+            with deadline_scope(create_request_deadline() if use_deadline else None):
+                intent = understand_fn(case.text)
+            result.predicted = [c for c in as_calls(intent) if c.get("tool") != UNKNOWN]
+        except Exception as e:
+            result.error = str(e)
+        result.latency_ms = (time.perf_counter() - started) * 1000
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="WALL-E-Eval") as pool:
+        return list(pool.map(run, cases))
+
+
+def summarize(results: List[EvalResult]) -> Dict[str, Any]:
+    """
+    汇总评测结果
+
+    Returns:
+        {"total", "tool_accuracy", "params_accuracy", "errors", "latency",
+         "per_tool": {期望工具: {...}}, "confusion": {期望工具: {预测工具: 次数}}}
+    """
+    total = len(results)
+    latency = LatencyStats(window=max(1, total))
+    per_tool: Dict[str, Dict[str, Any]] = {}
+    confusion: Dict[str, Dict[str, int]] = {}
+    for r in results:
+        latency.record(r.latency_ms)
+        expected = r.case.label
+        predicted = "error" if r.error is not None else r.label
+        confusion.setdefault(expected, {})
+        confusion[expected][predicted] = confusion[expected].get(predicted, 0) + 1
+
+        stats = per_tool.setdefault(expected, {
+            "count": 0, "tool_correct": 0, "params_correct": 0, "_latency": LatencyStats(window=max(1, total)),
+        })
+        stats["count"] += 1
+        stats["tool_correct"] += r.tool_correct
+        stats["params_correct"] += r.params_correct
+        stats["_latency"].record(r.latency_ms)
+
+    for stats in per_tool.values():
+        stats["tool_accuracy"] = stats["tool_correct"] / stats["count"]
+        stats["params_accuracy"] = stats["params_correct"] / stats["count"]
+        stats["latency"] = stats.pop("_latency").summary()
+
+    return {
+        "total": total,
+        "tool_accuracy": sum(r.tool_correct for r in results) / total if total else 0.0,
+        "params_accuracy": sum(r.params_correct for r in results) / total if total else 0.0,
+        "errors": sum(r.error is not None for r in results),
+        "latency": latency.summary(),
+        "per_tool": per_tool,
+        "confusion": confusion,
+    }
+
+
+def _pad(text: str, width: int) -> str:
+    # 中文字符占两列,按显示宽度补齐
+    shown = sum(2 if unicodedata.east_asian_width(ch) in ("W", "F") else 1 for ch in text)
+    return text + " " * max(0, width - shown)
+
+
+def format_report(summary: Dict[str, Any]) -> str:
+    """把 summarize() 结果渲染成文本报告"""
+    lines = [
+        f"📊 共 {summary['total']} 条, 工具准确率 {summary['tool_accuracy']:.1%}, "
+        f"参数准确率 {summary['params_accuracy']:.1%}, 出错 {summary['errors']} 条",
+        f"⏱️  延迟 {format_summary(summary['latency'])}",
+        "",
+        f"{_pad('期望工具', 30)}  条数   工具   参数  延迟",
+    ]
+    for tool, stats in sorted(summary["per_tool"].items()):
+        lines.append(
+            f"{_pad(tool, 30)}{stats['count']:>6}{stats['tool_accuracy']:>7.0%}{stats['params_accuracy']:>7.0%}  "
+            f"{format_summary(stats['latency'])}"
+        )
+
+    labels = sorted(set(summary["confusion"]) | {p for row in summary["confusion"].values() for p in row})
+    lines += ["", "混淆矩阵 (行: 期望, 列: 预测)"]
+    lines.append(" " * 30 + "".join(f"{i:>5}" for i in range(len(labels))))
+    for i, expected in enumerate(labels):
+        row = summary["confusion"].get(expected, {})
+        cells = "".join(f"{row.get(p, 0) or '.':>5}" for p in labels)
+        lines.append(f"{i:>2} {_pad(expected, 27)}{cells}")
+    return "\n".join(lines)
+
+
+def _rules_target() -> Callable[[str], Any]:
+    from intent_rules import match_intent
+    return match_intent
+
+
+def _router_target() -> Callable[[str], Any]:
+    from intent_router import route_intent
+    return route_intent
+
+
+def _module_target(module: str, attr: str = "understand_with_mcp") -> Callable[[], Callable[[str], Any]]:
+    return lambda: getattr(importlib.import_module(module), attr)
+
+
+TARGETS: Dict[str, Callable[[], Callable[[str], Any]]] = {
+    "rules": _rules_target,
+    "router": _router_target,
+    "simple": _module_target("voice_nav_mcp_simple"),
+    "mcp": _module_target("voice_nav_mcp"),
+}
+
+
+def resolve_target(name: str) -> Callable[[str], Any]:
+    """
+    按名称取得意图理解函数
+
+    Args:
+        name: rules / router / simple / mcp,或 "模块:函数" (如 voice_nav_mcp_simple:understand_with_mcp)
+    """
+    if name in TARGETS:
+        return TARGETS[name]()
+    if ":" in name:
+        module, attr = name.split(":", 1)
+        return _module_target(module, attr)()
+    raise ValueError(f"未知的评测目标: {name} (可选: {', '.join(TARGETS)} 或 模块:函数)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WALL-E 离线意图评测")
+    parser.add_argument("corpus", nargs="?", default="intent_eval_corpus.jsonl", help="评测语料 (JSON Lines)")
+    parser.add_argument("--target", default="simple", help="rules / router / simple / mcp 或 模块:函数")
+    parser.add_argument("--concurrency", type=int, default=4, help="最多同时进行的请求数")
+    parser.add_argument("--rate", type=float, default=0.0, help="每秒最多请求数 (0 = 不限速)")
+    parser.add_argument("--deadline", action="store_true", help="每条指令在 DEADLINE_* 时间预算中执行")
+    parser.add_argument("--cache", action="store_true", help="保留意图缓存 (默认关闭,避免重复指令影响延迟)")
+    parser.add_argument("--output", help="把完整结果写入 JSON 文件")
+    parser.add_argument("--show-failures", action="store_true", help="列出判错的指令")
+    args = parser.parse_args()
+
+    if not args.cache:
+        os.environ["INTENT_CACHE"] = "0"
+    cases = load_corpus(args.corpus)
+    understand_fn = resolve_target(args.target)
+    print(f"🧪 评测 {args.target}: {len(cases)} 条, 并发 {args.concurrency}, 限速 {args.rate or '无'}/s")
+
+    started = time.perf_counter()
+    results = evaluate(cases, understand_fn, args.concurrency, args.rate, args.deadline)
+    elapsed = time.perf_counter() - started
+    summary = summarize(results)
+    print(format_report(summary))
+    print(f"\n总耗时 {elapsed:.1f}s")
+
+    if args.show_failures:
+        print("\n❌ 判错的指令:")
+        for r in results:
+            if not r.params_correct:
+                print(f"  {r.case.text}: 期望 {r.case.calls}, 实际 {r.error or r.predicted}")
+
+    if args.output:
+        report = dict(summary, results=[
+            {"text": r.case.text, "expected": r.case.calls, "predicted": r.predicted,
+             "latency_ms": round(r.latency_ms, 1), "error": r.error,
+             "tool_correct": r.tool_correct, "params_correct": r.params_correct}
+            for r in results
+        ])
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"✅ 结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
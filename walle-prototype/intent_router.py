@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""
+WALL-E 本地向量意图路由
+把带标注的示例指令 (intent_examples.jsonl) 用字符 n-gram 哈希向量化,
+建成 NumPy 索引;新指令向量化后检索最相似的示例,按示例生成的句式模板抽取参数,
+相似度足够高且模板匹配时直接返回工具和参数 (毫秒级),否则交给大模型
+
+用法:
+    python intent_router.py build                   # 根据示例重建索引
+    python intent_router.py query "导航到南京西路"     # 查看路由结果
+"""
+
+import argparse
+import atexit
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from intent_rules import is_compound
+from logger_config import setup_logger
+from metrics import LatencyStats, format_summary
+from text_utils import normalize_transcript
+
+try:
+    import numpy as np
+except ImportError:  # 可选依赖,只有开启向量路由时才需要
+    np = None
+
+logger = setup_logger("WALL-E.IntentRouter", level=os.getenv("LOG_LEVEL", "INFO"))
+
+DEFAULT_EXAMPLES_PATH = str(Path(__file__).parent / "intent_examples.jsonl")
+DEFAULT_INDEX_PATH = "~/.walle/intent_index.npz"
+MAX_SLOT_CHARS = 20
+
+
+def _normalize(text: str) -> str:
+    return normalize_transcript(text).lower()
+
+
+def embed(texts: List[str], dim: int = 2048, ngram_range: Tuple[int, int] = (1, 3)) -> "np.ndarray":
+    """
+    字符 n-gram 哈希向量 (L2 归一化),不需要下载模型
+
+    Args:
+        texts: 文本列表
+        dim: 向量维度
+        ngram_range: n-gram 长度范围
+
+    Returns:
+        形状为 (len(texts), dim) 的 float32 矩阵
+    """
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        padded = f"^{_normalize(text)}$"
+        for n in range(ngram_range[0], ngram_range[1] + 1):
+            for i in range(len(padded) - n + 1):
+                # crc32 在不同进程间稳定,索引可以落盘复用
+                vectors[row, zlib.crc32(padded[i:i + n].encode("utf-8")) % dim] += 1.0
+    # 次线性词频,避免重复字符主导相似度
+    np.sqrt(vectors, out=vectors)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _slot_spans(normalized: str, params: Dict[str, Any]) -> Tuple[List[Tuple[int, int, str]], Dict[str, Any]]:
+    """参数值在句子中的位置 (按出现顺序,互不重叠) 和没有出现在句子中的固定参数"""
+    spans = []
+    constants = {}
+    for key, value in params.items():
+        position = normalized.find(_normalize(value)) if isinstance(value, str) and value else -1
+        if position < 0 or normalized.count(_normalize(value)) > 1:
+            constants[key] = value
+            continue
+        spans.append((position, position + len(_normalize(value)), key))
+
+    kept, cursor = [], 0
+    for start, end, key in sorted(spans):
+        if start < cursor:
+            constants[key] = params[key]
+            continue
+        kept.append((start, end, key))
+        cursor = end
+    return kept, constants
+
+
+def build_template(
+    text: str,
+    params: Dict[str, Any],
+    vocabulary: Optional[Dict[str, List[str]]] = None,
+) -> Tuple[Optional["re.Pattern"], Dict[str, Any]]:
+    """
+    根据示例生成句式模板: 把出现在句子中的参数值替换为命名分组
+
+    两个参数紧挨着时 ("上海明天") 边界有歧义,后一个参数只匹配示例中见过的取值
+
+    Args:
+        text: 示例指令
+        params: 示例参数
+        vocabulary: 参数名 → 示例中出现过的取值
+
+    Returns:
+        (模板正则, 固定参数);句子中没有出现的参数作为固定值直接带出
+    """
+    normalized = _normalize(text)
+    spans, constants = _slot_spans(normalized, params)
+    pattern, cursor = "", 0
+    for start, end, key in spans:
+        values = (vocabulary or {}).get(key)
+        if start == cursor and cursor > 0 and values:
+            group = "|".join(re.escape(v) for v in sorted(values, key=len, reverse=True))
+        else:
+            group = ".+?"
+        pattern += re.escape(normalized[cursor:start]) + f"(?P<{key}>{group})"
+        cursor = end
+    pattern += re.escape(normalized[cursor:])
+    if not spans:
+        return None, constants
+    return re.compile(f"^{pattern}$"), constants
+
+
+@dataclass
+class IntentExample:
+    """一条带标注的示例指令"""
+    text: str
+    tool: str
+    params: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class RouteMatch:
+    """路由结果"""
+    tool: str
+    params: Dict[str, Any]
+    similarity: float
+    example: str
+
+    def to_intent(self) -> Dict[str, Any]:
+        return {"tool": self.tool, "params": dict(self.params)}
+
+
+def load_examples(path: str) -> List[IntentExample]:
+    """
+    读取示例文件 (JSON Lines,每行 {"text", "tool", "params"},# 开头为注释)
+
+    Raises:
+        ValueError: 某一行格式不对
+    """
+    examples = []
+    with open(os.path.expanduser(path), encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                data = json.loads(line)
+                examples.append(IntentExample(data["text"], data["tool"], dict(data.get("params", {}))))
+            except (ValueError, KeyError, TypeError) as e:
+                raise ValueError(f"{path}:{lineno} 示例格式错误: {e}")
+    return examples
+
+
+def _file_digest(path: str) -> str:
+    return hashlib.sha1(Path(os.path.expanduser(path)).read_bytes()).hexdigest()
+
+
+class IntentRouter:
+    """
+    示例指令的向量索引
+
+    检索 top_k 个最相似的示例,尝试相似度不低于 min_similarity 的各个示例的句式模板,
+    模板匹配、参数合法的示例中绑定参数最多的胜出 (相同时取相似度高的)。
+    n-gram 相似度负责挑选候选句式,模板负责保证参数抽取准确;
+    参数较少的模板抽出的值里含有同一工具多参数句式的连接词 (如 "周杰伦的稻香" 中的 "的") 时,
+    说明句式不对,不采用
+    """
+
+    def __init__(
+        self,
+        examples: List[IntentExample],
+        vectors: Optional["np.ndarray"] = None,
+        dim: int = 2048,
+        min_similarity: float = 0.35,
+        top_k: int = 5,
+        source_digest: str = "",
+    ):
+        """
+        Args:
+            examples: 示例指令
+            vectors: 预先计算好的向量,None 表示现场计算
+            dim: 向量维度
+            min_similarity: 最低余弦相似度
+            top_k: 检索的候选数量
+            source_digest: 示例文件的摘要,用于判断索引是否过期
+        """
+        if np is None:
+            raise ImportError("使用向量意图路由需要安装 numpy: pip install numpy")
+        self.examples = examples
+        self.dim = dim
+        self.min_similarity = min_similarity
+        self.top_k = top_k
+        self.source_digest = source_digest
+        self.vectors = vectors if vectors is not None else embed([e.text for e in examples], dim)
+        vocabulary: Dict[Tuple[str, str], set] = {}
+        for e in examples:
+            for key, value in e.params.items():
+                if isinstance(value, str) and value and _normalize(value) in _normalize(e.text):
+                    vocabulary.setdefault((e.tool, key), set()).add(_normalize(value))
+        self.templates = [
+            build_template(e.text, e.params, {k: list(vocabulary.get((e.tool, k), ())) for k in e.params})
+            for e in examples
+        ]
+        # 工具 → 示例中最多绑定的参数数 / 相邻两个参数之间的连接词
+        self.max_slots: Dict[str, int] = {}
+        self.connectors: Dict[str, set] = {}
+        for e in examples:
+            normalized = _normalize(e.text)
+            spans, _ = _slot_spans(normalized, e.params)
+            self.max_slots[e.tool] = max(self.max_slots.get(e.tool, 0), len(spans))
+            for (_, end, _), (start, _, _) in zip(spans, spans[1:]):
+                if normalized[end:start].strip():
+                    self.connectors.setdefault(e.tool, set()).add(normalized[end:start].strip())
+
+        self.stats = LatencyStats()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_examples(cls, path: str, **kwargs) -> "IntentRouter":
+        return cls(load_examples(path), source_digest=_file_digest(path), **kwargs)
+
+    def save(self, path: str):
+        """保存索引 (向量 + 示例)"""
+        target = Path(os.path.expanduser(path))
+        target.parent.mkdir(parents=True, exist_ok=True)
+        meta = json.dumps(
+            {
+                "dim": self.dim,
+                "source_digest": self.source_digest,
+                "examples": [e.__dict__ for e in self.examples],
+            },
+            ensure_ascii=False,
+        )
+        with open(target, "wb") as f:
+            np.savez(f, vectors=self.vectors, meta=np.array(meta))
+        logger.info(f"已保存意图索引: {target} ({len(self.examples)} 条示例)")
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "IntentRouter":
+        """读取 save() 保存的索引"""
+        if np is None:
+            raise ImportError("使用向量意图路由需要安装 numpy: pip install numpy")
+        with np.load(os.path.expanduser(path)) as data:
+            meta = json.loads(str(data["meta"]))
+            vectors = data["vectors"]
+        examples = [IntentExample(**e) for e in meta["examples"]]
+        return cls(examples, vectors=vectors, dim=meta["dim"], source_digest=meta["source_digest"], **kwargs)
+
+    def _extract(self, index: int, normalized: str) -> Optional[Dict[str, Any]]:
+        pattern, constants = self.templates[index]
+        if pattern is None:
+            return None
+        m = pattern.match(normalized)
+        if m is None:
+            return None
+        slots = m.groupdict()
+        if any(not v or len(v) > MAX_SLOT_CHARS for v in slots.values()):
+            return None
+        tool = self.examples[index].tool
+        if len(slots) < self.max_slots.get(tool, 0) and any(
+            connector in value for value in slots.values() for connector in self.connectors.get(tool, ())
+        ):
+            return None
+        params = dict(constants)
+        params.update(slots)
+        # 保持与示例相同的参数顺序
+        return {key: params[key] for key in self.examples[index].params}
+
+    def route(self, text: str, record: bool = True) -> Optional[RouteMatch]:
+        """
+        路由一句话
+
+        Args:
+            text: 用户输入
+            record: 是否计入命中率和耗时统计 (流式识别的推测性查询传 False)
+
+        Returns:
+            RouteMatch,没有足够相似且模板匹配的示例时返回 None;复合指令 (然后/顺便...) 不路由
+        """
+        started = time.perf_counter()
+        normalized = _normalize(text)
+        result = None
+        # 模板的槽位会把后一个请求一起吞进前一个请求的参数,复合指令交给大模型拆分
+        if normalized and len(self.examples) and not is_compound(normalized):
+            similarities = self.vectors @ embed([normalized], self.dim)[0]
+            k = min(self.top_k, len(similarities))
+            candidates = np.argpartition(-similarities, k - 1)[:k]
+            best = None
+            for index in sorted(candidates, key=lambda i: -similarities[i]):
+                similarity = float(similarities[index])
+                if similarity < self.min_similarity:
+                    break
+                params = self._extract(index, normalized)
+                if params is None:
+                    continue
+                bound = len(self.templates[index][0].groupindex)
+                if best is None or bound > best[0]:
+                    example = self.examples[index]
+                    best = (bound, RouteMatch(example.tool, params, similarity, example.text))
+            result = best[1] if best is not None else None
+
+        if record:
+            self.stats.record((time.perf_counter() - started) * 1000)
+            with self._lock:
+                if result is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+        if result is not None:
+            logger.debug(f"向量路由命中 [{result.example}] ({result.similarity:.2f}): {result.tool} {result.params}")
+        return result
+
+    def log_stats(self):
+        total = self.hits + self.misses
+        if total:
+            logger.info(
+                f"向量意图路由: 命中 {self.hits}/{total} ({self.hits / total:.0%}), "
+                f"耗时 {format_summary(self.stats.summary())}"
+            )
+
+
+def build_index(examples_path: str, index_path: str, dim: int = 2048) -> IntentRouter:
+    """
+    根据示例文件 (重新) 建立索引并保存
+
+    Args:
+        examples_path: 示例文件
+        index_path: 索引保存路径
+        dim: 向量维度
+
+    Returns:
+        新建的 IntentRouter
+    """
+    router = IntentRouter.from_examples(examples_path, dim=dim)
+    router.save(index_path)
+    return router
+
+
+def intent_router_enabled() -> bool:
+    """是否开启向量意图路由 (INTENT_ROUTER=1)"""
+    return os.getenv("INTENT_ROUTER", "0").lower() in ("1", "true", "yes")
+
+
+_router: Optional[IntentRouter] = None
+_router_failed = False
+_router_lock = threading.Lock()
+
+
+def _load_or_build(examples_path: str, index_path: str, **kwargs) -> IntentRouter:
+    """读取索引;索引不存在或示例文件已修改时重建"""
+    digest = _file_digest(examples_path)
+    try:
+        router = IntentRouter.load(index_path, **kwargs)
+        if router.source_digest == digest:
+            logger.info(f"已加载意图索引: {index_path} ({len(router.examples)} 条示例)")
+            return router
+        logger.info("示例文件已修改,重建意图索引")
+    except FileNotFoundError:
+        logger.info("意图索引不存在,根据示例建立")
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"读取意图索引失败,重新建立: {e}")
+    router = IntentRouter.from_examples(examples_path, **kwargs)
+    try:
+        router.save(index_path)
+    except OSError as e:
+        logger.warning(f"保存意图索引失败: {e}")
+    return router
+
+
+def get_intent_router() -> Optional[IntentRouter]:
+    """
+    获取进程内共享的向量意图路由
+
+    Returns:
+        IntentRouter,未开启或加载失败时返回 None
+    """
+    global _router, _router_failed
+    if not intent_router_enabled() or _router_failed:
+        return None
+    with _router_lock:
+        if _router is None:
+            try:
+                _router = _load_or_build(
+                    os.getenv("INTENT_EXAMPLES_PATH", DEFAULT_EXAMPLES_PATH),
+                    os.getenv("INTENT_ROUTER_INDEX", DEFAULT_INDEX_PATH),
+                    min_similarity=float(os.getenv("INTENT_ROUTER_MIN_SIMILARITY", "0.35")),
+                )
+            except (ImportError, OSError, ValueError) as e:
+                logger.error(f"向量意图路由初始化失败,已关闭: {e}")
+                _router_failed = True
+                return None
+            atexit.register(_router.log_stats)
+        return _router
+
+
+def route_intent(text: str, record: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    向量路由: 命中时返回 {"tool", "params"},否则返回 None (需要交给大模型)
+
+    Args:
+        text: 用户输入
+        record: 是否计入命中率 (流式识别的推测性查询传 False)
+    """
+    router = get_intent_router()
+    if router is None:
+        return None
+    result = router.route(text, record=record)
+    return result.to_intent() if result is not None else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WALL-E 向量意图路由工具")
+    parser.add_argument("command", choices=["build", "query"])
+    parser.add_argument("text", nargs="?", help="query 时要路由的指令")
+    parser.add_argument("--examples", default=os.getenv("INTENT_EXAMPLES_PATH", DEFAULT_EXAMPLES_PATH))
+    parser.add_argument("--index", default=os.getenv("INTENT_ROUTER_INDEX", DEFAULT_INDEX_PATH))
+    parser.add_argument("--dim", type=int, default=2048, help="向量维度")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        router = build_index(args.examples, args.index, args.dim)
+        print(f"✅ 已建立意图索引: {args.index} ({len(router.examples)} 条示例)")
+        return
+
+    router = _load_or_build(args.examples, args.index)
+    result = router.route(args.text or "")
+    if result is None:
+        print("❓ 没有命中,将交给大模型")
+    else:
+        print(f"⚡ {result.tool} {result.params} (相似度 {result.similarity:.2f}, 示例: {result.example})")
+
+
+if __name__ == "__main__":
+    main()
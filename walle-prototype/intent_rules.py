@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+WALL-E 规则快速通道
+大部分指令都是固定句式 ("从A到B"、"导航到B"、"X天气怎么样"、"播放X的Y"),
+用预编译的正则直接解析出工具和参数,不必等待几秒的大模型调用;
+规则没有高置信度命中时才交给大模型,退出时输出快速通道覆盖率
+"""
+
+import atexit
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from logger_config import setup_logger
+from text_utils import normalize_transcript
+
+logger = setup_logger("WALL-E.IntentRules", level=os.getenv("LOG_LEVEL", "INFO"))
+
+# 出现这些词说明一句话里可能有多个意图或附加条件,交给大模型处理
+_COMPLEX_MARKERS = re.compile(r"然后|并且|而且|同时|顺便|之后|再(?:帮|查|看|放|播|来|去|导航|打开)|不要|别走|避开|途经")
+_POLITE_PREFIX = re.compile(r"^(?:请|麻烦|帮我|给我|wall-?e|瓦力)+", re.IGNORECASE)
+_WANT = r"(?:我想要|我想|我要)?"
+# 这些词做参数说明没有说清楚具体对象 (代词、播放器控制词不是歌名或地名)
+_VAGUE_SLOTS = {
+    "歌", "音乐", "歌曲", "一首歌", "哪里", "这里", "那里", "天气",
+    "我", "你", "他", "她", "它", "我们", "你们", "他们",
+    "下一首", "上一首", "暂停", "继续", "停止", "列表", "播放列表", "随机", "循环", "单曲循环",
+}
+_POLITE_SUFFIX = re.compile(r"(?:吧|吗|呢|啊|呀|谢谢|一下)+$")
+
+_DATES = {
+    "今天": "today",
+    "现在": "today",
+    "明天": "明天",
+    "后天": "后天",
+    "大后天": "大后天",
+    "周末": "周末",
+    "这周末": "周末",
+}
+_DATE_PATTERN = "|".join(sorted(_DATES, key=len, reverse=True))
+
+MAX_SLOT_CHARS = 20
+
+_CITY_SLOTS = ("city", "city1", "city2")
+# 城市参数里出现动词、代词或日期说明句式没有切对 ("搜索一下天气"、"从明天到后天上海天气"、"我和你天气")
+_NOT_CITY = re.compile(
+    rf"搜|查|看|找|告诉|播放|导航|打开|一下|从|到|我|你|他|她|它|{_DATE_PATTERN}|昨天|下周|星期|周[一二三四五六日天]|[0-9一二三四五六七八九十]+[号日]"
+)
+
+
+@dataclass
+class Rule:
+    """一条句式规则"""
+    name: str
+    tool: str
+    pattern: "re.Pattern"
+    build: Callable[[Dict[str, str]], Dict[str, Any]]
+    confidence: float = 0.95
+
+
+@dataclass
+class RuleMatch:
+    """规则匹配结果"""
+    rule: str
+    tool: str
+    params: Dict[str, Any]
+    confidence: float
+
+    def to_intent(self) -> Dict[str, Any]:
+        return {"tool": self.tool, "params": dict(self.params)}
+
+
+def _weather_date(groups: Dict[str, str]) -> str:
+    return _DATES.get(groups.get("date") or "今天", "today")
+
+
+def _rule(name: str, tool: str, pattern: str, build, confidence: float = 0.95) -> Rule:
+    return Rule(name, tool, re.compile(f"^(?:{pattern})$"), build, confidence)
+
+
+RULES: List[Rule] = [
+    _rule(
+        "nav_from_to", "navigate",
+        r"(?:导航)?从(?P<origin>.+?)(?:到|去)(?P<destination>.+?)(?:怎么走|的路线|导航)?",
+        lambda g: {"origin": g["origin"], "destination": g["destination"]},
+    ),
+    _rule(
+        "nav_home", "navigate",
+        r"(?:导航)?回家",
+        lambda g: {"origin": "当前位置", "destination": "家"},
+    ),
+    _rule(
+        "nav_to", "navigate",
+        r"(?:导航|带我|开车|送我)(?:到|去)(?P<destination>.+?)|去(?P<destination2>.+?)怎么走",
+        lambda g: {"origin": "当前位置", "destination": g["destination"] or g["destination2"]},
+    ),
+    _rule(
+        "compare_weather", "compare_weather",
+        r"(?:对比|比较)?(?P<city1>.+?)(?:和|跟|与)(?P<city2>.+?)的?天气(?:对比|比较|哪个好|怎么样)?",
+        lambda g: {"city1": g["city1"], "city2": g["city2"]},
+    ),
+    _rule(
+        "weather", "get_weather",
+        rf"(?:查询?|看看)?(?P<date2>{_DATE_PATTERN})(?P<city2>.+?)的?天气(?:怎么样|如何|预报)?"
+        rf"|(?:查询?一下|查询?|看看)?(?P<city>.+?)(?P<date>{_DATE_PATTERN})?的?天气(?:怎么样|如何|预报|好吗)?",
+        lambda g: {
+            "city": g["city"] or g["city2"],
+            "date": _weather_date({"date": g["date"] or g["date2"]}),
+        },
+    ),
+    _rule(
+        "playlist", "search_playlist",
+        r"(?:搜索?|找|查找)(?:一下)?(?P<keyword>.+?)(?:的)?歌单",
+        lambda g: {"keyword": g["keyword"]},
+    ),
+    _rule(
+        "play_artist_song", "play_music",
+        _WANT + r"(?:播放|放一首|来一首|来首)(?P<artist>.+?)的(?P<song>.+?)(?:这首歌)?",
+        lambda g: {"song": g["song"], "artist": g["artist"]},
+        confidence=0.9,
+    ),
+    _rule(
+        "play_song", "play_music",
+        _WANT + r"(?:播放|放一首|来一首|来首)(?P<song>.+?)(?:这首歌)?",
+        lambda g: {"song": g["song"], "artist": ""},
+        confidence=0.9,
+    ),
+    _rule(
+        "search_location", "search_location",
+        r"(?:搜索|查找|找一下|找找|搜一下)(?:一下)?(?:附近的)?(?P<query>.+?)(?:在哪里?|在哪儿)?",
+        lambda g: {"query": g["query"]},
+        confidence=0.9,
+    ),
+    # 单字 "放"/"听" 和 "我想去X" 常常不是播放或导航 ("放大地图"、"听说明天下雨"、"我想去看电影"),
+    # 只在大模型超时降级时使用
+    _rule(
+        "want_to_go", "navigate",
+        r"(?:我想要|我想|我要)(?:到|去)(?P<destination>.+?)",
+        lambda g: {"origin": "当前位置", "destination": g["destination"]},
+        confidence=0.7,
+    ),
+    _rule(
+        "listen_artist_song", "play_music",
+        _WANT + r"(?:听听|听|放)(?P<artist>.+?)的(?P<song>.+?)(?:这首歌)?",
+        lambda g: {"song": g["song"], "artist": g["artist"]},
+        confidence=0.7,
+    ),
+    _rule(
+        "listen_song", "play_music",
+        _WANT + r"(?:听听|听|放)(?P<song>.+?)(?:这首歌)?",
+        lambda g: {"song": g["song"], "artist": ""},
+        confidence=0.7,
+    ),
+    _rule(
+        "where_is", "search_location",
+        r"(?P<query>.+?)在哪里?",
+        lambda g: {"query": g["query"]},
+        confidence=0.8,
+    ),
+]
+
+
+def _clean(text: str) -> str:
+    text = normalize_transcript(text)
+    text = _POLITE_PREFIX.sub("", text)
+    return _POLITE_SUFFIX.sub("", text)
+
+
+def _valid_slots(params: Dict[str, Any]) -> bool:
+    for key, value in params.items():
+        if key in ("artist", "date"):
+            continue
+        if not value or len(value) > MAX_SLOT_CHARS or value in _VAGUE_SLOTS or value in _DATES:
+            return False
+        if key in _CITY_SLOTS and _NOT_CITY.search(value):
+            return False
+    return True
+
+
+def is_compound(text: str) -> bool:
+    """指令里有多个请求或附加条件 (然后/顺便/避开...),只能交给大模型拆分理解"""
+    return bool(_COMPLEX_MARKERS.search(text or ""))
+
+
+class IntentRuleEngine:
+    """按顺序尝试句式规则,第一条匹配且参数合法的规则胜出"""
+
+    def __init__(self, rules: Optional[List[Rule]] = None, min_confidence: float = 0.9):
+        """
+        Args:
+            rules: 规则列表,默认使用 RULES
+            min_confidence: 低于这个置信度的匹配不走快速通道
+        """
+        self.rules = rules if rules is not None else RULES
+        self.min_confidence = min_confidence
+        self.total = 0
+        self.matched = 0
+        self.by_rule: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def match(self, text: str, min_confidence: Optional[float] = None, record: bool = True) -> Optional[RuleMatch]:
+        """
+        解析一句话
+
+        Args:
+            text: 用户输入
+            min_confidence: 本次使用的置信度下限,默认使用 self.min_confidence
+            record: 是否计入快速通道覆盖率 (降级、预取等其他用途传 False)
+
+        Returns:
+            置信度达标的 RuleMatch,没有命中时返回 None
+        """
+        if min_confidence is None:
+            min_confidence = self.min_confidence
+        cleaned = _clean(text)
+        result = None
+        if cleaned and not is_compound(cleaned):
+            for rule in self.rules:
+                if rule.confidence < min_confidence:
+                    continue
+                m = rule.pattern.match(cleaned)
+                if m is None:
+                    continue
+                params = rule.build({k: v for k, v in m.groupdict().items()})
+                if _valid_slots(params):
+                    result = RuleMatch(rule.name, rule.tool, params, rule.confidence)
+                    break
+
+        if record:
+            with self._lock:
+                self.total += 1
+                if result is not None:
+                    self.matched += 1
+                    self.by_rule[result.rule] = self.by_rule.get(result.rule, 0) + 1
+        if result is not None:
+            logger.debug(f"规则 [{result.rule}] 命中: {result.tool} {result.params}")
+        return result
+
+    def coverage(self) -> Dict[str, Any]:
+        """快速通道覆盖率"""
+        with self._lock:
+            return {
+                "total": self.total,
+                "matched": self.matched,
+                "coverage": self.matched / self.total if self.total else 0.0,
+                "by_rule": dict(self.by_rule),
+            }
+
+    def log_coverage(self):
+        stats = self.coverage()
+        if stats["total"]:
+            logger.info(
+                f"规则快速通道覆盖率: {stats['matched']}/{stats['total']} ({stats['coverage']:.0%}), "
+                f"各规则命中: {stats['by_rule']}"
+            )
+
+
+_engine: Optional[IntentRuleEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_rule_engine() -> Optional[IntentRuleEngine]:
+    """
+    获取进程内共享的规则引擎
+
+    Returns:
+        IntentRuleEngine,INTENT_RULES=0 时返回 None
+    """
+    global _engine
+    if os.getenv("INTENT_RULES", "1").lower() not in ("1", "true", "yes"):
+        return None
+    with _engine_lock:
+        if _engine is None:
+            _engine = IntentRuleEngine(
+                min_confidence=float(os.getenv("INTENT_RULES_MIN_CONFIDENCE", "0.9"))
+            )
+            atexit.register(_engine.log_coverage)
+        return _engine
+
+
+def match_intent(
+    text: str, min_confidence: Optional[float] = None, record: bool = True,
+) -> Optional[Dict[str, Any]]:
+    """
+    规则快速通道: 命中时返回 {"tool", "params"},否则返回 None (需要交给大模型)
+
+    Args:
+        text: 用户输入
+        min_confidence: 置信度下限;大模型超时降级时传 0,接受低置信度的规则
+        record: 是否计入快速通道覆盖率;只有快速通道本身的查询计入,同一句话的降级和预取不重复统计
+    """
+    engine = get_rule_engine()
+    if engine is None:
+        return None
+    result = engine.match(text, min_confidence, record=record)
+    return result.to_intent() if result is not None else None
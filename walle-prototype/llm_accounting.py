@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+"""
+WALL-E 大模型调用记账
+网关发出的每一次请求 (包括切换服务商和对冲) 都记录服务商、模型、提示词/输出 token、
+首包延迟、总延迟和费用;内存中按 服务商/模型 汇总分位数,定期追加写入本地 JSON Lines 文件,
+用来看清 AI 理解阶段的 3 秒预算到底花在了哪里
+
+    python llm_accounting.py ~/.walle/llm_usage.jsonl
+"""
+
+import argparse
+import atexit
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from conversation import estimate_tokens, message_tokens
+from logger_config import setup_logger
+from metrics import LatencyStats, format_summary
+
+logger = setup_logger("WALL-E.LLMAccounting", level=os.getenv("LOG_LEVEL", "INFO"))
+
+DEFAULT_USAGE_PATH = "~/.walle/llm_usage.jsonl"
+# 未写入文件的记录达到这个数量时立即写入
+FLUSH_BATCH = 100
+
+
+@dataclass
+class CallRecord:
+    """
+    一次大模型请求
+
+    非流式请求一次拿到全部输出,首包延迟等于总延迟;没有 usage 时按字符估算 token (estimated)
+    """
+    provider: str
+    model: str
+    latency_ms: float
+    ttft_ms: Optional[float] = None
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost: float = 0.0
+    stream: bool = False
+    ok: bool = True
+    estimated: bool = False
+    at: float = field(default_factory=time.time)
+
+    def to_compact(self) -> Dict[str, Any]:
+        """写入文件的紧凑格式"""
+        data: Dict[str, Any] = {
+            "t": round(self.at, 3), "p": self.provider, "m": self.model,
+            "ms": round(self.latency_ms, 1), "in": self.prompt_tokens, "out": self.completion_tokens,
+        }
+        if self.ttft_ms is not None and self.stream:
+            data["ttft"] = round(self.ttft_ms, 1)
+        if self.cost:
+            data["usd"] = round(self.cost, 6)
+        if self.stream:
+            data["s"] = 1
+        if not self.ok:
+            data["err"] = 1
+        if self.estimated:
+            data["est"] = 1
+        return data
+
+    @classmethod
+    def from_compact(cls, data: Dict[str, Any]) -> "CallRecord":
+        stream = bool(data.get("s"))
+        return cls(
+            provider=data["p"], model=data["m"], latency_ms=data["ms"],
+            ttft_ms=data.get("ttft") if stream else data["ms"],
+            prompt_tokens=data.get("in", 0), completion_tokens=data.get("out", 0),
+            cost=data.get("usd", 0.0), stream=stream, ok=not data.get("err"),
+            estimated=bool(data.get("est")), at=data["t"],
+        )
+
+
+def parse_prices(spec: str) -> Dict[str, Tuple[float, float]]:
+    """
+    解析价格配置
+
+    Args:
+        spec: 形如 "gpt-4o-mini=0.15/0.6,deepseek-chat=0.27/1.1" (每百万 token 的输入/输出价格)
+
+    Returns:
+        模型 → (输入价格, 输出价格)
+
+    Raises:
+        ValueError: 格式不对
+    """
+    prices = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            model, price = item.split("=", 1)
+            prompt, completion = price.split("/", 1)
+            prices[model.strip()] = (float(prompt), float(completion))
+        except ValueError:
+            raise ValueError(f"价格配置格式错误: {item!r} (应为 模型=输入价格/输出价格)")
+    return prices
+
+
+def _usage_tokens(usage: Any) -> Optional[Tuple[int, int]]:
+    if usage is None:
+        return None
+    prompt = getattr(usage, "prompt_tokens", None)
+    completion = getattr(usage, "completion_tokens", None)
+    if prompt is None and completion is None:
+        return None
+    return int(prompt or 0), int(completion or 0)
+
+
+def _message_text(message: Any) -> str:
+    # 估算输出 token: 正文加上函数调用的名称和参数
+    parts = [getattr(message, "content", None) or ""]
+    for call in getattr(message, "tool_calls", None) or []:
+        function = getattr(call, "function", None)
+        parts.append(getattr(function, "name", None) or "")
+        parts.append(getattr(function, "arguments", None) or "")
+    return "".join(parts)
+
+
+class _StreamTracker:
+    """统计流式响应: 第一个数据块的时间、输出文本和最后的 usage"""
+
+    def __init__(self, accountant: "LLMAccountant", provider: str, request: Dict[str, Any], started: float):
+        self.accountant = accountant
+        self.provider = provider
+        self.request = request
+        self.started = started
+        self.ttft_ms: Optional[float] = None
+        self.usage = None
+        self.parts: List[str] = []
+        self.failed = False
+        self.finished = False
+
+    def observe(self, chunk: Any):
+        if self.ttft_ms is None:
+            self.ttft_ms = (time.perf_counter() - self.started) * 1000
+        usage = getattr(chunk, "usage", None)
+        if usage is not None:
+            self.usage = usage
+        for choice in getattr(chunk, "choices", None) or []:
+            delta = getattr(choice, "delta", None)
+            if delta is not None:
+                self.parts.append(_message_text(delta))
+
+    def finish(self):
+        if self.finished:
+            return
+        self.finished = True
+        self.accountant.record_call(
+            self.provider, self.request, self.started, self.usage, "".join(self.parts),
+            ttft_ms=self.ttft_ms, stream=True, ok=not self.failed,
+        )
+
+
+class AccountedStream:
+    """包装同步流式响应: 读完或关闭时记一笔账,其余属性透传"""
+
+    def __init__(self, stream: Any, tracker: _StreamTracker):
+        self._stream = stream
+        self._tracker = tracker
+
+    def __iter__(self) -> Iterator[Any]:
+        try:
+            for chunk in self._stream:
+                self._tracker.observe(chunk)
+                yield chunk
+        except Exception:
+            self._tracker.failed = True
+            raise
+        finally:
+            self._tracker.finish()
+
+    def close(self):
+        try:
+            close = getattr(self._stream, "close", None)
+            if callable(close):
+                close()
+        finally:
+            self._tracker.finish()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._stream, name)
+
+
+class AsyncAccountedStream:
+    """包装异步流式响应"""
+
+    def __init__(self, stream: Any, tracker: _StreamTracker):
+        self._stream = stream
+        self._tracker = tracker
+
+    async def __aiter__(self):
+        try:
+            async for chunk in self._stream:
+                self._tracker.observe(chunk)
+                yield chunk
+        except Exception:
+            self._tracker.failed = True
+            raise
+        finally:
+            self._tracker.finish()
+
+    async def close(self):
+        try:
+            close = getattr(self._stream, "close", None)
+            if callable(close):
+                await close()
+        finally:
+            self._tracker.finish()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._stream, name)
+
+
+class LLMAccountant:
+    """按 服务商/模型 汇总大模型调用,定期写入本地文件"""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        flush_seconds: float = 60.0,
+        prices: Optional[Dict[str, Tuple[float, float]]] = None,
+        llm_budget_ms: Optional[float] = None,
+    ):
+        """
+        Args:
+            path: 记录文件 (JSON Lines,追加写入);None 时只在内存中汇总
+            flush_seconds: 距上次写入超过这个时间(秒)后,下一次记录时写入文件
+            prices: 模型 → (每百万输入 token 价格, 每百万输出 token 价格)
+            llm_budget_ms: AI 理解阶段的时间预算,汇总时输出延迟占预算的比例
+        """
+        self.path = Path(os.path.expanduser(path)) if path else None
+        self.flush_seconds = flush_seconds
+        self.prices = dict(prices or {})
+        self.llm_budget_ms = llm_budget_ms
+        self._pending: List[CallRecord] = []
+        self._groups: Dict[str, Dict[str, Any]] = {}
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def cost(self, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        """按价格表计算费用,没有配置价格的模型为 0"""
+        prompt_price, completion_price = self.prices.get(model, (0.0, 0.0))
+        return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+    def record(self, call: CallRecord):
+        """记一笔账"""
+        if not call.cost and call.ok:
+            call.cost = self.cost(call.model, call.prompt_tokens, call.completion_tokens)
+        key = f"{call.provider}/{call.model}"
+        with self._lock:
+            group = self._groups.get(key)
+            if group is None:
+                group = self._groups[key] = {
+                    "calls": 0, "errors": 0, "estimated": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                    "cost": 0.0, "latency": LatencyStats(), "ttft": LatencyStats(),
+                }
+            group["calls"] += 1
+            group["errors"] += not call.ok
+            group["estimated"] += call.estimated
+            group["prompt_tokens"] += call.prompt_tokens
+            group["completion_tokens"] += call.completion_tokens
+            group["cost"] += call.cost
+            if call.ok:
+                group["latency"].record(call.latency_ms)
+                if call.ttft_ms is not None:
+                    group["ttft"].record(call.ttft_ms)
+            if self.path is None:
+                return
+            self._pending.append(call)
+            due = len(self._pending) >= FLUSH_BATCH or time.monotonic() - self._last_flush >= self.flush_seconds
+        if due:
+            self.flush()
+
+    def record_call(
+        self,
+        provider: str,
+        request: Dict[str, Any],
+        started: float,
+        usage: Any = None,
+        completion_text: str = "",
+        ttft_ms: Optional[float] = None,
+        stream: bool = False,
+        ok: bool = True,
+    ):
+        """
+        根据请求参数和响应记一笔账
+
+        Args:
+            provider: 服务商名称
+            request: chat.completions.create 的参数
+            started: 请求开始时的 time.perf_counter()
+            usage: 响应中的 usage;没有时按字符估算 token
+            completion_text: 输出文本 (估算输出 token 用)
+            ttft_ms: 首包延迟,非流式请求等于总延迟
+            stream: 是否流式请求
+            ok: 请求是否成功
+        """
+        latency_ms = (time.perf_counter() - started) * 1000
+        tokens = _usage_tokens(usage)
+        estimated = tokens is None and ok
+        if tokens is None:
+            tokens = (message_tokens(request.get("messages") or []), estimate_tokens(completion_text)) if ok else (0, 0)
+        self.record(CallRecord(
+            provider=provider, model=str(request.get("model") or ""), latency_ms=latency_ms,
+            ttft_ms=ttft_ms if stream else latency_ms, prompt_tokens=tokens[0], completion_tokens=tokens[1],
+            stream=stream, ok=ok, estimated=estimated,
+        ))
+
+    def track(self, provider: str, request: Dict[str, Any], started: float, response: Any = None, failed: bool = False) -> Any:
+        """
+        网关每次请求返回 (或失败) 后调用
+
+        Returns:
+            非流式请求原样返回响应;流式请求返回包装后的响应,读完或关闭时记账
+        """
+        if failed:
+            self.record_call(provider, request, started, ok=False)
+            return response
+        if request.get("stream"):
+            tracker = _StreamTracker(self, provider, request, started)
+            if hasattr(response, "__aiter__"):
+                return AsyncAccountedStream(response, tracker)
+            return AccountedStream(response, tracker)
+        choices = getattr(response, "choices", None) or []
+        text = _message_text(choices[0].message) if choices else ""
+        self.record_call(provider, request, started, getattr(response, "usage", None), text)
+        return response
+
+    def flush(self):
+        """把未写入的记录追加到文件"""
+        if self.path is None:
+            return
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+                self._last_flush = time.monotonic()
+            if not pending:
+                return
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    for call in pending:
+                        f.write(json.dumps(call.to_compact(), ensure_ascii=False, separators=(",", ":")) + "\n")
+            except OSError as e:
+                logger.warning(f"写入 LLM 调用记录失败: {e}")
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """
+        按 服务商/模型 汇总
+
+        Returns:
+            {"服务商/模型": {"calls", "errors", "estimated", "prompt_tokens", "completion_tokens",
+                             "cost", "latency": {...}, "ttft": {...}}}
+        """
+        with self._lock:
+            return {
+                key: dict(group, latency=group["latency"].summary(), ttft=group["ttft"].summary())
+                for key, group in self._groups.items()
+            }
+
+    def format_report(self) -> List[str]:
+        lines = []
+        for key, group in sorted(self.summary().items()):
+            ok = group["calls"] - group["errors"]
+            line = (
+                f"{key}: {group['calls']} 次 (失败 {group['errors']}), "
+                f"token 输入 {group['prompt_tokens']} / 输出 {group['completion_tokens']}"
+                f"{' (部分估算)' if group['estimated'] else ''}, "
+                f"平均 {group['prompt_tokens'] / max(ok, 1):.0f}/{group['completion_tokens'] / max(ok, 1):.0f}; "
+                f"首包 {format_summary(group['ttft'])}; 总延迟 {format_summary(group['latency'])}"
+            )
+            if group["cost"]:
+                line += f"; 费用 ${group['cost']:.4f}"
+            p50 = group["latency"].get("p50")
+            if self.llm_budget_ms and p50 is not None:
+                line += f"; p50 占 AI 预算 {p50 / self.llm_budget_ms:.0%}"
+            lines.append(line)
+        return lines
+
+    def close(self):
+        """退出时写入剩余记录并输出汇总"""
+        self.flush()
+        for line in self.format_report():
+            logger.info(f"LLM 记账 {line}")
+
+
+def load_records(path: str) -> List[CallRecord]:
+    """读取记录文件,跳过损坏的行 (进程被强制结束时最后一行可能不完整)"""
+    records = []
+    with open(os.path.expanduser(path), encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(CallRecord.from_compact(json.loads(line)))
+            except (ValueError, KeyError, TypeError):
+                continue
+    return records
+
+
+def create_llm_accountant() -> Optional[LLMAccountant]:
+    """
+    根据环境变量创建记账器
+
+    LLM_ACCOUNTING (默认开启) / LLM_ACCOUNTING_PATH (默认 ~/.walle/llm_usage.jsonl, 为空时只在内存中汇总) /
+    LLM_ACCOUNTING_FLUSH_SECONDS (默认 60) / LLM_PRICES (每百万 token 价格,如 gpt-4o-mini=0.15/0.6)
+    """
+    if os.getenv("LLM_ACCOUNTING", "1").lower() not in ("1", "true", "yes"):
+        return None
+    accountant = LLMAccountant(
+        path=os.getenv("LLM_ACCOUNTING_PATH", DEFAULT_USAGE_PATH) or None,
+        flush_seconds=float(os.getenv("LLM_ACCOUNTING_FLUSH_SECONDS", "60")),
+        prices=parse_prices(os.getenv("LLM_PRICES", "")),
+        llm_budget_ms=float(os.getenv("DEADLINE_LLM_SECONDS", "3")) * 1000,
+    )
+    atexit.register(accountant.close)
+    return accountant
+
+
+def main():
+    parser = argparse.ArgumentParser(description="汇总 WALL-E 大模型调用记录")
+    parser.add_argument("path", nargs="?", default=os.getenv("LLM_ACCOUNTING_PATH") or DEFAULT_USAGE_PATH, help="记录文件")
+    parser.add_argument("--since-hours", type=float, help="只统计最近多少小时的记录")
+    parser.add_argument("--budget-seconds", type=float, default=float(os.getenv("DEADLINE_LLM_SECONDS", "3")),
+                        help="AI 理解阶段的时间预算(秒)")
+    args = parser.parse_args()
+
+    records = load_records(args.path)
+    if args.since_hours:
+        cutoff = time.time() - args.since_hours * 3600
+        records = [r for r in records if r.at >= cutoff]
+    accountant = LLMAccountant(llm_budget_ms=args.budget_seconds * 1000)
+    for call in records:
+        accountant.record(call)
+    total_cost = sum(r.cost for r in records)
+    print(f"📊 共 {len(records)} 次大模型调用" + (f", 费用 ${total_cost:.4f}" if total_cost else ""))
+    for line in accountant.format_report():
+        print(f"  {line}")
+
+
+if __name__ == "__main__":
+    main()
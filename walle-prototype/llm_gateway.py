@@ -0,0 +1,606 @@
+#!/usr/bin/env python3
+"""
+WALL-E 大模型网关
+所有入口共用一组 OpenAI 兼容客户端和保持长连接的连接池,
+同时提供同步和 AsyncOpenAI 异步调用;启动时可先预热连接 (DNS + TLS),
+首条指令不再额外付出建连时间;每次调用记录延迟
+
+可以配置多个服务商 (OpenAI / DeepSeek / ...): 按各自最近的延迟选择最快的健康服务商,
+失败时切换到下一个;开启对冲后,请求超过阈值还没返回就向第二个服务商再发一次,
+先返回的结果生效,另一个被取消
+
+在 deadline_scope 中调用时,每次请求的超时取 AI 理解阶段剩余的时间预算,预算用完直接抛出 DeadlineExceeded;
+有时间预算 (deadline_scope 或调用方传了 timeout) 的请求不在 SDK 内重试,超时后由调用方降级
+
+每次实际发出的请求 (包括切换和对冲) 都交给 llm_accounting 记录 token、首包延迟、总延迟和费用;
+流式请求附带 stream_options.include_usage,从最后一个数据块读取实际 token 数
+"""
+
+import asyncio
+import atexit
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional
+
+from openai import AsyncOpenAI, OpenAI
+from dotenv import load_dotenv
+from deadline import Deadline, DeadlineExceeded, current_deadline
+from llm_accounting import LLMAccountant, create_llm_accountant
+from logger_config import setup_logger
+from metrics import LatencyStats, format_summary, percentile
+
+try:
+    import httpx
+    from openai import DefaultAsyncHttpxClient, DefaultHttpxClient
+except ImportError:
+    httpx = None
+
+logger = setup_logger("WALL-E.LLMGateway", level=os.getenv("LOG_LEVEL", "INFO"))
+
+# 对冲阈值按分位数计算时,至少需要的延迟样本数
+MIN_HEDGE_SAMPLES = 5
+
+# create() 的额外参数: 为 True 时不用服务商配置的 <名称>_MODEL 替换调用方的 model,不会发给接口
+KEEP_MODEL = "keep_model"
+
+
+class _Namespace:
+    def __init__(self, **attrs):
+        self.__dict__.update(attrs)
+
+
+class LLMProvider:
+    """
+    一个 OpenAI 兼容服务商: 客户端、连接池以及最近的延迟和错误统计
+
+    连续失败 failure_threshold 次或最近的错误率超过一半时进入冷却,
+    冷却期间只在其他服务商都不可用时才会使用;冷却结束后重新试探
+    """
+
+    def __init__(
+        self,
+        name: str,
+        api_key: Optional[str] = None,
+        base_url: str = "https://api.openai.com/v1",
+        model: Optional[str] = None,
+        timeout: float = 30.0,
+        max_connections: int = 10,
+        keepalive_seconds: float = 120.0,
+        max_retries: int = 2,
+        window: int = 50,
+        failure_threshold: int = 2,
+        cooldown_seconds: float = 30.0,
+    ):
+        """
+        Args:
+            name: 服务商名称 (日志和统计使用)
+            api_key: API 密钥
+            base_url: OpenAI 兼容接口地址
+            model: 使用的模型;为 None 时使用调用方传入的 model
+            timeout: 单次请求超时(秒)
+            max_connections: 连接池最大连接数
+            keepalive_seconds: 空闲连接保留时间,超过后关闭
+            max_retries: 失败重试次数
+            window: 计算延迟分位数和错误率的最近请求数
+            failure_threshold: 连续失败多少次进入冷却
+            cooldown_seconds: 冷却时间(秒)
+        """
+        self.name = name
+        self.base_url = base_url
+        self.model = model
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+
+        self._options = {"api_key": api_key, "base_url": base_url, "timeout": timeout, "max_retries": max_retries}
+        self._limits = None
+        if httpx is not None:
+            self._limits = httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=keepalive_seconds,
+            )
+
+        self.client = OpenAI(http_client=self._http_client(), **self._options)
+        self._budget_client: Optional[OpenAI] = None
+        self._async_client: Optional[AsyncOpenAI] = None
+        self._async_budget_client: Optional[AsyncOpenAI] = None
+        self._lock = threading.Lock()
+
+        self.stats = LatencyStats(window)
+        self._outcomes = deque(maxlen=window)
+        self.errors = 0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+
+    def _http_client(self):
+        if self._limits is None:
+            return None
+        return DefaultHttpxClient(limits=self._limits, timeout=self._options["timeout"])
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        """AsyncOpenAI 客户端 (首次使用时创建)"""
+        with self._lock:
+            if self._async_client is None:
+                http_client = None
+                if self._limits is not None:
+                    http_client = DefaultAsyncHttpxClient(limits=self._limits, timeout=self._options["timeout"])
+                self._async_client = AsyncOpenAI(http_client=http_client, **self._options)
+            return self._async_client
+
+    @property
+    def budget_client(self) -> OpenAI:
+        """不重试的客户端 (共用连接池): SDK 重试时每次都用完整的超时,会把时间预算放大数倍"""
+        with self._lock:
+            if self._budget_client is None:
+                self._budget_client = self.client.with_options(max_retries=0)
+            return self._budget_client
+
+    @property
+    def async_budget_client(self) -> AsyncOpenAI:
+        """不重试的 AsyncOpenAI 客户端"""
+        client = self.async_client
+        with self._lock:
+            if self._async_budget_client is None:
+                self._async_budget_client = client.with_options(max_retries=0)
+            return self._async_budget_client
+
+    def request_kwargs(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """配置了模型时替换调用方传入的 model;调用方传 keep_model=True 时保留 (如两级模型的小模型)"""
+        if KEEP_MODEL in kwargs:
+            kwargs = dict(kwargs)
+            if kwargs.pop(KEEP_MODEL):
+                return kwargs
+        return {**kwargs, "model": self.model} if self.model else kwargs
+
+    def record(self, elapsed_ms: float, failed: bool):
+        with self._lock:
+            self._outcomes.append(failed)
+            if failed:
+                self.errors += 1
+                self.consecutive_failures += 1
+                recent_errors = sum(self._outcomes)
+                if (self.consecutive_failures >= self.failure_threshold
+                        or (len(self._outcomes) >= 4 and recent_errors > len(self._outcomes) / 2)):
+                    self.cooldown_until = time.time() + self.cooldown_seconds
+                    logger.warning(
+                        f"LLM 服务商 {self.name} 连续失败 {self.consecutive_failures} 次"
+                        f" (最近 {recent_errors}/{len(self._outcomes)} 次失败), 冷却 {self.cooldown_seconds:.0f}s"
+                    )
+            else:
+                self.consecutive_failures = 0
+                self.stats.record(elapsed_ms)
+
+    @property
+    def error_rate(self) -> float:
+        with self._lock:
+            return sum(self._outcomes) / len(self._outcomes) if self._outcomes else 0.0
+
+    def healthy(self) -> bool:
+        """不在冷却期"""
+        return time.time() >= self.cooldown_until
+
+    def latency(self, q: float = 50) -> Optional[float]:
+        """最近成功请求的延迟分位数 (毫秒),没有样本时返回 None"""
+        return percentile(self.stats.samples(), q)
+
+    def summary(self) -> str:
+        return f"{self.name}: {format_summary(self.stats.summary())}, 错误率 {self.error_rate:.0%}"
+
+
+def _close_response(future: Future):
+    # 对冲中落败的请求: 流式响应关闭连接,不再接收剩余输出
+    if not future.cancelled() and future.exception() is None:
+        close = getattr(future.result(), "close", None)
+        if callable(close):
+            close()
+
+
+class LLMGateway:
+    """
+    共享的大模型客户端
+
+    gateway.chat.completions.create(...) 与 OpenAI 客户端用法相同,可以直接替换;
+    异步调用使用 await gateway.acreate(...)。流式调用记录的是拿到响应头的耗时
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: str = "https://api.openai.com/v1",
+        timeout: float = 30.0,
+        max_connections: int = 10,
+        keepalive_seconds: float = 120.0,
+        max_retries: int = 2,
+        providers: Optional[List[LLMProvider]] = None,
+        hedge_after_ms: Optional[float] = None,
+        hedge_percentile: Optional[float] = None,
+        accountant: Optional[LLMAccountant] = None,
+    ):
+        """
+        Args:
+            api_key: API 密钥 (未传入 providers 时使用)
+            base_url: OpenAI 兼容接口地址 (未传入 providers 时使用)
+            timeout: 单次请求超时(秒)
+            max_connections: 连接池最大连接数
+            keepalive_seconds: 空闲连接保留时间,超过后关闭
+            max_retries: 失败重试次数
+            providers: 多个服务商,按优先级排列;没有延迟数据时按这个顺序选择
+            hedge_after_ms: 请求超过这个时间(毫秒)未返回就向下一个服务商再发一次;None 或 0 不对冲
+            hedge_percentile: 按首选服务商最近延迟的这个分位数计算对冲阈值 (如 95),
+                样本不足时使用 hedge_after_ms
+            accountant: 记账器,None 时不记录每次请求的 token 和费用
+        """
+        if not providers:
+            providers = [LLMProvider(
+                "default", api_key=api_key, base_url=base_url, timeout=timeout,
+                max_connections=max_connections, keepalive_seconds=keepalive_seconds, max_retries=max_retries,
+            )]
+        self.providers = providers
+        self.base_url = providers[0].base_url
+        self.client = providers[0].client
+        self.hedge_after_ms = hedge_after_ms or None
+        self.hedge_percentile = hedge_percentile
+        self.accountant = accountant
+
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+        self.stats = LatencyStats()
+        self.errors = 0
+        self.failovers = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.warm_up_ms: Optional[float] = None
+        self.chat = _Namespace(completions=_Namespace(create=self.create))
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        """首选服务商的 AsyncOpenAI 客户端 (首次使用时创建)"""
+        return self.providers[0].async_client
+
+    def ranked_providers(self) -> List[LLMProvider]:
+        """
+        按选择顺序排列的服务商
+
+        健康的在前,按最近 p50 延迟从快到慢 (还没有数据的按配置顺序排在最前,先试探一次);
+        冷却中的 (连续失败或错误率过高) 排在最后,只在其他都失败时使用
+        """
+        order = {id(p): i for i, p in enumerate(self.providers)}
+
+        def key(provider: LLMProvider):
+            p50 = provider.latency(50)
+            return (p50 is not None, p50 or 0.0, order[id(provider)])
+
+        status = [(p, p.healthy()) for p in self.providers]
+        healthy = [p for p, ok in status if ok]
+        unhealthy = [p for p, ok in status if not ok]
+        return sorted(healthy, key=key) + unhealthy
+
+    def hedge_delay_ms(self, provider: LLMProvider) -> Optional[float]:
+        """对冲阈值 (毫秒),None 表示不对冲"""
+        if len(self.providers) < 2:
+            return None
+        if self.hedge_percentile and provider.stats.count >= MIN_HEDGE_SAMPLES:
+            return provider.latency(self.hedge_percentile)
+        return self.hedge_after_ms
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=max(4, 2 * len(self.providers)), thread_name_prefix="WALL-E-LLM"
+                )
+            return self._pool
+
+    @staticmethod
+    def _budgeted(kwargs: Dict[str, Any], deadline: Optional[Deadline]) -> Dict[str, Any]:
+        # 超时取 AI 理解阶段剩余的预算 (调用方传了 timeout 时取较小值)
+        if deadline is None:
+            return kwargs
+        deadline.check("llm")
+        return {**kwargs, "timeout": deadline.timeout("llm", cap=kwargs.get("timeout"))}
+
+    @staticmethod
+    def _client_for(provider: LLMProvider, request: Dict[str, Any]) -> OpenAI:
+        # 有超时预算的请求不重试,重试留给服务商切换和调用方的降级
+        return provider.budget_client if "timeout" in request else provider.client
+
+    @staticmethod
+    def _async_client_for(provider: LLMProvider, request: Dict[str, Any]) -> AsyncOpenAI:
+        return provider.async_budget_client if "timeout" in request else provider.async_client
+
+    def _stream_usage(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        # 流式响应默认不带 usage,请求服务商在最后一个数据块中附上 (调用方自己传了 stream_options 时不覆盖)
+        if self.accountant is None or not request.get("stream") or "stream_options" in request:
+            return request
+        return {**request, "stream_options": {"include_usage": True}}
+
+    def _account(self, provider: LLMProvider, request: Dict[str, Any], started: float,
+                 response: Any = None, failed: bool = False) -> Any:
+        # 流式响应包装后返回,读完或关闭时记账
+        if self.accountant is None:
+            return response
+        return self.accountant.track(provider.name, request, started, response, failed)
+
+    def _call(self, provider: LLMProvider, kwargs: Dict[str, Any], deadline: Optional[Deadline] = None) -> Any:
+        request = self._stream_usage(provider.request_kwargs(self._budgeted(kwargs, deadline)))
+        started = time.perf_counter()
+        try:
+            response = self._client_for(provider, request).chat.completions.create(**request)
+        except Exception as e:
+            provider.record((time.perf_counter() - started) * 1000, failed=True)
+            self._account(provider, request, started, failed=True)
+            logger.warning(f"LLM 服务商 {provider.name} 调用失败: {e}")
+            raise
+        provider.record((time.perf_counter() - started) * 1000, failed=False)
+        return self._account(provider, request, started, response)
+
+    def _hedged(
+        self, primary: LLMProvider, backup: LLMProvider, delay_ms: float,
+        kwargs: Dict[str, Any], deadline: Optional[Deadline],
+    ) -> Any:
+        futures = {self._executor().submit(self._call, primary, kwargs, deadline): primary}
+        done, _ = wait(futures, timeout=delay_ms / 1000)
+        hedged = not done
+        if hedged:
+            self.hedges += 1
+            logger.info(f"{primary.name} 超过 {delay_ms:.0f}ms 未返回, 同时请求 {backup.name}")
+        elif next(iter(done)).exception() is None:
+            return next(iter(done)).result()
+        else:
+            self.failovers += 1
+        futures[self._executor().submit(self._call, backup, kwargs, deadline)] = backup
+
+        pending = set(futures)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                # 同步请求无法中途打断: 落败的请求返回后丢弃,流式响应直接关闭
+                for loser in pending:
+                    loser.cancel()
+                    loser.add_done_callback(_close_response)
+                if hedged and futures[future] is backup:
+                    self.hedge_wins += 1
+                return future.result()
+        raise error
+
+    def _route(self, kwargs: Dict[str, Any], deadline: Optional[Deadline]) -> Any:
+        ranked = self.ranked_providers()
+        error: Optional[BaseException] = None
+        delay_ms = self.hedge_delay_ms(ranked[0])
+        if delay_ms is not None:
+            try:
+                return self._hedged(ranked[0], ranked[1], delay_ms, kwargs, deadline)
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                error, ranked = e, ranked[2:]
+        for provider in ranked:
+            if error is not None:
+                self.failovers += 1
+                logger.info(f"切换到 LLM 服务商 {provider.name}")
+            try:
+                return self._call(provider, kwargs, deadline)
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                error = e
+        raise error
+
+    async def _acall(self, provider: LLMProvider, kwargs: Dict[str, Any], deadline: Optional[Deadline] = None) -> Any:
+        request = self._stream_usage(provider.request_kwargs(self._budgeted(kwargs, deadline)))
+        started = time.perf_counter()
+        try:
+            response = await self._async_client_for(provider, request).chat.completions.create(**request)
+        except Exception as e:
+            provider.record((time.perf_counter() - started) * 1000, failed=True)
+            self._account(provider, request, started, failed=True)
+            logger.warning(f"LLM 服务商 {provider.name} 调用失败: {e}")
+            raise
+        provider.record((time.perf_counter() - started) * 1000, failed=False)
+        return self._account(provider, request, started, response)
+
+    async def _ahedged(
+        self, primary: LLMProvider, backup: LLMProvider, delay_ms: float,
+        kwargs: Dict[str, Any], deadline: Optional[Deadline],
+    ) -> Any:
+        tasks = {asyncio.ensure_future(self._acall(primary, kwargs, deadline)): primary}
+        done, _ = await asyncio.wait(tasks, timeout=delay_ms / 1000)
+        hedged = not done
+        if hedged:
+            self.hedges += 1
+            logger.info(f"{primary.name} 超过 {delay_ms:.0f}ms 未返回, 同时请求 {backup.name}")
+        elif next(iter(done)).exception() is None:
+            return next(iter(done)).result()
+        else:
+            self.failovers += 1
+        tasks[asyncio.ensure_future(self._acall(backup, kwargs, deadline))] = backup
+
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    error = task.exception()
+                    continue
+                for loser in pending:
+                    loser.cancel()
+                if hedged and tasks[task] is backup:
+                    self.hedge_wins += 1
+                return task.result()
+        raise error
+
+    async def _aroute(self, kwargs: Dict[str, Any], deadline: Optional[Deadline]) -> Any:
+        ranked = self.ranked_providers()
+        error: Optional[BaseException] = None
+        delay_ms = self.hedge_delay_ms(ranked[0])
+        if delay_ms is not None:
+            try:
+                return await self._ahedged(ranked[0], ranked[1], delay_ms, kwargs, deadline)
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                error, ranked = e, ranked[2:]
+        for provider in ranked:
+            if error is not None:
+                self.failovers += 1
+                logger.info(f"切换到 LLM 服务商 {provider.name}")
+            try:
+                return await self._acall(provider, kwargs, deadline)
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                error = e
+        raise error
+
+    def _record(self, started: float, failed: bool):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.stats.record(elapsed_ms)
+        if failed:
+            self.errors += 1
+        logger.debug(f"LLM 调用{'失败' if failed else '完成'}, 耗时 {elapsed_ms:.0f}ms")
+
+    def create(self, **kwargs) -> Any:
+        """同步调用 chat.completions.create (选择最快的健康服务商,失败时切换,超时对冲)"""
+        started = time.perf_counter()
+        try:
+            response = self._route(kwargs, current_deadline())
+        except Exception:
+            self._record(started, failed=True)
+            raise
+        self._record(started, failed=False)
+        return response
+
+    async def acreate(self, **kwargs) -> Any:
+        """异步调用 chat.completions.create (对冲时落败的请求直接取消)"""
+        started = time.perf_counter()
+        try:
+            response = await self._aroute(kwargs, current_deadline())
+        except Exception:
+            self._record(started, failed=True)
+            raise
+        self._record(started, failed=False)
+        return response
+
+    def warm_up(self, background: bool = True) -> Optional[threading.Thread]:
+        """
+        预热连接: 向每个服务商请求一次模型列表,提前完成 DNS 解析和 TLS 握手并放入连接池
+
+        不消耗 token;接口不支持模型列表时返回错误也同样完成了建连
+
+        Args:
+            background: 是否在后台线程执行
+
+        Returns:
+            后台执行时返回线程对象
+        """
+        if not background:
+            self._warm_up()
+            return None
+        thread = threading.Thread(target=self._warm_up, name="WALL-E-LLMWarmUp", daemon=True)
+        thread.start()
+        return thread
+
+    def _warm_up(self):
+        started = time.perf_counter()
+        for provider in self.providers:
+            try:
+                provider.client.models.list()
+            except Exception as e:
+                logger.debug(f"LLM 预热请求返回错误 (连接已建立即可): {provider.name}: {e}")
+        self.warm_up_ms = (time.perf_counter() - started) * 1000
+        logger.info(f"LLM 连接预热完成, 耗时 {self.warm_up_ms:.0f}ms")
+
+    def log_stats(self):
+        summary = self.stats.summary()
+        if summary["count"]:
+            logger.info(f"LLM 调用延迟: {format_summary(summary)}, 失败 {self.errors} 次")
+            if len(self.providers) > 1:
+                for provider in self.providers:
+                    logger.info(f"  {provider.summary()}")
+                logger.info(f"  切换 {self.failovers} 次, 对冲 {self.hedges} 次 (备用服务商先返回 {self.hedge_wins} 次)")
+
+
+def _env_float(name: str) -> Optional[float]:
+    value = os.getenv(name, "").strip()
+    return float(value) if value else None
+
+
+def providers_from_env() -> List[LLMProvider]:
+    """
+    根据环境变量创建服务商列表
+
+    LLM_PROVIDERS=openai,deepseek 时每个服务商读取 <NAME>_API_KEY / <NAME>_BASE_URL / <NAME>_MODEL;
+    未设置时使用 API_KEY / BASE_URL 创建单个服务商。多个服务商时由网关切换,不再在单个服务商上重试
+    """
+    options = {
+        "timeout": float(os.getenv("LLM_TIMEOUT", "30")),
+        "max_connections": int(os.getenv("LLM_MAX_CONNECTIONS", "10")),
+        "keepalive_seconds": float(os.getenv("LLM_KEEPALIVE_SECONDS", "120")),
+        "cooldown_seconds": float(os.getenv("LLM_PROVIDER_COOLDOWN", "30")),
+    }
+    names = [n.strip() for n in os.getenv("LLM_PROVIDERS", "").split(",") if n.strip()]
+    if not names:
+        return [LLMProvider(
+            "default", api_key=os.getenv("API_KEY"),
+            base_url=os.getenv("BASE_URL", "https://api.openai.com/v1"), **options,
+        )]
+
+    providers = []
+    for name in names:
+        prefix = name.upper().replace("-", "_")
+        providers.append(LLMProvider(
+            name,
+            api_key=os.getenv(f"{prefix}_API_KEY"),
+            base_url=os.getenv(f"{prefix}_BASE_URL", "https://api.openai.com/v1"),
+            model=os.getenv(f"{prefix}_MODEL") or None,
+            max_retries=0 if len(names) > 1 else 2,
+            **options,
+        ))
+    return providers
+
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_llm_gateway() -> LLMGateway:
+    """
+    获取进程内共享的大模型网关 (按环境变量 API_KEY / BASE_URL / LLM_* 创建)
+
+    Returns:
+        LLMGateway 实例
+    """
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            load_dotenv()
+            logger.info("初始化 LLM 网关...")
+            providers = providers_from_env()
+            _gateway = LLMGateway(
+                providers=providers,
+                hedge_after_ms=_env_float("LLM_HEDGE_MS"),
+                hedge_percentile=_env_float("LLM_HEDGE_PERCENTILE"),
+                accountant=create_llm_accountant(),
+            )
+            if len(providers) > 1:
+                logger.info(f"LLM 服务商: {', '.join(p.name for p in providers)}")
+            if httpx is None:
+                logger.warning("未找到 httpx,使用 OpenAI 默认连接池")
+            atexit.register(_gateway.log_stats)
+        return _gateway
+
+
+def warm_up_llm():
+    """启动时在后台预热 LLM 连接 (LLM_WARMUP, 默认开启)"""
+    if os.getenv("LLM_WARMUP", "1").lower() in ("1", "true", "yes"):
+        get_llm_gateway().warm_up(background=True)
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+WALL-E 流式意图理解
+以 stream=True 调用大模型,边接收边增量解析 JSON (正文或 tool_calls 的参数):
+工具名一出现就在后台预热该工具,params 对象一闭合就立即返回意图去执行工具,
+不必等模型输出结束
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+import webbrowser
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from logger_config import setup_logger
+from metrics import LatencyStats, format_summary
+from tool_schema import UNKNOWN_INTENT, intent_from_json, intent_from_tool_call
+
+logger = setup_logger("WALL-E.LLMStream", level=os.getenv("LOG_LEVEL", "INFO"))
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="WALL-E-Prewarm")
+
+# 请求开始 → 解析出工具名 / 解析出完整意图 的耗时
+tool_name_stats = LatencyStats()
+intent_stats = LatencyStats()
+stream_stats = {"requests": 0, "early_returns": 0}
+_stats_lock = threading.Lock()
+
+
+def llm_streaming_enabled() -> bool:
+    """是否开启流式意图理解 (LLM_STREAMING=1)"""
+    return os.getenv("LLM_STREAMING", "0").lower() in ("1", "true", "yes")
+
+
+class IncrementalJSONParser:
+    """
+    增量解析一个 JSON 对象的顶层字段
+
+    每送入一段文本,返回这段文本中刚刚完整的顶层键;对应的值保存在 fields 中。
+    对象前面的 ```json 之类的多余文本会被跳过
+    """
+
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}
+        self.complete = False
+        self._buffer = ""
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._token_start: Optional[int] = None
+        self._expect_key = True
+        self._key: Optional[str] = None
+
+    def feed(self, text: str) -> List[str]:
+        """
+        送入一段模型输出
+
+        Args:
+            text: 新收到的文本
+
+        Returns:
+            本次新解析完成的顶层键
+        """
+        completed = []
+        offset = len(self._buffer)
+        self._buffer += text
+        for i in range(offset, len(self._buffer)):
+            if self.complete:
+                break
+            key = self._step(i, self._buffer[i])
+            if key is not None:
+                completed.append(key)
+        return completed
+
+    def _step(self, i: int, c: str) -> Optional[str]:
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif c == "\\":
+                self._escape = True
+            elif c == '"':
+                self._in_string = False
+                if self._depth == 1 and self._token_start is not None:
+                    return self._finish(i + 1)
+            return None
+
+        if self._depth == 0:
+            if c == "{":
+                self._depth = 1
+            return None
+
+        if c == '"':
+            self._in_string = True
+            if self._depth == 1 and self._token_start is None:
+                self._token_start = i
+        elif c in "{[":
+            if self._depth == 1 and self._token_start is None:
+                self._token_start = i
+            self._depth += 1
+        elif c in "}]":
+            self._depth -= 1
+            if self._depth == 1 and self._token_start is not None:
+                return self._finish(i + 1)
+            if self._depth == 0:
+                key = self._finish(i) if self._token_start is not None else None
+                self.complete = True
+                return key
+        elif self._depth == 1:
+            if c == ",":
+                if self._token_start is not None:
+                    return self._finish(i)
+            elif c != ":" and not c.isspace() and self._token_start is None:
+                # 数字 / true / false / null
+                self._token_start = i
+        return None
+
+    def _finish(self, end: int) -> Optional[str]:
+        token = self._buffer[self._token_start:end].strip()
+        self._token_start = None
+        try:
+            value = json.loads(token)
+        except ValueError:
+            logger.debug(f"无法解析 JSON 片段: {token}")
+            value = None
+
+        if self._expect_key:
+            self._key = value if isinstance(value, str) else None
+            self._expect_key = False
+            return None
+
+        self._expect_key = True
+        if self._key is None:
+            return None
+        self.fields[self._key] = value
+        return self._key
+
+    def result(self) -> Dict[str, Any]:
+        """
+        解析完整输出 (模型输出结束后调用)
+
+        Raises:
+            ValueError: 输出中没有合法的 JSON 对象
+        """
+        if self.complete:
+            return dict(self.fields)
+        start, end = self._buffer.find("{"), self._buffer.rfind("}")
+        if start < 0 or end < start:
+            raise ValueError(f"模型输出不是 JSON: {self._buffer!r}")
+        return json.loads(self._buffer[start:end + 1])
+
+
+_PREWARM_HOOKS: Dict[str, Callable[[], None]] = {}
+
+
+def register_prewarm(tool_name: str, hook: Callable[[], None]):
+    """
+    注册工具预热函数,流式输出中一出现该工具名就在后台执行
+
+    Args:
+        tool_name: 工具名称
+        hook: 无参数的预热函数,需要可以重复调用
+    """
+    _PREWARM_HOOKS[tool_name] = hook
+
+
+def _warm_browser():
+    # 首次调用 webbrowser 时要扫描 PATH 并执行 xdg-settings 查找默认浏览器
+    webbrowser.get()
+
+
+for _tool in ("navigate", "search_location", "get_weather", "compare_weather", "play_music", "search_playlist"):
+    register_prewarm(_tool, _warm_browser)
+
+
+def _run_hook(tool_name: str, hook: Callable[[], None]):
+    started = time.perf_counter()
+    try:
+        hook()
+        logger.debug(f"工具 {tool_name} 预热完成, 耗时 {(time.perf_counter() - started) * 1000:.0f}ms")
+    except Exception as e:
+        logger.debug(f"工具 {tool_name} 预热失败: {e}")
+
+
+def prewarm_tool(tool_name: str) -> Optional[Future]:
+    """
+    在后台预热工具
+
+    Returns:
+        预热任务的 Future,工具没有预热函数时返回 None
+    """
+    hook = _PREWARM_HOOKS.get(tool_name)
+    if hook is None:
+        return None
+    return _executor.submit(_run_hook, tool_name, hook)
+
+
+def _count(key: str):
+    with _stats_lock:
+        stream_stats[key] += 1
+
+
+def log_stream_stats():
+    if stream_stats["requests"]:
+        logger.info(
+            f"流式意图理解: 请求 {stream_stats['requests']} 次, "
+            f"提前返回 {stream_stats['early_returns']} 次; "
+            f"出工具名 {format_summary(tool_name_stats.summary())}, "
+            f"出完整意图 {format_summary(intent_stats.summary())}"
+        )
+
+
+atexit.register(log_stream_stats)
+
+
+def stream_intent(
+    client,
+    model: str,
+    messages: List[Dict[str, str]],
+    on_tool: Optional[Callable[[str], Any]] = prewarm_tool,
+    multi_call: bool = False,
+    **kwargs,
+) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    流式调用大模型并解析 {"tool", "params"}
+
+    支持原生函数调用 (delta.tool_calls) 和 JSON 正文两种输出。
+    JSON 正文中 tool 和 params 都解析完整后、函数调用的参数对象一闭合后立即关闭连接并返回,
+    剩余的输出不再等待;multi_call 时函数调用可能有多个,读到流结束为止。
+    每个工具名出现时都会预热。模型既没有调用工具也没有输出 JSON 时返回 unknown
+
+    Args:
+        client: OpenAI 客户端或 LLMGateway
+        model: 模型名称
+        messages: 对话消息
+        on_tool: 工具名解析出来时调用 (默认预热该工具)
+        multi_call: 指令可能包含多个请求 (见 intent_rules.is_compound),
+            此时要等所有函数调用输出完
+        **kwargs: 透传给 chat.completions.create 的参数
+
+    Returns:
+        意图字典;一句话包含多个需求时返回它们的列表
+
+    Raises:
+        ValueError: 函数调用参数不是合法的 JSON
+    """
+    started = time.perf_counter()
+    _count("requests")
+    stream = client.chat.completions.create(model=model, messages=messages, stream=True, **kwargs)
+    parser = IncrementalJSONParser()
+    # index → [工具名, 参数文本]
+    calls: Dict[int, List[str]] = {}
+    arguments: Dict[int, IncrementalJSONParser] = {}
+    intent = None
+
+    def tool_known(name):
+        tool_name_stats.record((time.perf_counter() - started) * 1000)
+        if on_tool is not None:
+            on_tool(name)
+
+    try:
+        for chunk in stream:
+            if not chunk.choices:
+                # 最后一个数据块只有 usage,由网关记账
+                continue
+            choice = chunk.choices[0]
+            delta = choice.delta
+            for call in delta.tool_calls or []:
+                index = getattr(call, "index", 0) or 0
+                entry = calls.setdefault(index, [None, ""])
+                if call.function.name and entry[0] is None:
+                    entry[0] = call.function.name
+                    tool_known(entry[0])
+                if call.function.arguments:
+                    entry[1] += call.function.arguments
+                    args = arguments.setdefault(index, IncrementalJSONParser())
+                    args.feed(call.function.arguments)
+                    if args.complete and entry[0] and not multi_call:
+                        intent = {"tool": entry[0], "params": args.result()}
+                        break
+            if intent is not None:
+                break
+            if calls:
+                # 读到流结束: 结束标记之后还有带 usage 的数据块
+                continue
+
+            if not delta.content:
+                continue
+            for key in parser.feed(delta.content):
+                if key == "tool" and isinstance(parser.fields["tool"], str):
+                    tool_known(parser.fields["tool"])
+                elif key == "calls" and isinstance(parser.fields["calls"], list):
+                    for item in parser.fields["calls"]:
+                        if isinstance(item, dict) and isinstance(item.get("tool"), str):
+                            tool_known(item["tool"])
+            if "tool" in parser.fields and isinstance(parser.fields.get("params"), dict):
+                intent = {"tool": parser.fields["tool"], "params": parser.fields["params"]}
+                break
+            if isinstance(parser.fields.get("calls"), list):
+                intent = intent_from_json({"calls": parser.fields["calls"]})
+                break
+    finally:
+        close = getattr(stream, "close", None)
+        if callable(close):
+            close()
+
+    if intent is not None:
+        _count("early_returns")
+    elif calls:
+        intents = [
+            intent_from_tool_call(name, arguments)
+            for _, (name, arguments) in sorted(calls.items()) if name
+        ]
+        intent = intents[0] if len(intents) == 1 else (intents or dict(UNKNOWN_INTENT))
+    else:
+        try:
+            intent = intent_from_json(parser.result())
+        except ValueError:
+            logger.debug("模型没有调用工具,视为 unknown")
+            intent = dict(UNKNOWN_INTENT)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    intent_stats.record(elapsed_ms)
+    logger.debug(f"流式意图理解完成, 耗时 {elapsed_ms:.0f}ms")
+    return intent
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+WALL-E 本地大模型替身
+只用标准库实现 OpenAI 兼容的 /v1/chat/completions (含流式输出和 tool_calls) 与 /v1/models,
+按脚本 (JSON Lines 语料) 或规则快速通道回答意图,并按延迟配置注入首包延迟、逐段输出延迟、
+长尾卡顿和错误。把 BASE_URL 指向它,就能在没有网络的机器上重复测量整条语音助手流程:
+
+    python llm_stub_server.py --profile typical --script intent_eval_corpus.jsonl --seed 1
+    BASE_URL=http://127.0.0.1:8011/v1 API_KEY=stub python intent_eval.py --target simple
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass, replace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+from conversation import estimate_tokens, message_tokens
+from intent_eval import load_corpus
+from intent_rules import match_intent
+from logger_config import setup_logger
+from metrics import LatencyStats, format_summary
+
+logger = setup_logger("WALL-E.LLMStub", level=os.getenv("LOG_LEVEL", "INFO"))
+
+STUB_MODEL = "walle-stub"
+CHUNK_CHARS = 4
+# 提示词要求给出置信度时 (两级模型的小模型),按回答来源给出的置信度
+SCRIPT_CONFIDENCE = 0.95
+RULE_CONFIDENCE = 0.7
+
+
+@dataclass
+class LatencyProfile:
+    """
+    一种延迟配置
+
+    首包延迟服从对数正态分布: 中位数 ttft_ms,离散程度 sigma;
+    以 stall_rate 的概率额外卡顿 stall_ms (模拟长尾);以 error_rate 的概率返回 429/500
+    """
+    name: str
+    ttft_ms: float = 0.0
+    sigma: float = 0.0
+    chunk_ms: float = 0.0
+    error_rate: float = 0.0
+    stall_rate: float = 0.0
+    stall_ms: float = 0.0
+
+    def sample_ttft(self, rng: random.Random) -> float:
+        """抽样一次首包延迟 (毫秒)"""
+        delay = self.ttft_ms * math.exp(rng.gauss(0, self.sigma)) if self.sigma > 0 else self.ttft_ms
+        if self.stall_rate > 0 and rng.random() < self.stall_rate:
+            delay += self.stall_ms
+        return delay
+
+
+PROFILES: Dict[str, LatencyProfile] = {
+    "instant": LatencyProfile("instant"),
+    "fast": LatencyProfile("fast", ttft_ms=150, sigma=0.3, chunk_ms=5),
+    "typical": LatencyProfile("typical", ttft_ms=600, sigma=0.5, chunk_ms=20, error_rate=0.01),
+    "slow": LatencyProfile("slow", ttft_ms=2000, sigma=0.6, chunk_ms=40, error_rate=0.02),
+    "flaky": LatencyProfile("flaky", ttft_ms=800, sigma=0.8, chunk_ms=20, error_rate=0.1, stall_rate=0.05, stall_ms=8000),
+}
+
+
+def _last_user_text(messages: List[Dict[str, Any]]) -> str:
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            content = message.get("content") or ""
+            if isinstance(content, list):
+                content = "".join(part.get("text", "") for part in content if isinstance(part, dict))
+            return str(content).strip()
+    return ""
+
+
+def _system_text(messages: List[Dict[str, Any]]) -> str:
+    return "\n".join(str(m.get("content") or "") for m in messages if m.get("role") == "system")
+
+
+class StubLLMServer(ThreadingHTTPServer):
+    """OpenAI 兼容的本地替身服务"""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: Tuple[str, int] = ("127.0.0.1", 8011),
+        profile: Optional[LatencyProfile] = None,
+        script: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+        seed: Optional[int] = None,
+    ):
+        """
+        Args:
+            address: 监听地址,端口为 0 时自动分配
+            profile: 延迟配置,默认 instant (不加延迟)
+            script: 指令原文 → 工具调用列表;没有脚本的指令按规则快速通道回答
+            seed: 随机种子,相同种子得到相同的延迟和错误序列
+        """
+        super().__init__(address, _StubHandler)
+        self.profile = profile or PROFILES["instant"]
+        self.script = dict(script or {})
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self.stats = {"requests": 0, "errors": 0, "scripted": 0, "rules": 0, "unknown": 0}
+        self.ttft_stats = LatencyStats()
+        self._stats_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """可直接作为 BASE_URL 使用的地址"""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "StubLLMServer":
+        """在后台线程中开始服务"""
+        self._thread = threading.Thread(target=self.serve_forever, name="WALL-E-LLMStub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def draw(self) -> Tuple[float, Optional[int]]:
+        """
+        为一次请求抽样
+
+        Returns:
+            (首包延迟毫秒, 要注入的 HTTP 错误码;不注入时为 None)
+        """
+        with self._rng_lock:
+            delay = self.profile.sample_ttft(self._rng)
+            error = None
+            if self.profile.error_rate > 0 and self._rng.random() < self.profile.error_rate:
+                error = self._rng.choice((429, 500))
+        return delay, error
+
+    def answer(self, text: str) -> Tuple[List[Dict[str, Any]], float]:
+        """
+        一句话的期望工具调用: 先查脚本,再用规则快速通道 (接受低置信度),都没有时返回空列表
+
+        Returns:
+            (工具调用列表, 置信度)
+        """
+        if text in self.script:
+            self.count("scripted")
+            return [dict(call, params=dict(call["params"])) for call in self.script[text]], SCRIPT_CONFIDENCE
+        intent = match_intent(text, min_confidence=0.0, record=False)
+        if intent is not None:
+            self.count("rules")
+            return [intent], RULE_CONFIDENCE
+        self.count("unknown")
+        return [], 0.0
+
+    def log_stats(self):
+        logger.info(
+            f"替身服务统计: 请求 {self.stats['requests']} 次, 注入错误 {self.stats['errors']} 次, "
+            f"脚本 {self.stats['scripted']} / 规则 {self.stats['rules']} / 未识别 {self.stats['unknown']}, "
+            f"首包延迟 {format_summary(self.ttft_stats.summary())}"
+        )
+
+
+def load_script(path: str) -> Dict[str, List[Dict[str, Any]]]:
+    """读取脚本 (与 intent_eval 语料格式相同): 指令原文 → 工具调用列表"""
+    return {case.text: case.calls for case in load_corpus(path)}
+
+
+def render_content(calls: List[Dict[str, Any]], system: str, confidence: float = 0.0) -> str:
+    """
+    按 JSON 模式的约定渲染回答正文
+
+    基础版 (提示词要求 {"action": "nav", ...}) 返回导航格式,其余返回 {"tool", "params"} 或 {"calls": [...]};
+    提示词要求 confidence 时一并返回
+    """
+    if '"action"' in system:
+        nav = next((c for c in calls if c["tool"] == "navigate"), None)
+        if nav is None:
+            return json.dumps({"action": "unknown"})
+        result = {"action": "nav", "from": nav["params"].get("origin", "当前位置"), "to": nav["params"].get("destination", "")}
+        return json.dumps(result, ensure_ascii=False)
+    if not calls:
+        result = {"tool": "unknown", "params": {}}
+    elif len(calls) == 1:
+        result = dict(calls[0])
+    else:
+        result = {"calls": calls}
+    if '"confidence"' in system:
+        result["confidence"] = confidence
+    return json.dumps(result, ensure_ascii=False)
+
+
+def render_tool_calls(calls: List[Dict[str, Any]], tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """把工具调用渲染成 message.tool_calls (只保留请求中声明过的工具)"""
+    declared = {t.get("function", {}).get("name") for t in tools}
+    return [
+        {
+            "id": f"call_{uuid.uuid4().hex[:12]}",
+            "type": "function",
+            "function": {"name": call["tool"], "arguments": json.dumps(call["params"], ensure_ascii=False)},
+        }
+        for call in calls if call["tool"] in declared
+    ]
+
+
+def _chunks(text: str, size: int = CHUNK_CHARS) -> List[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+    server: StubLLMServer
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def _send_json(self, status: int, body: Dict[str, Any]):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status: int, message: str, kind: str):
+        self._send_json(status, {"error": {"message": message, "type": kind, "code": kind}})
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": STUB_MODEL, "object": "model", "owned_by": "walle"}]})
+        else:
+            self._send_error(404, f"未知路径: {self.path}", "not_found")
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_error(400, "请求体不是 JSON", "invalid_request_error")
+            return
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_error(404, f"未知路径: {self.path}", "not_found")
+            return
+
+        server = self.server
+        server.count("requests")
+        delay_ms, error = server.draw()
+        time.sleep(delay_ms / 1000)
+        server.ttft_stats.record(delay_ms)
+        if error is not None:
+            server.count("errors")
+            if error == 429:
+                self._send_error(429, "替身服务注入的限流错误", "rate_limit_exceeded")
+            else:
+                self._send_error(500, "替身服务注入的服务端错误", "server_error")
+            return
+
+        messages = request.get("messages") or []
+        calls, confidence = server.answer(_last_user_text(messages))
+        tool_calls = render_tool_calls(calls, request.get("tools") or []) if request.get("tools") else []
+        content = None if tool_calls else render_content(calls, _system_text(messages), confidence)
+        completion = content or "".join(c["function"]["name"] + c["function"]["arguments"] for c in tool_calls)
+        usage = {
+            "prompt_tokens": message_tokens(messages),
+            "completion_tokens": estimate_tokens(completion),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+        meta = {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "created": int(time.time()),
+            "model": request.get("model") or STUB_MODEL,
+        }
+        finish_reason = "tool_calls" if tool_calls else "stop"
+        if request.get("stream"):
+            include_usage = bool((request.get("stream_options") or {}).get("include_usage"))
+            self._stream(meta, content, tool_calls, finish_reason, usage if include_usage else None)
+            return
+        message = {"role": "assistant", "content": content}
+        if tool_calls:
+            message["tool_calls"] = tool_calls
+        self._send_json(200, dict(
+            meta, object="chat.completion", usage=usage,
+            choices=[{"index": 0, "message": message, "finish_reason": finish_reason}],
+        ))
+
+    def _stream(self, meta, content, tool_calls, finish_reason, usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def emit(delta, finish=None, **extra):
+            chunk = dict(meta, object="chat.completion.chunk",
+                         choices=[{"index": 0, "delta": delta, "finish_reason": finish}], **extra)
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        def pause():
+            if self.server.profile.chunk_ms > 0:
+                time.sleep(self.server.profile.chunk_ms / 1000)
+
+        emit({"role": "assistant", "content": "" if content is not None else None})
+        if content is not None:
+            for piece in _chunks(content):
+                pause()
+                emit({"content": piece})
+        for index, call in enumerate(tool_calls):
+            head = {"index": index, "id": call["id"], "type": "function",
+                    "function": {"name": call["function"]["name"], "arguments": ""}}
+            emit({"tool_calls": [head]})
+            for piece in _chunks(call["function"]["arguments"]):
+                pause()
+                emit({"tool_calls": [{"index": index, "function": {"arguments": piece}}]})
+        emit({}, finish_reason)
+        if usage is not None:
+            self.wfile.write(f"data: {json.dumps(dict(meta, object='chat.completion.chunk', choices=[], usage=usage))}\n\n".encode("utf-8"))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def start_stub_server(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    profile: str = "instant",
+    script_path: Optional[str] = None,
+    seed: Optional[int] = None,
+    **overrides: Any,
+) -> StubLLMServer:
+    """
+    在后台线程中启动替身服务 (测试和基准脚本使用)
+
+    Args:
+        host: 监听地址
+        port: 端口,0 表示自动分配
+        profile: 延迟配置名称 (instant / fast / typical / slow / flaky)
+        script_path: 脚本语料路径
+        seed: 随机种子
+        **overrides: 覆盖延迟配置中的字段,如 error_rate=0.2
+
+    Returns:
+        已启动的服务,server.url 可直接作为 BASE_URL
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"未知的延迟配置: {profile} (可选: {', '.join(PROFILES)})")
+    selected = replace(PROFILES[profile], **overrides)
+    script = load_script(script_path) if script_path else None
+    return StubLLMServer((host, port), selected, script, seed).start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WALL-E 本地大模型替身 (OpenAI 兼容接口)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--profile", default="typical", choices=sorted(PROFILES), help="延迟配置")
+    parser.add_argument("--script", help="脚本语料 (JSON Lines, 与 intent_eval 语料格式相同)")
+    parser.add_argument("--seed", type=int, help="随机种子 (固定延迟和错误序列)")
+    parser.add_argument("--ttft-ms", type=float, help="覆盖首包延迟中位数(毫秒)")
+    parser.add_argument("--sigma", type=float, help="覆盖首包延迟离散程度")
+    parser.add_argument("--chunk-ms", type=float, help="覆盖流式输出每段的间隔(毫秒)")
+    parser.add_argument("--error-rate", type=float, help="覆盖注入错误的概率")
+    parser.add_argument("--stall-rate", type=float, help="覆盖长尾卡顿的概率")
+    parser.add_argument("--stall-ms", type=float, help="覆盖长尾卡顿时长(毫秒)")
+    args = parser.parse_args()
+
+    overrides = {
+        field: getattr(args, field)
+        for field in ("ttft_ms", "sigma", "chunk_ms", "error_rate", "stall_rate", "stall_ms")
+        if getattr(args, field) is not None
+    }
+    server = start_stub_server(args.host, args.port, args.profile, args.script, args.seed, **overrides)
+    profile = server.profile
+    print(f"🤖 替身服务已启动: {server.url} (配置 {profile.name}: 首包 {profile.ttft_ms:.0f}ms, "
+          f"错误率 {profile.error_rate:.0%}, 脚本 {len(server.script)} 条)")
+    print(f"   使用: BASE_URL={server.url} API_KEY=stub MODEL={STUB_MODEL}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        server.log_stats()
+
+
+if __name__ == "__main__":
+    main()
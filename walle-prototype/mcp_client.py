@@ -11,6 +11,8 @@ import os
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 from logger_config import setup_logger
+from deadline import current_deadline, deadline_stage
+from tool_schema import mcp_tool_schema
 
 logger = setup_logger("WALL-E.MCPClient", level=os.getenv("LOG_LEVEL", "INFO"))
 
@@ -20,6 +22,7 @@ class MCPClient:
     def __init__(self):
         self.servers: Dict[str, Any] = {}
         self.tools: Dict[str, Any] = {}
+        self.schemas: Dict[str, Dict[str, Any]] = {}
         
     def register_server(self, server_name: str, server_module_path: str):
         """
@@ -93,6 +96,10 @@ class MCPClient:
                 sync_wrapper = create_sync_wrapper(tool_name)
                 self.tools[full_tool_name] = sync_wrapper
                 self.tools[tool_name] = sync_wrapper
+                try:
+                    self.schemas[tool_name] = mcp_tool_schema(tool)
+                except Exception as e:
+                    logger.warning(f"生成工具描述失败 ({tool_name}): {e}")
                 
         except Exception as e:
             logger.error(f"工具发现失败 ({server_name}): {e}", exc_info=True)
@@ -102,6 +109,10 @@ class MCPClient:
         """List all available tools"""
         return list(self.tools.keys())
     
+    def tool_schemas(self) -> List[Dict[str, Any]]:
+        """OpenAI function calling tool schemas (built once during discovery)"""
+        return list(self.schemas.values())
+    
     def call_tool(self, tool_name: str, **kwargs) -> Any:
         """
         Call a tool by name
@@ -118,10 +129,16 @@ class MCPClient:
             logger.warning(f"工具 '{tool_name}' 不存在,可用工具: {available}")
             return f"工具 '{tool_name}' 不存在。可用工具: {available}"
         
+        # 时间预算已用完时仍然执行 (工具就是用户要的动作),工具内部的网络请求会按剩余预算降级
+        deadline = current_deadline()
+        if deadline is not None and deadline.expired:
+            logger.warning(f"工具 {tool_name} 开始时已超出时间预算")
+        
         try:
             logger.debug(f"调用工具: {tool_name}, 参数: {kwargs}")
             tool_func = self.tools[tool_name]
-            result = tool_func(**kwargs)
+            with deadline_stage("tool"):
+                result = tool_func(**kwargs)
             logger.debug(f"工具 {tool_name} 返回结果: {result}")
             return result
         except Exception as e:
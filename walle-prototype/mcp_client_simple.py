@@ -7,9 +7,13 @@
 import importlib
 import sys
 import os
+import time
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 from logger_config import setup_logger
+from deadline import current_deadline, deadline_stage
+from tool_schema import function_schema
+from tool_manifest import LazyTool, ToolManifest, create_tool_manifest, manifest_enabled
 
 logger = setup_logger("WALL-E.SimpleMCPClient", level=os.getenv("LOG_LEVEL", "INFO"))
 
@@ -18,25 +22,32 @@ class SimpleMCPClient:
     
     def __init__(self):
         self.tools: Dict[str, Any] = {}
+        self._schemas: Optional[List[Dict[str, Any]]] = None
         
-    def register_tools_module(self, module_name: str, module_path: str):
+    def register_tools_module(self, module_name: str, module_path: str, manifest: Optional[ToolManifest] = None):
         """
         从工具模块注册工具
         
         Args:
             module_name: 模块名称
             module_path: 模块文件路径
+            manifest: 工具清单;提供且能静态解析模块时只按清单注册,第一次调用工具时才导入模块
         """
+        tools = manifest.tools(module_path) if manifest is not None else None
+        if tools is not None:
+            self._register_manifest(module_name, module_path, tools)
+            return
+        
         try:
             logger.debug(f"尝试注册工具模块: {module_name}, 路径: {module_path}")
-            sys.path.insert(0, str(Path(module_path).parent))
             module_file = Path(module_path).stem
-            module = importlib.import_module(module_file)
+            module = self._import_module(module_path)
             
             if hasattr(module, 'TOOLS'):
                 for tool_name, tool_func in module.TOOLS.items():
                     self.tools[tool_name] = tool_func
                     logger.debug(f"注册工具: {tool_name}")
+                self._schemas = None
                 logger.info(f"成功注册工具模块: {module_name} ({len(module.TOOLS)} 个工具)")
                 print(f"✅ 注册工具模块: {module_name} ({len(module.TOOLS)} 个工具)")
             else:
@@ -47,10 +58,43 @@ class SimpleMCPClient:
             logger.error(f"注册工具模块失败 ({module_name}): {e}", exc_info=True)
             print(f"❌ 注册工具模块失败 ({module_name}): {e}")
     
+    @staticmethod
+    def _import_module(module_path: str):
+        sys.path.insert(0, str(Path(module_path).parent))
+        return importlib.import_module(Path(module_path).stem)
+    
+    def _register_manifest(self, module_name: str, module_path: str, tools: Dict[str, Dict[str, Any]]):
+        loaded: Dict[str, Any] = {}
+        
+        def load_tools():
+            if "tools" not in loaded:
+                started = time.perf_counter()
+                loaded["tools"] = self._import_module(module_path).TOOLS
+                logger.info(f"首次调用, 导入工具模块: {module_name} ({(time.perf_counter() - started) * 1000:.1f}ms)")
+            return loaded["tools"]
+        
+        for tool_name, entry in tools.items():
+            self.tools[tool_name] = LazyTool(tool_name, entry, load_tools)
+            logger.debug(f"按清单注册工具: {tool_name}")
+        self._schemas = None
+        logger.info(f"按清单注册工具模块: {module_name} ({len(tools)} 个工具, 首次调用时导入)")
+        print(f"✅ 注册工具模块: {module_name} ({len(tools)} 个工具)")
+    
     def list_tools(self) -> List[str]:
         """列出所有可用工具"""
         return list(self.tools.keys())
     
+    def tool_schemas(self) -> List[Dict[str, Any]]:
+        """
+        根据工具函数签名和文档生成 OpenAI 函数调用描述 (只生成一次)
+        
+        Returns:
+            tools 参数列表
+        """
+        if self._schemas is None:
+            self._schemas = [function_schema(name, func) for name, func in self.tools.items()]
+        return self._schemas
+    
     def call_tool(self, tool_name: str, **kwargs) -> Any:
         """
         调用工具
@@ -67,10 +111,16 @@ class SimpleMCPClient:
             logger.warning(f"工具 '{tool_name}' 不存在,可用工具: {available}")
             return f"工具 '{tool_name}' 不存在。可用工具: {available}"
         
+        # 时间预算已用完时仍然执行 (工具就是用户要的动作),工具内部的网络请求会按剩余预算降级
+        deadline = current_deadline()
+        if deadline is not None and deadline.expired:
+            logger.warning(f"工具 {tool_name} 开始时已超出时间预算")
+        
         try:
             logger.debug(f"调用工具: {tool_name}, 参数: {kwargs}")
             tool_func = self.tools[tool_name]
-            result = tool_func(**kwargs)
+            with deadline_stage("tool"):
+                result = tool_func(**kwargs)
             logger.debug(f"工具 {tool_name} 返回结果: {result}")
             return result
         except Exception as e:
@@ -85,18 +135,21 @@ class SimpleMCPClient:
         tool_func = self.tools[tool_name]
         return tool_func.__doc__ or "无文档"
 
-def create_simple_mcp_client(tools_dir: str = None) -> SimpleMCPClient:
+def create_simple_mcp_client(tools_dir: str = None, lazy: Optional[bool] = None) -> SimpleMCPClient:
     """
     创建并配置简化版 MCP 客户端
     
     Args:
         tools_dir: 工具模块目录
+        lazy: 是否按工具清单延迟导入工具模块,None 时读取 TOOL_LAZY_IMPORT (默认开启)
         
     Returns:
         配置好的 SimpleMCPClient 实例
     """
     logger.info("创建简化版 MCP 客户端...")
+    started = time.perf_counter()
     client = SimpleMCPClient()
+    manifest = create_tool_manifest() if (manifest_enabled() if lazy is None else lazy) else None
     
     if tools_dir is None:
         tools_dir = Path(__file__).parent / "mcp_servers_simple"
@@ -109,15 +162,24 @@ def create_simple_mcp_client(tools_dir: str = None) -> SimpleMCPClient:
         "weather": tools_dir / "weather_tools.py",
         "music": tools_dir / "music_tools.py"
     }
+    # 配置了地图 API Key 时提供路线规划 (地理编码可以在模型理解意图时推测预取)
+    if os.getenv("AMAP_API_KEY") or os.getenv("BAIDU_API_KEY"):
+        tool_modules["navigation_api"] = tools_dir / "navigation_tools_api.py"
     
     for name, path in tool_modules.items():
         if path.exists():
-            client.register_tools_module(name, str(path))
+            client.register_tools_module(name, str(path), manifest=manifest)
         else:
             logger.warning(f"工具模块文件不存在: {path}")
             print(f"⚠️  工具模块文件不存在: {path}")
     
-    logger.info(f"简化版 MCP 客户端创建完成,共加载 {len(client.tools)} 个工具")
+    if manifest is not None:
+        manifest.save()
+        source = f"工具清单 (缓存命中 {manifest.stats['hits']}, 重新解析 {manifest.stats['scanned']})"
+    else:
+        source = "启动时导入全部模块"
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    logger.info(f"简化版 MCP 客户端创建完成,共 {len(client.tools)} 个工具, 耗时 {elapsed_ms:.1f}ms, {source}")
     return client
 
 if __name__ == "__main__":
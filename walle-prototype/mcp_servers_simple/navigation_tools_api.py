@@ -2,23 +2,98 @@
 """
 使用地图Web API的导航工具实现
 支持高德地图、百度地图的Web API
+请求超时取默认超时和当前指令剩余时间预算中较小的一个,来不及时直接打开地图网页
+地理编码结果在进程内缓存,意图理解期间推测预取的坐标也放在这里
 """
 
+import os
+import threading
+import time
 import requests
 import webbrowser
 from urllib.parse import urlencode
 import json
-from typing import Dict, Optional, Tuple
+from typing import Dict, Optional, Set, Tuple
+
+try:
+    from deadline import stage_timeout
+except ImportError:  # 单独使用工具模块时没有时间预算
+    stage_timeout = None
+
+# 单次请求默认超时(秒) / 剩余预算少于这个时间就不再发请求
+DEFAULT_TIMEOUT = 5
+MIN_REQUEST_SECONDS = 0.3
+
+# 地理编码缓存: 有效期(秒) / 最多条数
+GEOCODE_CACHE_TTL = float(os.getenv("GEOCODE_CACHE_TTL", "3600"))
+GEOCODE_CACHE_SIZE = 256
+
+_geocode_cache: Dict[Tuple[str, str], Tuple[float, Dict]] = {}
+_geocode_lock = threading.Lock()
+# 推测预取写入、还没被工具读取过的条目 / 工具读到预取结果的次数
+_prefetched: Set[Tuple[str, str]] = set()
+_prefetch_reads = 0
 
 class MapAPIError(Exception):
     """地图API调用错误"""
     pass
 
+class MapAPITimeout(MapAPIError):
+    """地图API请求超时或时间预算不足"""
+    pass
+
+def _request_timeout(default: float) -> float:
+    """单次请求的超时: 默认超时和剩余时间预算中较小的一个"""
+    timeout = default if stage_timeout is None else stage_timeout("tool", default)
+    if timeout < MIN_REQUEST_SECONDS:
+        raise MapAPITimeout("剩余时间预算不足")
+    return timeout
+
+def _cached_geocode(service: str, address: str) -> Optional[Dict]:
+    """缓存中未过期的地理编码结果"""
+    global _prefetch_reads
+    key = (service, address)
+    with _geocode_lock:
+        entry = _geocode_cache.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] > GEOCODE_CACHE_TTL:
+            del _geocode_cache[key]
+            _prefetched.discard(key)
+            return None
+        if key in _prefetched:
+            _prefetched.discard(key)
+            _prefetch_reads += 1
+        return dict(entry[1])
+
+def _store_geocode(service: str, address: str, result: Dict):
+    with _geocode_lock:
+        _geocode_cache.pop((service, address), None)
+        _geocode_cache[(service, address)] = (time.monotonic(), dict(result))
+        while len(_geocode_cache) > GEOCODE_CACHE_SIZE:
+            evicted = next(iter(_geocode_cache))
+            del _geocode_cache[evicted]
+            _prefetched.discard(evicted)
+
+def clear_geocode_cache():
+    """清空地理编码缓存"""
+    global _prefetch_reads
+    with _geocode_lock:
+        _geocode_cache.clear()
+        _prefetched.clear()
+        _prefetch_reads = 0
+
+def prefetched_geocode_reads() -> int:
+    """地理编码时读到推测预取结果的次数 (每条预取结果最多计一次)"""
+    with _geocode_lock:
+        return _prefetch_reads
+
 class AmapAPI:
     """高德地图Web API"""
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, timeout: float = DEFAULT_TIMEOUT):
         self.api_key = api_key
+        self.timeout = timeout
         self.base_url = "https://restapi.amap.com/v3"
     
     def geocode(self, address: str) -> Optional[Dict]:
@@ -31,6 +106,9 @@ class AmapAPI:
         Returns:
             {"location": "经度,纬度", "address": "格式化地址"}
         """
+        cached = _cached_geocode("amap", address)
+        if cached is not None:
+            return cached
         url = f"{self.base_url}/geocode/geo"
         params = {
             "key": self.api_key,
@@ -39,7 +117,7 @@ class AmapAPI:
         }
         
         try:
-            response = requests.get(url, params=params, timeout=5)
+            response = requests.get(url, params=params, timeout=_request_timeout(self.timeout))
             response.raise_for_status()
             data = response.json()
             
@@ -48,13 +126,17 @@ class AmapAPI:
                 location = geocode["location"]
                 formatted_address = geocode.get("formatted_address", address)
                 
-                return {
+                result = {
                     "location": location,
                     "formatted_address": formatted_address
                 }
+                _store_geocode("amap", address, result)
+                return result
             
             raise MapAPIError(f"未找到地址: {address}")
             
+        except requests.Timeout as e:
+            raise MapAPITimeout(f"API请求超时: {e}")
         except requests.RequestException as e:
             raise MapAPIError(f"API请求失败: {e}")
     
@@ -86,7 +168,7 @@ class AmapAPI:
         }
         
         try:
-            response = requests.get(url, params=params, timeout=5)
+            response = requests.get(url, params=params, timeout=_request_timeout(self.timeout))
             response.raise_for_status()
             data = response.json()
             
@@ -118,6 +200,8 @@ class AmapAPI:
             
             raise MapAPIError("路线规划失败")
             
+        except requests.Timeout as e:
+            raise MapAPITimeout(f"API请求超时: {e}")
         except requests.RequestException as e:
             raise MapAPIError(f"API请求失败: {e}")
 
@@ -125,14 +209,18 @@ class AmapAPI:
 class BaiduAPI:
     """百度地图Web API"""
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, timeout: float = DEFAULT_TIMEOUT):
         self.api_key = api_key
+        self.timeout = timeout
         self.base_url = "https://api.map.baidu.com"
     
     def geocode(self, address: str) -> Optional[Dict]:
         """
         地理编码 - 将地址转换为坐标
         """
+        cached = _cached_geocode("baidu", address)
+        if cached is not None:
+            return cached
         url = f"{self.base_url}/geocoding/v3/"
         params = {
             "ak": self.api_key,
@@ -141,7 +229,7 @@ class BaiduAPI:
         }
         
         try:
-            response = requests.get(url, params=params, timeout=5)
+            response = requests.get(url, params=params, timeout=_request_timeout(self.timeout))
             response.raise_for_status()
             data = response.json()
             
@@ -149,13 +237,17 @@ class BaiduAPI:
                 result = data.get("result", {})
                 location = result.get("location", {})
                 
-                return {
+                geocode = {
                     "location": f"{location['lng']},{location['lat']}",
                     "formatted_address": result.get("formatted_address", address)
                 }
+                _store_geocode("baidu", address, geocode)
+                return geocode
             
             raise MapAPIError(f"未找到地址: {address}")
             
+        except requests.Timeout as e:
+            raise MapAPITimeout(f"API请求超时: {e}")
         except requests.RequestException as e:
             raise MapAPIError(f"API请求失败: {e}")
     
@@ -185,7 +277,7 @@ class BaiduAPI:
         }
         
         try:
-            response = requests.get(url, params=params, timeout=5)
+            response = requests.get(url, params=params, timeout=_request_timeout(self.timeout))
             response.raise_for_status()
             data = response.json()
             
@@ -216,6 +308,8 @@ class BaiduAPI:
             
             raise MapAPIError("路线规划失败")
             
+        except requests.Timeout as e:
+            raise MapAPITimeout(f"API请求超时: {e}")
         except requests.RequestException as e:
             raise MapAPIError(f"API请求失败: {e}")
 
@@ -277,12 +371,60 @@ def navigate_with_api(
         
         return result
         
+    except MapAPITimeout as e:
+        # 来不及规划路线时直接打开地图网页,不让用户干等
+        from mcp_servers_simple.navigation_tools import navigate
+        return f"⏱️  路线规划超时 ({e}), 已直接打开地图\n\n" + navigate(origin, destination, map_service)
     except MapAPIError as e:
         return f"❌ 地图API错误: {e}"
     except Exception as e:
         return f"❌ 导航失败: {e}"
 
 
+def plan_route(origin: str, destination: str, map_service: str = "amap") -> str:
+    """
+    规划驾车路线,返回距离、预计时间和主要路段 (使用地图Web API)
+
+    Args:
+        origin: 起点
+        destination: 终点
+        map_service: 地图服务 (amap, baidu)
+
+    Returns:
+        路线信息;没有配置对应的 API Key 时直接打开地图导航
+    """
+    api_key = os.getenv(f"{map_service.upper()}_API_KEY")
+    return navigate_with_api(origin, destination, map_service, api_key=api_key, use_api=True)
+
+
+def prefetch_geocode(address: str, map_service: str = "amap", api_key: Optional[str] = None) -> Optional[Dict]:
+    """
+    推测预取: 在模型还在理解意图时提前查询地址坐标并放入缓存
+
+    Args:
+        address: 地址
+        map_service: 地图服务 (amap, baidu)
+        api_key: API密钥,默认读取 AMAP_API_KEY / BAIDU_API_KEY
+
+    Returns:
+        地理编码结果,没有 API Key 或不支持的服务时返回 None
+    """
+    api_key = api_key or os.getenv(f"{map_service.upper()}_API_KEY")
+    apis = {"amap": AmapAPI, "baidu": BaiduAPI}
+    if not api_key or map_service not in apis:
+        return None
+    key = (map_service, address)
+    with _geocode_lock:
+        cached = key in _geocode_cache
+    result = apis[map_service](api_key).geocode(address)
+    if not cached:
+        # 只有这次新查到的结果才算预取,之后工具读到时计为命中
+        with _geocode_lock:
+            if key in _geocode_cache:
+                _prefetched.add(key)
+    return result
+
+
 def get_api_key_info() -> str:
     """
     获取API Key配置说明
@@ -315,3 +457,8 @@ def get_api_key_info() -> str:
        use_api=True
    )
 """
+
+
+TOOLS = {
+    "plan_route": plan_route,
+}
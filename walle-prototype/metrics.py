@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+WALL-E 轻量级指标工具
+提供延迟分位数统计,供语音、AI 和工具各阶段记录耗时
+"""
+
+import math
+import threading
+from collections import deque
+from typing import Dict, Iterable, Optional
+
+
+def percentile(values: Iterable[float], q: float) -> Optional[float]:
+    """
+    计算分位数 (线性插值)
+
+    Args:
+        values: 数值序列
+        q: 分位点,取值 0-100
+
+    Returns:
+        分位数,序列为空时返回 None
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    if len(ordered) == 1:
+        return ordered[0]
+    rank = (len(ordered) - 1) * min(max(q, 0), 100) / 100
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+class LatencyStats:
+    """保留最近 window 个样本的延迟统计 (单位: 毫秒)"""
+
+    def __init__(self, window: int = 500):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def record(self, value_ms: float):
+        with self._lock:
+            self._samples.append(value_ms)
+            self.count += 1
+
+    def samples(self):
+        with self._lock:
+            return list(self._samples)
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        """返回 count / p50 / p95 / max 统计"""
+        samples = self.samples()
+        return {
+            "count": self.count,
+            "p50": percentile(samples, 50),
+            "p95": percentile(samples, 95),
+            "max": max(samples) if samples else None,
+        }
+
+
+def format_summary(summary: Dict[str, Optional[float]], unit: str = "ms") -> str:
+    """把 summary() 结果格式化为一行日志文本"""
+    if not summary.get("count"):
+        return "无数据"
+    return (
+        f"n={summary['count']} p50={summary['p50']:.0f}{unit} "
+        f"p95={summary['p95']:.0f}{unit} max={summary['max']:.0f}{unit}"
+    )
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+WALL-E 背景噪声校准
+首次使用某个麦克风时测量一次底噪,之后持续用非语音帧自适应更新,
+并按设备持久化到磁盘;下次启动直接读取,不再重新校准
+"""
+
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+import speech_recognition as sr
+from logger_config import setup_logger
+from metrics import percentile
+
+logger = setup_logger("WALL-E.NoiseCalibration", level=os.getenv("LOG_LEVEL", "INFO"))
+
+DEFAULT_PROFILE_PATH = "~/.walle/noise_profiles.json"
+
+
+@dataclass
+class NoiseProfile:
+    """一个输入设备的底噪档案"""
+    device: str
+    sample_rate: int
+    noise_floor: float
+    updated_at: float
+
+
+def device_key(source: sr.AudioSource) -> str:
+    """
+    生成输入设备的标识 (设备名 + 采样率)
+
+    Args:
+        source: sr.Microphone 音频源
+
+    Returns:
+        设备标识,查不到设备名时使用设备序号
+    """
+    index = getattr(source, "device_index", None)
+    name = "default" if index is None else f"device-{index}"
+    if index is not None:
+        try:
+            name = sr.Microphone.list_microphone_names()[index]
+        except Exception as e:
+            logger.debug(f"获取麦克风名称失败: {e}")
+    return f"{name}@{source.SAMPLE_RATE}"
+
+
+class NoiseProfileStore:
+    """按设备保存底噪档案的 JSON 文件"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(os.path.expanduser(path or DEFAULT_PROFILE_PATH))
+        self._lock = threading.Lock()
+
+    def _read(self) -> Dict[str, dict]:
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取底噪档案失败,重新校准: {e}")
+            return {}
+
+    def load(self, device: str) -> Optional[NoiseProfile]:
+        with self._lock:
+            data = self._read().get(device)
+        if not data:
+            return None
+        try:
+            return NoiseProfile(**data)
+        except TypeError:
+            return None
+
+    def save(self, profile: NoiseProfile):
+        with self._lock:
+            profiles = self._read()
+            profiles[profile.device] = asdict(profile)
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = self.path.with_suffix(".tmp")
+                tmp.write_text(json.dumps(profiles, ensure_ascii=False, indent=2), encoding="utf-8")
+                os.replace(tmp, self.path)
+            except OSError as e:
+                logger.warning(f"保存底噪档案失败: {e}")
+
+
+class NoiseCalibrator:
+    """
+    自适应底噪估计
+
+    没有档案时先用开头 calibration_ms 的音频测量底噪 (取中位数),
+    之后每个非语音帧都按指数滑动平均更新底噪;能量阈值 = 底噪 × ratio,
+    不低于 min_threshold。与 SpeechRecognition 的 dynamic_energy_threshold 思路一致
+    """
+
+    def __init__(
+        self,
+        device: str,
+        sample_rate: int,
+        store: Optional[NoiseProfileStore] = None,
+        ratio: float = 1.5,
+        min_threshold: float = 100,
+        calibration_ms: float = 1000,
+        adapt_seconds: float = 5.0,
+        save_interval: float = 30.0,
+    ):
+        """
+        Args:
+            device: 设备标识
+            sample_rate: 采样率
+            store: 档案存储,None 表示不持久化
+            ratio: 能量阈值相对底噪的倍数
+            min_threshold: 能量阈值下限
+            calibration_ms: 首次校准测量的音频时长
+            adapt_seconds: 自适应的时间常数,越大底噪变化越慢
+            save_interval: 两次写盘的最短间隔(秒)
+        """
+        self.device = device
+        self.sample_rate = sample_rate
+        self.store = store
+        self.ratio = ratio
+        self.min_threshold = min_threshold
+        self.calibration_ms = calibration_ms
+        self.adapt_seconds = adapt_seconds
+        self.save_interval = save_interval
+
+        self.noise_floor: Optional[float] = None
+        self._calibration_samples = []
+        self._calibration_duration = 0.0
+        self._last_saved = 0.0
+        self._saved_floor: Optional[float] = None
+
+        profile = store.load(device) if store is not None else None
+        if profile is not None and profile.sample_rate == sample_rate:
+            self.noise_floor = profile.noise_floor
+            self._saved_floor = profile.noise_floor
+            self._last_saved = time.monotonic()
+            logger.info(f"已加载设备 [{device}] 的底噪档案: {profile.noise_floor:.0f},跳过校准")
+
+    @property
+    def calibrated(self) -> bool:
+        return self.noise_floor is not None
+
+    @property
+    def energy_threshold(self) -> float:
+        if self.noise_floor is None:
+            return float("inf")
+        return max(self.min_threshold, self.noise_floor * self.ratio)
+
+    def calibrate(self, rms: float, duration_ms: float) -> bool:
+        """
+        首次校准阶段送入一帧的能量
+
+        Returns:
+            校准是否已完成
+        """
+        if self.calibrated:
+            return True
+        if not self._calibration_samples:
+            logger.info(f"正在测量设备 [{self.device}] 的底噪,请保持安静...")
+        self._calibration_samples.append(rms)
+        self._calibration_duration += duration_ms
+        if self._calibration_duration >= self.calibration_ms:
+            self.noise_floor = percentile(self._calibration_samples, 50)
+            self._calibration_samples = []
+            logger.info(
+                f"设备 [{self.device}] 底噪校准完成: {self.noise_floor:.0f}, "
+                f"能量阈值 {self.energy_threshold:.0f}"
+            )
+            self.save(force=True)
+        return self.calibrated
+
+    def observe(self, rms: float, duration_ms: float):
+        """用一帧非语音音频的能量更新底噪"""
+        if not self.calibrated:
+            self.calibrate(rms, duration_ms)
+            return
+        alpha = min(1.0, duration_ms / 1000 / self.adapt_seconds)
+        self.noise_floor += alpha * (rms - self.noise_floor)
+        self.save()
+
+    def save(self, force: bool = False):
+        """底噪有明显变化且距上次写盘足够久时持久化"""
+        if self.store is None or self.noise_floor is None:
+            return
+        now = time.monotonic()
+        if not force:
+            if now - self._last_saved < self.save_interval:
+                return
+            if self._saved_floor and abs(self.noise_floor - self._saved_floor) < 0.1 * self._saved_floor:
+                return
+        self.store.save(NoiseProfile(self.device, self.sample_rate, self.noise_floor, time.time()))
+        self._last_saved = now
+        self._saved_floor = self.noise_floor
+
+
+def noise_calibration_enabled() -> bool:
+    """是否开启自适应底噪校准 (NOISE_CALIBRATION, 默认开启)"""
+    return os.getenv("NOISE_CALIBRATION", "1").lower() in ("1", "true", "yes")
+
+
+def create_calibrator_from_env(device: str, sample_rate: int) -> NoiseCalibrator:
+    """根据环境变量 NOISE_* 创建底噪校准器"""
+    return NoiseCalibrator(
+        device,
+        sample_rate,
+        store=NoiseProfileStore(os.getenv("NOISE_PROFILE_PATH")),
+        ratio=float(os.getenv("NOISE_THRESHOLD_RATIO", "1.5")),
+        min_threshold=float(os.getenv("NOISE_MIN_THRESHOLD", "100")),
+    )
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+WALL-E 推测预取
+等待大模型理解意图的几百毫秒到几秒里,先从原文中抽出可能用到的地点和城市,
+在低优先级线程池里提前查询 (如地理编码) 放进工具缓存;
+模型选定工具后,用不到的预取任务还没开始的直接取消;只有工具真正从缓存读到预取结果才算命中,
+其余执行过的预取都记为浪费,退出时输出命中率
+"""
+
+import atexit
+import contextvars
+import importlib
+import os
+import re
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from intent_rules import match_intent
+from logger_config import setup_logger
+from tool_executor import Intent, as_calls
+
+logger = setup_logger("WALL-E.Prefetch", level=os.getenv("LOG_LEVEL", "INFO"))
+
+# 实体类型 → 会用到这类实体的工具参数
+ENTITY_PARAMS: Dict[str, Dict[str, Tuple[str, ...]]] = {
+    "place": {
+        "navigate": ("origin", "destination"),
+        "plan_route": ("origin", "destination"),
+        "search_location": ("query",),
+    },
+    "city": {"get_weather": ("city",), "compare_weather": ("city1", "city2")},
+}
+
+_STOP = r"(?=然后|并且|而且|同时|顺便|之后|再|的路线|怎么走|(?:吧|吗|呢|啊|呀)*(?:[,，。!！?？、\s]|$))"
+_PLACE_PATTERNS = [
+    re.compile(r"从(?P<value>[^,，。!！?？\s]+?)(?:出发)?(?:到|去)"),
+    re.compile(r"(?:导航到|导航去|前往|带我去|去|到|回)(?P<value>[^,，。!！?？\s]+?)" + _STOP),
+]
+_CITY_PATTERN = re.compile(r"(?P<value>[一-龥]{2,8}?)(?:今天|明天|后天|大后天|这周末|周末|现在)?的?天气")
+_CITY_PREFIX = re.compile(r"^.*(?:查一下|查查|查下|查|看一下|看看|问下|顺便|今天|明天|后天|周末|现在)")
+# 这些词不是具体地点,预取没有意义
+_VAGUE = {"当前位置", "这里", "那里", "哪里", "哪儿", "家", "公司"}
+
+MAX_ENTITIES = 4
+
+# 会读取地理编码缓存的工具;注册的工具里没有这些时预取的坐标没人用,不注册地点预取
+GEOCODE_TOOLS = {"plan_route"}
+
+
+def extract_entities(text: str) -> List[Tuple[str, str]]:
+    """
+    从原文中抽取候选实体
+
+    先用规则快速通道 (接受低置信度) 的参数,再用宽松的正则补充
+
+    Args:
+        text: 用户输入
+
+    Returns:
+        [(实体类型, 值), ...],去重后最多 MAX_ENTITIES 个
+    """
+    found: List[Tuple[str, str]] = []
+
+    def add(kind: str, value: Optional[str]):
+        value = (value or "").strip()
+        if value and value not in _VAGUE and len(value) <= 20 and (kind, value) not in found:
+            found.append((kind, value))
+
+    intent = match_intent(text, min_confidence=0.0, record=False)
+    for call in as_calls(intent):
+        for kind, tools in ENTITY_PARAMS.items():
+            for param in tools.get(call["tool"], ()):
+                add(kind, call["params"].get(param))
+
+    for pattern in _PLACE_PATTERNS:
+        for m in pattern.finditer(text):
+            add("place", m.group("value"))
+    for m in _CITY_PATTERN.finditer(text):
+        add("city", _CITY_PREFIX.sub("", m.group("value")))
+    return found[:MAX_ENTITIES]
+
+
+def needed_entities(intent: Intent) -> Set[Tuple[str, str]]:
+    """意图中各工具实际用到的实体"""
+    needed = set()
+    for call in as_calls(intent):
+        params = call.get("params") or {}
+        for kind, tools in ENTITY_PARAMS.items():
+            for param in tools.get(call.get("tool"), ()):
+                value = params.get(param)
+                if isinstance(value, str) and value.strip():
+                    needed.add((kind, value.strip()))
+    return needed
+
+
+@dataclass
+class PrefetchBatch:
+    """一条指令的预取任务"""
+    prefetcher: "SpeculativePrefetcher"
+    futures: Dict[Tuple[str, str], Future] = field(default_factory=dict)
+    settled: bool = False
+
+    def settle(self, intent: Optional[Intent]):
+        """
+        模型选定工具后调用: 取消用不到的任务,统计没有预取到的实体
+
+        Args:
+            intent: 最终意图,失败时传 None (全部取消)
+        """
+        if self.settled:
+            return
+        self.settled = True
+        self.prefetcher.settle(self, needed_entities(intent) if intent is not None else set())
+
+
+class SpeculativePrefetcher:
+    """
+    推测预取器
+
+    每类实体可以注册一个预取函数 (如地点 → 地理编码),函数的结果由它自己放进工具缓存,
+    缓存提供读到预取结果的次数作为命中数;预取在单独的小线程池里执行,不占用工具并行执行的线程
+    """
+
+    def __init__(self, max_workers: int = 2):
+        """
+        Args:
+            max_workers: 同时执行的预取任务数
+        """
+        self.max_workers = max_workers
+        self.fetchers: Dict[str, Callable[[str], Any]] = {}
+        # 实体类型 → (读取命中数的函数, 注册时的命中数)
+        self._reads: Dict[str, Tuple[Callable[[], int], int]] = {}
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.stats = {"launched": 0, "cancelled": 0, "missed": 0}
+
+    def register(self, kind: str, fetch: Callable[[str], Any], reads: Optional[Callable[[], int]] = None):
+        """
+        注册一类实体的预取函数
+
+        Args:
+            kind: 实体类型 (place / city)
+            fetch: 接收实体值的函数,需要可以重复调用
+            reads: 返回工具从缓存读到预取结果的累计次数;不提供时这类预取不计命中
+        """
+        self.fetchers[kind] = fetch
+        if reads is not None:
+            self._reads[kind] = (reads, reads())
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="WALL-E-Prefetch")
+            return self._pool
+
+    def _run(self, kind: str, value: str):
+        try:
+            self.fetchers[kind](value)
+            logger.debug(f"预取完成: {kind}={value}")
+        except Exception as e:
+            logger.debug(f"预取失败: {kind}={value}: {e}")
+
+    def start(self, text: str) -> PrefetchBatch:
+        """
+        从原文抽取实体并开始预取 (在调用大模型之前调用,不阻塞)
+
+        Returns:
+            PrefetchBatch,模型返回后调用 batch.settle(intent)
+        """
+        batch = PrefetchBatch(self)
+        if not self.fetchers:
+            return batch
+        for kind, value in extract_entities(text):
+            if kind not in self.fetchers:
+                continue
+            # 带上当前上下文,预取请求同样受这条指令的时间预算限制
+            batch.futures[(kind, value)] = self._executor().submit(
+                contextvars.copy_context().run, self._run, kind, value
+            )
+        if batch.futures:
+            logger.debug(f"推测预取 {len(batch.futures)} 个实体: {list(batch.futures)}")
+            with self._lock:
+                self.stats["launched"] += len(batch.futures)
+        return batch
+
+    def settle(self, batch: PrefetchBatch, needed: Set[Tuple[str, str]]):
+        cancelled = sum(1 for key, future in batch.futures.items() if key not in needed and future.cancel())
+        missed = sum(1 for key in needed if key[0] in self.fetchers and key not in batch.futures)
+        with self._lock:
+            self.stats["cancelled"] += cancelled
+            self.stats["missed"] += missed
+
+    def counts(self) -> Dict[str, int]:
+        """
+        预取统计
+
+        Returns:
+            launched / hits (工具读到预取结果) / wasted (执行了但没被读取) / cancelled / missed
+        """
+        hits = sum(reads() - baseline for reads, baseline in self._reads.values())
+        with self._lock:
+            counts = dict(self.stats)
+        counts["hits"] = hits
+        counts["wasted"] = max(0, counts["launched"] - counts["cancelled"] - hits)
+        return counts
+
+    def hit_rate(self) -> Optional[float]:
+        """命中的预取占全部预取的比例,没有预取时返回 None"""
+        counts = self.counts()
+        return counts["hits"] / counts["launched"] if counts["launched"] else None
+
+    def log_stats(self):
+        counts = self.counts()
+        if counts["launched"]:
+            logger.info(
+                f"推测预取: {counts['launched']} 次, 命中 {counts['hits']} 次 ({self.hit_rate():.0%}), "
+                f"浪费 {counts['wasted']} 次, 取消 {counts['cancelled']} 次, 未预取到 {counts['missed']} 次"
+            )
+
+
+def prefetch_enabled() -> bool:
+    """是否开启推测预取 (PREFETCH, 默认开启;没有可用的预取函数时不产生任何请求)"""
+    return os.getenv("PREFETCH", "1").lower() in ("1", "true", "yes")
+
+
+def _navigation_api():
+    # 与 SimpleMCPClient 一样按文件名导入,预取和 plan_route 工具读写同一份地理编码缓存
+    tools_dir = str(Path(__file__).parent / "mcp_servers_simple")
+    if tools_dir not in sys.path:
+        sys.path.insert(0, tools_dir)
+    return importlib.import_module("navigation_tools_api")
+
+
+def create_prefetcher(tools: Iterable[str] = ()) -> SpeculativePrefetcher:
+    """
+    根据环境变量和注册的工具创建预取器
+
+    注册了读取地理编码缓存的工具 (GEOCODE_TOOLS,即配置地图 API Key 后简化版客户端提供的 plan_route)
+    且配置了 AMAP_API_KEY (或 BAIDU_API_KEY) 时预取地点的地理编码;navigate / search_location
+    只生成地图链接,天气工具只打开查询网页,都没有可以提前取的数据,这时不注册任何预取,不产生请求
+
+    Args:
+        tools: 已注册的工具名 (可带 "服务名." 前缀)
+    """
+    prefetcher = SpeculativePrefetcher(max_workers=int(os.getenv("PREFETCH_MAX_WORKERS", "2")))
+    reads_geocode = any(name.rsplit(".", 1)[-1] in GEOCODE_TOOLS for name in tools)
+    if prefetch_enabled() and reads_geocode:
+        navigation_api = _navigation_api()
+        for service in ("amap", "baidu"):
+            if os.getenv(f"{service.upper()}_API_KEY"):
+                prefetcher.register(
+                    "place", lambda place, service=service: navigation_api.prefetch_geocode(place, service),
+                    navigation_api.prefetched_geocode_reads,
+                )
+                break
+    atexit.register(prefetcher.log_stats)
+    return prefetcher
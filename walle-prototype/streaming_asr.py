@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+WALL-E 流式识别 + 推测式意图理解
+边说边出中间识别结果,中间结果稳定后提前开始意图理解;
+最终识别结果与推测一致时直接复用,不一致时丢弃推测重新理解
+"""
+
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import speech_recognition as sr
+from asr_backends import get_asr_backend
+from audio_capture import get_capture_service
+from deadline import restart_deadline, stage_timeout
+from logger_config import setup_logger
+from text_utils import is_exit_command, normalize_transcript
+from wake_word import get_wake_gate
+
+logger = setup_logger("WALL-E.StreamingASR", level=os.getenv("LOG_LEVEL", "INFO"))
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="WALL-E-Speculative")
+
+speculation_stats = {"launched": 0, "hits": 0, "misses": 0, "saved_ms": 0.0}
+_stats_lock = threading.Lock()
+
+
+def streaming_enabled() -> bool:
+    """是否开启流式识别 (ASR_STREAMING=1)"""
+    return os.getenv("ASR_STREAMING", "0").lower() in ("1", "true", "yes")
+
+
+def _count(key: str, value: float = 1):
+    with _stats_lock:
+        speculation_stats[key] += value
+
+
+class SpeculativeIntentRunner:
+    """
+    根据中间识别结果推测性地执行意图理解
+
+    同一个中间结果连续出现 stable_partials 次视为稳定,稳定且与上次推测不同时
+    在后台线程发起理解;每句话最多推测 max_speculations 次,控制额外的 LLM 调用
+
+    推测针对的是还没说完的话,使用单独的 speculate_fn: 它不应写缓存、记录会话或计入统计,
+    返回 None 表示不需要推测 (如规则就能直接回答),说完后由 understand_fn 正常理解
+    """
+
+    def __init__(
+        self,
+        understand_fn: Callable[[str], Dict[str, Any]],
+        min_chars: int = 4,
+        stable_partials: int = 2,
+        max_speculations: int = 3,
+        speculate_fn: Optional[Callable[[str], Optional[Dict[str, Any]]]] = None,
+    ):
+        """
+        Args:
+            understand_fn: 意图理解函数,最终识别结果使用
+            min_chars: 中间结果至少多少个字才推测
+            stable_partials: 同一个中间结果连续出现多少次视为稳定
+            max_speculations: 每句话最多推测次数
+            speculate_fn: 推测性理解函数 (没有副作用),默认使用 understand_fn
+        """
+        self.understand_fn = understand_fn
+        self.speculate_fn = speculate_fn or understand_fn
+        self.min_chars = min_chars
+        self.stable_partials = stable_partials
+        self.max_speculations = max_speculations
+
+        self._last_partial = ""
+        self._repeat = 0
+        self._speculations = 0
+        self._speculated_text: Optional[str] = None
+        self._future: Optional[Future] = None
+        self._started_at = 0.0
+
+    def on_partial(self, text: str):
+        """收到一条中间识别结果"""
+        normalized = normalize_transcript(text)
+        if normalized == self._last_partial:
+            self._repeat += 1
+        else:
+            self._last_partial = normalized
+            self._repeat = 1
+
+        if (
+            self._repeat >= self.stable_partials
+            and len(normalized) >= self.min_chars
+            and normalized != self._speculated_text
+            and self._speculations < self.max_speculations
+            and not is_exit_command(normalized)
+        ):
+            self._speculate(text, normalized)
+
+    def _speculate(self, text: str, normalized: str):
+        self.cancel()
+        logger.debug(f"中间结果已稳定,推测性理解: {text}")
+        self._speculations += 1
+        self._speculated_text = normalized
+        self._started_at = time.perf_counter()
+        # 带上当前上下文,推测的 LLM 请求同样受这条指令的时间预算限制
+        self._future = _executor.submit(contextvars.copy_context().run, self.speculate_fn, text)
+        _count("launched")
+
+    def cancel(self):
+        """取消尚未开始的推测 (已开始的结果会被丢弃)"""
+        if self._future is not None:
+            self._future.cancel()
+            self._future = None
+            self._speculated_text = None
+
+    def finalize(self, final_text: str) -> Optional[Dict[str, Any]]:
+        """
+        根据最终识别结果给出意图
+
+        Args:
+            final_text: 最终识别结果
+
+        Returns:
+            推测命中时返回推测结果,否则重新理解后返回;退出指令不做理解,返回 None
+        """
+        if is_exit_command(final_text):
+            self.cancel()
+            return None
+
+        if self._future is not None and normalize_transcript(final_text) == self._speculated_text:
+            saved_ms = (time.perf_counter() - self._started_at) * 1000
+            result = None
+            try:
+                # 推测还没返回时最多等到 AI 理解阶段的预算用完,超时后重新理解 (会走降级)
+                result = self._future.result(timeout=stage_timeout("llm"))
+            except Exception as e:
+                logger.warning(f"推测理解失败,重新理解: {e}")
+            # 推测函数返回 None (不需要推测) 时按最终结果正常理解
+            if result is not None:
+                _count("hits")
+                _count("saved_ms", saved_ms)
+                logger.info(f"推测理解命中,提前 {saved_ms:.0f}ms 开始理解")
+                return result
+        elif self._future is not None:
+            logger.info("最终结果与推测不一致,丢弃推测结果")
+            _count("misses")
+        self.cancel()
+        return self.understand_fn(final_text)
+
+
+def listen_streaming(
+    understand_fn: Callable[[str], Dict[str, Any]],
+    timeout: float = 5,
+    speculate_fn: Optional[Callable[[str], Optional[Dict[str, Any]]]] = None,
+) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """
+    流式监听语音,并在说完之前推测性地开始意图理解
+
+    Args:
+        understand_fn: 意图理解函数 (text -> intent)
+        timeout: 等待开口的最长时间(秒)
+        speculate_fn: 对中间结果推测性理解的函数 (没有副作用),默认使用 understand_fn
+
+    Returns:
+        (识别文本, 意图),没有识别到内容时返回 (None, None),退出指令返回 (识别文本, None)
+    """
+    print("\n🎤 请说话...")
+    logger.info("开始流式监听语音输入...")
+    runner = SpeculativeIntentRunner(understand_fn, speculate_fn=speculate_fn)
+    try:
+        stream = get_wake_gate(get_capture_service()).get_utterance_stream(timeout=timeout)
+        asr_stream = get_asr_backend().create_stream(stream.sample_rate, stream.sample_width)
+        for frame in stream.frames():
+            partial = asr_stream.accept(frame)
+            if partial:
+                print(f"\r💭 {partial}", end="", flush=True)
+                runner.on_partial(partial)
+
+        if stream.discarded:
+            runner.cancel()
+            logger.debug("语音片段过短被丢弃")
+            return None, None
+
+        # 说完才开始计算这条指令的时间预算
+        restart_deadline()
+        text = asr_stream.finish()
+        logger.info(f"语音识别成功: {text}")
+        print(f"\n📝 识别: {text}")
+        return text, runner.finalize(text)
+    except sr.WaitTimeoutError:
+        logger.warning("语音监听超时,没有检测到声音")
+        print("⏰ 没听到声音")
+    except sr.UnknownValueError:
+        logger.warning("语音识别失败,无法理解音频内容")
+        print("\n❌ 无法识别")
+    except Exception as e:
+        logger.error(f"语音识别出错: {e}", exc_info=True)
+        print(f"\n❌ 错误: {e}")
+    runner.cancel()
+    return None, None
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Test suite for asr_backends.py
+"""
+
+import json
+import threading
+import unittest
+from unittest.mock import Mock, patch
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import speech_recognition as sr
+import asr_backends
+from asr_backends import (
+    ASRBackend,
+    GoogleASRBackend,
+    RecognizerRace,
+    VoskASRBackend,
+    create_asr_backend,
+    get_asr_backend,
+)
+
+
+def make_audio(seconds=0.1):
+    return sr.AudioData(b"\x00\x00" * int(16000 * seconds), 16000, 2)
+
+
+class CountingBackend(ASRBackend):
+    name = "counting"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.load_count = 0
+        self.recognize_count = 0
+
+    def _load(self):
+        self.load_count += 1
+
+    def _recognize(self, audio):
+        self.recognize_count += 1
+        return "测试"
+
+
+class TestASRBackend(unittest.TestCase):
+
+    def test_model_loaded_once(self):
+        backend = CountingBackend()
+
+        backend.recognize(make_audio())
+        backend.recognize(make_audio())
+
+        self.assertEqual(backend.load_count, 1)
+        self.assertEqual(backend.recognize_count, 2)
+
+    def test_warm_up_loads_and_runs_once(self):
+        backend = CountingBackend()
+
+        backend.warm_up()
+
+        self.assertEqual(backend.load_count, 1)
+        self.assertEqual(backend.recognize_count, 1)
+
+    def test_warm_up_failure_is_logged_not_raised(self):
+        backend = CountingBackend()
+        backend._load = Mock(side_effect=RuntimeError("no model"))
+
+        backend.warm_up()
+
+    def test_normalize_chinese_text(self):
+        backend = CountingBackend(language="zh-CN")
+
+        self.assertEqual(backend._normalize_text(" 导航 到 虹桥 机场 "), "导航到虹桥机场")
+        with self.assertRaises(sr.UnknownValueError):
+            backend._normalize_text("  ")
+
+
+class TestGoogleASRBackend(unittest.TestCase):
+
+    def test_recognize_uses_language(self):
+        backend = GoogleASRBackend(language="zh-CN", preprocess=False)
+        backend.recognizer = Mock()
+        backend.recognizer.recognize_google.return_value = "从上海到北京"
+        audio = make_audio()
+
+        result = backend.recognize(audio)
+
+        self.assertEqual(result, "从上海到北京")
+        backend.recognizer.recognize_google.assert_called_once_with(audio, language="zh-CN")
+
+    def test_recognize_uploads_preprocessed_audio(self):
+        backend = GoogleASRBackend(preprocess=True)
+        backend.recognizer = Mock()
+        backend.recognizer.recognize_google.return_value = "测试"
+
+        backend.recognize(sr.AudioData(b"\x00\x00" * 4410, 44100, 2))
+
+        uploaded = backend.recognizer.recognize_google.call_args[0][0]
+        self.assertEqual(uploaded.sample_rate, 16000)
+
+    def test_warm_up_skips_network(self):
+        backend = GoogleASRBackend()
+        backend.recognizer = Mock()
+
+        backend.warm_up()
+
+        backend.recognizer.recognize_google.assert_not_called()
+
+
+class TestVoskASRBackend(unittest.TestCase):
+
+    def test_missing_model_dir(self):
+        backend = VoskASRBackend(model_path="/nonexistent/model")
+
+        with patch.dict('sys.modules', {'vosk': Mock()}):
+            with self.assertRaises(FileNotFoundError):
+                backend.recognize(make_audio())
+
+    def test_recognize(self):
+        mock_vosk = Mock()
+        mock_vosk.KaldiRecognizer.return_value.FinalResult.return_value = json.dumps(
+            {"text": "播放 晴天"}
+        )
+
+        with tempfile.TemporaryDirectory() as model_dir, \
+             patch.dict('sys.modules', {'vosk': mock_vosk}):
+            backend = VoskASRBackend(model_path=model_dir)
+            result = backend.recognize(make_audio())
+
+        self.assertEqual(result, "播放晴天")
+        mock_vosk.Model.assert_called_once_with(model_dir)
+
+
+class TestASRStream(unittest.TestCase):
+
+    def test_default_stream_recognizes_whole_utterance(self):
+        backend = CountingBackend()
+        stream = backend.create_stream(16000, 2)
+
+        self.assertIsNone(stream.accept(b"\x00\x00"))
+        self.assertIsNone(stream.accept(b"\x00\x00"))
+        self.assertEqual(stream.finish(), "测试")
+        self.assertEqual(backend.recognize_count, 1)
+
+    def test_vosk_stream_partials_and_committed_segments(self):
+        mock_vosk = Mock()
+        kaldi = mock_vosk.KaldiRecognizer.return_value
+        kaldi.AcceptWaveform.side_effect = [False, True, False, False]
+        kaldi.PartialResult.side_effect = [
+            json.dumps({"partial": "导航 到"}),
+            json.dumps({"partial": "机场"}),
+            json.dumps({"partial": "机场"}),
+        ]
+        kaldi.Result.return_value = json.dumps({"text": "导航 到 虹桥"})
+        kaldi.FinalResult.return_value = json.dumps({"text": "机场"})
+
+        with tempfile.TemporaryDirectory() as model_dir, \
+             patch.dict('sys.modules', {'vosk': mock_vosk}):
+            stream = VoskASRBackend(model_path=model_dir).create_stream(16000, 2)
+            partials = [stream.accept(b"\x00\x00") for _ in range(4)]
+            final = stream.finish()
+
+        self.assertEqual(partials, ["导航到", "导航到虹桥", "导航到虹桥机场", None])
+        self.assertEqual(final, "导航到虹桥机场")
+
+
+class FakeEngine(ASRBackend):
+    def __init__(self, name, text="测试", confidence=None, delay=0.0, error=None):
+        super().__init__()
+        self.name = name
+        self.text = text
+        self.confidence = confidence
+        self.delay = delay
+        self.error = error
+
+    def _transcribe(self, audio):
+        threading.Event().wait(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.text, self.confidence
+
+
+class TestRecognizerRace(unittest.TestCase):
+
+    def test_first_confident_result_wins(self):
+        race = RecognizerRace(backends=[
+            FakeEngine("fast", "快", confidence=0.9, delay=0.0),
+            FakeEngine("slow", "慢", confidence=0.99, delay=0.3),
+        ], confidence_threshold=0.6)
+
+        self.assertEqual(race.recognize(make_audio()), "快")
+        self.assertEqual(race.report()["fast"]["wins"], 1)
+
+    def test_low_confidence_result_skipped(self):
+        race = RecognizerRace(backends=[
+            FakeEngine("fast", "快", confidence=0.2, delay=0.0),
+            FakeEngine("slow", "慢", confidence=0.8, delay=0.05),
+        ], confidence_threshold=0.6)
+
+        self.assertEqual(race.recognize(make_audio()), "慢")
+
+    def test_best_result_when_none_confident(self):
+        race = RecognizerRace(backends=[
+            FakeEngine("a", "甲", confidence=0.2),
+            FakeEngine("b", "乙", confidence=0.4, delay=0.05),
+        ], confidence_threshold=0.6)
+
+        result = race.transcribe(make_audio())
+
+        self.assertEqual(result.text, "乙")
+        self.assertEqual(result.confidence, 0.4)
+
+    def test_missing_confidence_treated_as_confident(self):
+        race = RecognizerRace(backends=[FakeEngine("google", "测试", confidence=None)])
+
+        self.assertEqual(race.recognize(make_audio()), "测试")
+
+    def test_all_unknown(self):
+        race = RecognizerRace(backends=[
+            FakeEngine("a", error=sr.UnknownValueError()),
+            FakeEngine("b", error=sr.UnknownValueError()),
+        ])
+
+        with self.assertRaises(sr.UnknownValueError):
+            race.recognize(make_audio())
+
+    def test_request_error_propagated_when_all_fail(self):
+        race = RecognizerRace(backends=[
+            FakeEngine("a", error=sr.UnknownValueError()),
+            FakeEngine("b", error=sr.RequestError("offline")),
+        ])
+
+        with self.assertRaises(sr.RequestError):
+            race.recognize(make_audio())
+
+    def test_failing_engine_does_not_block_winner(self):
+        race = RecognizerRace(backends=[
+            FakeEngine("broken", error=sr.RequestError("offline")),
+            FakeEngine("ok", "好", confidence=0.9, delay=0.05),
+        ])
+
+        self.assertEqual(race.recognize(make_audio()), "好")
+
+    def test_unavailable_backend_skipped(self):
+        broken = FakeEngine("broken")
+        broken._load = Mock(side_effect=ImportError("missing"))
+        race = RecognizerRace(backends=[broken, FakeEngine("ok", "好")])
+
+        self.assertEqual(race.recognize(make_audio()), "好")
+        self.assertEqual([b.name for b in race.backends], ["ok"])
+
+    def test_report_win_rate(self):
+        race = RecognizerRace(backends=[
+            FakeEngine("fast", confidence=0.9),
+            FakeEngine("slow", confidence=0.9, delay=0.05),
+        ])
+
+        for _ in range(3):
+            race.recognize(make_audio())
+        threading.Event().wait(0.2)
+
+        report = race.report()
+        self.assertEqual(report["fast"]["wins"], 3)
+        self.assertEqual(report["slow"]["wins"], 0)
+        self.assertEqual(report["fast"]["win_rate"], 1.0)
+        self.assertEqual(report["fast"]["count"], 3)
+
+
+class TestCreateASRBackend(unittest.TestCase):
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            create_asr_backend("nope")
+
+    def test_create_google(self):
+        self.assertIsInstance(create_asr_backend("google"), GoogleASRBackend)
+
+    @patch.dict('os.environ', {'ASR_BACKEND': 'vosk', 'VOSK_MODEL_PATH': '/tmp/model'})
+    def test_get_asr_backend_from_env(self):
+        with patch.object(asr_backends, '_asr_backend', None):
+            backend = get_asr_backend()
+
+            self.assertIsInstance(backend, VoskASRBackend)
+            self.assertEqual(backend.model_path, '/tmp/model')
+            self.assertIs(get_asr_backend(), backend)
+
+
+if __name__ == '__main__':
+    unittest.main()
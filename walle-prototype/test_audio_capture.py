@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Test suite for audio_capture.py
+"""
+
+import unittest
+from unittest.mock import Mock, patch
+import struct
+import threading
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import speech_recognition as sr
+import audio_capture
+from audio_capture import AudioCaptureService, set_capture_service
+from vad import EnergyEndpointer
+
+
+CHUNK = 160
+SAMPLE_RATE = 16000
+
+
+def make_frame(amplitude, samples=CHUNK):
+    return struct.pack(f"<{samples}h", *([amplitude] * samples))
+
+
+class FakeStream:
+    """按顺序返回预设帧,读完后阻塞直到被停止"""
+
+    def __init__(self, frames):
+        self.frames = list(frames)
+        self.read_count = 0
+        self.exhausted = threading.Event()
+
+    def read(self, size):
+        self.read_count += 1
+        if self.frames:
+            return self.frames.pop(0)
+        self.exhausted.set()
+        threading.Event().wait(0.01)
+        return b""
+
+
+class FakeSource(sr.AudioSource):
+    SAMPLE_RATE = SAMPLE_RATE
+    SAMPLE_WIDTH = 2
+    CHUNK = CHUNK
+
+    def __init__(self, frames):
+        self.stream = FakeStream(frames)
+        self.enter_count = 0
+        self.exit_count = 0
+
+    def __enter__(self):
+        self.enter_count += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.exit_count += 1
+
+
+class TestAudioCaptureService(unittest.TestCase):
+
+    def make_service(self, frames, **kwargs):
+        source = FakeSource(frames)
+        endpointer = EnergyEndpointer(
+            SAMPLE_RATE,
+            hangover_ms=50,
+            preroll_ms=20,
+            max_utterance_ms=kwargs.pop("max_utterance_ms", 10000),
+            min_speech_ms=20,
+        )
+        service = AudioCaptureService(source=source, endpointer=endpointer, **kwargs)
+        self.addCleanup(service.stop)
+        return service, source
+
+    def test_segments_utterance(self):
+        frames = [make_frame(0)] * 5 + [make_frame(2000)] * 10 + [make_frame(0)] * 10
+        service, _ = self.make_service(frames)
+
+        audio = service.get_utterance(timeout=2)
+
+        self.assertIsInstance(audio, sr.AudioData)
+        self.assertEqual(audio.sample_rate, SAMPLE_RATE)
+        # 2 帧 pre-roll + 10 帧语音 + 5 帧拖尾静音
+        self.assertEqual(len(audio.frame_data), 17 * CHUNK * 2)
+
+    def test_source_opened_once_for_many_utterances(self):
+        utterance = [make_frame(2000)] * 5 + [make_frame(0)] * 10
+        service, source = self.make_service(utterance * 3)
+
+        for _ in range(3):
+            service.get_utterance(timeout=2)
+
+        self.assertEqual(source.enter_count, 1)
+        service.stop()
+        self.assertEqual(source.exit_count, 1)
+
+    def test_timeout_without_speech(self):
+        service, source = self.make_service([make_frame(0)] * 5)
+
+        with self.assertRaises(sr.WaitTimeoutError):
+            service.get_utterance(timeout=0.1)
+
+    def test_max_utterance_length(self):
+        frames = [make_frame(2000)] * 50
+        service, _ = self.make_service(frames, max_utterance_ms=100)
+
+        audio = service.get_utterance(timeout=2)
+
+        self.assertEqual(len(audio.frame_data), 10 * CHUNK * 2)
+
+    def test_queue_drops_oldest_when_full(self):
+        utterance = [make_frame(2000)] * 3 + [make_frame(0)] * 10
+        service, source = self.make_service(utterance * 3, queue_size=1)
+        service.start()
+        source.stream.exhausted.wait(2)
+
+        self.assertEqual(service.dropped_utterances, 2)
+        service.get_utterance(timeout=1)
+        with self.assertRaises(sr.WaitTimeoutError):
+            service.get_utterance(timeout=0.1)
+
+    def test_stream_available_before_utterance_ends(self):
+        frames = [make_frame(0)] * 2 + [make_frame(2000)] * 10 + [make_frame(0)] * 10
+        service, _ = self.make_service(frames)
+
+        stream = service.get_utterance_stream(timeout=2)
+        received = list(stream.frames())
+
+        # 2 帧 pre-roll + 10 帧语音 + 5 帧拖尾静音
+        self.assertEqual(len(received), 17)
+        self.assertEqual(stream.wait(timeout=1).frame_data, b"".join(received))
+
+    def test_discarded_noise_skipped(self):
+        frames = [make_frame(2000)] + [make_frame(0)] * 10 + [make_frame(2000)] * 5 + [make_frame(0)] * 10
+        service, _ = self.make_service(frames)
+
+        audio = service.get_utterance(timeout=2)
+
+        self.assertEqual(len(audio.frame_data), 12 * CHUNK * 2)
+
+    def test_clear(self):
+        utterance = [make_frame(2000)] * 3 + [make_frame(0)] * 10
+        service, source = self.make_service(utterance * 2)
+        service.start()
+        source.stream.exhausted.wait(2)
+
+        service.clear()
+
+        with self.assertRaises(sr.WaitTimeoutError):
+            service.get_utterance(timeout=0.1)
+
+    def test_stop_leaves_stream_to_blocked_thread(self):
+        service, source = self.make_service([make_frame(0)] * 2 + [make_frame(2000)] * 3)
+        release = threading.Event()
+        read = source.stream.read
+
+        def blocking_read(size):
+            if not source.stream.frames:
+                release.wait(2)
+            return read(size)
+
+        source.stream.read = blocking_read
+        service.stop_timeout = 0.05
+        stream = service.get_utterance_stream(timeout=2)
+        thread = service._thread
+
+        service.stop()
+
+        # 采集线程仍阻塞在读取上,语音流不能被 stop() 关闭
+        self.assertFalse(stream.done)
+        release.set()
+        thread.join(timeout=1)
+        self.assertTrue(stream.discarded)
+
+
+class TestSetCaptureService(unittest.TestCase):
+
+    def test_swapped_service_registered_for_shutdown(self):
+        first, second = Mock(), Mock()
+        with patch.object(audio_capture, '_capture_service', None), \
+                patch.object(audio_capture.atexit, 'register') as register, \
+                patch.object(audio_capture.atexit, 'unregister') as unregister:
+            set_capture_service(first)
+            set_capture_service(second)
+            set_capture_service(second)
+
+        self.assertEqual(register.call_args_list, [((first.stop,),), ((second.stop,),)])
+        unregister.assert_called_once_with(first.stop)
+        first.stop.assert_called_once_with()
+        second.stop.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
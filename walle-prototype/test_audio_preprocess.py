@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Test suite for audio_preprocess.py
+"""
+
+import math
+import struct
+import unittest
+from unittest.mock import patch
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import speech_recognition as sr
+from audio_preprocess import AudioPreprocessor, CompactAudioData
+
+
+def make_pcm(rate, seconds, amplitude=0):
+    count = int(rate * seconds)
+    return b"".join(
+        struct.pack("<h", int(amplitude * math.sin(2 * math.pi * 440 * i / rate)))
+        for i in range(count)
+    )
+
+
+def make_utterance(rate=44100):
+    silence = make_pcm(rate, 0.5)
+    speech = make_pcm(rate, 0.5, amplitude=8000)
+    return sr.AudioData(silence + speech + silence, rate, 2)
+
+
+class TestAudioPreprocessor(unittest.TestCase):
+
+    def test_resample_trim_and_encode(self):
+        preprocessor = AudioPreprocessor(margin_ms=100)
+        audio = make_utterance()
+
+        compact = preprocessor.process(audio)
+
+        self.assertIsInstance(compact, CompactAudioData)
+        self.assertEqual(compact.sample_rate, 16000)
+        # 0.5 秒语音 + 前后各 100ms 余量 (允许一个窗口的误差)
+        duration = len(compact.frame_data) / (16000 * 2)
+        self.assertAlmostEqual(duration, 0.7, delta=0.03)
+        self.assertTrue(compact.flac_data.startswith(b"fLaC"))
+
+        report = preprocessor.report()
+        self.assertEqual(report["input_bytes"], len(audio.frame_data))
+        self.assertGreater(report["bytes_saved"], 0)
+        self.assertGreater(report["saved_ratio"], 0.8)
+        self.assertEqual(report["encode"]["count"], 1)
+
+    def test_low_rate_not_upsampled(self):
+        compact = AudioPreprocessor().process(sr.AudioData(make_pcm(8000, 0.2, 8000), 8000, 2))
+
+        self.assertEqual(compact.sample_rate, 8000)
+
+    def test_all_silence_kept(self):
+        audio = sr.AudioData(make_pcm(16000, 0.3), 16000, 2)
+
+        compact = AudioPreprocessor().process(audio)
+
+        self.assertEqual(compact.frame_data, audio.frame_data)
+
+    def test_flac_reused_for_upload(self):
+        compact = AudioPreprocessor().process(make_utterance(16000))
+
+        with patch.object(sr.AudioData, "get_flac_data") as encode:
+            self.assertIs(compact.get_flac_data(convert_rate=None, convert_width=2), compact.flac_data)
+            encode.assert_not_called()
+
+    def test_encode_failure_falls_back_to_pcm(self):
+        preprocessor = AudioPreprocessor()
+
+        with patch.object(sr.AudioData, "get_flac_data", side_effect=OSError("no flac")):
+            result = preprocessor.process(make_utterance(16000))
+
+        self.assertNotIsInstance(result, CompactAudioData)
+        self.assertEqual(result.sample_rate, 16000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Test suite for audio_replay.py
+"""
+
+import math
+import struct
+import tempfile
+import unittest
+import wave
+from unittest.mock import patch
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import speech_recognition as sr
+import audio_replay
+from asr_backends import ASRBackend
+from audio_capture import AudioCaptureService
+from audio_replay import (
+    WavReplaySource,
+    character_error_rate,
+    load_corpus,
+    replay_exhausted,
+    run_replay,
+    start_replay_input,
+)
+
+
+def write_wav(path, seconds=0.5, rate=16000, amplitude=8000):
+    silence = b"\x00\x00" * int(rate * 0.2)
+    tone = b"".join(
+        struct.pack("<h", int(amplitude * math.sin(2 * math.pi * 440 * i / rate)))
+        for i in range(int(rate * seconds))
+    )
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(silence + tone + silence)
+
+
+class ScriptedBackend(ASRBackend):
+    name = "scripted"
+
+    def __init__(self, texts):
+        super().__init__()
+        self.texts = list(texts)
+
+    def _warm_up(self, audio):
+        pass
+
+    def _recognize(self, audio):
+        return self.texts.pop(0)
+
+
+class TestLoadCorpus(unittest.TestCase):
+
+    def test_sidecar_and_index_transcripts(self):
+        with tempfile.TemporaryDirectory() as corpus:
+            root = Path(corpus)
+            write_wav(root / "a.wav")
+            write_wav(root / "b.wav")
+            write_wav(root / "c.wav")
+            (root / "a.txt").write_text("导航到虹桥机场\n", encoding="utf-8")
+            (root / "transcripts.tsv").write_text("b.wav\t播放晴天\n", encoding="utf-8")
+
+            items = load_corpus(corpus)
+
+        self.assertEqual([i.path.name for i in items], ["a.wav", "b.wav", "c.wav"])
+        self.assertEqual([i.expected for i in items], ["导航到虹桥机场", "播放晴天", None])
+
+    def test_empty_directory(self):
+        with tempfile.TemporaryDirectory() as corpus:
+            with self.assertRaises(FileNotFoundError):
+                load_corpus(corpus)
+
+
+class TestCharacterErrorRate(unittest.TestCase):
+
+    def test_ignores_punctuation(self):
+        self.assertEqual(character_error_rate("导航到虹桥机场", "导航到 虹桥机场。"), 0.0)
+
+    def test_substitution(self):
+        self.assertAlmostEqual(character_error_rate("播放晴天", "播放情天"), 0.25)
+
+    def test_missing_result(self):
+        self.assertEqual(character_error_rate("播放晴天", None), 1.0)
+
+
+class TestWavReplaySource(unittest.TestCase):
+
+    def test_reads_all_data_then_eof(self):
+        source = WavReplaySource([b"\x01\x00" * 100], speed=0, chunk_size=64, gap_ms=10)
+
+        with source:
+            chunks = []
+            with self.assertRaises(EOFError):
+                while True:
+                    chunks.append(source.stream.read(source.CHUNK))
+
+        self.assertEqual(len(b"".join(chunks)), 200 + 320)
+        self.assertIsNotNone(source.segment_end_times[0])
+
+    def test_realtime_pacing(self):
+        # 0.1 秒音频按 2 倍速回放约需 50ms
+        source = WavReplaySource([b"\x00\x00" * 1600], speed=2, gap_ms=0)
+
+        with source:
+            with self.assertRaises(EOFError):
+                while True:
+                    source.stream.read(source.CHUNK)
+            elapsed = source.segment_end_times[0] - source._started_at
+
+        self.assertGreaterEqual(elapsed, 0.045)
+
+    def test_capture_service_stops_at_end(self):
+        source = WavReplaySource([b"\x00\x00" * 1600], speed=0, gap_ms=0)
+        service = AudioCaptureService(source=source, chunk_size=source.CHUNK)
+
+        with self.assertRaises(sr.WaitTimeoutError):
+            service.get_utterance(timeout=2)
+        self.assertTrue(service.exhausted)
+
+
+class TestRunReplay(unittest.TestCase):
+
+    def test_report(self):
+        with tempfile.TemporaryDirectory() as corpus:
+            root = Path(corpus)
+            write_wav(root / "a.wav")
+            write_wav(root / "b.wav")
+            (root / "transcripts.tsv").write_text("a\t导航到虹桥机场\nb\t播放晴天\n", encoding="utf-8")
+
+            report = run_replay(corpus, speed=0, asr=ScriptedBackend(["导航到虹桥机场", "播放情天"]))
+
+        summary = report["summary"]
+        self.assertEqual(summary["files"], 2)
+        self.assertEqual(summary["recognized"], 2)
+        self.assertEqual(summary["exact_match"], 0.5)
+        self.assertAlmostEqual(summary["mean_cer"], 0.125)
+        self.assertEqual(summary["total"]["count"], 2)
+        self.assertEqual(report["results"][1]["text"], "播放情天")
+
+
+class TestReplayInput(unittest.TestCase):
+
+    def test_global_input_replaced(self):
+        with tempfile.TemporaryDirectory() as corpus:
+            write_wav(Path(corpus) / "a.wav")
+
+            with patch('audio_capture._capture_service', None), \
+                 patch.object(audio_replay, '_replay_source', None), \
+                 patch.dict('os.environ', {'REPLAY_SPEED': '0'}):
+                self.assertEqual(start_replay_input(corpus, speed=0), 1)
+                self.assertFalse(replay_exhausted())
+
+                audio = audio_replay.get_capture_service().get_utterance(timeout=2)
+                with self.assertRaises(sr.WaitTimeoutError):
+                    audio_replay.get_capture_service().get_utterance(timeout=2)
+
+                self.assertGreater(len(audio.frame_data), 16000)
+                self.assertTrue(replay_exhausted())
+
+
+if __name__ == '__main__':
+    unittest.main()
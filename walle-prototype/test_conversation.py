@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Test suite for conversation.py
+"""
+
+import json
+import time
+import unittest
+from unittest.mock import Mock, patch
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import conversation
+from conversation import SessionContext, estimate_tokens, message_tokens
+
+NAVIGATE = {"tool": "navigate", "params": {"origin": "当前位置", "destination": "虹桥机场", "map_service": "amap"}}
+WEATHER = {"tool": "get_weather", "params": {"city": "上海", "date": "明天"}}
+
+
+class TestEstimateTokens(unittest.TestCase):
+
+    @patch.object(conversation, "tiktoken", None)
+    def test_heuristic(self):
+        self.assertEqual(estimate_tokens("导航去机场"), 5)
+        self.assertEqual(estimate_tokens("abcdefgh"), 2)
+        self.assertEqual(estimate_tokens(""), 0)
+
+    @patch.object(conversation, "tiktoken", None)
+    def test_message_tokens(self):
+        self.assertEqual(message_tokens([{"role": "user", "content": "你好"}]), 2 + 4 + 2)
+
+
+class TestSessionContext(unittest.TestCase):
+
+    def setUp(self):
+        self.session = SessionContext(max_turns=2, token_budget=400)
+
+    def test_follow_up_requires_history(self):
+        self.assertFalse(self.session.is_follow_up("那换成百度地图"))
+        self.session.record("导航去虹桥机场", NAVIGATE)
+        self.assertTrue(self.session.is_follow_up("那换成百度地图"))
+        self.assertTrue(self.session.is_follow_up("明天呢"))
+        self.assertFalse(self.session.is_follow_up("查一下北京的天气"))
+
+    def test_unknown_not_recorded(self):
+        self.session.record("嗯", {"tool": "unknown", "params": {}})
+        self.assertEqual(len(self.session.turns), 0)
+
+    def test_state_tracks_last_call_and_places(self):
+        self.session.record("导航去虹桥机场顺便查天气", [NAVIGATE, WEATHER])
+        state = self.session.state()
+        self.assertEqual(state["last_tool"], "get_weather")
+        self.assertEqual(state["last_params"], WEATHER["params"])
+        self.assertEqual(state["places"], ["虹桥机场", "上海"])
+
+    def test_keeps_last_n_turns(self):
+        for i in range(4):
+            self.session.record(f"第{i}句", WEATHER)
+        self.assertEqual([t.text for t in self.session.turns], ["第2句", "第3句"])
+
+    def test_context_messages(self):
+        self.session.record("导航去虹桥机场", NAVIGATE)
+        messages = self.session.context_messages()
+        self.assertEqual([m["role"] for m in messages], ["system", "user", "assistant"])
+        self.assertIn("虹桥机场", messages[0]["content"])
+        self.assertEqual(json.loads(messages[2]["content"]), NAVIGATE)
+
+    def test_budget_drops_oldest_turns(self):
+        self.session.record("导航去虹桥机场", NAVIGATE)
+        self.session.record("查一下上海明天的天气", WEATHER)
+        full = self.session.context_messages()
+        self.assertEqual(len(full), 5)
+
+        self.session.token_budget = message_tokens(full[:1] + full[3:])
+        trimmed = self.session.context_messages()
+        self.assertEqual(trimmed, full[:1] + full[3:])
+        self.assertLessEqual(message_tokens(trimmed), self.session.token_budget)
+
+        self.session.token_budget = 1
+        self.assertEqual(self.session.context_messages(), [])
+
+    def test_expired_session_is_cleared(self):
+        self.session.ttl_seconds = 60
+        self.session.record("导航去虹桥机场", NAVIGATE)
+        self.session.turns[-1].at = time.time() - 120
+        self.assertFalse(self.session.is_follow_up("那换成百度地图"))
+        self.assertIsNone(self.session.state()["last_tool"])
+
+    def test_disabled_never_follow_up(self):
+        session = SessionContext(max_turns=0)
+        session.record("导航去虹桥机场", NAVIGATE)
+        self.assertFalse(session.is_follow_up("那换成百度地图"))
+
+    def test_record_prompt(self):
+        self.session.record("导航去虹桥机场", NAVIGATE)
+        context = self.session.context_messages()
+        messages = [{"role": "system", "content": "提示"}] + context + [{"role": "user", "content": "那换成百度地图"}]
+        self.session.record_prompt(messages, len(context), Mock(prompt_tokens=120))
+        self.session.record_prompt(messages[:1] + messages[-1:], 0)
+
+        self.assertEqual(self.session.prompt_stats.summary()["count"], 2)
+        self.assertEqual(self.session.follow_ups, 1)
+        self.assertEqual(self.session.usage_stats.samples(), [120])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Test suite for deadline.py
+"""
+
+import unittest
+from unittest.mock import Mock, patch
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import requests
+
+import deadline
+from deadline import (
+    Deadline, DeadlineExceeded, create_request_deadline, current_deadline,
+    deadline_scope, deadline_stage, finish_deadline, restart_deadline, stage_timeout,
+)
+from mcp_servers_simple import navigation_tools_api
+from mcp_servers_simple.navigation_tools_api import AmapAPI, MapAPITimeout, clear_geocode_cache, navigate_with_api
+from tool_executor import ParallelToolExecutor
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestDeadline(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.deadline = Deadline(10, {"asr": 2, "llm": 3}, clock=self.clock)
+
+    def test_remaining_and_restart(self):
+        self.clock.now += 4
+        self.assertEqual(self.deadline.remaining(), 6)
+        self.deadline.restart()
+        self.assertEqual(self.deadline.remaining(), 10)
+        self.clock.now += 11
+        self.assertTrue(self.deadline.expired)
+        self.assertEqual(self.deadline.remaining(), 0)
+
+    def test_stage_budget(self):
+        self.assertEqual(self.deadline.timeout("llm"), 3)
+        with self.deadline.stage("llm"):
+            self.clock.now += 1
+            self.assertEqual(self.deadline.timeout("llm"), 2)
+            self.assertEqual(self.deadline.timeout("llm", cap=0.5), 0.5)
+        self.assertEqual(self.deadline.stage_elapsed["llm"], 1)
+        self.assertEqual(self.deadline.timeout("tool"), 9)
+
+    def test_total_budget_caps_stage(self):
+        self.clock.now += 9
+        self.assertEqual(self.deadline.timeout("llm"), 1)
+
+    def test_check(self):
+        self.deadline.check("llm")
+        with self.deadline.stage("llm"):
+            self.clock.now += 3
+            with self.assertRaises(DeadlineExceeded):
+                self.deadline.check("llm")
+
+
+class TestDeadlineScope(unittest.TestCase):
+
+    def test_no_deadline(self):
+        self.assertIsNone(current_deadline())
+        self.assertIsNone(stage_timeout("llm"))
+        self.assertEqual(stage_timeout("tool", 5), 5)
+        with deadline_stage("llm") as current:
+            self.assertIsNone(current)
+        restart_deadline()
+        finish_deadline()
+
+    def test_scope_sets_and_resets(self):
+        with deadline_scope(Deadline(10, {"llm": 3})) as current:
+            self.assertIs(current_deadline(), current)
+            self.assertLessEqual(stage_timeout("llm"), 3)
+            self.assertLessEqual(stage_timeout("tool", 5), 5)
+        self.assertIsNone(current_deadline())
+
+    def test_finish_records_overrun(self):
+        clock = FakeClock()
+        before = deadline.overruns["count"]
+        with deadline_scope(Deadline(10, clock=clock)):
+            clock.now += 12
+            finish_deadline()
+        self.assertEqual(deadline.overruns["count"], before + 1)
+
+    def test_propagates_to_tool_threads(self):
+        seen = []
+        executor = ParallelToolExecutor(lambda tool, **params: seen.append(current_deadline()))
+        with deadline_scope(Deadline(10)) as current:
+            executor.run([{"tool": "a", "params": {}}, {"tool": "b", "params": {}}])
+        self.assertEqual(seen, [current, current])
+
+    @patch.dict('os.environ', {'DEADLINE_SECONDS': '8', 'DEADLINE_LLM_SECONDS': '2.5'})
+    def test_create_from_env(self):
+        created = create_request_deadline()
+        self.assertEqual(created.budget_seconds, 8)
+        self.assertEqual(created.stage_budgets, {"asr": 2, "llm": 2.5})
+
+    @patch.dict('os.environ', {'DEADLINE_SECONDS': '0'})
+    def test_disabled(self):
+        self.assertIsNone(create_request_deadline())
+
+
+class TestMapAPIDeadline(unittest.TestCase):
+
+    def setUp(self):
+        clear_geocode_cache()
+
+    def test_request_timeout_uses_remaining_budget(self):
+        response = Mock()
+        response.json.return_value = {"status": "1", "geocodes": [{"location": "121,31"}]}
+        with patch.object(navigation_tools_api.requests, 'get', return_value=response) as mock_get:
+            with deadline_scope(Deadline(2)):
+                AmapAPI("key").geocode("虹桥机场")
+        self.assertLessEqual(mock_get.call_args.kwargs["timeout"], 2)
+
+    def test_no_budget_left(self):
+        with patch.object(navigation_tools_api.requests, 'get') as mock_get:
+            with deadline_scope(Deadline(0.1)), self.assertRaises(MapAPITimeout):
+                AmapAPI("key").geocode("虹桥机场")
+        mock_get.assert_not_called()
+
+    def test_timeout_falls_back_to_browser(self):
+        with patch.object(navigation_tools_api.requests, 'get', side_effect=requests.Timeout("slow")), \
+                patch('mcp_servers_simple.navigation_tools.webbrowser.open') as mock_open:
+            result = navigate_with_api("上海", "北京", api_key="key", use_api=True)
+        self.assertIn("路线规划超时", result)
+        mock_open.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
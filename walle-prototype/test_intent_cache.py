@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Test suite for intent_cache.py
+"""
+
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from intent_cache import IntentCache, create_intent_cache, normalize_utterance, tool_fingerprint
+
+NAV = {"tool": "navigate", "params": {"origin": "当前位置", "destination": "家"}}
+MUSIC = {"tool": "play_music", "params": {"song": "晴天"}}
+
+
+def make_client(tools):
+    client = Mock()
+    client.list_tools.return_value = list(tools)
+    client.get_tool_info.side_effect = lambda name: tools[name]
+    return client
+
+
+class TestNormalize(unittest.TestCase):
+
+    def test_punctuation_space_and_case(self):
+        self.assertEqual(normalize_utterance(" 播放 Jay 的晴天。"), normalize_utterance("播放jay的晴天"))
+
+
+class TestIntentCache(unittest.TestCase):
+
+    def test_hit_and_miss(self):
+        cache = IntentCache()
+
+        self.assertIsNone(cache.get("导航回家"))
+        cache.put("导航回家", NAV)
+
+        self.assertEqual(cache.get("导航回家。"), NAV)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+        self.assertEqual(cache.stats()["hit_rate"], 0.5)
+
+    def test_returns_copy(self):
+        cache = IntentCache()
+        cache.put("导航回家", NAV)
+
+        cache.get("导航回家")["params"]["destination"] = "公司"
+
+        self.assertEqual(cache.get("导航回家")["params"]["destination"], "家")
+
+    def test_unknown_not_cached(self):
+        cache = IntentCache()
+
+        cache.put("随便说说", {"tool": "unknown", "params": {}})
+        cache.put("坏结果", ["not", "a", "dict"])
+
+        self.assertEqual(len(cache), 0)
+
+    def test_multiple_calls_cached(self):
+        cache = IntentCache()
+        calls = [NAV, {"tool": "get_weather", "params": {"city": "上海", "date": "明天"}}]
+
+        cache.put("导航回家顺便查下上海明天的天气", calls)
+        cache.put("回家然后随便说说", [NAV, {"tool": "unknown", "params": {}}])
+
+        self.assertEqual(cache.get("导航回家顺便查下上海明天的天气"), calls)
+        self.assertEqual(len(cache), 1)
+
+    def test_lru_eviction(self):
+        cache = IntentCache(max_size=2)
+        cache.put("导航回家", NAV)
+        cache.put("播放晴天", MUSIC)
+        cache.get("导航回家")
+
+        cache.put("查询天气", {"tool": "get_weather", "params": {"city": "上海"}})
+
+        self.assertIsNotNone(cache.get("导航回家"))
+        self.assertIsNone(cache.get("播放晴天"))
+
+    def test_ttl_expiry(self):
+        cache = IntentCache(ttl_seconds=60)
+        with patch("intent_cache.time.time", return_value=1000.0):
+            cache.put("导航回家", NAV)
+        with patch("intent_cache.time.time", return_value=1061.0):
+            self.assertIsNone(cache.get("导航回家"))
+        self.assertEqual(len(cache), 0)
+
+    def test_fingerprint_change_invalidates(self):
+        cache = IntentCache(fingerprint="a")
+        cache.put("导航回家", NAV)
+
+        cache.set_fingerprint("a")
+        self.assertIsNotNone(cache.get("导航回家"))
+
+        cache.set_fingerprint("b")
+        self.assertIsNone(cache.get("导航回家"))
+
+
+class TestDiskStore(unittest.TestCase):
+
+    def test_survives_restart(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = str(Path(tmp) / "intents.sqlite3")
+            IntentCache(path=path, fingerprint="v1").put("导航回家", NAV)
+
+            self.assertEqual(IntentCache(path=path, fingerprint="v1").get("导航回家"), NAV)
+
+    def test_other_fingerprint_dropped_on_load(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = str(Path(tmp) / "intents.sqlite3")
+            IntentCache(path=path, fingerprint="v1").put("导航回家", NAV)
+
+            self.assertIsNone(IntentCache(path=path, fingerprint="v2").get("导航回家"))
+            self.assertIsNone(IntentCache(path=path, fingerprint="v1").get("导航回家"))
+
+    def test_expired_rows_not_loaded(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = str(Path(tmp) / "intents.sqlite3")
+            with patch("intent_cache.time.time", return_value=1000.0):
+                IntentCache(path=path).put("导航回家", NAV)
+
+            self.assertEqual(len(IntentCache(path=path, ttl_seconds=60)), 0)
+
+    def test_invalidate_clears_disk(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = str(Path(tmp) / "intents.sqlite3")
+            cache = IntentCache(path=path)
+            cache.put("导航回家", NAV)
+
+            cache.invalidate()
+
+            self.assertEqual(len(IntentCache(path=path)), 0)
+
+
+class TestToolFingerprint(unittest.TestCase):
+
+    def test_changes_with_tools_and_prompt(self):
+        base = tool_fingerprint(make_client({"navigate": "导航", "get_weather": "天气"}), "prompt")
+
+        self.assertEqual(base, tool_fingerprint(make_client({"get_weather": "天气", "navigate": "导航"}), "prompt"))
+        self.assertNotEqual(base, tool_fingerprint(make_client({"navigate": "导航"}), "prompt"))
+        self.assertNotEqual(base, tool_fingerprint(make_client({"navigate": "导航v2", "get_weather": "天气"}), "prompt"))
+        self.assertNotEqual(base, tool_fingerprint(make_client({"navigate": "导航", "get_weather": "天气"}), "new"))
+
+
+class TestCreateIntentCache(unittest.TestCase):
+
+    @patch.dict('os.environ', {'INTENT_CACHE': '0'})
+    def test_disabled(self):
+        self.assertIsNone(create_intent_cache())
+
+    @patch.dict('os.environ', {'INTENT_CACHE': '1', 'INTENT_CACHE_SIZE': '3', 'INTENT_CACHE_PATH': ''})
+    def test_from_env(self):
+        cache = create_intent_cache("fp")
+
+        self.assertEqual(cache.max_size, 3)
+        self.assertEqual(cache.fingerprint, "fp")
+
+
+if __name__ == '__main__':
+    unittest.main()
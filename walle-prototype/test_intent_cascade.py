@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Test suite for intent_cascade.py
+"""
+
+import json
+import unittest
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from deadline import DeadlineExceeded
+from intent_cascade import ModelCascade, create_model_cascade
+from llm_gateway import LLMGateway, LLMProvider
+from tool_schema import function_schema
+
+
+def navigate(origin: str, destination: str, map_service: str = "amap") -> str:
+    """
+    导航
+
+    Args:
+        origin: 起点
+        destination: 终点
+        map_service: 地图服务
+    """
+
+
+def get_weather(city: str, date: str = "today") -> str:
+    """
+    查询天气
+
+    Args:
+        city: 城市
+        date: 日期
+    """
+
+
+SCHEMAS = [function_schema("navigate", navigate), function_schema("get_weather", get_weather)]
+
+
+def _client(*contents):
+    client = Mock()
+    client.chat.completions.create.side_effect = [
+        SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+        for content in contents
+    ]
+    return client
+
+
+class TestJudge(unittest.TestCase):
+
+    def setUp(self):
+        self.cascade = ModelCascade(Mock(), "small", SCHEMAS, min_confidence=0.8)
+
+    def test_accept(self):
+        intent, reason, confidence = self.cascade.judge(
+            {"tool": "navigate", "params": {"origin": "上海", "destination": "北京"}, "confidence": 0.92}
+        )
+        self.assertIsNone(reason)
+        self.assertEqual(intent, {"tool": "navigate", "params": {"origin": "上海", "destination": "北京"}})
+        self.assertEqual(confidence, 0.92)
+
+    def test_escalation_reasons(self):
+        cases = [
+            ({"tool": "navigate", "params": {"origin": "上海", "destination": "北京"}, "confidence": 0.5}, "low_confidence"),
+            ({"tool": "navigate", "params": {"origin": "上海", "destination": "北京"}}, "low_confidence"),
+            ({"tool": "navigate", "params": {"origin": "上海", "destination": " "}, "confidence": 0.9}, "missing_params"),
+            ({"tool": "unknown", "params": {}, "confidence": 0}, "unknown"),
+            ({"tool": "order_food", "params": {}, "confidence": 0.9}, "unknown_tool"),
+            (["navigate"], "invalid"),
+        ]
+        for result, expected in cases:
+            self.assertEqual(self.cascade.judge(result)[1], expected, result)
+
+    def test_multiple_calls(self):
+        intent, reason, _ = self.cascade.judge({"calls": [
+            {"tool": "navigate", "params": {"origin": "当前位置", "destination": "虹桥机场"}},
+            {"tool": "get_weather", "params": {"city": "上海"}},
+        ], "confidence": 0.85})
+        self.assertIsNone(reason)
+        self.assertEqual([c["tool"] for c in intent], ["navigate", "get_weather"])
+
+
+class TestClassify(unittest.TestCase):
+
+    def test_accept_and_escalate(self):
+        client = _client(
+            json.dumps({"tool": "get_weather", "params": {"city": "上海"}, "confidence": 0.9}),
+            json.dumps({"tool": "get_weather", "params": {"city": "上海"}, "confidence": 0.6}),
+            "不是 JSON",
+        )
+        cascade = ModelCascade(client, "small", SCHEMAS, min_confidence=0.8, timeout=0.5)
+        self.assertEqual(cascade.classify("上海天气"), {"tool": "get_weather", "params": {"city": "上海"}})
+        self.assertIsNone(cascade.classify("上海天气"))
+        self.assertIsNone(cascade.classify("上海天气"))
+
+        kwargs = client.chat.completions.create.call_args.kwargs
+        self.assertEqual(kwargs["model"], "small")
+        self.assertEqual(kwargs["timeout"], 0.5)
+        self.assertEqual(cascade.stats["accepted"], 1)
+        self.assertEqual(cascade.stats["low_confidence"], 1)
+        self.assertEqual(cascade.stats["invalid"], 1)
+        self.assertAlmostEqual(cascade.escalation_rate(), 2 / 3)
+        self.assertAlmostEqual(cascade.escalation_at(0.5), 1 / 3)
+        self.assertAlmostEqual(cascade.escalation_at(0.95), 1.0)
+
+    def test_gateway_keeps_small_model(self):
+        provider = LLMProvider("openai", api_key="k", base_url="https://a.test.com/v1", model="gpt-4o")
+        gateway = LLMGateway(providers=[provider])
+        content = json.dumps({"tool": "get_weather", "params": {"city": "上海"}, "confidence": 0.9})
+        response = SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+        # 小模型请求带超时,走不重试的客户端
+        with patch.object(provider.budget_client.chat.completions, 'create', return_value=response) as budgeted, \
+                patch.object(provider.client.chat.completions, 'create', return_value=response) as create:
+            ModelCascade(gateway, "gpt-4o-mini", SCHEMAS).classify("上海天气")
+            gateway.create(model="ignored", messages=[])
+
+        self.assertEqual(budgeted.call_args.kwargs["model"], "gpt-4o-mini")
+        self.assertNotIn("keep_model", budgeted.call_args.kwargs)
+        self.assertEqual(create.call_args.kwargs["model"], "gpt-4o")
+
+    def test_error_escalates(self):
+        client = Mock()
+        client.chat.completions.create.side_effect = RuntimeError("boom")
+        cascade = ModelCascade(client, "small", SCHEMAS)
+        self.assertIsNone(cascade.classify("上海天气"))
+        self.assertEqual(cascade.stats["error"], 1)
+
+    def test_deadline_propagates(self):
+        client = Mock()
+        client.chat.completions.create.side_effect = DeadlineExceeded("llm")
+        with self.assertRaises(DeadlineExceeded):
+            ModelCascade(client, "small", SCHEMAS).classify("上海天气")
+
+    def test_create_from_env(self):
+        with patch.dict('os.environ', {'LLM_CASCADE_MODEL': ''}):
+            self.assertIsNone(create_model_cascade(Mock(), SCHEMAS))
+        with patch.dict('os.environ', {'LLM_CASCADE_MODEL': 'gpt-4o-mini', 'LLM_CASCADE_MIN_CONFIDENCE': '0.7'}):
+            cascade = create_model_cascade(Mock(), SCHEMAS)
+        self.assertEqual((cascade.model, cascade.min_confidence), ("gpt-4o-mini", 0.7))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Test suite for intent_eval.py
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from intent_eval import EvalCase, RateLimiter, evaluate, format_report, load_corpus, resolve_target, summarize
+
+NAV = {"tool": "navigate", "params": {"origin": "当前位置", "destination": "外滩", "map_service": "amap"}}
+WEATHER = {"tool": "get_weather", "params": {"city": "上海", "date": "明天"}}
+
+ANSWERS = {
+    "去外滩怎么走": NAV,
+    "上海明天天气": {"tool": "get_weather", "params": {"city": "北京", "date": "明天"}},
+    "导航去外滩顺便查天气": [WEATHER, NAV],
+    "讲个笑话": {"tool": "unknown", "params": {}},
+}
+
+
+def fake_understand(text):
+    if text == "坏掉了":
+        raise RuntimeError("boom")
+    return ANSWERS.get(text)
+
+
+class TestLoadCorpus(unittest.TestCase):
+
+    def test_formats(self):
+        lines = [
+            "# 注释",
+            json.dumps({"text": "去外滩怎么走", "tool": "navigate", "params": {"destination": "外滩"}}, ensure_ascii=False),
+            json.dumps({"text": "讲个笑话", "tool": "unknown"}, ensure_ascii=False),
+            json.dumps({"text": "导航顺便查天气", "calls": [NAV, WEATHER]}, ensure_ascii=False),
+        ]
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False, encoding="utf-8") as f:
+            f.write("\n".join(lines))
+        try:
+            cases = load_corpus(f.name)
+        finally:
+            os.unlink(f.name)
+
+        self.assertEqual(len(cases), 3)
+        self.assertEqual(cases[0].label, "navigate")
+        self.assertEqual(cases[1].calls, [])
+        self.assertEqual(cases[1].label, "unknown")
+        self.assertEqual(cases[2].label, "get_weather+navigate")
+
+    def test_bundled_corpus_loads(self):
+        cases = load_corpus(str(Path(__file__).parent / "intent_eval_corpus.jsonl"))
+        self.assertGreater(len(cases), 10)
+
+
+class TestEvaluate(unittest.TestCase):
+
+    def setUp(self):
+        self.cases = [
+            EvalCase("去外滩怎么走", [{"tool": "navigate", "params": {"destination": "外滩"}}]),
+            EvalCase("上海明天天气", [{"tool": "get_weather", "params": {"city": "上海"}}]),
+            EvalCase("导航去外滩顺便查天气", [{"tool": "navigate", "params": {}}, {"tool": "get_weather", "params": {}}]),
+            EvalCase("讲个笑话", []),
+            EvalCase("播放晴天", [{"tool": "play_music", "params": {"song": "晴天"}}]),
+            EvalCase("坏掉了", [{"tool": "navigate", "params": {}}]),
+        ]
+
+    def test_scoring(self):
+        results = evaluate(self.cases, fake_understand, concurrency=3)
+        self.assertEqual([r.case.text for r in results], [c.text for c in self.cases])
+        self.assertEqual([r.tool_correct for r in results], [True, True, True, True, False, False])
+        self.assertEqual([r.params_correct for r in results], [True, False, True, True, False, False])
+        self.assertEqual(results[5].error, "boom")
+
+    def test_summary_and_confusion(self):
+        summary = summarize(evaluate(self.cases, fake_understand))
+        self.assertEqual(summary["total"], 6)
+        self.assertAlmostEqual(summary["tool_accuracy"], 4 / 6)
+        self.assertAlmostEqual(summary["params_accuracy"], 3 / 6)
+        self.assertEqual(summary["errors"], 1)
+        self.assertEqual(summary["confusion"]["play_music"], {"unknown": 1})
+        self.assertEqual(summary["confusion"]["navigate"], {"navigate": 1, "error": 1})
+        self.assertEqual(summary["per_tool"]["get_weather"]["params_accuracy"], 0.0)
+        self.assertEqual(summary["per_tool"]["navigate"]["latency"]["count"], 2)
+
+        report = format_report(summary)
+        self.assertIn("工具准确率 66.7%", report)
+        self.assertIn("混淆矩阵", report)
+
+    def test_bounded_concurrency(self):
+        active, peak = [0], [0]
+        lock = threading.Lock()
+
+        def slow(text):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+            return None
+
+        evaluate([EvalCase(str(i), []) for i in range(8)], slow, concurrency=2)
+        self.assertEqual(peak[0], 2)
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_limits_rate(self):
+        limiter = RateLimiter(rate=50, burst=1)
+        started = time.monotonic()
+        for _ in range(6):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+
+    def test_unlimited(self):
+        limiter = RateLimiter(rate=0)
+        started = time.monotonic()
+        for _ in range(100):
+            limiter.acquire()
+        self.assertLess(time.monotonic() - started, 0.05)
+
+
+class TestResolveTarget(unittest.TestCase):
+
+    def test_named_and_module_targets(self):
+        from intent_rules import match_intent
+        self.assertIs(resolve_target("rules"), match_intent)
+        self.assertIs(resolve_target("intent_rules:match_intent"), match_intent)
+        with self.assertRaises(ValueError):
+            resolve_target("nope")
+
+
+if __name__ == '__main__':
+    unittest.main()
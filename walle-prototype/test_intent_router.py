@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Test suite for intent_router.py
+"""
+
+import json
+import tempfile
+import unittest
+from unittest.mock import patch
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import intent_router
+from intent_router import (
+    DEFAULT_EXAMPLES_PATH,
+    IntentExample,
+    IntentRouter,
+    build_index,
+    build_template,
+    embed,
+    load_examples,
+    route_intent,
+)
+
+
+@unittest.skipIf(intent_router.np is None, "需要 numpy")
+class TestEmbedding(unittest.TestCase):
+
+    def test_normalized_and_stable(self):
+        vectors = embed(["导航到虹桥机场", "导航到虹桥机场。", "播放晴天"])
+        self.assertAlmostEqual(float((vectors[0] ** 2).sum()), 1.0, places=5)
+        self.assertAlmostEqual(float(vectors[0] @ vectors[1]), 1.0, places=5)
+        self.assertLess(float(vectors[0] @ vectors[2]), 0.3)
+
+
+class TestBuildTemplate(unittest.TestCase):
+
+    def test_slots_and_constants(self):
+        pattern, constants = build_template("导航到虹桥机场", {"origin": "当前位置", "destination": "虹桥机场"})
+        self.assertEqual(constants, {"origin": "当前位置"})
+        self.assertEqual(pattern.match("导航到南京西路").groupdict(), {"destination": "南京西路"})
+        self.assertIsNone(pattern.match("带我去南京西路"))
+
+    def test_adjacent_slots_use_vocabulary(self):
+        pattern, _ = build_template(
+            "上海明天会下雨吗", {"city": "上海", "date": "明天"}, {"date": ["明天", "大后天", "后天"]},
+        )
+        self.assertEqual(pattern.match("北京大后天会下雨吗").groupdict(), {"city": "北京", "date": "大后天"})
+
+    def test_no_slots_in_text(self):
+        pattern, constants = build_template("回家", {"destination": "家里"})
+        self.assertIsNone(pattern)
+        self.assertEqual(constants, {"destination": "家里"})
+
+
+@unittest.skipIf(intent_router.np is None, "需要 numpy")
+class TestIntentRouter(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.router = IntentRouter.from_examples(DEFAULT_EXAMPLES_PATH)
+
+    def assertRoute(self, text, tool, params):
+        result = self.router.route(text)
+        self.assertIsNotNone(result, text)
+        self.assertEqual((result.tool, result.params), (tool, params), text)
+
+    def test_routes_paraphrases(self):
+        self.assertRoute("带我去陆家嘴", "navigate", {"origin": "当前位置", "destination": "陆家嘴"})
+        self.assertRoute("附近有没有药店", "search_location", {"query": "药店"})
+        self.assertRoute("上海明天会下雨吗", "get_weather", {"city": "上海", "date": "明天"})
+        self.assertRoute("北京和天津哪个更热", "compare_weather", {"city1": "北京", "city2": "天津"})
+        self.assertRoute("我想听周杰伦的稻香", "play_music", {"song": "稻香", "artist": "周杰伦"})
+        self.assertRoute("推荐一些摇滚歌单", "search_playlist", {"keyword": "摇滚"})
+
+    def test_unrelated_falls_back(self):
+        for text in ["给我讲个笑话", "今天天气怎么样", "打开空调", ""]:
+            self.assertIsNone(self.router.route(text), text)
+
+    def test_wrong_shape_template_rejected(self):
+        # "播放七里香" 的模板会把 "周杰伦的稻香" 整个当成歌名
+        self.assertIsNone(self.router.route("播放周杰伦的稻香"))
+        self.assertIsNone(self.router.route("播放周杰伦的七里香"))
+        self.assertRoute("播放稻香", "play_music", {"song": "稻香", "artist": ""})
+
+    def test_compound_commands_not_routed(self):
+        for text in [
+            "播放七里香然后导航回家",
+            "送我到静安寺再查下天气",
+            "导航到机场然后播放音乐",
+            "带我去浦东机场顺便放一首周杰伦的晴天",
+        ]:
+            self.assertIsNone(self.router.route(text), text)
+
+    def test_prefers_template_binding_most_slots(self):
+        router = IntentRouter([
+            IntentExample("播放七里香", "play_music", {"song": "七里香", "artist": ""}),
+            IntentExample("播放王菲的红豆", "play_music", {"song": "红豆", "artist": "王菲"}),
+        ], min_similarity=0.0)
+        result = router.route("播放周杰伦的稻香")
+        self.assertEqual(result.params, {"song": "稻香", "artist": "周杰伦"})
+        self.assertEqual(result.example, "播放王菲的红豆")
+
+    def test_min_similarity(self):
+        strict = IntentRouter(self.router.examples, vectors=self.router.vectors, min_similarity=0.99)
+        self.assertIsNone(strict.route("带我去陆家嘴"))
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = str(Path(tmp) / "index.npz")
+            self.router.save(path)
+            loaded = IntentRouter.load(path)
+
+        self.assertEqual(len(loaded.examples), len(self.router.examples))
+        self.assertEqual(loaded.source_digest, self.router.source_digest)
+        self.assertEqual(loaded.route("带我去陆家嘴").params["destination"], "陆家嘴")
+
+
+@unittest.skipIf(intent_router.np is None, "需要 numpy")
+class TestIndexBuilder(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.examples = Path(self.tmp.name) / "examples.jsonl"
+        self.index = str(Path(self.tmp.name) / "index.npz")
+        self._write([{"text": "播放七里香", "tool": "play_music", "params": {"song": "七里香", "artist": ""}}])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, rows):
+        lines = ["# 示例"] + [json.dumps(r, ensure_ascii=False) for r in rows]
+        self.examples.write_text("\n".join(lines), encoding="utf-8")
+
+    def test_load_examples(self):
+        self.assertEqual(load_examples(str(self.examples)), [
+            IntentExample("播放七里香", "play_music", {"song": "七里香", "artist": ""}),
+        ])
+
+    def test_bad_example_line(self):
+        self.examples.write_text('{"text": "缺少工具"}', encoding="utf-8")
+        with self.assertRaises(ValueError):
+            load_examples(str(self.examples))
+
+    def test_rebuilds_when_examples_change(self):
+        build_index(str(self.examples), self.index)
+        self._write([{"text": "搜索周杰伦歌单", "tool": "search_playlist", "params": {"keyword": "周杰伦"}}])
+
+        router = intent_router._load_or_build(str(self.examples), self.index)
+
+        self.assertEqual(router.examples[0].tool, "search_playlist")
+        self.assertEqual(IntentRouter.load(self.index).examples[0].tool, "search_playlist")
+
+    def test_route_intent_from_env(self):
+        env = {"INTENT_ROUTER": "1", "INTENT_EXAMPLES_PATH": str(self.examples), "INTENT_ROUTER_INDEX": self.index}
+        with patch.dict('os.environ', env), patch.object(intent_router, '_router', None):
+            self.assertEqual(route_intent("播放稻香"), {"tool": "play_music", "params": {"song": "稻香", "artist": ""}})
+
+
+class TestRouteIntentDisabled(unittest.TestCase):
+
+    @patch.dict('os.environ', {'INTENT_ROUTER': '0'})
+    def test_disabled(self):
+        self.assertIsNone(route_intent("带我去陆家嘴"))
+
+
+if __name__ == '__main__':
+    unittest.main()
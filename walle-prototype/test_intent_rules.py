@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test suite for intent_rules.py
+"""
+
+import unittest
+from unittest.mock import patch
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import intent_rules
+from intent_rules import IntentRuleEngine, match_intent
+
+
+class TestIntentRuleEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = IntentRuleEngine()
+
+    def assertIntent(self, text, tool, params):
+        result = self.engine.match(text)
+        self.assertIsNotNone(result, text)
+        self.assertEqual(result.tool, tool, text)
+        self.assertEqual(result.params, params, text)
+
+    def test_navigation(self):
+        self.assertIntent("从上海到北京", "navigate", {"origin": "上海", "destination": "北京"})
+        self.assertIntent("导航到虹桥机场。", "navigate", {"origin": "当前位置", "destination": "虹桥机场"})
+        self.assertIntent("请帮我导航到公司吧", "navigate", {"origin": "当前位置", "destination": "公司"})
+        self.assertIntent("去外滩怎么走", "navigate", {"origin": "当前位置", "destination": "外滩"})
+        self.assertIntent("导航回家", "navigate", {"origin": "当前位置", "destination": "家"})
+
+    def test_weather(self):
+        self.assertIntent("上海天气怎么样", "get_weather", {"city": "上海", "date": "today"})
+        self.assertIntent("上海明天天气怎么样", "get_weather", {"city": "上海", "date": "明天"})
+        self.assertIntent("明天北京天气", "get_weather", {"city": "北京", "date": "明天"})
+        self.assertIntent("上海和北京天气对比", "compare_weather", {"city1": "上海", "city2": "北京"})
+
+    def test_music(self):
+        self.assertIntent("播放周杰伦的晴天", "play_music", {"song": "晴天", "artist": "周杰伦"})
+        self.assertIntent("我想来一首七里香", "play_music", {"song": "七里香", "artist": ""})
+        self.assertIntent("搜索周杰伦歌单", "search_playlist", {"keyword": "周杰伦"})
+
+    def test_location(self):
+        self.assertIntent("搜索附近的咖啡店", "search_location", {"query": "咖啡店"})
+
+    def test_falls_back_to_llm(self):
+        for text in ["今天天气怎么样", "导航到机场然后播放音乐", "帮我讲个笑话", "听一首歌", "",
+                     "放大地图", "放弃", "听不清", "听说明天下雨", "我想听听周杰伦", "我想去看电影",
+                     "搜索一下天气", "从明天到后天上海天气怎么样", "播放下一首", "播放暂停", "播放列表",
+                     "我和你天气"]:
+            self.assertIsNone(self.engine.match(text), text)
+
+    def test_loose_forms_only_on_fallback(self):
+        for text, tool, params in [
+            ("我要去人民广场", "navigate", {"origin": "当前位置", "destination": "人民广场"}),
+            ("我想听七里香", "play_music", {"song": "七里香", "artist": ""}),
+            ("我想听听周杰伦的稻香", "play_music", {"song": "稻香", "artist": "周杰伦"}),
+        ]:
+            self.assertIsNone(self.engine.match(text), text)
+            result = self.engine.match(text, min_confidence=0.0)
+            self.assertEqual((result.tool, result.params), (tool, params), text)
+
+    def test_low_confidence_rule_skipped(self):
+        self.assertIsNone(self.engine.match("人民广场在哪里"))
+        self.assertIsNotNone(IntentRuleEngine(min_confidence=0.8).match("人民广场在哪里"))
+        self.assertIsNotNone(self.engine.match("人民广场在哪里", min_confidence=0.0))
+
+    def test_coverage(self):
+        for text in ["导航回家", "播放晴天", "帮我讲个笑话", "导航回家"]:
+            self.engine.match(text)
+
+        # 降级和预取的查询不计入覆盖率
+        self.engine.match("播放晴天", min_confidence=0.0, record=False)
+
+        coverage = self.engine.coverage()
+        self.assertEqual(coverage["total"], 4)
+        self.assertEqual(coverage["matched"], 3)
+        self.assertEqual(coverage["coverage"], 0.75)
+        self.assertEqual(coverage["by_rule"]["nav_home"], 2)
+
+
+class TestMatchIntent(unittest.TestCase):
+
+    def test_returns_intent_dict(self):
+        with patch.object(intent_rules, '_engine', None):
+            self.assertEqual(
+                match_intent("播放晴天"),
+                {"tool": "play_music", "params": {"song": "晴天", "artist": ""}},
+            )
+
+    @patch.dict('os.environ', {'INTENT_RULES': '0'})
+    def test_disabled(self):
+        self.assertIsNone(match_intent("导航回家"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Test suite for llm_accounting.py
+"""
+
+import json
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from llm_accounting import CallRecord, LLMAccountant, create_llm_accountant, load_records, parse_prices
+from llm_gateway import LLMGateway, LLMProvider
+
+MESSAGES = [{"role": "user", "content": "导航去虹桥机场"}]
+
+
+def _response(content="{}", usage=(120, 8)):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content, tool_calls=None))],
+        usage=SimpleNamespace(prompt_tokens=usage[0], completion_tokens=usage[1]) if usage else None,
+    )
+
+
+def _chunk(content=None, usage=None):
+    choices = [SimpleNamespace(delta=SimpleNamespace(content=content, tool_calls=None))] if content else []
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+class FakeStream:
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.closed = False
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def close(self):
+        self.closed = True
+
+
+class TestLLMAccountant(unittest.TestCase):
+
+    def setUp(self):
+        self.accountant = LLMAccountant(prices={"m": (1.0, 2.0)}, llm_budget_ms=3000)
+
+    def test_usage_and_cost(self):
+        self.accountant.track("openai", {"model": "m", "messages": MESSAGES}, time.perf_counter(), _response())
+        group = self.accountant.summary()["openai/m"]
+        self.assertEqual((group["prompt_tokens"], group["completion_tokens"]), (120, 8))
+        self.assertAlmostEqual(group["cost"], (120 * 1.0 + 8 * 2.0) / 1_000_000)
+        self.assertEqual(group["ttft"]["count"], 1)
+        self.assertIn("占 AI 预算", self.accountant.format_report()[0])
+
+    def test_estimates_without_usage(self):
+        self.accountant.track("default", {"model": "m", "messages": MESSAGES}, time.perf_counter(),
+                              _response('{"tool": "navigate"}', usage=None))
+        group = self.accountant.summary()["default/m"]
+        self.assertEqual(group["estimated"], 1)
+        self.assertGreater(group["prompt_tokens"], 0)
+        self.assertGreater(group["completion_tokens"], 0)
+
+    def test_failure(self):
+        self.accountant.track("default", {"model": "m", "messages": MESSAGES}, time.perf_counter(), failed=True)
+        group = self.accountant.summary()["default/m"]
+        self.assertEqual((group["calls"], group["errors"], group["cost"]), (1, 1, 0.0))
+        self.assertEqual(group["latency"]["count"], 0)
+
+    def test_stream_recorded_on_close(self):
+        inner = FakeStream([
+            _chunk('{"tool": '), _chunk('"navigate"}'),
+            _chunk(usage=SimpleNamespace(prompt_tokens=50, completion_tokens=6)),
+        ])
+        stream = self.accountant.track("default", {"model": "m", "messages": MESSAGES, "stream": True},
+                                       time.perf_counter(), inner)
+        chunks = iter(stream)
+        next(chunks)
+        self.assertEqual(self.accountant.summary(), {})
+        stream.close()
+        stream.close()
+
+        self.assertTrue(inner.closed)
+        group = self.accountant.summary()["default/m"]
+        self.assertEqual(group["calls"], 1)
+        self.assertEqual(group["estimated"], 1)
+        self.assertLessEqual(group["ttft"]["p50"], group["latency"]["p50"])
+
+    def test_stream_usage(self):
+        inner = FakeStream([_chunk("{}"), _chunk(usage=SimpleNamespace(prompt_tokens=50, completion_tokens=6))])
+        stream = self.accountant.track("default", {"model": "m", "messages": MESSAGES, "stream": True},
+                                       time.perf_counter(), inner)
+        self.assertEqual(len(list(stream)), 2)
+        group = self.accountant.summary()["default/m"]
+        self.assertEqual((group["prompt_tokens"], group["completion_tokens"], group["estimated"]), (50, 6, 0))
+
+    def test_flush_and_load(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "usage.jsonl"
+            accountant = LLMAccountant(path=str(path), flush_seconds=3600)
+            accountant.record(CallRecord("openai", "m", 812.345, prompt_tokens=120, completion_tokens=8))
+            accountant.record(CallRecord("openai", "m", 90.0, ttft_ms=40.0, stream=True))
+            self.assertFalse(path.exists())
+            accountant.flush()
+
+            lines = path.read_text(encoding="utf-8").splitlines()
+            self.assertEqual(json.loads(lines[0])["ms"], 812.3)
+            records = load_records(str(path))
+            self.assertEqual([r.ttft_ms for r in records], [812.3, 40.0])
+            self.assertTrue(records[1].stream)
+
+    def test_parse_prices(self):
+        self.assertEqual(parse_prices("gpt-4o-mini=0.15/0.6, deepseek-chat=0.27/1.1"), {
+            "gpt-4o-mini": (0.15, 0.6), "deepseek-chat": (0.27, 1.1),
+        })
+        with self.assertRaises(ValueError):
+            parse_prices("gpt-4o-mini=0.15")
+
+    @patch.dict('os.environ', {'LLM_ACCOUNTING': '0'})
+    def test_disabled(self):
+        self.assertIsNone(create_llm_accountant())
+
+
+class TestGatewayAccounting(unittest.TestCase):
+
+    def test_every_provider_request_recorded(self):
+        accountant = LLMAccountant()
+        failing = LLMProvider("a", api_key="k", base_url="https://a.test.com/v1", model="model-a")
+        working = LLMProvider("b", api_key="k", base_url="https://b.test.com/v1")
+        gateway = LLMGateway(providers=[failing, working], accountant=accountant)
+        with patch.object(failing.client.chat.completions, 'create', side_effect=RuntimeError("boom")), \
+                patch.object(working.client.chat.completions, 'create', return_value=_response()):
+            gateway.create(model="m", messages=MESSAGES)
+
+        summary = accountant.summary()
+        self.assertEqual(summary["a/model-a"]["errors"], 1)
+        self.assertEqual(summary["b/m"]["prompt_tokens"], 120)
+
+
+if __name__ == '__main__':
+    unittest.main()
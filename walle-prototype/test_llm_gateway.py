@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Test suite for llm_gateway.py
+"""
+
+import asyncio
+import time
+import unittest
+from unittest.mock import AsyncMock, Mock, patch
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import llm_gateway
+from deadline import Deadline, DeadlineExceeded, deadline_scope
+from llm_accounting import LLMAccountant
+from llm_gateway import LLMGateway, LLMProvider, get_llm_gateway, providers_from_env
+from llm_stub_server import start_stub_server
+
+
+class TestLLMGateway(unittest.TestCase):
+
+    def setUp(self):
+        self.gateway = LLMGateway(api_key="test-key", base_url="https://api.test.com/v1")
+
+    def test_create_records_latency(self):
+        with patch.object(self.gateway.client.chat.completions, 'create', return_value="resp") as mock_create:
+            result = self.gateway.chat.completions.create(model="m", messages=[])
+
+        self.assertEqual(result, "resp")
+        mock_create.assert_called_once_with(model="m", messages=[])
+        self.assertEqual(self.gateway.stats.count, 1)
+        self.assertEqual(self.gateway.errors, 0)
+
+    def test_create_error_counted_and_raised(self):
+        with patch.object(self.gateway.client.chat.completions, 'create', side_effect=RuntimeError("boom")):
+            with self.assertRaises(RuntimeError):
+                self.gateway.create(model="m", messages=[])
+
+        self.assertEqual(self.gateway.stats.count, 1)
+        self.assertEqual(self.gateway.errors, 1)
+
+    def test_deadline_limits_timeout(self):
+        deadline = Deadline(10, {"llm": 3})
+        budget_client = self.gateway.providers[0].budget_client
+        with patch.object(budget_client.chat.completions, 'create', return_value="resp") as mock_create:
+            with deadline_scope(deadline):
+                self.gateway.create(model="m", messages=[], timeout=30)
+        self.assertLessEqual(mock_create.call_args.kwargs["timeout"], 3)
+        self.assertGreater(mock_create.call_args.kwargs["timeout"], 2.5)
+
+    def test_expired_deadline_skips_call(self):
+        deadline = Deadline(0)
+        with patch.object(self.gateway.client.chat.completions, 'create') as mock_create:
+            with deadline_scope(deadline), self.assertRaises(DeadlineExceeded):
+                self.gateway.create(model="m", messages=[])
+        mock_create.assert_not_called()
+        self.assertEqual(self.gateway.errors, 1)
+
+    def test_async_create(self):
+        async_client = self.gateway.async_client
+        self.assertIs(self.gateway.async_client, async_client)
+
+        with patch.object(async_client.chat.completions, 'create', new=AsyncMock(return_value="resp")):
+            result = asyncio.run(self.gateway.acreate(model="m", messages=[]))
+
+        self.assertEqual(result, "resp")
+        self.assertEqual(self.gateway.stats.count, 1)
+
+    def test_warm_up_ignores_errors(self):
+        with patch.object(self.gateway.client.models, 'list', side_effect=RuntimeError("404")) as mock_list:
+            self.assertIsNone(self.gateway.warm_up(background=False))
+
+        mock_list.assert_called_once()
+        self.assertIsNotNone(self.gateway.warm_up_ms)
+
+    def test_warm_up_background(self):
+        with patch.object(self.gateway.client.models, 'list') as mock_list:
+            thread = self.gateway.warm_up(background=True)
+            thread.join(timeout=1)
+
+        mock_list.assert_called_once()
+
+
+class TestBudgetAgainstStub(unittest.TestCase):
+
+    def setUp(self):
+        # 替身服务 1.5s 后才返回,超过 AI 理解阶段的预算
+        self.server = start_stub_server(ttft_ms=1500)
+        self.gateway = LLMGateway(api_key="stub", base_url=self.server.url, max_retries=2)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def create(self, **kwargs):
+        started = time.perf_counter()
+        with self.assertRaises(Exception):
+            self.gateway.create(model="m", messages=[{"role": "user", "content": "上海天气"}], **kwargs)
+        return time.perf_counter() - started
+
+    def test_deadline_not_retried(self):
+        with deadline_scope(Deadline(10, {"llm": 0.5})):
+            elapsed = self.create()
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual(self.server.stats["requests"], 1)
+
+    def test_explicit_timeout_not_retried(self):
+        self.assertLess(self.create(timeout=0.5), 1.0)
+        self.assertEqual(self.server.stats["requests"], 1)
+
+
+class TestStreamUsage(unittest.TestCase):
+
+    def setUp(self):
+        self.server = start_stub_server()
+        self.accountant = LLMAccountant()
+        self.gateway = LLMGateway(api_key="stub", base_url=self.server.url, accountant=self.accountant)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_stream_usage_requested_and_recorded(self):
+        stream = self.gateway.create(model="m", messages=[{"role": "user", "content": "上海天气"}], stream=True)
+        chunks = list(stream)
+
+        self.assertIsNotNone(chunks[-1].usage)
+        group = self.accountant.summary()["default/m"]
+        self.assertEqual(group["estimated"], 0)
+        self.assertEqual(group["prompt_tokens"], chunks[-1].usage.prompt_tokens)
+
+    def test_caller_stream_options_kept(self):
+        stream = self.gateway.create(
+            model="m", messages=[{"role": "user", "content": "上海天气"}],
+            stream=True, stream_options={"include_usage": False},
+        )
+        self.assertTrue(all(chunk.usage is None for chunk in stream))
+        self.assertEqual(self.accountant.summary()["default/m"]["estimated"], 1)
+
+
+def _provider(name, **kwargs):
+    return LLMProvider(name, api_key="test-key", base_url=f"https://{name}.test.com/v1", **kwargs)
+
+
+class TestProviderRouting(unittest.TestCase):
+
+    def setUp(self):
+        self.fast = _provider("fast", model="fast-model")
+        self.slow = _provider("slow")
+        self.gateway = LLMGateway(providers=[self.slow, self.fast])
+
+    def test_ranks_by_latency(self):
+        self.assertEqual(self.gateway.ranked_providers(), [self.slow, self.fast])
+        self.fast.record(100, failed=False)
+        self.assertEqual(self.gateway.ranked_providers(), [self.slow, self.fast])
+        self.slow.record(800, failed=False)
+        self.assertEqual(self.gateway.ranked_providers(), [self.fast, self.slow])
+
+    def test_cooldown_after_consecutive_failures(self):
+        self.slow.record(100, failed=False)
+        self.fast.record(50, failed=True)
+        self.assertTrue(self.fast.healthy())
+        self.fast.record(50, failed=True)
+        self.assertFalse(self.fast.healthy())
+        self.assertEqual(self.gateway.ranked_providers(), [self.slow, self.fast])
+        self.assertAlmostEqual(self.fast.error_rate, 1.0)
+
+        self.fast.cooldown_until = time.time() - 1
+        self.assertTrue(self.fast.healthy())
+
+    def test_failover_and_model_override(self):
+        with patch.object(self.slow.client.chat.completions, 'create', side_effect=RuntimeError("down")), \
+                patch.object(self.fast.client.chat.completions, 'create', return_value="resp") as fast_create:
+            result = self.gateway.create(model="m", messages=[])
+
+        self.assertEqual(result, "resp")
+        fast_create.assert_called_once_with(model="fast-model", messages=[])
+        self.assertEqual(self.gateway.failovers, 1)
+        self.assertEqual(self.slow.errors, 1)
+        self.assertEqual(self.gateway.errors, 0)
+
+    def test_all_providers_fail(self):
+        with patch.object(self.slow.client.chat.completions, 'create', side_effect=RuntimeError("a")), \
+                patch.object(self.fast.client.chat.completions, 'create', side_effect=RuntimeError("b")):
+            with self.assertRaisesRegex(RuntimeError, "b"):
+                self.gateway.create(model="m", messages=[])
+        self.assertEqual(self.gateway.errors, 1)
+
+    def test_hedge_backup_wins_and_loser_closed(self):
+        self.gateway.hedge_after_ms = 20
+        slow_response = Mock()
+
+        def slow_create(**kwargs):
+            time.sleep(0.3)
+            return slow_response
+
+        with patch.object(self.slow.client.chat.completions, 'create', side_effect=slow_create), \
+                patch.object(self.fast.client.chat.completions, 'create', return_value="fast"):
+            started = time.perf_counter()
+            result = self.gateway.create(model="m", messages=[])
+            elapsed = time.perf_counter() - started
+            self.assertEqual(result, "fast")
+            self.assertLess(elapsed, 0.25)
+            time.sleep(0.4)
+
+        self.assertEqual((self.gateway.hedges, self.gateway.hedge_wins), (1, 1))
+        slow_response.close.assert_called_once()
+
+    def test_no_hedge_when_primary_fast(self):
+        self.gateway.hedge_after_ms = 200
+        with patch.object(self.slow.client.chat.completions, 'create', return_value="primary"), \
+                patch.object(self.fast.client.chat.completions, 'create') as fast_create:
+            self.assertEqual(self.gateway.create(model="m", messages=[]), "primary")
+        fast_create.assert_not_called()
+        self.assertEqual(self.gateway.hedges, 0)
+
+    def test_hedge_delay_from_percentile(self):
+        self.gateway.hedge_after_ms = 500
+        self.gateway.hedge_percentile = 95
+        self.assertEqual(self.gateway.hedge_delay_ms(self.slow), 500)
+        for _ in range(5):
+            self.slow.record(100, failed=False)
+        self.assertEqual(self.gateway.hedge_delay_ms(self.slow), 100)
+        self.assertIsNone(LLMGateway(providers=[self.slow]).hedge_delay_ms(self.slow))
+
+    def test_async_hedge_cancels_loser(self):
+        self.gateway.hedge_after_ms = 20
+        cancelled = []
+
+        async def slow_create(**kwargs):
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        with patch.object(self.slow.async_client.chat.completions, 'create', new=slow_create), \
+                patch.object(self.fast.async_client.chat.completions, 'create', new=AsyncMock(return_value="fast")):
+            async def run():
+                result = await self.gateway.acreate(model="m", messages=[])
+                await asyncio.sleep(0)
+                return result
+            result = asyncio.run(run())
+
+        self.assertEqual(result, "fast")
+        self.assertEqual(cancelled, [True])
+        self.assertEqual(self.gateway.hedge_wins, 1)
+
+
+class TestProvidersFromEnv(unittest.TestCase):
+
+    @patch.dict('os.environ', {'API_KEY': 'k', 'BASE_URL': 'https://api.test.com/v1'}, clear=True)
+    def test_single_provider(self):
+        providers = providers_from_env()
+        self.assertEqual([p.name for p in providers], ["default"])
+        self.assertIsNone(providers[0].model)
+
+    @patch.dict('os.environ', {
+        'LLM_PROVIDERS': 'openai, deepseek',
+        'OPENAI_API_KEY': 'k1', 'OPENAI_BASE_URL': 'https://api.openai.com/v1',
+        'DEEPSEEK_API_KEY': 'k2', 'DEEPSEEK_BASE_URL': 'https://api.deepseek.com/v1', 'DEEPSEEK_MODEL': 'deepseek-chat',
+    }, clear=True)
+    def test_multiple_providers(self):
+        providers = providers_from_env()
+        self.assertEqual([p.name for p in providers], ["openai", "deepseek"])
+        self.assertEqual(providers[1].base_url, "https://api.deepseek.com/v1")
+        self.assertEqual(providers[1].model, "deepseek-chat")
+        self.assertIsNone(providers[0].model)
+
+
+class TestGetLLMGateway(unittest.TestCase):
+
+    @patch.dict('os.environ', {'API_KEY': 'test-key', 'BASE_URL': 'https://api.test.com/v1', 'LLM_TIMEOUT': '5'})
+    def test_shared_instance(self):
+        with patch.object(llm_gateway, '_gateway', None):
+            gateway = get_llm_gateway()
+            self.assertIs(get_llm_gateway(), gateway)
+            self.assertEqual(gateway.base_url, 'https://api.test.com/v1')
+
+    @patch.dict('os.environ', {'LLM_WARMUP': '0'})
+    def test_warm_up_disabled(self):
+        with patch.object(llm_gateway, 'get_llm_gateway') as mock_get:
+            llm_gateway.warm_up_llm()
+        mock_get.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Test suite for llm_stream.py
+"""
+
+import json
+import unittest
+from unittest.mock import Mock, patch
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import llm_stream
+from llm_stream import IncrementalJSONParser, stream_intent
+
+
+def _chunk(text):
+    chunk = Mock()
+    chunk.choices = [Mock()]
+    chunk.choices[0].delta.content = text
+    chunk.choices[0].delta.tool_calls = None
+    chunk.choices[0].finish_reason = None
+    return chunk
+
+
+def _finish_chunk(reason="tool_calls"):
+    chunk = _chunk(None)
+    chunk.choices[0].finish_reason = reason
+    return chunk
+
+
+def _call_chunk(name=None, arguments=None, index=0):
+    call = Mock()
+    call.index = index
+    call.function.name = name
+    call.function.arguments = arguments
+    chunk = _chunk(None)
+    chunk.choices[0].delta.tool_calls = [call]
+    return chunk
+
+
+def _usage_chunk():
+    chunk = Mock()
+    chunk.choices = []
+    return chunk
+
+
+class FakeStream:
+    """按片段产出模型输出,记录读取了多少片段"""
+
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.consumed = 0
+        self.closed = False
+
+    def __iter__(self):
+        for piece in self.pieces:
+            self.consumed += 1
+            yield piece if isinstance(piece, Mock) else _chunk(piece)
+
+    def close(self):
+        self.closed = True
+
+
+def _split(text, size=3):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class TestIncrementalJSONParser(unittest.TestCase):
+
+    def test_fields_complete_in_order(self):
+        parser = IncrementalJSONParser()
+        text = '{"tool": "navigate", "params": {"origin": "上海", "destination": "北京"}}'
+        completed = []
+        for piece in _split(text):
+            completed.extend(parser.feed(piece))
+
+        self.assertEqual(completed, ["tool", "params"])
+        self.assertTrue(parser.complete)
+        self.assertEqual(parser.result(), json.loads(text))
+
+    def test_tool_known_before_params(self):
+        parser = IncrementalJSONParser()
+        self.assertEqual(parser.feed('{"tool": "get_wea'), [])
+        self.assertEqual(parser.feed('ther", "params": {"ci'), ["tool"])
+        self.assertEqual(parser.fields, {"tool": "get_weather"})
+
+    def test_strings_with_braces_and_escapes(self):
+        parser = IncrementalJSONParser()
+        text = '```json\n{"tool": "search_location", "params": {"query": "a}\\"b{"}, "n": 1, "ok": true}'
+        for piece in _split(text, 2):
+            parser.feed(piece)
+
+        self.assertEqual(parser.fields["params"], {"query": 'a}"b{'})
+        self.assertEqual(parser.fields["n"], 1)
+        self.assertIs(parser.fields["ok"], True)
+
+    def test_result_without_json(self):
+        parser = IncrementalJSONParser()
+        parser.feed("抱歉,我不明白")
+        with self.assertRaises(ValueError):
+            parser.result()
+
+
+class TestStreamIntent(unittest.TestCase):
+
+    def _client(self, stream):
+        client = Mock()
+        client.chat.completions.create.return_value = stream
+        return client
+
+    def test_returns_when_params_close(self):
+        text = '{"tool": "play_music", "params": {"song": "晴天", "artist": "周杰伦"}}\n\n说明: 已为你播放'
+        stream = FakeStream(_split(text))
+        on_tool = Mock()
+
+        intent = stream_intent(self._client(stream), "m", [], on_tool=on_tool, temperature=0)
+
+        self.assertEqual(intent, {"tool": "play_music", "params": {"song": "晴天", "artist": "周杰伦"}})
+        on_tool.assert_called_once_with("play_music")
+        self.assertLess(stream.consumed, len(stream.pieces))
+        self.assertTrue(stream.closed)
+
+    def test_stream_flag_passed(self):
+        client = self._client(FakeStream(['{"tool": "unknown", "params": {}}']))
+        stream_intent(client, "m", [{"role": "user", "content": "hi"}], on_tool=None, temperature=0)
+
+        kwargs = client.chat.completions.create.call_args.kwargs
+        self.assertTrue(kwargs["stream"])
+        self.assertEqual(kwargs["model"], "m")
+        self.assertEqual(kwargs["temperature"], 0)
+
+    def test_falls_back_to_full_output(self):
+        stream = FakeStream(['{"tool": "unknown"}'])
+        intent = stream_intent(self._client(stream), "m", [], on_tool=None)
+        self.assertEqual(intent, {"tool": "unknown", "params": {}})
+
+    def test_plain_reply_is_unknown(self):
+        intent = stream_intent(self._client(FakeStream(["不知道"])), "m", [], on_tool=None)
+        self.assertEqual(intent, {"tool": "unknown", "params": {}})
+
+    def test_native_tool_call(self):
+        pieces = [_call_chunk(name="navigate", arguments="")]
+        pieces += [_call_chunk(arguments=p) for p in _split('{"origin": "上海", "destination": "北京"}', 5)]
+        pieces += [_finish_chunk(), _chunk(None)]
+        stream = FakeStream(pieces)
+        on_tool = Mock()
+
+        intent = stream_intent(self._client(stream), "m", [], on_tool=on_tool)
+
+        self.assertEqual(intent, {"tool": "navigate", "params": {"origin": "上海", "destination": "北京"}})
+        on_tool.assert_called_once_with("navigate")
+        self.assertLess(stream.consumed, len(stream.pieces))
+
+    def test_multiple_native_tool_calls(self):
+        stream = FakeStream([
+            _call_chunk(name="navigate", arguments='{"origin": "当前位置", '),
+            _call_chunk(arguments='"destination": "虹桥机场"}'),
+            _call_chunk(name="get_weather", arguments='{"city": "上海", "date": "明天"}', index=1),
+            _finish_chunk(),
+            _usage_chunk(),
+        ])
+        on_tool = Mock()
+
+        intent = stream_intent(self._client(stream), "m", [], on_tool=on_tool, multi_call=True)
+
+        self.assertEqual(intent, [
+            {"tool": "navigate", "params": {"origin": "当前位置", "destination": "虹桥机场"}},
+            {"tool": "get_weather", "params": {"city": "上海", "date": "明天"}},
+        ])
+        self.assertEqual([c.args[0] for c in on_tool.call_args_list], ["navigate", "get_weather"])
+        # 结束标记之后的 usage 数据块也读完,网关才能记下实际 token 数
+        self.assertEqual(stream.consumed, len(stream.pieces))
+
+    def test_native_tool_call_returns_when_arguments_close(self):
+        arguments = _split('{"city": "上海", "date": "明天"}', 4)
+        pieces = [_call_chunk(name="get_weather", arguments=arguments[0])]
+        pieces += [_call_chunk(arguments=p) for p in arguments[1:]]
+        pieces += [_chunk(None), _finish_chunk()]
+        stream = FakeStream(pieces)
+
+        intent = stream_intent(self._client(stream), "m", [], on_tool=None)
+
+        self.assertEqual(intent, {"tool": "get_weather", "params": {"city": "上海", "date": "明天"}})
+        self.assertEqual(stream.consumed, len(arguments))
+        self.assertTrue(stream.closed)
+
+    def test_json_calls(self):
+        text = '{"calls": [{"tool": "play_music", "params": {"song": "晴天"}}, {"tool": "get_weather", "params": {"city": "上海"}}]}'
+        intent = stream_intent(self._client(FakeStream(_split(text, 7))), "m", [], on_tool=None)
+        self.assertEqual([c["tool"] for c in intent], ["play_music", "get_weather"])
+
+    def test_native_tool_call_without_arguments(self):
+        stream = FakeStream([_call_chunk(name="get_help")])
+        intent = stream_intent(self._client(stream), "m", [], on_tool=None)
+        self.assertEqual(intent, {"tool": "get_help", "params": {}})
+
+
+class TestPrewarm(unittest.TestCase):
+
+    def test_registered_hook_runs(self):
+        hook = Mock()
+        with patch.dict(llm_stream._PREWARM_HOOKS, {}):
+            llm_stream.register_prewarm("demo_tool", hook)
+            llm_stream.prewarm_tool("demo_tool").result(timeout=1)
+        hook.assert_called_once()
+
+    def test_unknown_tool_not_prewarmed(self):
+        self.assertIsNone(llm_stream.prewarm_tool("no_such_tool"))
+
+    def test_hook_error_swallowed(self):
+        with patch.dict(llm_stream._PREWARM_HOOKS, {"demo_tool": Mock(side_effect=RuntimeError("x"))}):
+            llm_stream.prewarm_tool("demo_tool").result(timeout=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Test suite for llm_stub_server.py
+"""
+
+import json
+import random
+import tempfile
+import unittest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import requests
+
+from llm_stub_server import PROFILES, LatencyProfile, render_content, start_stub_server
+from tool_schema import intent_from_json
+
+TOOLS = [
+    {"type": "function", "function": {"name": "navigate", "parameters": {"type": "object", "properties": {}}}},
+    {"type": "function", "function": {"name": "get_weather", "parameters": {"type": "object", "properties": {}}}},
+]
+
+
+def _messages(text, system="你是 WALL-E 智能助手"):
+    return [{"role": "system", "content": system}, {"role": "user", "content": text}]
+
+
+class TestStubServer(unittest.TestCase):
+
+    def setUp(self):
+        self.script = tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False, encoding="utf-8")
+        self.script.write(json.dumps({"text": "我饿了", "calls": [
+            {"tool": "navigate", "params": {"origin": "当前位置", "destination": "餐厅"}},
+            {"tool": "get_weather", "params": {"city": "上海"}},
+        ]}, ensure_ascii=False) + "\n")
+        self.script.close()
+        self.server = start_stub_server(script_path=self.script.name, seed=1)
+
+    def tearDown(self):
+        self.server.stop()
+        Path(self.script.name).unlink()
+
+    def post(self, **body):
+        return requests.post(f"{self.server.url}/chat/completions", json=dict(model="m", **body), timeout=5)
+
+    def test_models(self):
+        response = requests.get(f"{self.server.url}/models", timeout=5)
+        self.assertEqual(response.json()["data"][0]["id"], "walle-stub")
+
+    def test_tool_calls_from_rules(self):
+        data = self.post(messages=_messages("从上海到北京"), tools=TOOLS).json()
+        choice = data["choices"][0]
+        self.assertEqual(choice["finish_reason"], "tool_calls")
+        call = choice["message"]["tool_calls"][0]["function"]
+        self.assertEqual(call["name"], "navigate")
+        self.assertEqual(json.loads(call["arguments"]), {"origin": "上海", "destination": "北京"})
+        self.assertGreater(data["usage"]["prompt_tokens"], 0)
+
+    def test_json_mode_from_script(self):
+        data = self.post(messages=_messages("我饿了"), response_format={"type": "json_object"}).json()
+        intent = intent_from_json(json.loads(data["choices"][0]["message"]["content"]))
+        self.assertEqual([c["tool"] for c in intent], ["navigate", "get_weather"])
+        self.assertEqual(self.server.stats["scripted"], 1)
+
+    def test_confidence_when_asked(self):
+        system = '只返回 JSON: {"tool": "工具名", "params": {}, "confidence": 0 到 1}'
+        data = self.post(messages=_messages("我饿了", system), response_format={"type": "json_object"}).json()
+        self.assertEqual(json.loads(data["choices"][0]["message"]["content"])["confidence"], 0.95)
+
+    def test_unknown(self):
+        data = self.post(messages=_messages("嗯嗯"), tools=TOOLS).json()
+        self.assertEqual(json.loads(data["choices"][0]["message"]["content"])["tool"], "unknown")
+
+    def test_stream_tool_calls(self):
+        response = requests.post(
+            f"{self.server.url}/chat/completions", stream=True, timeout=5,
+            json={"model": "m", "messages": _messages("我饿了"), "tools": TOOLS, "stream": True,
+                  "stream_options": {"include_usage": True}},
+        )
+        events = [line[len("data: "):] for line in response.iter_lines(decode_unicode=True) if line.startswith("data: ")]
+        self.assertEqual(events[-1], "[DONE]")
+        chunks = [json.loads(e) for e in events[:-1]]
+        arguments = {}
+        for chunk in chunks:
+            for choice in chunk["choices"]:
+                for call in choice["delta"].get("tool_calls") or []:
+                    arguments[call["index"]] = arguments.get(call["index"], "") + call["function"]["arguments"]
+        self.assertEqual(json.loads(arguments[0]), {"origin": "当前位置", "destination": "餐厅"})
+        self.assertEqual(json.loads(arguments[1]), {"city": "上海"})
+        self.assertIn("usage", chunks[-1])
+
+    def test_injected_errors(self):
+        self.server.profile = LatencyProfile("broken", error_rate=1.0)
+        response = self.post(messages=_messages("从上海到北京"))
+        self.assertIn(response.status_code, (429, 500))
+        self.assertIn("error", response.json())
+        self.assertEqual(self.server.stats["errors"], 1)
+
+
+class TestLatencyProfile(unittest.TestCase):
+
+    def test_seeded_samples_repeat(self):
+        profile = PROFILES["flaky"]
+        first = [profile.sample_ttft(random.Random(7)) for _ in range(3)]
+        second = [profile.sample_ttft(random.Random(7)) for _ in range(3)]
+        self.assertEqual(first, second)
+
+    def test_stall(self):
+        profile = LatencyProfile("stall", ttft_ms=100, stall_rate=1.0, stall_ms=5000)
+        self.assertEqual(profile.sample_ttft(random.Random(0)), 5100)
+
+    def test_basic_version_format(self):
+        calls = [{"tool": "navigate", "params": {"origin": "上海", "destination": "北京"}}]
+        content = json.loads(render_content(calls, '返回 JSON: {"action":"nav","from":"起点","to":"终点"}'))
+        self.assertEqual(content, {"action": "nav", "from": "上海", "to": "北京"})
+
+
+if __name__ == '__main__':
+    unittest.main()
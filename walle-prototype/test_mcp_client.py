@@ -35,6 +35,26 @@ class TestMCPClient(unittest.TestCase):
         self.assertIn('test_tool', self.client.tools)
         self.assertIn('test_server.test_tool', self.client.tools)
     
+    def test_discover_tools_builds_schemas(self):
+        from types import SimpleNamespace
+        tool = SimpleNamespace(
+            name='navigate',
+            description='Open map navigation',
+            inputSchema={'type': 'object', 'properties': {'origin': {'title': 'Origin', 'type': 'string'}}},
+        )
+        mock_mcp = Mock()
+        
+        async def list_tools():
+            return [tool]
+        mock_mcp.list_tools = list_tools
+        
+        self.client._discover_tools('navigation', mock_mcp)
+        
+        schemas = self.client.tool_schemas()
+        self.assertEqual(len(schemas), 1)
+        self.assertEqual(schemas[0]['function']['name'], 'navigate')
+        self.assertEqual(schemas[0]['function']['parameters']['properties'], {'origin': {'type': 'string'}})
+    
     def test_register_server_missing_mcp(self):
         mock_module = Mock(spec=[])
         
@@ -140,6 +140,8 @@ class TestSimpleMCPClient(unittest.TestCase):
         test_func.assert_called_once_with(key1='val1', key2='val2')
 
 
+# 没有地图 API Key 时只注册三个基础工具模块
+@patch.dict('os.environ', {'AMAP_API_KEY': '', 'BAIDU_API_KEY': ''})
 class TestCreateSimpleMCPClient(unittest.TestCase):
     
     @patch('mcp_client_simple.Path')
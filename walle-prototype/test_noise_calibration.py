@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Test suite for noise_calibration.py
+"""
+
+import struct
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import speech_recognition as sr
+from noise_calibration import NoiseCalibrator, NoiseProfile, NoiseProfileStore, device_key
+from vad import EnergyEndpointer, create_endpointer_from_env
+
+SAMPLE_RATE = 16000
+
+
+def make_frame(amplitude, samples=160):
+    return struct.pack(f"<{samples}h", *([amplitude] * samples))
+
+
+class TestNoiseProfileStore(unittest.TestCase):
+
+    def test_round_trip_per_device(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = NoiseProfileStore(str(Path(tmp) / "profiles" / "noise.json"))
+            store.save(NoiseProfile("mic-a@16000", 16000, 120.0, 1.0))
+            store.save(NoiseProfile("mic-b@44100", 44100, 80.0, 2.0))
+
+            self.assertEqual(store.load("mic-a@16000").noise_floor, 120.0)
+            self.assertEqual(store.load("mic-b@44100").noise_floor, 80.0)
+            self.assertIsNone(store.load("mic-c@16000"))
+
+    def test_corrupt_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "noise.json"
+            path.write_text("{not json", encoding="utf-8")
+
+            self.assertIsNone(NoiseProfileStore(str(path)).load("mic"))
+
+
+class TestNoiseCalibrator(unittest.TestCase):
+
+    def test_initial_calibration_uses_median(self):
+        calibrator = NoiseCalibrator("mic", SAMPLE_RATE, calibration_ms=50)
+
+        for rms in [100, 120, 5000, 110, 90]:
+            calibrator.calibrate(rms, 10)
+
+        self.assertTrue(calibrator.calibrated)
+        self.assertEqual(calibrator.noise_floor, 110)
+        self.assertEqual(calibrator.energy_threshold, 165)
+
+    def test_min_threshold(self):
+        calibrator = NoiseCalibrator("mic", SAMPLE_RATE, calibration_ms=10, min_threshold=100)
+
+        calibrator.calibrate(0, 10)
+
+        self.assertEqual(calibrator.energy_threshold, 100)
+
+    def test_adapts_to_louder_room(self):
+        calibrator = NoiseCalibrator("mic", SAMPLE_RATE, calibration_ms=10, adapt_seconds=1)
+        calibrator.calibrate(100, 10)
+
+        for _ in range(300):
+            calibrator.observe(400, 10)
+
+        self.assertGreater(calibrator.noise_floor, 380)
+
+    def test_persisted_profile_skips_calibration(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = NoiseProfileStore(str(Path(tmp) / "noise.json"))
+            first = NoiseCalibrator("mic", SAMPLE_RATE, store=store, calibration_ms=10)
+            first.calibrate(200, 10)
+
+            second = NoiseCalibrator("mic", SAMPLE_RATE, store=store)
+
+            self.assertTrue(second.calibrated)
+            self.assertEqual(second.noise_floor, 200)
+
+    def test_profile_for_other_rate_ignored(self):
+        store = Mock()
+        store.load.return_value = NoiseProfile("mic", 44100, 200.0, 0.0)
+
+        self.assertFalse(NoiseCalibrator("mic", SAMPLE_RATE, store=store).calibrated)
+
+    def test_save_throttled(self):
+        store = Mock()
+        store.load.return_value = None
+        calibrator = NoiseCalibrator("mic", SAMPLE_RATE, store=store, calibration_ms=10, save_interval=60)
+        calibrator.calibrate(100, 10)
+
+        for _ in range(100):
+            calibrator.observe(300, 10)
+
+        self.assertEqual(store.save.call_count, 1)
+
+
+class TestCalibratedEndpointer(unittest.TestCase):
+
+    def test_threshold_follows_noise_floor(self):
+        calibrator = NoiseCalibrator("mic", SAMPLE_RATE, calibration_ms=100)
+        endpointer = EnergyEndpointer(SAMPLE_RATE, calibrator=calibrator,
+                                      hangover_ms=100, min_speech_ms=50)
+        noise = make_frame(400)
+
+        # 校准期间即使是较大的底噪也不会触发语音
+        for _ in range(20):
+            endpointer.process(noise)
+        self.assertFalse(endpointer.in_speech)
+        self.assertEqual(endpointer.threshold, 600)
+
+        endpointer.process(make_frame(2000))
+        self.assertTrue(endpointer.in_speech)
+
+    def test_device_enables_calibration(self):
+        with tempfile.TemporaryDirectory() as tmp, \
+             patch.dict('os.environ', {'NOISE_PROFILE_PATH': str(Path(tmp) / "noise.json"),
+                                       'VAD_BACKEND': 'energy'}):
+            self.assertIsNone(create_endpointer_from_env(SAMPLE_RATE).calibrator)
+            endpointer = create_endpointer_from_env(SAMPLE_RATE, device="mic@16000")
+
+        self.assertEqual(endpointer.calibrator.device, "mic@16000")
+
+    def test_device_key(self):
+        source = Mock(device_index=None, SAMPLE_RATE=44100)
+
+        self.assertEqual(device_key(source), "default@44100")
+
+        source.device_index = 1
+        with patch.object(sr.Microphone, 'list_microphone_names', return_value=["Built-in", "USB Mic"]):
+            self.assertEqual(device_key(source), "USB Mic@44100")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Test suite for prefetch.py
+"""
+
+import threading
+import unittest
+from unittest.mock import Mock, patch
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from mcp_client_simple import create_simple_mcp_client
+from prefetch import SpeculativePrefetcher, create_prefetcher, extract_entities, needed_entities
+from mcp_servers_simple import navigation_tools_api
+from mcp_servers_simple.navigation_tools_api import (
+    AmapAPI, clear_geocode_cache, prefetch_geocode, prefetched_geocode_reads,
+)
+
+NAVIGATE = {"tool": "navigate", "params": {"origin": "当前位置", "destination": "虹桥机场"}}
+WEATHER = {"tool": "get_weather", "params": {"city": "上海", "date": "明天"}}
+
+
+class TestExtractEntities(unittest.TestCase):
+
+    def test_places_and_cities(self):
+        self.assertEqual(
+            extract_entities("导航去虹桥机场顺便查下上海明天的天气"),
+            [("place", "虹桥机场"), ("city", "上海")],
+        )
+        self.assertEqual(extract_entities("从上海到北京"), [("place", "上海"), ("place", "北京")])
+        self.assertEqual(extract_entities("带我去人民广场吧"), [("place", "人民广场")])
+
+    def test_vague_places_skipped(self):
+        self.assertEqual(extract_entities("回家"), [])
+        self.assertEqual(extract_entities("播放周杰伦的晴天"), [])
+
+    def test_needed_entities(self):
+        self.assertEqual(needed_entities([NAVIGATE, WEATHER]), {
+            ("place", "当前位置"), ("place", "虹桥机场"), ("city", "上海"),
+        })
+        self.assertEqual(needed_entities({"tool": "unknown", "params": {}}), set())
+
+
+class TestSpeculativePrefetcher(unittest.TestCase):
+
+    def test_hits_counted_from_cache_reads(self):
+        cache = {}
+        reads = []
+        prefetcher = SpeculativePrefetcher()
+        prefetcher.register("place", lambda place: cache.setdefault(place, True), lambda: len(reads))
+        batch = prefetcher.start("从上海到北京")
+        for future in batch.futures.values():
+            future.result(timeout=1)
+        batch.settle({"tool": "navigate", "params": {"origin": "上海", "destination": "南京"}})
+        batch.settle(None)
+
+        self.assertEqual(sorted(cache), ["上海", "北京"])
+        # 意图用到了 "上海",但在工具真正读取缓存之前不算命中
+        self.assertEqual(prefetcher.counts()["hits"], 0)
+        reads.append("上海")
+        counts = prefetcher.counts()
+        self.assertEqual((counts["launched"], counts["hits"], counts["wasted"], counts["missed"]), (2, 1, 1, 1))
+        self.assertEqual(prefetcher.hit_rate(), 0.5)
+
+    def test_no_reads_probe_never_hits(self):
+        prefetcher = SpeculativePrefetcher()
+        prefetcher.register("place", lambda place: None)
+        batch = prefetcher.start("从上海到北京")
+        for future in batch.futures.values():
+            future.result(timeout=1)
+        batch.settle({"tool": "navigate", "params": {"origin": "上海", "destination": "北京"}})
+        self.assertEqual(prefetcher.counts()["hits"], 0)
+        self.assertEqual(prefetcher.counts()["wasted"], 2)
+
+    def test_unneeded_queued_prefetch_cancelled(self):
+        release = threading.Event()
+        prefetcher = SpeculativePrefetcher(max_workers=1)
+        prefetcher.register("place", lambda place: release.wait(1))
+        batch = prefetcher.start("从上海到北京")
+        batch.settle({"tool": "get_weather", "params": {"city": "上海"}})
+        release.set()
+
+        counts = prefetcher.counts()
+        self.assertEqual((counts["hits"], counts["cancelled"], counts["wasted"]), (0, 1, 1))
+
+    def test_no_fetchers(self):
+        prefetcher = SpeculativePrefetcher()
+        batch = prefetcher.start("从上海到北京")
+        batch.settle(NAVIGATE)
+        self.assertEqual(batch.futures, {})
+        self.assertIsNone(prefetcher.hit_rate())
+
+    def test_create_from_env(self):
+        tools = ["navigate", "plan_route"]
+        with patch.dict('os.environ', {'AMAP_API_KEY': 'key'}):
+            self.assertIn("place", create_prefetcher(tools).fetchers)
+            # 现有的导航工具只生成地图链接,不读地理编码缓存
+            self.assertEqual(create_prefetcher(["navigate", "search_location"]).fetchers, {})
+        with patch.dict('os.environ', {'AMAP_API_KEY': 'key', 'PREFETCH': '0'}):
+            self.assertEqual(create_prefetcher(tools).fetchers, {})
+
+
+class TestPlanRoutePrefetch(unittest.TestCase):
+
+    def setUp(self):
+        self.navigation_api = sys.modules.get("navigation_tools_api")
+
+    def tearDown(self):
+        if self.navigation_api is not None:
+            self.navigation_api.clear_geocode_cache()
+
+    @patch.dict('os.environ', {'AMAP_API_KEY': 'key', 'TOOL_LAZY_IMPORT': '0'})
+    def test_route_reads_prefetched_geocode(self):
+        client = create_simple_mcp_client()
+        self.assertIn("plan_route", client.list_tools())
+        prefetcher = create_prefetcher(client.list_tools())
+        self.navigation_api = sys.modules["navigation_tools_api"]
+        self.navigation_api.clear_geocode_cache()
+
+        geocode = Mock()
+        geocode.json.return_value = {"status": "1", "geocodes": [{"location": "121,31", "formatted_address": "x"}]}
+        route = Mock()
+        route.json.return_value = {"status": "0"}
+        with patch.object(self.navigation_api.requests, 'get', side_effect=[geocode, geocode, route]) as mock_get, \
+                patch("webbrowser.open"):
+            batch = prefetcher.start("从上海到虹桥机场")
+            for future in batch.futures.values():
+                future.result(timeout=1)
+            intent = {"tool": "plan_route", "params": {"origin": "上海", "destination": "虹桥机场"}}
+            batch.settle(intent)
+            client.call_tool("plan_route", **intent["params"])
+
+        # 两次地理编码都在预取时完成,路线规划只发出路线请求
+        self.assertEqual(mock_get.call_count, 3)
+        self.assertEqual(prefetcher.counts()["hits"], 2)
+        self.assertEqual(prefetcher.counts()["wasted"], 0)
+
+    @patch.dict('os.environ', {}, clear=True)
+    def test_no_route_tool_without_key(self):
+        self.assertNotIn("plan_route", create_simple_mcp_client(lazy=False).list_tools())
+
+
+class TestGeocodeCache(unittest.TestCase):
+
+    def setUp(self):
+        clear_geocode_cache()
+
+    def tearDown(self):
+        clear_geocode_cache()
+
+    def test_geocode_cached(self):
+        response = Mock()
+        response.json.return_value = {"status": "1", "geocodes": [{"location": "121,31", "formatted_address": "虹桥机场"}]}
+        with patch.object(navigation_tools_api.requests, 'get', return_value=response) as mock_get:
+            first = prefetch_geocode("虹桥机场", "amap", api_key="key")
+            second = AmapAPI("key").geocode("虹桥机场")
+        self.assertEqual(first, second)
+        mock_get.assert_called_once()
+        self.assertEqual(prefetched_geocode_reads(), 1)
+
+        AmapAPI("key").geocode("虹桥机场")
+        self.assertEqual(prefetched_geocode_reads(), 1)
+
+    @patch.dict('os.environ', {}, clear=True)
+    def test_prefetch_without_key(self):
+        with patch.object(navigation_tools_api.requests, 'get') as mock_get:
+            self.assertIsNone(prefetch_geocode("虹桥机场"))
+        mock_get.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Test suite for streaming_asr.py
+"""
+
+import contextvars
+import threading
+import unittest
+from unittest.mock import Mock, patch
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import speech_recognition as sr
+from streaming_asr import (
+    SpeculativeIntentRunner,
+    listen_streaming,
+    normalize_transcript,
+    speculation_stats,
+    streaming_enabled,
+)
+
+
+NAV_INTENT = {"tool": "navigate", "params": {"origin": "当前位置", "destination": "虹桥机场"}}
+
+
+class TestNormalizeTranscript(unittest.TestCase):
+
+    def test_strips_punctuation_and_spaces(self):
+        self.assertEqual(normalize_transcript(" 导航到 虹桥机场。"), "导航到虹桥机场")
+
+    def test_none(self):
+        self.assertEqual(normalize_transcript(None), "")
+
+
+class TestSpeculativeIntentRunner(unittest.TestCase):
+
+    def test_hit_reuses_speculation(self):
+        understand = Mock(return_value=NAV_INTENT)
+        runner = SpeculativeIntentRunner(understand)
+
+        runner.on_partial("导航到虹桥机场")
+        runner.on_partial("导航到虹桥机场")
+        result = runner.finalize("导航到虹桥机场。")
+
+        self.assertEqual(result, NAV_INTENT)
+        understand.assert_called_once_with("导航到虹桥机场")
+
+    def test_miss_reruns_with_final_text(self):
+        understand = Mock(return_value=NAV_INTENT)
+        runner = SpeculativeIntentRunner(understand)
+
+        runner.on_partial("导航到虹桥")
+        runner.on_partial("导航到虹桥")
+        runner.finalize("导航到虹桥火车站")
+
+        self.assertEqual(understand.call_args_list[-1][0][0], "导航到虹桥火车站")
+
+    def test_unstable_partial_not_speculated(self):
+        understand = Mock(return_value=NAV_INTENT)
+        runner = SpeculativeIntentRunner(understand)
+
+        runner.on_partial("导航到")
+        runner.on_partial("导航到虹桥")
+        runner.on_partial("导航到虹桥机场")
+        runner.finalize("导航到虹桥机场")
+
+        understand.assert_called_once_with("导航到虹桥机场")
+
+    def test_short_prefix_not_speculated(self):
+        understand = Mock(return_value=NAV_INTENT)
+        runner = SpeculativeIntentRunner(understand, min_chars=4)
+
+        runner.on_partial("导航")
+        runner.on_partial("导航")
+        runner.finalize("导航")
+
+        understand.assert_called_once_with("导航")
+
+    def test_max_speculations(self):
+        started = threading.Event()
+        understand = Mock(side_effect=lambda text: started.set() or NAV_INTENT)
+        runner = SpeculativeIntentRunner(understand, stable_partials=1, max_speculations=2)
+
+        for partial in ["导航到虹桥", "导航到虹桥机", "导航到虹桥机场"]:
+            runner.on_partial(partial)
+            started.wait(1)
+
+        self.assertLessEqual(understand.call_count, 2)
+
+    def test_failed_speculation_falls_back(self):
+        understand = Mock(side_effect=[RuntimeError("boom"), NAV_INTENT])
+        runner = SpeculativeIntentRunner(understand)
+
+        runner.on_partial("导航到虹桥机场")
+        runner.on_partial("导航到虹桥机场")
+        result = runner.finalize("导航到虹桥机场")
+
+        self.assertEqual(result, NAV_INTENT)
+        self.assertEqual(understand.call_count, 2)
+
+    def test_speculate_fn_used_for_partials(self):
+        understand = Mock(return_value=NAV_INTENT)
+        speculate = Mock(return_value={"tool": "navigate", "params": {"destination": "推测"}})
+        runner = SpeculativeIntentRunner(understand, speculate_fn=speculate)
+
+        runner.on_partial("导航到虹桥机场")
+        runner.on_partial("导航到虹桥机场")
+        self.assertEqual(runner.finalize("导航到虹桥机场")["params"]["destination"], "推测")
+
+        speculate.assert_called_once_with("导航到虹桥机场")
+        understand.assert_not_called()
+
+    def test_speculate_none_understands_final_text(self):
+        understand = Mock(return_value=NAV_INTENT)
+        runner = SpeculativeIntentRunner(understand, speculate_fn=Mock(return_value=None))
+        hits = speculation_stats["hits"]
+
+        runner.on_partial("导航到虹桥机场")
+        runner.on_partial("导航到虹桥机场")
+        self.assertEqual(runner.finalize("导航到虹桥机场"), NAV_INTENT)
+
+        understand.assert_called_once_with("导航到虹桥机场")
+        self.assertEqual(speculation_stats["hits"], hits)
+
+    def test_speculation_runs_in_caller_context(self):
+        var = contextvars.ContextVar("request", default=None)
+        seen = []
+        runner = SpeculativeIntentRunner(Mock(), speculate_fn=lambda text: seen.append(var.get()) or NAV_INTENT)
+
+        token = var.set("当前指令")
+        try:
+            runner.on_partial("导航到虹桥机场")
+            runner.on_partial("导航到虹桥机场")
+            runner.finalize("导航到虹桥机场")
+        finally:
+            var.reset(token)
+        self.assertEqual(seen, ["当前指令"])
+
+    def test_exit_command_not_understood(self):
+        understand = Mock(return_value=NAV_INTENT)
+        runner = SpeculativeIntentRunner(understand)
+
+        runner.on_partial("退出导航吧")
+        runner.on_partial("退出导航吧")
+        self.assertIsNone(runner.finalize("退出导航吧。"))
+
+        understand.assert_not_called()
+
+
+class TestListenStreaming(unittest.TestCase):
+
+    def make_stream(self, frames, discarded=False):
+        stream = Mock()
+        stream.sample_rate = 16000
+        stream.sample_width = 2
+        stream.frames.return_value = iter(frames)
+        stream.discarded = discarded
+        return stream
+
+    @patch('streaming_asr.get_asr_backend')
+    @patch('streaming_asr.get_capture_service')
+    def test_success(self, mock_get_capture, mock_get_asr):
+        mock_get_capture.return_value.get_utterance_stream.return_value = self.make_stream([b"a", b"b", b"c"])
+        asr_stream = mock_get_asr.return_value.create_stream.return_value
+        asr_stream.accept.side_effect = ["导航到虹桥机场", None, "导航到虹桥机场"]
+        asr_stream.finish.return_value = "导航到虹桥机场"
+        understand = Mock(return_value=NAV_INTENT)
+
+        text, intent = listen_streaming(understand)
+
+        self.assertEqual(text, "导航到虹桥机场")
+        self.assertEqual(intent, NAV_INTENT)
+        self.assertEqual(asr_stream.accept.call_count, 3)
+
+    @patch('streaming_asr.get_asr_backend')
+    @patch('streaming_asr.get_capture_service')
+    def test_exit_command(self, mock_get_capture, mock_get_asr):
+        mock_get_capture.return_value.get_utterance_stream.return_value = self.make_stream([b"a"])
+        asr_stream = mock_get_asr.return_value.create_stream.return_value
+        asr_stream.accept.return_value = None
+        asr_stream.finish.return_value = "结束"
+        understand = Mock(return_value=NAV_INTENT)
+
+        self.assertEqual(listen_streaming(understand), ("结束", None))
+        understand.assert_not_called()
+
+    @patch('streaming_asr.get_asr_backend')
+    @patch('streaming_asr.get_capture_service')
+    def test_timeout(self, mock_get_capture, mock_get_asr):
+        mock_get_capture.return_value.get_utterance_stream.side_effect = sr.WaitTimeoutError()
+        understand = Mock()
+
+        self.assertEqual(listen_streaming(understand), (None, None))
+        understand.assert_not_called()
+
+    @patch('streaming_asr.get_asr_backend')
+    @patch('streaming_asr.get_capture_service')
+    def test_discarded_utterance(self, mock_get_capture, mock_get_asr):
+        mock_get_capture.return_value.get_utterance_stream.return_value = self.make_stream([b"a"], discarded=True)
+        mock_get_asr.return_value.create_stream.return_value.accept.return_value = None
+
+        self.assertEqual(listen_streaming(Mock()), (None, None))
+        mock_get_asr.return_value.create_stream.return_value.finish.assert_not_called()
+
+    @patch('streaming_asr.get_asr_backend')
+    @patch('streaming_asr.get_capture_service')
+    def test_unknown_value(self, mock_get_capture, mock_get_asr):
+        mock_get_capture.return_value.get_utterance_stream.return_value = self.make_stream([b"a"])
+        asr_stream = mock_get_asr.return_value.create_stream.return_value
+        asr_stream.accept.return_value = None
+        asr_stream.finish.side_effect = sr.UnknownValueError()
+
+        self.assertEqual(listen_streaming(Mock()), (None, None))
+
+    @patch.dict('os.environ', {'ASR_STREAMING': '1'})
+    def test_streaming_enabled(self):
+        self.assertTrue(streaming_enabled())
+
+
+if __name__ == '__main__':
+    unittest.main()
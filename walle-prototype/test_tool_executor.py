@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Test suite for tool_executor.py
+"""
+
+import threading
+import time
+import unittest
+from unittest.mock import Mock
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from tool_executor import ParallelToolExecutor, as_calls
+
+
+class TestAsCalls(unittest.TestCase):
+
+    def test_single_and_list(self):
+        call = {"tool": "navigate", "params": {}}
+        self.assertEqual(as_calls(call), [call])
+        self.assertEqual(as_calls([call, "bad", call]), [call, call])
+        self.assertEqual(as_calls(None), [])
+
+
+class TestParallelToolExecutor(unittest.TestCase):
+
+    def test_runs_concurrently_and_keeps_order(self):
+        def slow_tool(tool_name, **params):
+            time.sleep(0.2)
+            return f"{tool_name}:{params}"
+
+        executor = ParallelToolExecutor(slow_tool)
+        calls = [
+            {"tool": "navigate", "params": {"destination": "虹桥机场"}},
+            {"tool": "get_weather", "params": {"city": "上海", "date": "明天"}},
+            {"tool": "play_music", "params": {"song": "晴天"}},
+        ]
+
+        started = time.perf_counter()
+        results = executor.run(calls)
+        elapsed = time.perf_counter() - started
+
+        self.assertLess(elapsed, 0.45)
+        self.assertEqual([r.tool for r in results], ["navigate", "get_weather", "play_music"])
+        self.assertEqual(results[1].result, "get_weather:{'city': '上海', 'date': '明天'}")
+        self.assertEqual(executor.parallel_runs, 1)
+        self.assertGreater(executor.saved_ms, 0)
+
+    def test_single_call_runs_inline(self):
+        threads = []
+
+        def tool(tool_name, **params):
+            threads.append(threading.current_thread())
+            return "ok"
+
+        results = ParallelToolExecutor(tool).run([{"tool": "navigate", "params": {}}])
+
+        self.assertEqual(results[0].result, "ok")
+        self.assertIs(threads[0], threading.current_thread())
+
+    def test_duplicate_calls_executed_once(self):
+        call_fn = Mock(return_value="ok")
+        call = {"tool": "get_weather", "params": {"city": "上海"}}
+
+        results = ParallelToolExecutor(call_fn).run([call, dict(call)])
+
+        call_fn.assert_called_once_with("get_weather", city="上海")
+        self.assertEqual(len(results), 2)
+
+    def test_error_isolated(self):
+        def tool(tool_name, **params):
+            if tool_name == "navigate":
+                raise RuntimeError("地图打不开")
+            return "ok"
+
+        results = ParallelToolExecutor(tool).run([
+            {"tool": "navigate", "params": {}},
+            {"tool": "get_weather", "params": {}},
+        ])
+
+        self.assertEqual(results[0].error, "地图打不开")
+        self.assertEqual(results[1].result, "ok")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Test suite for tool_manifest.py
+"""
+
+import json
+import os
+import sys
+import tempfile
+import textwrap
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from mcp_client_simple import SimpleMCPClient, create_simple_mcp_client
+from tool_manifest import LazyTool, ToolManifest, scan_module
+from tool_schema import function_schema
+
+TOOL_SOURCE = '''
+CALLS = []
+
+
+def forecast(city: str, days: int = 1, *, detail: bool = False, unit=None) -> str:
+    """
+    Get weather forecast
+
+    Args:
+        city: City name
+        days: Number of days
+    """
+    CALLS.append(city)
+    return f"{city} {days}"
+
+
+TOOLS = {
+    "forecast": forecast,
+}
+'''
+
+
+class TestScanModule(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, source):
+        path = self.dir / name
+        path.write_text(textwrap.dedent(source), encoding="utf-8")
+        return str(path)
+
+    def test_signature_and_doc(self):
+        tools = scan_module(self.write("manifest_forecast_tools.py", TOOL_SOURCE))
+        entry = tools["forecast"]
+        self.assertEqual(entry["function"], "forecast")
+        self.assertEqual([(p["name"], p["kind"], p.get("default", "-")) for p in entry["params"]], [
+            ("city", "POSITIONAL_OR_KEYWORD", "-"),
+            ("days", "POSITIONAL_OR_KEYWORD", 1),
+            ("detail", "KEYWORD_ONLY", False),
+            ("unit", "KEYWORD_ONLY", None),
+        ])
+
+        namespace = {}
+        exec(TOOL_SOURCE, namespace)
+        lazy = LazyTool("forecast", entry, lambda: {})
+        self.assertEqual(lazy.__doc__, namespace["forecast"].__doc__)
+        self.assertEqual(function_schema("forecast", lazy), function_schema("forecast", namespace["forecast"]))
+
+    def test_unsupported_modules(self):
+        self.assertIsNone(scan_module(self.write("no_table.py", "def f():\n    pass\n")))
+        self.assertIsNone(scan_module(self.write("built.py", "def f():\n    pass\nTOOLS = dict(f=f)\n")))
+        self.assertIsNone(scan_module(self.write("dynamic_default.py", """
+            import os
+
+            def f(path: str = os.getcwd()):
+                pass
+
+            TOOLS = {"f": f}
+        """)))
+        self.assertIsNone(scan_module(str(self.dir / "missing.py")))
+
+
+class TestToolManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.module = self.dir / "manifest_cached_tools.py"
+        self.module.write_text(TOOL_SOURCE, encoding="utf-8")
+        self.path = str(self.dir / "manifest.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        sys.modules.pop("manifest_cached_tools", None)
+
+    def test_cached_until_module_changes(self):
+        first = ToolManifest(self.path)
+        first.tools(str(self.module))
+        first.save()
+        self.assertEqual(first.stats, {"hits": 0, "scanned": 1})
+
+        second = ToolManifest(self.path)
+        self.assertIn("forecast", second.tools(str(self.module)))
+        self.assertEqual(second.stats, {"hits": 1, "scanned": 0})
+
+        self.module.write_text(TOOL_SOURCE.replace('"forecast": forecast', '"weather": forecast'), encoding="utf-8")
+        os.utime(self.module, ns=(0, 0))
+        self.assertEqual(list(ToolManifest(self.path).tools(str(self.module))), ["weather"])
+
+    def test_corrupt_file_rebuilt(self):
+        Path(self.path).write_text("{", encoding="utf-8")
+        manifest = ToolManifest(self.path)
+        self.assertIn("forecast", manifest.tools(str(self.module)))
+        manifest.save()
+        self.assertEqual(json.loads(Path(self.path).read_text(encoding="utf-8"))["version"], 1)
+
+    def test_client_imports_on_first_call(self):
+        client = SimpleMCPClient()
+        client.register_tools_module("forecast", str(self.module), manifest=ToolManifest())
+
+        self.assertEqual(client.list_tools(), ["forecast"])
+        self.assertEqual(client.tool_schemas()[0]["function"]["parameters"]["required"], ["city"])
+        self.assertNotIn("manifest_cached_tools", sys.modules)
+
+        self.assertEqual(client.call_tool("forecast", city="上海", days=3), "上海 3")
+        self.assertIn("manifest_cached_tools", sys.modules)
+        self.assertEqual(sys.modules["manifest_cached_tools"].CALLS, ["上海"])
+
+    def test_falls_back_to_import(self):
+        self.module.write_text(TOOL_SOURCE + "TOOLS = dict(TOOLS)\n", encoding="utf-8")
+        client = SimpleMCPClient()
+        client.register_tools_module("forecast", str(self.module), manifest=ToolManifest())
+        self.assertNotIsInstance(client.tools["forecast"], LazyTool)
+        self.assertIn("manifest_cached_tools", sys.modules)
+
+
+class TestSimpleClientManifest(unittest.TestCase):
+
+    def test_lazy_matches_eager(self):
+        with patch.dict('os.environ', {'TOOL_MANIFEST_PATH': ''}):
+            lazy = create_simple_mcp_client(lazy=True)
+        eager = create_simple_mcp_client(lazy=False)
+
+        self.assertEqual(lazy.list_tools(), eager.list_tools())
+        self.assertEqual(lazy.tool_schemas(), eager.tool_schemas())
+        for name in eager.list_tools():
+            self.assertIsInstance(lazy.tools[name], LazyTool)
+            self.assertEqual(lazy.get_tool_info(name), eager.get_tool_info(name))
+
+
+if __name__ == '__main__':
+    unittest.main()
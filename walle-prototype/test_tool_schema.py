@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Test suite for tool_schema.py
+"""
+
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from mcp_client_simple import create_simple_mcp_client
+from tool_schema import (
+    describe_tools,
+    function_schema,
+    intent_from_message,
+    mcp_tool_schema,
+    parse_arg_docs,
+    tool_request_kwargs,
+)
+
+
+def sample_tool(city: str, days: int = 1, detail: bool = False) -> str:
+    """
+    Get weather forecast
+
+    Args:
+        city: City name
+        days: Number of days,
+              counted from today
+        detail: Whether to include details
+
+    Returns:
+        Forecast text
+    """
+    return city
+
+
+def _message(content=None, tool_calls=None):
+    return SimpleNamespace(content=content, tool_calls=tool_calls)
+
+
+def _tool_call(name, arguments):
+    return SimpleNamespace(function=SimpleNamespace(name=name, arguments=arguments))
+
+
+class TestFunctionSchema(unittest.TestCase):
+
+    def test_parse_arg_docs(self):
+        docs = parse_arg_docs(sample_tool.__doc__)
+        self.assertEqual(docs["city"], "City name")
+        self.assertEqual(docs["days"], "Number of days, counted from today")
+        self.assertNotIn("Forecast", str(docs))
+
+    def test_function_schema(self):
+        schema = function_schema("forecast", sample_tool)
+        function = schema["function"]
+
+        self.assertEqual(schema["type"], "function")
+        self.assertEqual(function["name"], "forecast")
+        self.assertEqual(function["description"], "Get weather forecast")
+        self.assertEqual(function["parameters"]["required"], ["city"])
+        self.assertEqual(function["parameters"]["properties"]["days"], {
+            "type": "integer", "description": "Number of days, counted from today", "default": 1,
+        })
+        self.assertEqual(function["parameters"]["properties"]["detail"]["type"], "boolean")
+
+    def test_mcp_tool_schema(self):
+        tool = SimpleNamespace(
+            name="navigate",
+            description=sample_tool.__doc__,
+            inputSchema={
+                "title": "navigateArguments",
+                "type": "object",
+                "properties": {"city": {"title": "City", "type": "string"}},
+                "required": ["city"],
+            },
+        )
+        schema = mcp_tool_schema(tool)
+
+        self.assertEqual(schema["function"]["name"], "navigate")
+        self.assertEqual(schema["function"]["parameters"], {
+            "type": "object",
+            "properties": {"city": {"type": "string", "description": "City name"}},
+            "required": ["city"],
+        })
+
+    def test_simple_client_schemas_match_defaults(self):
+        client = create_simple_mcp_client()
+        schemas = {s["function"]["name"]: s for s in client.tool_schemas()}
+
+        self.assertEqual(set(schemas), set(client.list_tools()))
+        self.assertEqual(
+            schemas["navigate"]["function"]["parameters"]["properties"]["map_service"]["default"], "amap"
+        )
+        self.assertIs(client.tool_schemas(), client.tool_schemas())
+
+    def test_describe_tools(self):
+        text = describe_tools([function_schema("forecast", sample_tool)])
+        self.assertIn('1. forecast(city, days=1, detail=false) - Get weather forecast', text)
+
+
+class TestIntentFromMessage(unittest.TestCase):
+
+    def test_tool_call(self):
+        message = _message(tool_calls=[_tool_call("navigate", '{"origin": "上海", "destination": "北京"}')])
+        self.assertEqual(intent_from_message(message), {
+            "tool": "navigate", "params": {"origin": "上海", "destination": "北京"},
+        })
+
+    def test_multiple_tool_calls(self):
+        message = _message(tool_calls=[
+            _tool_call("navigate", '{"origin": "当前位置", "destination": "虹桥机场"}'),
+            _tool_call("get_weather", '{"city": "上海", "date": "明天"}'),
+        ])
+        self.assertEqual([c["tool"] for c in intent_from_message(message)], ["navigate", "get_weather"])
+
+    def test_json_calls(self):
+        message = _message(content='{"calls": [{"tool": "navigate", "params": {"destination": "外滩"}}, {"tool": "play_music"}]}')
+        self.assertEqual(intent_from_message(message), [
+            {"tool": "navigate", "params": {"destination": "外滩"}},
+            {"tool": "play_music", "params": {}},
+        ])
+
+    def test_tool_call_without_arguments(self):
+        message = _message(tool_calls=[_tool_call("get_help", "")])
+        self.assertEqual(intent_from_message(message), {"tool": "get_help", "params": {}})
+
+    def test_json_content(self):
+        message = _message(content='{"tool": "get_weather", "params": {"city": "上海"}}')
+        self.assertEqual(intent_from_message(message)["params"], {"city": "上海"})
+
+    def test_plain_reply_is_unknown(self):
+        self.assertEqual(intent_from_message(_message(content="你想去哪里?")), {"tool": "unknown", "params": {}})
+        self.assertEqual(intent_from_message(_message()), {"tool": "unknown", "params": {}})
+
+
+class TestToolRequestKwargs(unittest.TestCase):
+
+    def test_native(self):
+        schemas = [function_schema("forecast", sample_tool)]
+        self.assertEqual(tool_request_kwargs(schemas, "native"), {"tools": schemas, "tool_choice": "auto"})
+
+    @patch.dict('os.environ', {'LLM_TOOL_CALLING': 'json'})
+    def test_json_mode_from_env(self):
+        self.assertEqual(tool_request_kwargs([]), {"response_format": {"type": "json_object"}})
+
+
+if __name__ == '__main__':
+    unittest.main()
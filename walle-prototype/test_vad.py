@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Test suite for vad.py
+"""
+
+import unittest
+from unittest.mock import Mock, patch
+import struct
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from vad import (
+    EnergyEndpointer,
+    WebRTCEndpointer,
+    create_endpointer,
+    create_endpointer_from_env,
+    frame_rms,
+)
+
+SAMPLE_RATE = 16000
+FRAME_SAMPLES = 160  # 10ms
+
+
+def make_frame(amplitude, samples=FRAME_SAMPLES):
+    return struct.pack(f"<{samples}h", *([amplitude] * samples))
+
+
+SPEECH = make_frame(2000)
+SILENCE = make_frame(0)
+
+
+def feed(endpointer, frames):
+    results = []
+    for frame in frames:
+        utterance = endpointer.process(frame)
+        if utterance is not None:
+            results.append(utterance)
+    return results
+
+
+class TestFrameRMS(unittest.TestCase):
+
+    def test_silence(self):
+        self.assertEqual(frame_rms(SILENCE), 0.0)
+
+    def test_constant_amplitude(self):
+        self.assertAlmostEqual(frame_rms(make_frame(1000)), 1000.0)
+
+    def test_empty_frame(self):
+        self.assertEqual(frame_rms(b""), 0.0)
+
+    def test_invalid_width(self):
+        with self.assertRaises(ValueError):
+            frame_rms(b"\x00\x00\x00", 3)
+
+
+class TestEnergyEndpointer(unittest.TestCase):
+
+    def make(self, **kwargs):
+        kwargs.setdefault("hangover_ms", 100)
+        kwargs.setdefault("preroll_ms", 30)
+        kwargs.setdefault("min_speech_ms", 50)
+        return EnergyEndpointer(SAMPLE_RATE, energy_threshold=300, **kwargs)
+
+    def test_hangover_ends_utterance(self):
+        endpointer = self.make()
+
+        results = feed(endpointer, [SILENCE] * 5 + [SPEECH] * 20 + [SILENCE] * 9)
+        self.assertEqual(results, [])
+        self.assertTrue(endpointer.in_speech)
+
+        results = feed(endpointer, [SILENCE])
+        self.assertEqual(len(results), 1)
+        self.assertFalse(endpointer.in_speech)
+        self.assertAlmostEqual(results[0].speech_ms, 200)
+        self.assertFalse(results[0].truncated)
+
+    def test_preroll_included(self):
+        endpointer = self.make()
+
+        utterance = feed(endpointer, [SILENCE] * 10 + [SPEECH] * 10 + [SILENCE] * 10)[0]
+
+        # 3 帧 pre-roll + 10 帧语音 + 10 帧 hangover
+        self.assertEqual(len(utterance.data), 23 * FRAME_SAMPLES * 2)
+
+    def test_short_pause_does_not_split(self):
+        endpointer = self.make()
+
+        frames = [SPEECH] * 10 + [SILENCE] * 5 + [SPEECH] * 10 + [SILENCE] * 10
+        results = feed(endpointer, frames)
+
+        self.assertEqual(len(results), 1)
+        self.assertAlmostEqual(results[0].speech_ms, 200)
+
+    def test_max_utterance_truncates(self):
+        endpointer = self.make(max_utterance_ms=150)
+
+        results = feed(endpointer, [SPEECH] * 40)
+
+        self.assertEqual(len(results), 2)
+        self.assertTrue(all(u.truncated for u in results))
+
+    def test_short_noise_discarded(self):
+        endpointer = self.make()
+
+        results = feed(endpointer, [SPEECH] * 2 + [SILENCE] * 20)
+
+        self.assertEqual(results, [])
+        self.assertEqual(endpointer.stats.count, 0)
+
+    def test_latency_recorded(self):
+        endpointer = self.make()
+
+        feed(endpointer, [SPEECH] * 10 + [SILENCE] * 10)
+
+        summary = endpointer.stats.summary()
+        self.assertEqual(summary["count"], 1)
+        self.assertGreaterEqual(summary["p50"], 0)
+
+    def test_reset(self):
+        endpointer = self.make()
+        feed(endpointer, [SPEECH] * 10)
+
+        endpointer.reset()
+
+        self.assertFalse(endpointer.in_speech)
+        self.assertEqual(feed(endpointer, [SILENCE] * 20), [])
+
+
+class TestWebRTCEndpointer(unittest.TestCase):
+
+    @patch('vad.webrtcvad')
+    def test_majority_vote_over_subframes(self, mock_webrtcvad):
+        mock_vad = Mock()
+        mock_webrtcvad.Vad.return_value = mock_vad
+        mock_vad.is_speech.side_effect = [True, True, False]
+        endpointer = WebRTCEndpointer(SAMPLE_RATE, aggressiveness=3)
+
+        # 90ms = 3 个 30ms 子帧
+        self.assertTrue(endpointer.is_speech(make_frame(0, 1440)))
+        mock_webrtcvad.Vad.assert_called_once_with(3)
+        self.assertEqual(mock_vad.is_speech.call_count, 3)
+
+    @patch('vad.webrtcvad')
+    def test_partial_subframe_carried_over(self, mock_webrtcvad):
+        mock_vad = Mock()
+        mock_webrtcvad.Vad.return_value = mock_vad
+        mock_vad.is_speech.return_value = True
+        endpointer = WebRTCEndpointer(SAMPLE_RATE)
+
+        self.assertFalse(endpointer.is_speech(make_frame(0, 320)))
+        mock_vad.is_speech.assert_not_called()
+        self.assertTrue(endpointer.is_speech(make_frame(0, 320)))
+        mock_vad.is_speech.assert_called_once()
+
+    @patch('vad.webrtcvad')
+    def test_unsupported_sample_rate(self, mock_webrtcvad):
+        with self.assertRaises(ValueError):
+            WebRTCEndpointer(44100)
+
+    @patch('vad.webrtcvad', None)
+    def test_missing_dependency(self):
+        with self.assertRaises(ImportError):
+            WebRTCEndpointer(SAMPLE_RATE)
+
+
+class TestCreateEndpointer(unittest.TestCase):
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            create_endpointer("nope", SAMPLE_RATE)
+
+    @patch.dict('os.environ', {'VAD_BACKEND': 'energy', 'VAD_HANGOVER_MS': '250',
+                               'VAD_ENERGY_THRESHOLD': '500'})
+    def test_from_env(self):
+        endpointer = create_endpointer_from_env(SAMPLE_RATE)
+
+        self.assertIsInstance(endpointer, EnergyEndpointer)
+        self.assertEqual(endpointer.hangover_ms, 250)
+        self.assertEqual(endpointer.energy_threshold, 500)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Test suite for wake_word.py
+"""
+
+import queue
+import unittest
+from unittest.mock import Mock, patch
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import numpy as np
+import speech_recognition as sr
+import wake_word
+from audio_capture import UtteranceStream
+from wake_word import WakeWordDetector, WakeWordGate, get_wake_gate, mfcc
+
+RATE = 16000
+
+
+def tones(freqs, duration=0.15, amplitude=6000):
+    t = np.arange(int(RATE * duration)) / RATE
+    return np.concatenate([
+        amplitude * np.sin(2 * np.pi * f * t) + amplitude * 0.3 * np.sin(2 * np.pi * 2.1 * f * t)
+        for f in freqs
+    ])
+
+
+def pcm(*parts):
+    return np.concatenate(parts).astype("<i2").tobytes()
+
+
+SILENCE = np.zeros(int(RATE * 0.3))
+WAKE = tones([300, 500, 800, 600, 400])
+WAKE_SPOKEN = tones([310, 510, 790, 610, 395], duration=0.16)
+COMMAND = tones([1200, 200, 1500], duration=0.3)
+OTHER = tones([1200, 200, 1500, 900, 1800])
+
+
+def make_detector():
+    return WakeWordDetector([pcm(SILENCE, WAKE * k, SILENCE) for k in (1.0, 0.7, 1.2)])
+
+
+def make_stream(data, chunk=1600):
+    stream = UtteranceStream(RATE, 2)
+    for offset in range(0, len(data), chunk):
+        stream.push(data[offset:offset + chunk])
+    stream.close(data)
+    return stream
+
+
+class FakeCapture:
+    def __init__(self, streams):
+        self.streams = queue.Queue()
+        for stream in streams:
+            self.streams.put(stream)
+        self.running = True
+
+    def get_utterance_stream(self, timeout=None):
+        try:
+            return self.streams.get(timeout=timeout if timeout is not None else 1)
+        except queue.Empty:
+            raise sr.WaitTimeoutError()
+
+
+class TestMFCC(unittest.TestCase):
+
+    def test_shape(self):
+        features, energy = mfcc(pcm(WAKE))
+
+        # 0.75s, 10ms 帧移
+        self.assertEqual(features.shape[1], 12)
+        self.assertAlmostEqual(len(features), 73, delta=2)
+        self.assertEqual(len(energy), len(features))
+
+    def test_too_short(self):
+        features, _ = mfcc(b"\x00\x00" * 100)
+
+        self.assertEqual(len(features), 0)
+
+
+class TestWakeWordDetector(unittest.TestCase):
+
+    def setUp(self):
+        self.detector = make_detector()
+
+    def test_detects_wake_word_and_end(self):
+        woke, distance, end = self.detector.detect(sr.AudioData(pcm(SILENCE, WAKE_SPOKEN, COMMAND), RATE, 2))
+
+        self.assertTrue(woke)
+        self.assertLess(distance, self.detector.threshold)
+        self.assertAlmostEqual(end, 0.3 + 0.8, delta=0.1)
+
+    def test_rejects_other_speech(self):
+        woke, _, end = self.detector.detect(sr.AudioData(pcm(SILENCE, OTHER), RATE, 2))
+
+        self.assertFalse(woke)
+        self.assertIsNone(end)
+
+    def test_rejects_noise(self):
+        noise = np.random.default_rng(1).normal(0, 2000, RATE)
+
+        self.assertFalse(self.detector.detect(sr.AudioData(pcm(SILENCE, noise), RATE, 2))[0])
+
+    def test_resamples_input(self):
+        audio = sr.AudioData(pcm(SILENCE, WAKE_SPOKEN), RATE, 2)
+        resampled = sr.AudioData(audio.get_raw_data(convert_rate=44100), 44100, 2)
+
+        self.assertTrue(self.detector.detect(resampled)[0])
+
+    def test_missing_templates(self):
+        with self.assertRaises(FileNotFoundError):
+            WakeWordDetector.from_directory("/nonexistent/templates")
+
+
+class TestWakeWordGate(unittest.TestCase):
+
+    def setUp(self):
+        self.detector = make_detector()
+
+    def test_ignores_speech_without_wake_word(self):
+        capture = FakeCapture([make_stream(pcm(SILENCE, OTHER))])
+        gate = WakeWordGate(capture, self.detector)
+
+        with self.assertRaises(sr.WaitTimeoutError):
+            gate.get_utterance(timeout=0.3)
+        self.assertEqual(gate.report()["utterances"], 1)
+        self.assertEqual(gate.report()["commands"], 0)
+
+    def test_command_in_same_utterance(self):
+        capture = FakeCapture([make_stream(pcm(SILENCE, WAKE_SPOKEN, COMMAND, SILENCE))])
+        gate = WakeWordGate(capture, self.detector)
+
+        audio = gate.get_utterance(timeout=1)
+
+        # 只保留唤醒词之后的指令部分 (0.9s 指令 + 0.3s 静音)
+        seconds = len(audio.frame_data) / (RATE * 2)
+        self.assertAlmostEqual(seconds, 1.2, delta=0.15)
+        self.assertEqual(gate.wakes, 1)
+        self.assertEqual(gate.commands, 1)
+        self.assertEqual(gate.wake_latency.count, 1)
+
+    def test_wake_word_then_next_utterance(self):
+        command = make_stream(pcm(SILENCE, OTHER))
+        capture = FakeCapture([make_stream(pcm(SILENCE, WAKE_SPOKEN, SILENCE)), command])
+        gate = WakeWordGate(capture, self.detector)
+
+        audio = gate.get_utterance(timeout=1)
+
+        self.assertIs(audio, command.audio)
+        self.assertFalse(gate.awake)
+        self.assertEqual(gate.report()["commands"], 1)
+
+
+class TestGetWakeGate(unittest.TestCase):
+
+    @patch.dict('os.environ', {'WAKE_WORD': '0'})
+    def test_disabled_returns_capture(self):
+        capture = Mock()
+
+        self.assertIs(get_wake_gate(capture), capture)
+
+    @patch.dict('os.environ', {'WAKE_WORD': '1'})
+    def test_enabled_wraps_capture(self):
+        capture = Mock()
+        with patch.object(wake_word, '_gate', None), \
+             patch.object(WakeWordDetector, 'from_directory', return_value=make_detector()):
+            gate = get_wake_gate(capture)
+
+            self.assertIsInstance(gate, WakeWordGate)
+            self.assertIs(get_wake_gate(capture), gate)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+"""
+WALL-E 文本工具
+识别结果和用户输入的归一化,供流式识别、意图缓存等模块比较文本使用
+"""
+
+import re
+
+_PUNCTUATION = re.compile(r"[\s,.!?;:，。！？；：、\"'“”‘’]+")
+
+# 主循环遇到这些词时结束程序
+EXIT_WORDS = ("退出", "结束")
+
+
+def normalize_transcript(text: str) -> str:
+    """去掉空白和标点,用于比较识别结果"""
+    return _PUNCTUATION.sub("", text or "")
+
+
+def is_exit_command(text: str) -> bool:
+    """是否为结束程序的指令"""
+    return any(word in (text or "") for word in EXIT_WORDS)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+WALL-E 工具并行执行
+一句话里包含多个需求 ("导航去虹桥机场顺便查下上海明天的天气") 时,
+意图层返回多个工具调用;这些调用互不依赖,放进线程池并行执行,
+总耗时取决于最慢的工具而不是所有工具之和
+"""
+
+import atexit
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from logger_config import setup_logger
+
+logger = setup_logger("WALL-E.ToolExecutor", level=os.getenv("LOG_LEVEL", "INFO"))
+
+Intent = Union[Dict[str, Any], List[Dict[str, Any]]]
+
+
+def as_calls(intent: Intent) -> List[Dict[str, Any]]:
+    """
+    把意图统一转换为工具调用列表
+
+    Args:
+        intent: 单个 {"tool", "params"} 或它们的列表
+
+    Returns:
+        工具调用列表
+    """
+    if isinstance(intent, list):
+        return [call for call in intent if isinstance(call, dict)]
+    return [intent] if isinstance(intent, dict) else []
+
+
+@dataclass
+class ToolResult:
+    """一次工具调用的结果"""
+    tool: str
+    params: Dict[str, Any]
+    result: Any = None
+    error: Optional[str] = None
+    elapsed_ms: float = 0.0
+
+
+class ParallelToolExecutor:
+    """
+    并行执行互不依赖的工具调用,结果按原顺序返回
+
+    只有一个调用时直接在当前线程执行;完全相同的调用只执行一次
+    """
+
+    def __init__(self, call_fn: Callable[..., Any], max_workers: int = 4):
+        """
+        Args:
+            call_fn: 工具调用函数,形如 mcp_client.call_tool(tool_name, **params)
+            max_workers: 最多同时执行的工具数
+        """
+        self.call_fn = call_fn
+        self.max_workers = max_workers
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+        self.parallel_runs = 0
+        self.saved_ms = 0.0
+
+    def _call(self, call: Dict[str, Any]) -> ToolResult:
+        tool, params = call.get("tool"), call.get("params") or {}
+        started = time.perf_counter()
+        try:
+            result = ToolResult(tool, params, result=self.call_fn(tool, **params))
+        except Exception as e:
+            logger.error(f"工具 {tool} 执行失败: {e}", exc_info=True)
+            result = ToolResult(tool, params, error=str(e))
+        result.elapsed_ms = (time.perf_counter() - started) * 1000
+        return result
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="WALL-E-Tool")
+            return self._pool
+
+    def run(self, calls: List[Dict[str, Any]]) -> List[ToolResult]:
+        """
+        执行一组工具调用
+
+        Args:
+            calls: [{"tool", "params"}, ...]
+
+        Returns:
+            与 calls 顺序一致的 ToolResult 列表
+        """
+        unique: Dict[str, Dict[str, Any]] = {}
+        keys = []
+        for call in calls:
+            key = repr((call.get("tool"), sorted((call.get("params") or {}).items(), key=lambda kv: kv[0])))
+            unique.setdefault(key, call)
+            keys.append(key)
+
+        if len(unique) <= 1:
+            results = {key: self._call(call) for key, call in unique.items()}
+            return [results[key] for key in keys]
+
+        started = time.perf_counter()
+        # 每个任务带上当前上下文 (时间预算等),工作线程里也能读到
+        futures = {
+            key: self._executor().submit(contextvars.copy_context().run, self._call, call)
+            for key, call in unique.items()
+        }
+        results = {key: future.result() for key, future in futures.items()}
+        wall_ms = (time.perf_counter() - started) * 1000
+
+        serial_ms = sum(r.elapsed_ms for r in results.values())
+        with self._lock:
+            self.parallel_runs += 1
+            self.saved_ms += max(0.0, serial_ms - wall_ms)
+        logger.info(f"并行执行 {len(unique)} 个工具, 耗时 {wall_ms:.0f}ms (串行需要 {serial_ms:.0f}ms)")
+        return [results[key] for key in keys]
+
+    def log_stats(self):
+        if self.parallel_runs:
+            logger.info(f"工具并行执行 {self.parallel_runs} 次, 共节省 {self.saved_ms:.0f}ms")
+
+
+def create_tool_executor(mcp_client) -> ParallelToolExecutor:
+    """根据环境变量 TOOL_MAX_WORKERS 创建并行执行器"""
+    executor = ParallelToolExecutor(
+        mcp_client.call_tool,
+        max_workers=int(os.getenv("TOOL_MAX_WORKERS", "4")),
+    )
+    atexit.register(executor.log_stats)
+    return executor
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+WALL-E 工具清单
+不导入工具模块,直接用 AST 读取 TOOLS 字典中每个工具的函数签名和文档,
+按模块文件的修改时间缓存到磁盘;SimpleMCPClient 据此列出工具、生成模型用的工具描述,
+第一次调用某个工具时才导入它所在的模块
+"""
+
+import argparse
+import ast
+import inspect
+import json
+import os
+import subprocess
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from logger_config import setup_logger
+
+logger = setup_logger("WALL-E.ToolManifest", level=os.getenv("LOG_LEVEL", "INFO"))
+
+DEFAULT_MANIFEST_PATH = "~/.walle/tool_manifest.json"
+
+# 清单格式变化时递增,旧缓存整体作废
+MANIFEST_VERSION = 1
+
+# 清单只记录注解名称,这些内置类型还原成类型对象,其余保持为空 (与 function_schema 的处理一致)
+_ANNOTATIONS = {"str": str, "int": int, "float": float, "bool": bool, "list": list, "dict": dict}
+
+_JSON_DEFAULTS = (str, int, float, bool, type(None))
+
+
+def _param_entries(args: ast.arguments) -> Optional[List[Dict[str, Any]]]:
+    """函数参数 → 清单条目;有不能静态求值的默认值时返回 None"""
+    positional = args.posonlyargs + args.args
+    padded = [None] * (len(positional) - len(args.defaults)) + list(args.defaults)
+    slots = [
+        (arg, "POSITIONAL_ONLY" if i < len(args.posonlyargs) else "POSITIONAL_OR_KEYWORD", default)
+        for i, (arg, default) in enumerate(zip(positional, padded))
+    ]
+    if args.vararg:
+        slots.append((args.vararg, "VAR_POSITIONAL", None))
+    slots += [(arg, "KEYWORD_ONLY", default) for arg, default in zip(args.kwonlyargs, args.kw_defaults)]
+    if args.kwarg:
+        slots.append((args.kwarg, "VAR_KEYWORD", None))
+
+    params = []
+    for arg, kind, default in slots:
+        entry: Dict[str, Any] = {"name": arg.arg, "kind": kind}
+        if arg.annotation is not None:
+            entry["annotation"] = ast.unparse(arg.annotation)
+        if default is not None:
+            try:
+                value = ast.literal_eval(default)
+            except ValueError:
+                return None
+            if not isinstance(value, _JSON_DEFAULTS):
+                return None
+            entry["default"] = value
+        params.append(entry)
+    return params
+
+
+def scan_module(path: str) -> Optional[Dict[str, Dict[str, Any]]]:
+    """
+    不导入模块,读取 TOOLS 字典中每个工具的签名和文档
+
+    Args:
+        path: 工具模块文件路径
+
+    Returns:
+        工具名 → {"function", "doc", "params"};没有字面量 TOOLS 字典、工具不是模块顶层函数
+        或默认值不能静态求值时返回 None,调用方应改为直接导入模块
+    """
+    try:
+        tree = ast.parse(Path(path).read_text(encoding="utf-8"), filename=path)
+    except (OSError, SyntaxError, ValueError) as e:
+        logger.debug(f"解析工具模块失败 ({path}): {e}")
+        return None
+
+    functions = {node.name: node for node in tree.body if isinstance(node, ast.FunctionDef)}
+    table = None
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id == "TOOLS" for t in node.targets):
+            table = node.value
+        elif isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name) and node.target.id == "TOOLS":
+            table = node.value
+    if not isinstance(table, ast.Dict):
+        return None
+
+    tools: Dict[str, Dict[str, Any]] = {}
+    for key, value in zip(table.keys, table.values):
+        if not (isinstance(key, ast.Constant) and isinstance(key.value, str) and isinstance(value, ast.Name)):
+            return None
+        func = functions.get(value.id)
+        params = _param_entries(func.args) if func is not None else None
+        if params is None:
+            return None
+        tools[key.value] = {"function": func.name, "doc": ast.get_docstring(func, clean=False), "params": params}
+    return tools
+
+
+def manifest_signature(params: List[Dict[str, Any]]) -> inspect.Signature:
+    """根据清单中的参数条目还原函数签名 (供 inspect.signature / function_schema 使用)"""
+    return inspect.Signature([
+        inspect.Parameter(
+            p["name"],
+            getattr(inspect.Parameter, p["kind"]),
+            default=p.get("default", inspect.Parameter.empty),
+            annotation=_ANNOTATIONS.get(p.get("annotation"), inspect.Parameter.empty),
+        )
+        for p in params
+    ])
+
+
+class ToolManifest:
+    """
+    工具清单的磁盘缓存
+
+    每个模块按文件路径记录修改时间和大小,文件变化后重新解析;path 为空时只在内存中解析
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(os.path.expanduser(path)) if path else None
+        self._modules: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "scanned": 0}
+        if self.path is not None:
+            self._modules = self._read()
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取工具清单失败,重新生成: {e}")
+            return {}
+        if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+            return {}
+        return data.get("modules") or {}
+
+    def tools(self, module_path: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        获取模块的工具清单 (文件未变化时直接使用缓存)
+
+        Args:
+            module_path: 工具模块文件路径
+
+        Returns:
+            同 scan_module()
+        """
+        key = str(Path(module_path).resolve())
+        try:
+            stat = os.stat(key)
+        except OSError:
+            return None
+        with self._lock:
+            cached = self._modules.get(key)
+            if cached and cached.get("mtime_ns") == stat.st_mtime_ns and cached.get("size") == stat.st_size:
+                self.stats["hits"] += 1
+                return cached.get("tools")
+            tools = scan_module(key)
+            self.stats["scanned"] += 1
+            self._modules[key] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "tools": tools}
+            self._dirty = True
+            return tools
+
+    def save(self):
+        """有新解析的模块时写回磁盘"""
+        with self._lock:
+            if self.path is None or not self._dirty:
+                return
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = self.path.with_suffix(".tmp")
+                data = {"version": MANIFEST_VERSION, "modules": self._modules}
+                tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+                os.replace(tmp, self.path)
+                self._dirty = False
+            except OSError as e:
+                logger.warning(f"保存工具清单失败: {e}")
+
+
+class LazyTool:
+    """
+    按清单注册的工具
+
+    签名和文档来自清单,第一次调用时才导入模块并取出 TOOLS 中的真实函数
+    """
+
+    def __init__(self, name: str, entry: Dict[str, Any], loader: Callable[[], Dict[str, Callable]]):
+        """
+        Args:
+            name: 工具名称
+            entry: 清单条目
+            loader: 导入模块并返回其 TOOLS 字典
+        """
+        self.name = name
+        self.__doc__ = entry.get("doc")
+        self.__signature__ = manifest_signature(entry["params"])
+        self._loader = loader
+        self._func: Optional[Callable] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._func is not None
+
+    def load(self) -> Callable:
+        if self._func is None:
+            self._func = self._loader()[self.name]
+        return self._func
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+    def __repr__(self):
+        return f"<LazyTool {self.name}{' (loaded)' if self.loaded else ''}>"
+
+
+def manifest_enabled() -> bool:
+    """TOOL_LAZY_IMPORT=0 时启动即导入全部工具模块"""
+    return os.getenv("TOOL_LAZY_IMPORT", "1").lower() not in ("0", "false", "no", "off")
+
+
+def create_tool_manifest() -> ToolManifest:
+    """根据环境变量 TOOL_MANIFEST_PATH 创建工具清单 (为空时不写磁盘)"""
+    return ToolManifest(os.getenv("TOOL_MANIFEST_PATH", DEFAULT_MANIFEST_PATH).strip() or None)
+
+
+_STARTUP_PROBE = """
+import time
+started = time.perf_counter()
+from mcp_client_simple import create_simple_mcp_client
+client = create_simple_mcp_client()
+client.tool_schemas()
+print((time.perf_counter() - started) * 1000)
+"""
+
+
+def measure_startup(lazy: bool, runs: int = 5) -> List[float]:
+    """
+    在新进程中测量创建客户端并生成工具描述的耗时 (毫秒)
+
+    Args:
+        lazy: 是否按清单延迟导入
+        runs: 测量次数
+
+    Returns:
+        每次的耗时
+    """
+    env = dict(os.environ, TOOL_LAZY_IMPORT="1" if lazy else "0", LOG_LEVEL="ERROR")
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", _STARTUP_PROBE], cwd=str(Path(__file__).parent),
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        samples.append(float(output.strip().splitlines()[-1]))
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WALL-E 工具清单")
+    parser.add_argument("--tools-dir", default=str(Path(__file__).parent / "mcp_servers_simple"), help="工具模块目录")
+    parser.add_argument("--compare", action="store_true", help="对比启动即导入和按清单延迟导入的启动耗时")
+    parser.add_argument("--runs", type=int, default=5, help="对比时每种方式的测量次数")
+    args = parser.parse_args()
+
+    manifest = create_tool_manifest()
+    for path in sorted(Path(args.tools_dir).glob("*.py")):
+        tools = manifest.tools(str(path))
+        if tools is None:
+            print(f"{path.name}: 无法静态解析 TOOLS,将直接导入")
+            continue
+        print(f"{path.name}: {', '.join(tools)}")
+    manifest.save()
+
+    if args.compare:
+        for label, lazy in (("启动即导入", False), ("按清单延迟导入", True)):
+            samples = sorted(measure_startup(lazy, args.runs))
+            print(f"{label}: 中位数 {samples[len(samples) // 2]:.1f}ms (最小 {samples[0]:.1f}ms, {args.runs} 次)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+WALL-E 工具函数调用描述
+从工具函数签名和文档 (mcp_servers_simple 的 TOOLS) 或 FastMCP list_tools() 的
+inputSchema 自动生成 OpenAI tools 描述,并解析模型返回的 tool_calls;
+工具改了默认值或参数,发给模型的描述随之更新,不会和代码不一致
+"""
+
+import inspect
+import json
+import os
+import re
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from logger_config import setup_logger
+
+logger = setup_logger("WALL-E.ToolSchema", level=os.getenv("LOG_LEVEL", "INFO"))
+
+_JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean", list: "array", dict: "object"}
+
+UNKNOWN_INTENT = {"tool": "unknown", "params": {}}
+
+
+def _docstring_summary(doc: str) -> str:
+    """文档中 Args/Returns 之前的部分"""
+    lines = []
+    for line in inspect.cleandoc(doc or "").splitlines():
+        if re.match(r"^(Args|Arguments|Returns|Raises):\s*$", line.strip()):
+            break
+        lines.append(line.strip())
+    return " ".join(line for line in lines if line)
+
+
+def parse_arg_docs(doc: str) -> Dict[str, str]:
+    """
+    解析 Google 风格文档中 Args: 段落的参数说明
+
+    Args:
+        doc: 函数文档
+
+    Returns:
+        参数名 → 说明
+    """
+    result: Dict[str, str] = {}
+    in_args = False
+    current = None
+    for line in inspect.cleandoc(doc or "").splitlines():
+        stripped = line.strip()
+        if re.match(r"^(Args|Arguments):\s*$", stripped):
+            in_args = True
+            continue
+        if not in_args:
+            continue
+        if re.match(r"^(Returns|Raises|Yields|Examples?):\s*$", stripped):
+            break
+        m = re.match(r"^(\w+)\s*(?:\([^)]*\))?:\s*(.*)$", stripped)
+        if m and (len(line) - len(line.lstrip())) <= 4:
+            current = m.group(1)
+            result[current] = m.group(2)
+        elif current and stripped:
+            result[current] = f"{result[current]} {stripped}".strip()
+    return result
+
+
+def _tool(name: str, description: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "type": "function",
+        "function": {"name": name, "description": description, "parameters": parameters},
+    }
+
+
+def function_schema(name: str, func: Callable) -> Dict[str, Any]:
+    """
+    根据函数签名和文档生成 OpenAI tool 描述
+
+    Args:
+        name: 工具名称
+        func: 工具函数
+
+    Returns:
+        {"type": "function", "function": {...}}
+    """
+    arg_docs = parse_arg_docs(func.__doc__)
+    properties: Dict[str, Any] = {}
+    required: List[str] = []
+    for param in inspect.signature(func).parameters.values():
+        if param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
+            continue
+        prop: Dict[str, Any] = {"type": _JSON_TYPES.get(param.annotation, "string")}
+        if param.name in arg_docs:
+            prop["description"] = arg_docs[param.name]
+        if param.default is param.empty:
+            required.append(param.name)
+        else:
+            prop["default"] = param.default
+        properties[param.name] = prop
+
+    parameters = {"type": "object", "properties": properties, "required": required}
+    return _tool(name, _docstring_summary(func.__doc__), parameters)
+
+
+def _strip_titles(schema: Any) -> Any:
+    # pydantic 生成的 title 字段对模型没有帮助,只会多占 token
+    if isinstance(schema, dict):
+        return {k: _strip_titles(v) for k, v in schema.items() if k != "title"}
+    if isinstance(schema, list):
+        return [_strip_titles(v) for v in schema]
+    return schema
+
+
+def mcp_tool_schema(tool: Any) -> Dict[str, Any]:
+    """
+    根据 FastMCP list_tools() 返回的 Tool 生成 OpenAI tool 描述
+
+    Args:
+        tool: mcp.types.Tool (name / description / inputSchema)
+
+    Returns:
+        {"type": "function", "function": {...}}
+    """
+    parameters = _strip_titles(dict(tool.inputSchema or {"type": "object", "properties": {}}))
+    parameters.setdefault("type", "object")
+    parameters.setdefault("properties", {})
+    arg_docs = parse_arg_docs(tool.description)
+    for key, prop in parameters["properties"].items():
+        if key in arg_docs and "description" not in prop:
+            prop["description"] = arg_docs[key]
+    return _tool(tool.name, _docstring_summary(tool.description), parameters)
+
+
+def describe_tools(schemas: List[Dict[str, Any]]) -> str:
+    """
+    把工具描述渲染成提示词中的工具列表 (JSON 模式使用)
+
+    Returns:
+        形如 "1. navigate(origin, destination, map_service="amap") - 说明" 的文本
+    """
+    lines = ["可用工具:"]
+    for i, schema in enumerate(schemas, 1):
+        function = schema["function"]
+        args = []
+        for key, prop in function["parameters"].get("properties", {}).items():
+            args.append(f"{key}={json.dumps(prop['default'], ensure_ascii=False)}" if "default" in prop else key)
+        lines.append(f"{i}. {function['name']}({', '.join(args)}) - {function['description']}")
+    return "\n".join(lines)
+
+
+def tool_calling_mode() -> str:
+    """
+    意图理解的调用方式 (LLM_TOOL_CALLING)
+
+    Returns:
+        native: 原生函数调用 (默认); json: JSON 模式 (接口不支持 tools 时使用)
+    """
+    mode = os.getenv("LLM_TOOL_CALLING", "native").lower()
+    return mode if mode in ("native", "json") else "native"
+
+
+def tool_request_kwargs(schemas: List[Dict[str, Any]], mode: Optional[str] = None) -> Dict[str, Any]:
+    """chat.completions.create 的附加参数"""
+    if (mode or tool_calling_mode()) == "native":
+        return {"tools": schemas, "tool_choice": "auto"}
+    return {"response_format": {"type": "json_object"}}
+
+
+def intent_from_tool_call(name: str, arguments: Optional[str]) -> Dict[str, Any]:
+    """把一次函数调用转换为 {"tool", "params"}"""
+    params = json.loads(arguments) if arguments and arguments.strip() else {}
+    if not isinstance(params, dict):
+        raise ValueError(f"工具参数不是对象: {arguments!r}")
+    return {"tool": name, "params": params}
+
+
+def _single_or_list(intents: List[Dict[str, Any]]) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+    if not intents:
+        return dict(UNKNOWN_INTENT)
+    return intents[0] if len(intents) == 1 else intents
+
+
+def intent_from_json(result: Any) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    解析 JSON 模式的输出: {"tool", "params"} 或多个需求时的 {"calls": [...]}
+
+    Returns:
+        单个意图或意图列表,格式不对时返回 unknown
+    """
+    if isinstance(result, dict) and isinstance(result.get("calls"), list):
+        calls = [c for c in result["calls"] if isinstance(c, dict) and "tool" in c]
+        for call in calls:
+            call.setdefault("params", {})
+        return _single_or_list(calls)
+    if isinstance(result, dict) and "tool" in result:
+        result.setdefault("params", {})
+        return result
+    return dict(UNKNOWN_INTENT)
+
+
+def intent_from_message(message: Any) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    从模型回复中取出意图
+
+    有 tool_calls 时取出全部函数调用;否则按 JSON 模式解析正文;
+    既没有函数调用也不是意图 JSON (模型直接回复了文字) 时视为 unknown
+
+    Args:
+        message: response.choices[0].message
+
+    Returns:
+        {"tool", "params"};一句话包含多个需求时返回它们的列表
+    """
+    tool_calls = getattr(message, "tool_calls", None)
+    if isinstance(tool_calls, list) and tool_calls:
+        return _single_or_list([
+            intent_from_tool_call(call.function.name, call.function.arguments) for call in tool_calls
+        ])
+
+    content = (message.content or "").strip()
+    try:
+        result = json.loads(content)
+    except ValueError:
+        logger.debug(f"模型没有调用工具: {content[:100]}")
+        return dict(UNKNOWN_INTENT)
+    return intent_from_json(result)
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+WALL-E 语音端点检测 (VAD)
+逐帧判断是否为语音,按可配置的拖尾静音(hangover)、开口前缓冲(pre-roll)
+和最大语音时长切分出完整语句,并记录每句话的端点检测延迟
+"""
+
+import math
+import os
+import time
+from array import array
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+from logger_config import setup_logger
+from metrics import LatencyStats
+from noise_calibration import NoiseCalibrator, create_calibrator_from_env, noise_calibration_enabled
+
+try:
+    import webrtcvad
+except ImportError:  # 可选依赖,只有使用 webrtc 后端时才需要
+    webrtcvad = None
+
+logger = setup_logger("WALL-E.VAD", level=os.getenv("LOG_LEVEL", "INFO"))
+
+_ARRAY_TYPECODES = {1: "b", 2: "h", 4: "i"}
+
+
+def frame_rms(frame: bytes, sample_width: int = 2) -> float:
+    """
+    计算一帧 PCM 音频的均方根能量
+
+    Args:
+        frame: 原始 PCM 数据 (小端有符号整数)
+        sample_width: 每个采样的字节数 (1, 2, 4)
+
+    Returns:
+        RMS 能量值
+    """
+    typecode = _ARRAY_TYPECODES.get(sample_width)
+    if typecode is None:
+        raise ValueError(f"不支持的采样宽度: {sample_width}")
+    usable = len(frame) - len(frame) % sample_width
+    if usable <= 0:
+        return 0.0
+    samples = array(typecode)
+    samples.frombytes(frame[:usable])
+    return math.sqrt(sum(s * s for s in samples) / len(samples))
+
+
+@dataclass
+class Utterance:
+    """端点检测切分出的一段语音"""
+    data: bytes
+    speech_ms: float
+    endpoint_latency_ms: float
+    truncated: bool = False
+
+
+class Endpointer:
+    """
+    端点检测器基类
+
+    子类只需实现 is_speech(frame),切分逻辑由基类统一处理
+    """
+
+    name = "base"
+
+    def __init__(
+        self,
+        sample_rate: int,
+        sample_width: int = 2,
+        hangover_ms: float = 300,
+        preroll_ms: float = 300,
+        max_utterance_ms: float = 10000,
+        min_speech_ms: float = 90,
+    ):
+        """
+        Args:
+            sample_rate: 采样率
+            sample_width: 每个采样的字节数
+            hangover_ms: 语音结束后需要持续的静音时长,超过即判定说完
+            preroll_ms: 语音开始前额外保留的音频时长
+            max_utterance_ms: 单句最大时长,超过强制切分
+            min_speech_ms: 有效语音的最短时长,更短的视为噪声丢弃
+        """
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.hangover_ms = hangover_ms
+        self.preroll_ms = preroll_ms
+        self.max_utterance_ms = max_utterance_ms
+        self.min_speech_ms = min_speech_ms
+        self.stats = LatencyStats()
+
+        self._preroll = deque()
+        self._preroll_duration = 0.0
+        self._frames = []
+        self._duration = 0.0
+        self._voiced_ms = 0.0
+        self._silence_ms = 0.0
+        self._last_voiced_at = 0.0
+        self.in_speech = False
+
+    def is_speech(self, frame: bytes) -> bool:
+        """判断一帧音频是否为语音"""
+        raise NotImplementedError
+
+    def frame_ms(self, frame: bytes) -> float:
+        return len(frame) / (self.sample_width * self.sample_rate) * 1000
+
+    def process(self, frame: bytes) -> Optional[Utterance]:
+        """
+        送入一帧音频
+
+        Returns:
+            检测到一句话结束时返回 Utterance,否则返回 None
+        """
+        duration = self.frame_ms(frame)
+        voiced = self.is_speech(frame)
+
+        if not self.in_speech:
+            if voiced:
+                self._start(frame, duration)
+            else:
+                self._remember(frame, duration)
+            return None
+
+        self._frames.append(frame)
+        self._duration += duration
+        if voiced:
+            self._voiced_ms += duration
+            self._silence_ms = 0.0
+            self._last_voiced_at = time.monotonic()
+        else:
+            self._silence_ms += duration
+
+        if self._silence_ms >= self.hangover_ms:
+            return self._finish(truncated=False)
+        if self._duration >= self.max_utterance_ms:
+            return self._finish(truncated=True)
+        return None
+
+    def current_frames(self):
+        """进行中语音已收集的帧 (含 pre-roll)"""
+        return list(self._frames)
+
+    def reset(self):
+        """丢弃进行中的语音和 pre-roll 缓冲"""
+        self._preroll.clear()
+        self._preroll_duration = 0.0
+        self._frames = []
+        self._duration = 0.0
+        self._voiced_ms = 0.0
+        self._silence_ms = 0.0
+        self.in_speech = False
+
+    def _remember(self, frame: bytes, duration: float):
+        self._preroll.append((frame, duration))
+        self._preroll_duration += duration
+        while self._preroll and self._preroll_duration - self._preroll[0][1] >= self.preroll_ms:
+            self._preroll_duration -= self._preroll.popleft()[1]
+
+    def _start(self, frame: bytes, duration: float):
+        self.in_speech = True
+        self._frames = [f for f, _ in self._preroll] + [frame]
+        self._duration = self._preroll_duration + duration
+        self._voiced_ms = duration
+        self._silence_ms = 0.0
+        self._last_voiced_at = time.monotonic()
+        self._preroll.clear()
+        self._preroll_duration = 0.0
+
+    def _finish(self, truncated: bool) -> Optional[Utterance]:
+        frames, voiced_ms = self._frames, self._voiced_ms
+        latency_ms = (time.monotonic() - self._last_voiced_at) * 1000
+        self.reset()
+
+        if voiced_ms < self.min_speech_ms:
+            logger.debug(f"语音过短 ({voiced_ms:.0f}ms),视为噪声丢弃")
+            return None
+
+        self.stats.record(latency_ms)
+        logger.info(
+            f"端点检测[{self.name}]: 语音 {voiced_ms:.0f}ms, "
+            f"端点延迟 {latency_ms:.0f}ms{' (达到最大时长)' if truncated else ''}"
+        )
+        return Utterance(b"".join(frames), voiced_ms, latency_ms, truncated)
+
+
+class EnergyEndpointer(Endpointer):
+    """
+    基于帧能量阈值的端点检测
+
+    传入 calibrator 时阈值随底噪自适应: 校准完成前的帧都视为静音,
+    之后每个非语音帧都用来更新底噪
+    """
+
+    name = "energy"
+
+    def __init__(self, sample_rate: int, sample_width: int = 2,
+                 energy_threshold: float = 300,
+                 calibrator: Optional[NoiseCalibrator] = None, **kwargs):
+        super().__init__(sample_rate, sample_width, **kwargs)
+        self.energy_threshold = energy_threshold
+        self.calibrator = calibrator
+
+    @property
+    def threshold(self) -> float:
+        """当前生效的能量阈值"""
+        if self.calibrator is not None:
+            return self.calibrator.energy_threshold
+        return self.energy_threshold
+
+    def is_speech(self, frame: bytes) -> bool:
+        rms = frame_rms(frame, self.sample_width)
+        if self.calibrator is None:
+            return rms > self.energy_threshold
+        if not self.calibrator.calibrated:
+            self.calibrator.calibrate(rms, self.frame_ms(frame))
+            return False
+        voiced = rms > self.calibrator.energy_threshold
+        if not voiced and not self.in_speech:
+            self.calibrator.observe(rms, self.frame_ms(frame))
+        return voiced
+
+
+class WebRTCEndpointer(Endpointer):
+    """
+    基于 WebRTC VAD 的端点检测 (需要安装 webrtcvad)
+
+    WebRTC VAD 只接受 8/16/32/48kHz 的 16 位单声道音频,每次 10/20/30ms;
+    输入帧会被切成 30ms 子帧,多数子帧为语音时判定整帧为语音
+    """
+
+    name = "webrtc"
+    SUPPORTED_RATES = (8000, 16000, 32000, 48000)
+    SUBFRAME_MS = 30
+
+    def __init__(self, sample_rate: int, sample_width: int = 2,
+                 aggressiveness: int = 2, **kwargs):
+        if webrtcvad is None:
+            raise ImportError("使用 webrtc 端点检测需要安装 webrtcvad: pip install webrtcvad")
+        if sample_rate not in self.SUPPORTED_RATES:
+            raise ValueError(f"WebRTC VAD 不支持采样率 {sample_rate}Hz, 可选: {self.SUPPORTED_RATES}")
+        if sample_width != 2:
+            raise ValueError("WebRTC VAD 只支持 16 位音频")
+        super().__init__(sample_rate, sample_width, **kwargs)
+        self._vad = webrtcvad.Vad(aggressiveness)
+        self._subframe_bytes = sample_rate * self.SUBFRAME_MS // 1000 * sample_width
+        self._pending = b""
+        self._last_decision = False
+
+    def is_speech(self, frame: bytes) -> bool:
+        buffer = self._pending + frame
+        voiced = total = 0
+        offset = 0
+        while offset + self._subframe_bytes <= len(buffer):
+            total += 1
+            if self._vad.is_speech(buffer[offset:offset + self._subframe_bytes], self.sample_rate):
+                voiced += 1
+            offset += self._subframe_bytes
+        self._pending = buffer[offset:]
+        if total:
+            self._last_decision = voiced * 2 >= total
+        return self._last_decision
+
+
+ENDPOINTERS = {
+    "energy": EnergyEndpointer,
+    "webrtc": WebRTCEndpointer,
+}
+
+
+def create_endpointer(backend: str, sample_rate: int, sample_width: int = 2, **kwargs) -> Endpointer:
+    """
+    按名称创建端点检测器
+
+    Args:
+        backend: 后端名称 (energy, webrtc)
+        sample_rate: 采样率
+        sample_width: 每个采样的字节数
+        **kwargs: 传给具体端点检测器的参数
+
+    Returns:
+        Endpointer 实例
+    """
+    if backend not in ENDPOINTERS:
+        raise ValueError(f"未知的端点检测后端: {backend}, 可选: {', '.join(ENDPOINTERS)}")
+    return ENDPOINTERS[backend](sample_rate, sample_width, **kwargs)
+
+
+def create_endpointer_from_env(sample_rate: int, sample_width: int = 2,
+                               device: Optional[str] = None) -> Endpointer:
+    """
+    根据环境变量 VAD_* 创建端点检测器
+
+    Args:
+        sample_rate: 采样率
+        sample_width: 每个采样的字节数
+        device: 输入设备标识;energy 后端据此加载/保存该设备的底噪档案 (NOISE_CALIBRATION)
+    """
+    backend = os.getenv("VAD_BACKEND", "energy")
+    kwargs = {
+        "hangover_ms": float(os.getenv("VAD_HANGOVER_MS", "300")),
+        "preroll_ms": float(os.getenv("VAD_PREROLL_MS", "300")),
+        "max_utterance_ms": float(os.getenv("VAD_MAX_UTTERANCE_MS", "10000")),
+    }
+    if backend == "energy":
+        kwargs["energy_threshold"] = float(os.getenv("VAD_ENERGY_THRESHOLD", "300"))
+    elif backend == "webrtc":
+        kwargs["aggressiveness"] = int(os.getenv("VAD_AGGRESSIVENESS", "2"))
+    logger.info(f"使用端点检测后端: {backend}, 参数: {kwargs}")
+    if backend == "energy" and device is not None and noise_calibration_enabled():
+        kwargs["calibrator"] = create_calibrator_from_env(device, sample_rate)
+    return create_endpointer(backend, sample_rate, sample_width, **kwargs)
@@ -6,52 +6,58 @@ WALL-E 语音导航原型
 
 import os
 import json
+from contextlib import nullcontext
 import webbrowser
 import speech_recognition as sr
-from openai import OpenAI
 from dotenv import load_dotenv
+from asr_backends import get_asr_backend
+from audio_capture import get_capture_service
+from audio_replay import prompt_replay_input, replay_exhausted
+from deadline import create_request_deadline, deadline_scope, deadline_stage, finish_deadline, restart_deadline
+from intent_rules import match_intent
+from llm_gateway import get_llm_gateway, warm_up_llm
 from logger_config import setup_logger
+from streaming_asr import listen_streaming, streaming_enabled
+from text_utils import is_exit_command
+from wake_word import get_wake_gate
 
 logger = setup_logger("WALL-E.VoiceNav", level=os.getenv("LOG_LEVEL", "INFO"))
 
 load_dotenv()
-logger.info("初始化 OpenAI 客户端...")
-client = OpenAI(
-    api_key=os.getenv("API_KEY"),
-    base_url=os.getenv("BASE_URL", "https://api.openai.com/v1")
-)
+# 所有入口共用一个长连接池的 LLM 网关,用法与 OpenAI 客户端相同
+client = get_llm_gateway()
 
 def listen():
-    """监听语音并转文字"""
-    recognizer = sr.Recognizer()
-    
-    with sr.Microphone() as source:
-        print("\n🎤 请说话...")
-        logger.info("开始监听语音输入...")
-        try:
-            audio = recognizer.listen(source, timeout=5)
-            logger.debug("音频捕获成功,开始识别...")
-            text = recognizer.recognize_google(audio, language='zh-CN')
-            logger.info(f"语音识别成功: {text}")
-            print(f"📝 识别: {text}")
-            return text
-        except sr.WaitTimeoutError:
-            logger.warning("语音监听超时,没有检测到声音")
-            print("⏰ 没听到声音")
-            return None
-        except sr.UnknownValueError:
-            logger.warning("语音识别失败,无法理解音频内容")
-            print("❌ 无法识别")
-            return None
-        except Exception as e:
-            logger.error(f"语音识别出错: {e}", exc_info=True)
-            print(f"❌ 错误: {e}")
-            return None
+    """监听语音并转文字 (复用常驻的音频采集服务,不再每次重新打开麦克风)"""
+    print("\n🎤 请说话...")
+    logger.info("开始监听语音输入...")
+    try:
+        audio = get_wake_gate(get_capture_service()).get_utterance(timeout=5)
+        # 说完才开始计算这条指令的时间预算
+        restart_deadline()
+        logger.debug("音频捕获成功,开始识别...")
+        text = get_asr_backend().recognize(audio)
+        logger.info(f"语音识别成功: {text}")
+        print(f"📝 识别: {text}")
+        return text
+    except sr.WaitTimeoutError:
+        logger.warning("语音监听超时,没有检测到声音")
+        print("⏰ 没听到声音")
+        return None
+    except sr.UnknownValueError:
+        logger.warning("语音识别失败,无法理解音频内容")
+        print("❌ 无法识别")
+        return None
+    except Exception as e:
+        logger.error(f"语音识别出错: {e}", exc_info=True)
+        print(f"❌ 错误: {e}")
+        return None
 
 def text_input():
     """文字输入"""
     try:
         text = input("\n💬 请输入(输入'退出'结束): ").strip()
+        restart_deadline()
         if text:
             logger.info(f"文字输入成功: {text}")
             print(f"📝 输入: {text}")
@@ -65,39 +71,68 @@ def get_user_input(mode):
     """根据模式获取用户输入"""
     if mode == "voice":
         return listen()
+    elif mode == "replay":
+        # 语料回放完毕后自动退出
+        return "退出" if replay_exhausted() else listen()
     else:
         return text_input()
 
-def understand(text):
-    """AI 理解用户意图"""
-    logger.info(f"开始 AI 理解用户输入: {text}")
+def understand(text, speculative=False):
+    """
+    AI 理解用户意图
+
+    speculative=True 用于流式识别中还没说完的中间结果: 规则能回答时返回 None,
+    否则只调用模型并返回结果;不输出、不计入统计,失败时直接抛出
+    """
+    logger.info(f"开始 AI 理解用户输入: {text}" + (" (推测)" if speculative else ""))
+    fast = match_intent(text, record=not speculative)
+    if speculative and fast is not None:
+        return None
+    if fast is not None:
+        # 基础版只支持导航,规则识别出的其他意图直接视为 unknown
+        if fast["tool"] == "navigate":
+            result = {"action": "nav", "from": fast["params"]["origin"], "to": fast["params"]["destination"]}
+        else:
+            result = {"action": "unknown"}
+        logger.info(f"规则快速通道命中: {result}")
+        print(f"⚡ 规则: {result}")
+        return result
     try:
         logger.debug(f"调用 LLM 模型: {os.getenv('MODEL', 'gpt-3.5-turbo')}")
-        response = client.chat.completions.create(
-            model=os.getenv("MODEL", "gpt-3.5-turbo"),
-            messages=[
-                {
-                    "role": "system",
-                    "content": """你是导航助手。用户说导航需求,提取起点终点。
+        with nullcontext() if speculative else deadline_stage("llm"):
+            response = client.chat.completions.create(
+                model=os.getenv("MODEL", "gpt-3.5-turbo"),
+                messages=[
+                    {
+                        "role": "system",
+                        "content": """你是导航助手。用户说导航需求,提取起点终点。
 返回 JSON:
 - 导航: {"action":"nav","from":"起点","to":"终点"}  
 - 其他: {"action":"unknown"}"""
-                },
-                {"role": "user", "content": text}
-            ],
-            temperature=0
-        )
+                    },
+                    {"role": "user", "content": text}
+                ],
+                temperature=0
+            )
         
         result = json.loads(response.choices[0].message.content)
+        if speculative:
+            return result
         logger.info(f"AI 理解结果: {result}")
         print(f"🤖 AI: {result}")
         return result
         
     except Exception as e:
+        if speculative:
+            raise
         logger.error(f"AI 理解失败: {e}", exc_info=True)
         print(f"❌ AI失败: {e}")
         return {"action": "unknown"}
 
+def speculate(text):
+    """流式识别中对中间结果的推测性理解 (没有副作用)"""
+    return understand(text, speculative=True)
+
 def navigate(origin, destination):
     """打开百度地图"""
     logger.info(f"执行导航: {origin} → {destination}")
@@ -113,6 +148,7 @@ def navigate(origin, destination):
 def main():
     """主程序"""
     logger.info("WALL-E 语音导航原型启动")
+    warm_up_llm()
     print("=" * 50)
     print("🤖 WALL-E 语音导航原型")
     print("支持语音输入和文字输入")
@@ -121,37 +157,53 @@ def main():
     print("\n请选择输入模式:")
     print("1. 语音输入 (按回车键)")
     print("2. 文字输入 (输入 2)")
+    print("3. 回放 WAV 语料 (输入 3)")
     
     mode_choice = input("\n选择模式 [1]: ").strip()
-    input_mode = "text" if mode_choice == "2" else "voice"
+    input_mode = {"2": "text", "3": "replay"}.get(mode_choice, "voice")
     
-    mode_text = "文字输入" if input_mode == "text" else "语音输入"
+    mode_text = {"text": "文字输入", "replay": "语料回放"}.get(input_mode, "语音输入")
     logger.info(f"用户选择输入模式: {mode_text}")
     print(f"\n✅ 已选择: {mode_text}")
+    if input_mode == "replay" and not prompt_replay_input():
+        return
+    if input_mode != "text":
+        get_asr_backend().warm_up()
     print("输入'退出'或'结束'可结束程序")
     print("=" * 50)
     
+    streaming = input_mode == "voice" and streaming_enabled()
+    if streaming:
+        logger.info("已开启流式识别,说话过程中会提前开始意图理解")
+
     logger.info("进入主循环,等待用户输入...")
     while True:
-        text = get_user_input(input_mode)
-        if not text:
-            continue
-        
-        if "退出" in text or "结束" in text:
-            logger.info("用户请求退出程序")
-            print("👋 再见!")
-            break
-        
-        intent = understand(text)
-        
-        if intent.get("action") == "nav":
-            navigate(
-                intent.get("from", "当前位置"),
-                intent.get("to", "")
-            )
-        else:
-            logger.warning("无法识别用户意图")
-            print("❓ 没听懂,请说导航指令")
+        # 每条指令一个时间预算,识别、AI 理解和工具调用依次只用剩余的时间
+        with deadline_scope(create_request_deadline()):
+            if streaming:
+                text, intent = listen_streaming(understand, speculate_fn=speculate)
+            else:
+                text, intent = get_user_input(input_mode), None
+            if not text:
+                continue
+            
+            if is_exit_command(text):
+                logger.info("用户请求退出程序")
+                print("👋 再见!")
+                break
+            
+            if intent is None:
+                intent = understand(text)
+            
+            if intent.get("action") == "nav":
+                navigate(
+                    intent.get("from", "当前位置"),
+                    intent.get("to", "")
+                )
+            else:
+                logger.warning("无法识别用户意图")
+                print("❓ 没听懂,请说导航指令")
+            finish_deadline()
     
     logger.info("WALL-E 语音导航原型已退出")
 
@@ -6,55 +6,110 @@ WALL-E 语音导航原型 (MCP 版本)
 
 import os
 import json
+from contextlib import nullcontext
 import speech_recognition as sr
-from openai import OpenAI
 from dotenv import load_dotenv
 from mcp_client import create_mcp_client
+from asr_backends import get_asr_backend
+from conversation import create_session_context
+from audio_capture import get_capture_service
+from audio_replay import prompt_replay_input, replay_exhausted
+from deadline import DeadlineExceeded, create_request_deadline, deadline_scope, deadline_stage, finish_deadline, restart_deadline
+from intent_cache import create_intent_cache, tool_fingerprint
+from intent_cascade import create_model_cascade
+from intent_router import route_intent
+from intent_rules import is_compound, match_intent
+from llm_gateway import get_llm_gateway, warm_up_llm
+from llm_stream import llm_streaming_enabled, stream_intent
 from logger_config import setup_logger
+from streaming_asr import listen_streaming, streaming_enabled
+from text_utils import is_exit_command
+from tool_executor import as_calls, create_tool_executor
+from tool_schema import describe_tools, intent_from_message, tool_calling_mode, tool_request_kwargs
+from wake_word import get_wake_gate
 
 logger = setup_logger("WALL-E.VoiceNav", level=os.getenv("LOG_LEVEL", "INFO"))
 
 load_dotenv()
-logger.info("初始化 OpenAI 客户端...")
-client = OpenAI(
-    api_key=os.getenv("API_KEY"),
-    base_url=os.getenv("BASE_URL", "https://api.openai.com/v1")
-)
+# 所有入口共用一个长连接池的 LLM 网关,用法与 OpenAI 客户端相同
+client = get_llm_gateway()
 
 logger.info("初始化 MCP 客户端...")
 mcp_client = create_mcp_client()
 
+# 启动时根据工具函数签名和文档生成一次函数调用描述,不再手写工具说明
+TOOL_SCHEMAS = mcp_client.tool_schemas()
+TOOLS_DESCRIPTION = describe_tools(TOOL_SCHEMAS)
+
+# 配置了 LLM_CASCADE_MODEL 时先问小模型,置信度低或参数不全才交给大模型
+cascade = create_model_cascade(client, TOOL_SCHEMAS)
+
+# 工具集或工具描述变化时指纹随之变化,旧的缓存自动失效
+intent_cache = create_intent_cache(
+    tool_fingerprint(mcp_client, json.dumps(TOOL_SCHEMAS, ensure_ascii=False, sort_keys=True))
+)
+
+# 一句话包含多个需求时,互不依赖的工具调用并行执行
+tool_executor = create_tool_executor(mcp_client)
+
+# 最近几轮指令和结构化状态,只在追问 ("那换成百度地图") 时发给模型
+session = create_session_context()
+
+def build_intent_messages(text, mode, context=None):
+    """构造意图理解的对话消息 (context 为追问时附带的上下文消息)"""
+    if mode == "native":
+        system = (
+            "你是 WALL-E 智能助手。根据用户需求调用合适的工具;"
+            "一句话包含多个需求时同时调用多个工具;需求不明确时不要调用工具,直接简短回复。"
+        )
+    else:
+        system = f"""你是 WALL-E 智能助手。根据用户需求选择合适的工具。
+
+{TOOLS_DESCRIPTION}
+
+返回 JSON:
+- 格式: {{"tool": "工具名", "params": {{参数字典}}}}
+- 例子: {{"tool": "navigate", "params": {{"origin": "上海", "destination": "北京"}}}}
+- 多个需求: {{"calls": [{{"tool": "工具名", "params": {{...}}}}, {{"tool": "工具名", "params": {{...}}}}]}}
+- 不明确: {{"tool": "unknown", "params": {{}}}}
+"""
+    return [
+        {"role": "system", "content": system},
+        *(context or []),
+        {"role": "user", "content": text}
+    ]
+
 def listen():
-    """监听语音并转文字"""
-    recognizer = sr.Recognizer()
-    
-    with sr.Microphone() as source:
-        print("\n🎤 请说话...")
-        logger.info("开始监听语音输入...")
-        try:
-            audio = recognizer.listen(source, timeout=5)
-            logger.debug("音频捕获成功,开始识别...")
-            text = recognizer.recognize_google(audio, language='zh-CN')
-            logger.info(f"语音识别成功: {text}")
-            print(f"📝 识别: {text}")
-            return text
-        except sr.WaitTimeoutError:
-            logger.warning("语音监听超时,没有检测到声音")
-            print("⏰ 没听到声音")
-            return None
-        except sr.UnknownValueError:
-            logger.warning("语音识别失败,无法理解音频内容")
-            print("❌ 无法识别")
-            return None
-        except Exception as e:
-            logger.error(f"语音识别出错: {e}", exc_info=True)
-            print(f"❌ 错误: {e}")
-            return None
+    """监听语音并转文字 (复用常驻的音频采集服务,不再每次重新打开麦克风)"""
+    print("\n🎤 请说话...")
+    logger.info("开始监听语音输入...")
+    try:
+        audio = get_wake_gate(get_capture_service()).get_utterance(timeout=5)
+        # 说完才开始计算这条指令的时间预算
+        restart_deadline()
+        logger.debug("音频捕获成功,开始识别...")
+        text = get_asr_backend().recognize(audio)
+        logger.info(f"语音识别成功: {text}")
+        print(f"📝 识别: {text}")
+        return text
+    except sr.WaitTimeoutError:
+        logger.warning("语音监听超时,没有检测到声音")
+        print("⏰ 没听到声音")
+        return None
+    except sr.UnknownValueError:
+        logger.warning("语音识别失败,无法理解音频内容")
+        print("❌ 无法识别")
+        return None
+    except Exception as e:
+        logger.error(f"语音识别出错: {e}", exc_info=True)
+        print(f"❌ 错误: {e}")
+        return None
 
 def text_input():
     """文字输入"""
     try:
         text = input("\n💬 请输入(输入'退出'结束): ").strip()
+        restart_deadline()
         if text:
             logger.info(f"文字输入成功: {text}")
             print(f"📝 输入: {text}")
@@ -68,54 +123,108 @@ def get_user_input(mode):
     """根据模式获取用户输入"""
     if mode == "voice":
         return listen()
+    elif mode == "replay":
+        # 语料回放完毕后自动退出
+        return "退出" if replay_exhausted() else listen()
     else:
         return text_input()
 
-def understand_with_mcp(text):
-    """AI 理解用户意图并选择 MCP 工具"""
-    logger.info(f"开始 AI 理解用户输入: {text}")
-    tools_description = """
-可用工具:
-1. navigate(origin, destination, map_service="baidu") - 地图导航
-2. search_location(query, map_service="baidu") - 搜索地点
-3. get_weather(city, date="today") - 查询天气
-4. compare_weather(city1, city2) - 对比天气
-5. play_music(song, artist="", platform="qq") - 播放音乐
-6. search_playlist(keyword, platform="qq") - 搜索歌单
-"""
+def understand_with_mcp(text, speculative=False):
+    """
+    AI 理解用户意图并选择 MCP 工具
+
+    speculative=True 用于流式识别中还没说完的中间结果: 规则、缓存或路由能回答时返回 None (说完再查只要几毫秒),
+    否则只调用模型并返回结果;不输出、不预取、不写缓存和会话,也不计入各项统计,失败时直接抛出
+    """
+    logger.info(f"开始 AI 理解用户输入: {text}" + (" (推测)" if speculative else ""))
+    # 追问依赖上一轮的内容,规则、缓存和向量路由都无法正确理解,直接交给模型
+    follow_up = session.is_follow_up(text)
+    if speculative and not follow_up and (
+        match_intent(text, record=False) is not None
+        or (intent_cache is not None and intent_cache.get(text, record=False) is not None)
+        or route_intent(text, record=False) is not None
+    ):
+        return None
+    if not follow_up and not speculative:
+        fast = match_intent(text)
+        if fast is not None:
+            logger.info(f"规则快速通道命中: tool={fast['tool']}, params={fast['params']}")
+            print(f"⚡ 规则: {fast}")
+            return fast
+        if intent_cache is not None:
+            cached = intent_cache.get(text)
+            if cached is not None:
+                logger.info(f"意图缓存命中: {cached}")
+                print(f"⚡ 缓存: {cached}")
+                return cached
+        routed = route_intent(text)
+        if routed is not None:
+            logger.info(f"向量路由命中: tool={routed['tool']}, params={routed['params']}")
+            print(f"⚡ 路由: {routed}")
+            return routed
     
     try:
         logger.debug(f"调用 LLM 模型: {os.getenv('MODEL', 'gpt-3.5-turbo')}")
-        response = client.chat.completions.create(
-            model=os.getenv("MODEL", "gpt-3.5-turbo"),
-            messages=[
-                {
-                    "role": "system",
-                    "content": f"""你是 WALL-E 智能助手。根据用户需求选择合适的工具。
-
-{tools_description}
-
-返回 JSON:
-- 格式: {{"tool": "工具名", "params": {{参数字典}}}}
-- 例子: {{"tool": "navigate", "params": {{"origin": "上海", "destination": "北京"}}}}
-- 不明确: {{"tool": "unknown", "params": {{}}}}
-"""
-                },
-                {"role": "user", "content": text}
-            ],
-            temperature=0
-        )
-        
-        result = json.loads(response.choices[0].message.content)
-        logger.info(f"AI 理解结果: tool={result.get('tool')}, params={result.get('params')}")
+        # 原生函数调用 (或 JSON 模式) 由接口保证输出格式,不需要重试或重新提示
+        # 推测与主流程并行,不占用 AI 理解阶段的计时 (请求超时仍受时间预算限制)
+        with nullcontext() if speculative else deadline_stage("llm"):
+            mode = tool_calling_mode() if TOOL_SCHEMAS else "json"
+            context = session.context_messages() if follow_up else []
+            if context:
+                logger.info(f"追问, 附带 {len(context)} 条上下文消息")
+            messages = build_intent_messages(text, mode, context)
+            usage = None
+            # 追问需要上下文才能理解,直接交给大模型
+            cascaded = cascade.classify(text, record=not speculative) if cascade is not None and not follow_up else None
+            if cascaded is not None:
+                result = cascaded
+            elif llm_streaming_enabled() and not speculative:
+                # 工具名一出现就预热工具,params 一闭合就返回去执行,不等模型输出结束
+                result = stream_intent(
+                    client, os.getenv("MODEL", "gpt-3.5-turbo"), messages,
+                    multi_call=is_compound(text),
+                    temperature=0, **tool_request_kwargs(TOOL_SCHEMAS, mode),
+                )
+            else:
+                response = client.chat.completions.create(
+                    model=os.getenv("MODEL", "gpt-3.5-turbo"),
+                    messages=messages,
+                    temperature=0,
+                    **tool_request_kwargs(TOOL_SCHEMAS, mode)
+                )
+                result = intent_from_message(response.choices[0].message)
+                usage = getattr(response, "usage", None)
+        if speculative:
+            return result
+        if cascaded is None:
+            session.record_prompt(messages, len(context), usage)
+        logger.info(f"AI 理解结果: {result}")
         print(f"🤖 AI: {result}")
+        # 追问的结果取决于上下文,不能按原文缓存
+        if intent_cache is not None and not follow_up:
+            intent_cache.put(text, result)
         return result
         
     except Exception as e:
-        logger.error(f"AI 理解失败: {e}", exc_info=True)
+        if speculative:
+            raise
+        if isinstance(e, DeadlineExceeded):
+            logger.warning(f"AI 理解跳过: {e}")
+        else:
+            logger.error(f"AI 理解失败: {e}", exc_info=True)
         print(f"❌ AI失败: {e}")
+        # 超出时间预算或调用失败时降级: 接受低置信度的规则匹配,总比没有回应好
+        fallback = match_intent(text, min_confidence=0.0, record=False)
+        if fallback is not None:
+            logger.info(f"降级到规则匹配: {fallback}")
+            print(f"⚡ 降级规则: {fallback}")
+            return fallback
         return {"tool": "unknown", "params": {}}
 
+def speculate_with_mcp(text):
+    """流式识别中对中间结果的推测性理解 (没有副作用)"""
+    return understand_with_mcp(text, speculative=True)
+
 def execute_tool(tool_name, params):
     """执行 MCP 工具"""
     if tool_name == "unknown":
@@ -133,9 +242,28 @@ def execute_tool(tool_name, params):
         logger.error(f"工具执行失败: {e}", exc_info=True)
         print(f"❌ 工具执行失败: {e}")
 
+def execute_intent(intent):
+    """执行意图: 一句话包含多个工具调用时并行执行,按原顺序输出结果"""
+    calls = [c for c in as_calls(intent) if c.get("tool") != "unknown"]
+    if len(calls) <= 1:
+        call = calls[0] if calls else {"tool": "unknown", "params": {}}
+        execute_tool(call.get("tool"), call.get("params", {}))
+        return
+    
+    names = ", ".join(c.get("tool") for c in calls)
+    logger.info(f"并行执行 {len(calls)} 个 MCP 工具: {names}")
+    print(f"🔧 并行调用 {len(calls)} 个工具: {names}")
+    for result in tool_executor.run(calls):
+        if result.error is None:
+            logger.info(f"工具 {result.tool} 执行成功 ({result.elapsed_ms:.0f}ms): {result.result}")
+            print(f"✅ [{result.tool}] {result.result}")
+        else:
+            print(f"❌ [{result.tool}] 工具执行失败: {result.error}")
+
 def main():
     """主程序"""
     logger.info("WALL-E 语音助手启动")
+    warm_up_llm()
     print("=" * 60)
     print("🤖 WALL-E 语音助手 (MCP 架构版本)")
     print("支持导航、天气、音乐等多种功能")
@@ -145,13 +273,18 @@ def main():
     print("\n请选择输入模式:")
     print("1. 语音输入 (按回车键)")
     print("2. 文字输入 (输入 2)")
+    print("3. 回放 WAV 语料 (输入 3)")
     
     mode_choice = input("\n选择模式 [1]: ").strip()
-    input_mode = "text" if mode_choice == "2" else "voice"
+    input_mode = {"2": "text", "3": "replay"}.get(mode_choice, "voice")
     
-    mode_text = "文字输入" if input_mode == "text" else "语音输入"
+    mode_text = {"text": "文字输入", "replay": "语料回放"}.get(input_mode, "语音输入")
     logger.info(f"用户选择输入模式: {mode_text}")
     print(f"\n✅ 已选择: {mode_text}")
+    if input_mode == "replay" and not prompt_replay_input():
+        return
+    if input_mode != "text":
+        get_asr_backend().warm_up()
     
     tool_count = len(set(t for t in mcp_client.list_tools() if '.' not in t))
     logger.info(f"已加载 {tool_count} 个 MCP 工具")
@@ -159,19 +292,32 @@ def main():
     print("输入'退出'或'结束'可结束程序")
     print("=" * 60)
     
+    streaming = input_mode == "voice" and streaming_enabled()
+    if streaming:
+        logger.info("已开启流式识别,说话过程中会提前开始意图理解")
+
     logger.info("进入主循环,等待用户输入...")
     while True:
-        text = get_user_input(input_mode)
-        if not text:
-            continue
-        
-        if "退出" in text or "结束" in text:
-            logger.info("用户请求退出程序")
-            print("👋 再见!")
-            break
-        
-        intent = understand_with_mcp(text)
-        execute_tool(intent.get("tool"), intent.get("params", {}))
+        # 每条指令一个时间预算,识别、AI 理解和工具调用依次只用剩余的时间
+        with deadline_scope(create_request_deadline()):
+            if streaming:
+                text, intent = listen_streaming(understand_with_mcp, speculate_fn=speculate_with_mcp)
+            else:
+                text, intent = get_user_input(input_mode), None
+            if not text:
+                continue
+            
+            if is_exit_command(text):
+                logger.info("用户请求退出程序")
+                print("👋 再见!")
+                break
+            
+            if intent is None:
+                intent = understand_with_mcp(text)
+            execute_intent(intent)
+            finish_deadline()
+            # 只记录最终执行的指令 (流式识别中途的推测结果不进入上下文)
+            session.record(text, intent)
     
     logger.info("WALL-E 语音助手已退出")
 
@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+"""
+WALL-E 唤醒词检测
+在识别器前面加一层常驻的关键词检测: 对端点检测切出的每段语音计算 MFCC,
+和录好的 "WALL-E" 模板做 DTW 模板匹配,只有唤醒之后的语音才送去识别,
+空闲时不再产生任何识别调用
+
+模板录制:
+    python wake_word.py enroll --count 3
+"""
+
+import argparse
+import atexit
+import os
+import threading
+import time
+import wave
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import speech_recognition as sr
+from audio_capture import AudioCaptureService, UtteranceStream
+from logger_config import setup_logger
+from metrics import LatencyStats, format_summary
+from vad import frame_rms
+
+try:
+    import numpy as np
+except ImportError:  # 可选依赖,只有开启唤醒词时才需要
+    np = None
+
+logger = setup_logger("WALL-E.WakeWord", level=os.getenv("LOG_LEVEL", "INFO"))
+
+FEATURE_SAMPLE_RATE = 16000
+FRAME_MS = 25
+HOP_MS = 10
+NUM_MEL_FILTERS = 26
+NUM_CEPSTRA = 13
+DEFAULT_TEMPLATE_DIR = "models/wake_word"
+
+
+def _mel_filterbank(sample_rate: int, n_fft: int, num_filters: int):
+    def hz_to_mel(hz):
+        return 2595 * np.log10(1 + hz / 700)
+
+    def mel_to_hz(mel):
+        return 700 * (10 ** (mel / 2595) - 1)
+
+    mel_points = np.linspace(hz_to_mel(0), hz_to_mel(sample_rate / 2), num_filters + 2)
+    bins = np.floor((n_fft + 1) * mel_to_hz(mel_points) / sample_rate).astype(int)
+    filters = np.zeros((num_filters, n_fft // 2 + 1))
+    for m in range(1, num_filters + 1):
+        left, center, right = bins[m - 1], bins[m], bins[m + 1]
+        for k in range(left, center):
+            filters[m - 1, k] = (k - left) / max(center - left, 1)
+        for k in range(center, right):
+            filters[m - 1, k] = (right - k) / max(right - center, 1)
+    return filters
+
+
+_FILTERBANK_CACHE = {}
+
+
+def mfcc(pcm: bytes, sample_rate: int = FEATURE_SAMPLE_RATE) -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    计算 16 位单声道 PCM 的 MFCC 特征
+
+    Args:
+        pcm: 原始 PCM 数据
+        sample_rate: 采样率
+
+    Returns:
+        (特征矩阵 [帧数, NUM_CEPSTRA - 1], 每帧对数能量);去掉 c0 并做倒谱均值归一化
+    """
+    signal = np.frombuffer(pcm, dtype="<i2").astype(np.float32)
+    frame_len = sample_rate * FRAME_MS // 1000
+    hop = sample_rate * HOP_MS // 1000
+    if len(signal) < frame_len:
+        return np.zeros((0, NUM_CEPSTRA - 1)), np.zeros(0)
+
+    signal = np.append(signal[0], signal[1:] - 0.97 * signal[:-1])
+    count = 1 + (len(signal) - frame_len) // hop
+    index = np.arange(frame_len)[None, :] + hop * np.arange(count)[:, None]
+    frames = signal[index] * np.hamming(frame_len)
+
+    n_fft = 1 << (frame_len - 1).bit_length()
+    power = np.abs(np.fft.rfft(frames, n_fft)) ** 2 / n_fft
+    key = (sample_rate, n_fft)
+    if key not in _FILTERBANK_CACHE:
+        _FILTERBANK_CACHE[key] = _mel_filterbank(sample_rate, n_fft, NUM_MEL_FILTERS)
+    mel_energy = np.log(power @ _FILTERBANK_CACHE[key].T + 1e-10)
+
+    # DCT-II
+    n = np.arange(NUM_MEL_FILTERS)
+    dct = np.cos(np.pi * np.arange(NUM_CEPSTRA)[:, None] * (2 * n + 1) / (2 * NUM_MEL_FILTERS))
+    cepstra = mel_energy @ dct.T
+    features = cepstra[:, 1:]
+    features = features - features.mean(axis=0)
+    energy = np.log(np.sum(frames ** 2, axis=1) + 1e-10)
+    return features, energy
+
+
+def voiced_range(energy, floor_db: float = 30) -> Tuple[int, int]:
+    """返回能量不低于最响帧 floor_db 的首尾帧范围 [start, end)"""
+    if len(energy) == 0:
+        return 0, 0
+    voiced = np.nonzero(energy > energy.max() - floor_db / 10 * np.log(10))[0]
+    return int(voiced[0]), int(voiced[-1]) + 1
+
+
+def trim_silence_frames(features, energy, floor_db: float = 30):
+    """去掉首尾的静音帧"""
+    start, end = voiced_range(energy, floor_db)
+    return features[start:end]
+
+
+def subsequence_dtw(template, utterance) -> Tuple[float, int]:
+    """
+    模板和语音开头部分的 DTW 匹配 (起点对齐,终点自由)
+
+    Args:
+        template: 模板特征 [n, d]
+        utterance: 语音特征 [m, d]
+
+    Returns:
+        (归一化距离, 匹配结束的帧号);无法匹配时返回 (inf, -1)
+    """
+    n, m = len(template), len(utterance)
+    if n == 0 or m < n // 2:
+        return float("inf"), -1
+    a = template / (np.linalg.norm(template, axis=1, keepdims=True) + 1e-10)
+    b = utterance / (np.linalg.norm(utterance, axis=1, keepdims=True) + 1e-10)
+    cost = 1 - a @ b.T
+
+    previous = np.cumsum(cost[0])
+    for i in range(1, n):
+        diagonal = np.concatenate(([np.inf], previous[:-1]))
+        current = cost[i] + np.minimum(previous, diagonal)
+        current[0] = previous[0] + cost[i, 0]
+        for j in range(1, m):
+            if current[j - 1] + cost[i, j] < current[j]:
+                current[j] = current[j - 1] + cost[i, j]
+        previous = current
+
+    normalized = previous / (n + np.arange(m) + 1)
+    normalized[:n // 2] = np.inf
+    end = int(np.argmin(normalized))
+    return float(normalized[end]), end
+
+
+class WakeWordDetector:
+    """基于 MFCC + DTW 模板匹配的唤醒词检测器"""
+
+    def __init__(self, templates: List[bytes], threshold: float = 0.3):
+        """
+        Args:
+            templates: 唤醒词模板 (16kHz 16 位单声道 PCM)
+            threshold: DTW 距离阈值,越小越严格
+        """
+        if np is None:
+            raise ImportError("使用唤醒词检测需要安装 numpy: pip install numpy")
+        if not templates:
+            raise ValueError("至少需要一个唤醒词模板")
+        self.threshold = threshold
+        self.templates = [trim_silence_frames(*mfcc(pcm)) for pcm in templates]
+        longest = max(len(t) for t in self.templates)
+        # 语音开头 (pre-roll + 略长于模板) 收集够就判断,不必等整句说完,唤醒延迟控制在 500ms 内
+        self.window_ms = longest * HOP_MS * 1.3 + 300
+        self.stats = LatencyStats()
+
+    @classmethod
+    def from_directory(cls, directory: str, threshold: float = 0.3) -> "WakeWordDetector":
+        """从目录加载 *.wav 模板"""
+        paths = sorted(Path(directory).glob("*.wav"))
+        if not paths:
+            raise FileNotFoundError(
+                f"没有找到唤醒词模板: {directory},请先运行 python wake_word.py enroll"
+            )
+        templates = []
+        for path in paths:
+            with sr.AudioFile(str(path)) as source:
+                audio = sr.Recognizer().record(source)
+            templates.append(audio.get_raw_data(convert_rate=FEATURE_SAMPLE_RATE, convert_width=2))
+        logger.info(f"已加载 {len(templates)} 个唤醒词模板: {directory}")
+        return cls(templates, threshold)
+
+    def detect(self, audio: sr.AudioData) -> Tuple[bool, float, Optional[float]]:
+        """
+        检测一段语音开头是否为唤醒词
+
+        Args:
+            audio: 语音开头部分
+
+        Returns:
+            (是否唤醒, 最小距离, 唤醒词结束位置(秒,相对 audio 开头))
+        """
+        started = time.perf_counter()
+        pcm = audio.get_raw_data(convert_rate=FEATURE_SAMPLE_RATE, convert_width=2)
+        features, energy = mfcc(pcm)
+        if len(energy) == 0:
+            return False, float("inf"), None
+        offset, _ = voiced_range(energy)
+        utterance = features[offset:]
+
+        best, best_end = float("inf"), -1
+        for template in self.templates:
+            distance, end = subsequence_dtw(template, utterance[:len(template) * 2])
+            if distance < best:
+                best, best_end = distance, end
+        self.stats.record((time.perf_counter() - started) * 1000)
+
+        if best > self.threshold:
+            return False, best, None
+        end_seconds = ((offset + best_end) * HOP_MS + FRAME_MS) / 1000
+        return True, best, end_seconds
+
+
+class WakeWordGate:
+    """
+    放在采集服务和识别器之间的唤醒词门控
+
+    接口与 AudioCaptureService 的 get_utterance / get_utterance_stream 相同;
+    空闲时只做本地模板匹配,唤醒后把唤醒词后面的语音 (或唤醒窗口内的下一句) 交给识别器
+    """
+
+    def __init__(
+        self,
+        capture: AudioCaptureService,
+        detector: WakeWordDetector,
+        window_seconds: float = 8.0,
+        min_command_ms: float = 200,
+        energy_threshold: float = 300,
+    ):
+        """
+        Args:
+            capture: 音频采集服务
+            detector: 唤醒词检测器
+            window_seconds: 单独说唤醒词后,等待指令的时长
+            min_command_ms: 唤醒词后面的有声部分超过这个时长才视为同一句里的指令
+            energy_threshold: 判断有声部分的能量阈值
+        """
+        self.capture = capture
+        self.detector = detector
+        self.window_seconds = window_seconds
+        self.min_command_ms = min_command_ms
+        self.energy_threshold = energy_threshold
+
+        self._awake_until = 0.0
+        self.wake_latency = LatencyStats()
+        self.utterances_seen = 0
+        self.wakes = 0
+        self.commands = 0
+
+    @property
+    def awake(self) -> bool:
+        return time.monotonic() < self._awake_until
+
+    def get_utterance_stream(self, timeout: Optional[float] = None) -> UtteranceStream:
+        """
+        获取唤醒后的下一段语音流
+
+        Raises:
+            sr.WaitTimeoutError: 超时仍未收到唤醒后的指令
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if self.awake:
+                # 唤醒窗口内的指令最多等到窗口结束
+                window = self._awake_until - time.monotonic()
+                remaining = window if remaining is None else min(remaining, window)
+            try:
+                stream = self.capture.get_utterance_stream(timeout=remaining)
+            except sr.WaitTimeoutError:
+                if not self.capture.running:
+                    raise
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise
+                continue
+            self.utterances_seen += 1
+
+            if self.awake:
+                self._awake_until = 0.0
+                self.commands += 1
+                return stream
+
+            command = self._check(stream)
+            if command is not None:
+                return command
+
+    def get_utterance(self, timeout: Optional[float] = None) -> sr.AudioData:
+        """获取唤醒后的下一段完整语音"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            audio = self.get_utterance_stream(timeout=remaining).wait()
+            if audio is not None:
+                return audio
+
+    def _check(self, stream: UtteranceStream) -> Optional[UtteranceStream]:
+        """在语音开头做唤醒词检测;唤醒词后面还有话时返回只含后半句的语音流"""
+        bytes_per_second = stream.sample_rate * stream.sample_width
+        window_bytes = int(self.detector.window_ms / 1000 * bytes_per_second)
+        frames, arrivals, size = [], [], 0
+        iterator = stream.frames()
+        for frame in iterator:
+            frames.append(frame)
+            arrivals.append(time.perf_counter())
+            size += len(frame)
+            if size >= window_bytes:
+                break
+        if not frames:
+            return None
+
+        prefix = sr.AudioData(b"".join(frames), stream.sample_rate, stream.sample_width)
+        woke, distance, end_seconds = self.detector.detect(prefix)
+        if not woke:
+            logger.debug(f"未检测到唤醒词 (距离 {distance:.3f}),忽略这段语音")
+            return None
+
+        self.wakes += 1
+        # 唤醒延迟: 唤醒词最后一帧到达 → 判定完成
+        end_byte = int(end_seconds * bytes_per_second)
+        consumed = 0
+        for frame, arrived in zip(frames, arrivals):
+            consumed += len(frame)
+            if consumed >= end_byte:
+                self.wake_latency.record((time.perf_counter() - arrived) * 1000)
+                break
+        logger.info(f"检测到唤醒词 (距离 {distance:.3f})")
+        print("👂 我在!")
+
+        data = b"".join(frames)
+        end_byte -= end_byte % stream.sample_width
+        command = UtteranceStream(stream.sample_rate, stream.sample_width)
+        command.push(data[end_byte:])
+        threading.Thread(
+            target=self._forward, args=(stream, iterator, command, data[end_byte:]),
+            name="WALL-E-WakeForward", daemon=True,
+        ).start()
+        return command
+
+    def _forward(self, stream: UtteranceStream, iterator, command: UtteranceStream, head: bytes):
+        """把唤醒词之后的帧继续转发给指令语音流"""
+        rest = [head]
+        for frame in iterator:
+            command.push(frame)
+            rest.append(frame)
+        tail = b"".join(rest)
+        if stream.discarded or self._voiced_ms(tail, stream) < self.min_command_ms:
+            # 只说了唤醒词: 丢弃这段,等待窗口内的下一句
+            self._awake_until = time.monotonic() + self.window_seconds
+            print("🎤 请说指令...")
+            command.close(None)
+        else:
+            self.commands += 1
+            command.close(tail)
+
+    def _voiced_ms(self, data: bytes, stream: UtteranceStream) -> float:
+        window = stream.sample_rate // 100 * stream.sample_width
+        voiced = sum(
+            1 for offset in range(0, len(data), window)
+            if frame_rms(data[offset:offset + window], stream.sample_width) > self.energy_threshold
+        )
+        return voiced * 10.0
+
+    def report(self) -> dict:
+        return {
+            "utterances": self.utterances_seen,
+            "wakes": self.wakes,
+            "commands": self.commands,
+            "detect": self.detector.stats.summary(),
+            "wake_latency": self.wake_latency.summary(),
+        }
+
+    def log_report(self):
+        report = self.report()
+        if not report["utterances"]:
+            return
+        logger.info(
+            f"唤醒词统计: 语音 {report['utterances']} 段, 唤醒 {report['wakes']} 次, "
+            f"送识别 {report['commands']} 段; 检测耗时 {format_summary(report['detect'])}; "
+            f"唤醒延迟 {format_summary(report['wake_latency'])}"
+        )
+
+
+def wake_word_enabled() -> bool:
+    """是否开启唤醒词 (WAKE_WORD=1)"""
+    return os.getenv("WAKE_WORD", "0").lower() in ("1", "true", "yes")
+
+
+_gate: Optional[WakeWordGate] = None
+_gate_lock = threading.Lock()
+
+
+def get_wake_gate(capture: AudioCaptureService):
+    """
+    获取语音输入来源: 开启唤醒词时返回包装了采集服务的 WakeWordGate,否则原样返回采集服务
+    """
+    global _gate
+    if not wake_word_enabled():
+        return capture
+    with _gate_lock:
+        if _gate is None or _gate.capture is not capture:
+            detector = WakeWordDetector.from_directory(
+                os.getenv("WAKE_WORD_TEMPLATES", DEFAULT_TEMPLATE_DIR),
+                threshold=float(os.getenv("WAKE_WORD_THRESHOLD", "0.3")),
+            )
+            _gate = WakeWordGate(
+                capture, detector,
+                window_seconds=float(os.getenv("WAKE_WORD_WINDOW", "8")),
+                energy_threshold=float(os.getenv("VAD_ENERGY_THRESHOLD", "300")),
+            )
+            atexit.register(_gate.log_report)
+            print("💤 已开启唤醒词,说 \"WALL-E\" 唤醒")
+        return _gate
+
+
+def _write_wav(path: Path, audio: sr.AudioData):
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(FEATURE_SAMPLE_RATE)
+        f.writeframes(audio.get_raw_data(convert_rate=FEATURE_SAMPLE_RATE, convert_width=2))
+
+
+def enroll(directory: str, count: int = 3):
+    """录制唤醒词模板,并根据模板之间的距离给出阈值建议"""
+    from audio_capture import get_capture_service
+
+    target = Path(directory)
+    target.mkdir(parents=True, exist_ok=True)
+    capture = get_capture_service()
+    recorded = []
+    for i in range(count):
+        print(f"\n🎤 ({i + 1}/{count}) 请说 \"WALL-E\"...")
+        try:
+            audio = capture.get_utterance(timeout=10)
+        except sr.WaitTimeoutError:
+            print("⏰ 没听到声音")
+            continue
+        path = target / f"template_{int(time.time())}_{i}.wav"
+        _write_wav(path, audio)
+        recorded.append(audio.get_raw_data(convert_rate=FEATURE_SAMPLE_RATE, convert_width=2))
+        print(f"💾 已保存: {path}")
+
+    if len(recorded) >= 2 and np is not None:
+        templates = [trim_silence_frames(*mfcc(pcm)) for pcm in recorded]
+        distances = [
+            subsequence_dtw(a, b[:len(a) * 2])[0]
+            for i, a in enumerate(templates) for j, b in enumerate(templates) if i != j
+        ]
+        print(f"📏 模板之间的最大距离 {max(distances):.3f},建议 WAKE_WORD_THRESHOLD={max(distances) * 1.3:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WALL-E 唤醒词模板工具")
+    parser.add_argument("command", choices=["enroll"])
+    parser.add_argument("--count", type=int, default=3, help="录制的模板数量")
+    parser.add_argument("--dir", default=os.getenv("WAKE_WORD_TEMPLATES", DEFAULT_TEMPLATE_DIR))
+    args = parser.parse_args()
+    enroll(args.dir, args.count)
+
+
+if __name__ == "__main__":
+    main()